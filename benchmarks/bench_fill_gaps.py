@@ -0,0 +1,302 @@
+# =============================================================================
+# BENCHMARK: FILL_GAPS - cross_pharm_market_analysis
+# =============================================================================
+# Файл: benchmarks/bench_fill_gaps.py
+# Дата: 2026-10-17
+# Опис: Еквівалентність та прискорення vectorized etl_utils.fill_gaps
+# =============================================================================
+
+"""
+Benchmark GAP FILLING: vectorized skeleton (np.repeat + тижневі зсуви)
+проти попередньої реалізації (iterrows + pd.date_range per group).
+
+Що перевіряється:
+    1. Еквівалентність: результат fill_gaps() побітово збігається з
+       legacy реалізацією (assert_frame_equal, check_exact=True)
+    2. Прискорення: час на 10^6+ серій (PHARM_ID, DRUGS_ID)
+
+Legacy реалізація на 10^6 серій працює хвилинами і потребує гігабайти
+пам'яті під мільйон дрібних DataFrame, тому вона запускається на
+підвибірці (--legacy-series), а час на повному обсязі екстраполюється
+лінійно. --legacy-series 0 запускає legacy на всіх серіях.
+
+Використання:
+    python benchmarks/bench_fill_gaps.py
+    python benchmarks/bench_fill_gaps.py --series 2000000 --legacy-series 50000
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Додаємо project root до sys.path для імпортів
+SCRIPT_PATH = Path(__file__).resolve()
+PROJECT_ROOT = SCRIPT_PATH.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from project_core.utility_functions.etl_utils import fill_gaps
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_SERIES = 1_000_000
+DEFAULT_LEGACY_SERIES = 20_000
+DEFAULT_SEED = 42
+
+# Горизонт даних як у реальних ринках (~3 роки тижневих даних)
+HORIZON_WEEKS = 156
+EPOCH_MONDAY = np.datetime64('2023-01-02')
+
+CATEGORICAL_COLS = ['DRUGS_NAME', 'INN_NAME', 'INN_ID', 'NFC1_ID', 'NFC_ID']
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def make_series_frame(n_series: int, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Згенерувати тижневі продажі для n_series серій (PHARM_ID, DRUGS_ID) з пропусками.
+
+    Кожна серія має 1-6 спостережень у вікні до 12 тижнів, частина
+    спостережень — дублікати дати (кілька записів на тиждень), частина
+    категоріальних значень — пропущені (NaN) для перевірки ffill/bfill.
+
+    Args:
+        n_series: Кількість серій
+        seed: Seed генератора
+
+    Returns:
+        pd.DataFrame: Датафрейм у форматі входу fill_gaps
+    """
+    rng = np.random.default_rng(seed)
+
+    n_obs = rng.integers(1, 7, n_series)
+    span = rng.integers(1, 13, n_series)
+    start = rng.integers(0, HORIZON_WEEKS - 12, n_series)
+
+    series_idx = np.repeat(np.arange(n_series), n_obs)
+    week = np.repeat(start, n_obs) + rng.integers(0, np.repeat(span, n_obs))
+
+    n_pharm = max(1, n_series // 2_000)
+    pharm_ids = series_idx % n_pharm
+    drug_ids = series_idx // n_pharm
+
+    names = np.array([f"DRUG_{i}" for i in range(1_000)], dtype=object)
+    forms = np.array(['Таблетки', 'Капсули', 'Розчини', 'Мазі'], dtype=object)
+
+    df = pd.DataFrame({
+        'PHARM_ID': pharm_ids.astype(np.int64),
+        'DRUGS_ID': drug_ids.astype(np.int64),
+        'Date': EPOCH_MONDAY + week.astype('timedelta64[W]'),
+        'Q': np.round(rng.gamma(1.5, 2.0, len(series_idx)), 2),
+        'V': np.round(rng.gamma(1.5, 200.0, len(series_idx)), 2),
+        'DRUGS_NAME': names[drug_ids % len(names)],
+        'INN_NAME': names[(drug_ids // 7) % len(names)],
+        'INN_ID': ((drug_ids // 7) % 500).astype(np.int64),
+        'NFC1_ID': forms[drug_ids % len(forms)],
+        'NFC_ID': forms[(drug_ids + 1) % len(forms)]
+    })
+
+    # Пропуски в категоріальних колонках (ffill/bfill повинні їх закрити)
+    missing = rng.random(len(df)) < 0.05
+    df.loc[missing, 'DRUGS_NAME'] = np.nan
+    df.loc[missing, 'INN_ID'] = np.nan
+
+    # Перемішуємо рядки — fill_gaps не повинен залежати від порядку входу
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def select_series(df: pd.DataFrame, n_series: int) -> pd.DataFrame:
+    """
+    Відібрати перші n_series серій (за DRUGS_ID, PHARM_ID) з датафрейму.
+
+    Args:
+        df: Датафрейм серій
+        n_series: Кількість серій
+
+    Returns:
+        pd.DataFrame: Підвибірка
+    """
+    keys = df[['DRUGS_ID', 'PHARM_ID']].drop_duplicates().sort_values(['DRUGS_ID', 'PHARM_ID'])
+    keys = keys.head(n_series)
+    return df.merge(keys, on=['DRUGS_ID', 'PHARM_ID'], how='inner')
+
+
+# =============================================================================
+# LEGACY IMPLEMENTATION (еталон для перевірки еквівалентності)
+# =============================================================================
+
+def fill_gaps_legacy(
+    df: pd.DataFrame,
+    group_cols: List[str] = ['PHARM_ID', 'DRUGS_ID'],
+    date_col: str = 'Date',
+    value_cols: List[str] = ['Q', 'V'],
+    categorical_cols: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Попередня реалізація fill_gaps (iterrows skeleton + lambda transform).
+
+    Args:
+        df: Вхідний датафрейм
+        group_cols: Колонки для групування
+        date_col: Назва колонки з датою
+        value_cols: Колонки для заповнення нулями
+        categorical_cols: Категоріальні колонки для forward fill
+
+    Returns:
+        pd.DataFrame: Датафрейм з заповненими пропусками
+    """
+    if categorical_cols is None:
+        categorical_cols = CATEGORICAL_COLS
+
+    existing_value_cols = [c for c in value_cols if c in df.columns]
+    existing_cat_cols = [c for c in categorical_cols if c in df.columns]
+
+    agg_dict = {col: 'sum' for col in existing_value_cols}
+    agg_dict.update({col: 'first' for col in existing_cat_cols})
+    all_group_keys = group_cols + [date_col]
+    df_agg = df.groupby(all_group_keys, sort=False).agg(agg_dict).reset_index()
+
+    date_ranges = df_agg.groupby(group_cols)[date_col].agg(['min', 'max']).reset_index()
+
+    skeleton_rows = []
+    for _, row in date_ranges.iterrows():
+        full_dates = pd.date_range(start=row['min'], end=row['max'], freq='7D')
+        chunk = pd.DataFrame({date_col: full_dates})
+        for col in group_cols:
+            chunk[col] = row[col]
+        skeleton_rows.append(chunk)
+
+    if not skeleton_rows:
+        return df.copy()
+
+    skeleton = pd.concat(skeleton_rows, ignore_index=True)
+    result = skeleton.merge(df_agg, on=all_group_keys, how='left')
+
+    for col in existing_value_cols:
+        result[col] = result[col].fillna(0)
+
+    if existing_cat_cols:
+        result[existing_cat_cols] = result.groupby(group_cols)[existing_cat_cols].transform(
+            lambda x: x.ffill().bfill()
+        )
+
+    return result
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def _timed(func, *args, **kwargs):
+    """Виконати функцію та повернути (результат, секунди)."""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def assert_equivalent(expected: pd.DataFrame, actual: pd.DataFrame) -> None:
+    """
+    Перевірити побітову еквівалентність результатів GAP FILLING.
+
+    Args:
+        expected: Результат legacy реалізації
+        actual: Результат fill_gaps()
+
+    Raises:
+        AssertionError: Якщо результати відрізняються
+    """
+    pd.testing.assert_frame_equal(
+        expected.reset_index(drop=True),
+        actual.reset_index(drop=True),
+        check_exact=True
+    )
+
+
+def run_benchmark(
+    n_series: int = DEFAULT_SERIES,
+    legacy_series: int = DEFAULT_LEGACY_SERIES,
+    seed: int = DEFAULT_SEED
+) -> Dict[str, float]:
+    """
+    Запустити benchmark fill_gaps.
+
+    Args:
+        n_series: Кількість серій для vectorized fill_gaps
+        legacy_series: Кількість серій для legacy (0 = всі)
+        seed: Seed генератора
+
+    Returns:
+        Dict: Метрики (часи, прискорення, розміри)
+    """
+    df = make_series_frame(n_series, seed)
+
+    result, vectorized_sec = _timed(fill_gaps, df, categorical_cols=CATEGORICAL_COLS, show_progress=False)
+
+    # Legacy + перевірка еквівалентності на (під)вибірці
+    legacy_n = n_series if legacy_series <= 0 else min(legacy_series, n_series)
+    df_legacy = df if legacy_n == n_series else select_series(df, legacy_n)
+
+    expected, legacy_sec = _timed(fill_gaps_legacy, df_legacy)
+    actual, vectorized_subset_sec = _timed(
+        fill_gaps, df_legacy, categorical_cols=CATEGORICAL_COLS, show_progress=False
+    )
+    assert_equivalent(expected, actual)
+
+    legacy_full_sec = legacy_sec * n_series / legacy_n
+
+    return {
+        'series': n_series,
+        'input_rows': len(df),
+        'output_rows': len(result),
+        'vectorized_sec': vectorized_sec,
+        'legacy_series': legacy_n,
+        'legacy_sec': legacy_sec,
+        'vectorized_subset_sec': vectorized_subset_sec,
+        'legacy_full_sec_estimated': legacy_full_sec,
+        'speedup': legacy_full_sec / vectorized_sec
+    }
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark vectorized fill_gaps vs legacy реалізації'
+    )
+    parser.add_argument('--series', type=int, default=DEFAULT_SERIES,
+                        help=f'Кількість серій (PHARM_ID, DRUGS_ID) (default: {DEFAULT_SERIES:,})')
+    parser.add_argument('--legacy-series', type=int, default=DEFAULT_LEGACY_SERIES,
+                        help=f'Серій для legacy реалізації, 0 = всі (default: {DEFAULT_LEGACY_SERIES:,})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'Seed генератора (default: {DEFAULT_SEED})')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: fill_gaps")
+    print("=" * 60)
+
+    metrics = run_benchmark(args.series, args.legacy_series, args.seed)
+
+    print(f"\nСерій: {metrics['series']:,} ({metrics['input_rows']:,} → {metrics['output_rows']:,} рядків)")
+    print(f"Еквівалентність (legacy, {metrics['legacy_series']:,} серій): OK")
+    print(f"\n  vectorized ({metrics['series']:,} серій):   {metrics['vectorized_sec']:8.2f} сек")
+    print(f"  legacy ({metrics['legacy_series']:,} серій):       {metrics['legacy_sec']:8.2f} сек")
+    print(f"  vectorized ({metrics['legacy_series']:,} серій):   {metrics['vectorized_subset_sec']:8.2f} сек")
+    if metrics['legacy_series'] < metrics['series']:
+        print(f"  legacy (екстраполяція на {metrics['series']:,}): {metrics['legacy_full_sec_estimated']:8.2f} сек")
+    print(f"\nПрискорення: x{metrics['speedup']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
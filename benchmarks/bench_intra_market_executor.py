@@ -0,0 +1,226 @@
+# =============================================================================
+# BENCHMARK: INTRA-MARKET EXECUTOR - cross_pharm_market_analysis
+# =============================================================================
+# Файл: benchmarks/bench_intra_market_executor.py
+# Дата: 2026-10-17
+# Опис: Масштабування INN-рівневого паралелізму Steps 3-4 (serial / threads / processes)
+# =============================================================================
+
+"""
+Benchmark виконавця INN-груп всередині ринку (inn_executor).
+
+Для одного обробленого ринку (Steps 1-3 вже виконані) вимірюється час
+per-INN обробки Step 3 (_process_inn_group_did) та Step 4
+(_process_inn_group_substitute) для кожного режиму INTRA_MARKET_EXECUTOR
+і кількості workers:
+    - serial — базова лінія
+    - threads — ThreadPoolExecutor (обмежений GIL на Python-рівні)
+    - processes — постійний пул процесів (spawn)
+
+Що перевіряється:
+    1. Еквівалентність: результати кожного режиму збігаються з serial
+       (ті самі записи в тому самому порядку)
+    2. Масштабування: прискорення та ефективність (прискорення / workers)
+
+Пул процесів прогрівається одним невимірюваним запуском (старт
+процесів та імпорти — одноразові на market worker). Per-INN кеш не
+використовується, артефакти не пишуться.
+
+Використання (на машині, де масштабування потрібно оцінити):
+    python benchmarks/bench_intra_market_executor.py --market-id 28670
+    python benchmarks/bench_intra_market_executor.py --market-id 28670 --workers 2 4 8 16 32
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+import pandas as pd
+
+# Додаємо project root до sys.path для імпортів
+SCRIPT_PATH = Path(__file__).resolve()
+PROJECT_ROOT = SCRIPT_PATH.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from project_core.data_config.paths_config import load_target_pharmacies
+from project_core.utility_functions.parallel_runner import ensure_import_paths
+from project_core.utility_functions.inn_executor import (
+    map_inn_groups,
+    shutdown_inn_executor
+)
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_REPEAT = 3
+
+MODES = ['threads', 'processes']
+
+
+# =============================================================================
+# WORKLOAD
+# =============================================================================
+
+def default_worker_counts() -> List[int]:
+    """Кількості workers: 2, 4, 8, ... до кількості доступних CPU."""
+    n_cpu = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    counts = []
+    n = 2
+    while n <= max(2, n_cpu):
+        counts.append(n)
+        n *= 2
+    return counts
+
+
+def build_workloads(client_id: int) -> Dict[str, Tuple[Callable[..., Any], List[tuple]]]:
+    """
+    Підготувати INN задачі Steps 3 та 4 оброблених даних ринку.
+
+    Args:
+        client_id: ID цільової аптеки (Steps 1-3 виконані)
+
+    Returns:
+        Dict: {'step3' | 'step4': (функція INN групи, задачі)}
+    """
+    import importlib
+
+    ensure_import_paths()
+    step3 = importlib.import_module('02_03_did_analysis')
+    step4 = importlib.import_module('02_04_substitute_analysis')
+
+    did_paths = step3.get_did_paths(client_id)
+    df_events = step3.load_stockout_events(client_id, did_paths)
+    step3_tasks = [
+        (inn_id, inn_events, client_id, did_paths)
+        for inn_id, inn_events in df_events.groupby('INN_ID')
+    ]
+
+    sub_paths = step4.get_substitute_paths(client_id)
+    df_did = step4.load_did_results(client_id, sub_paths)
+    df_mapping = step4.load_substitute_mapping(client_id, sub_paths)
+    mapping_by_event = {eid: grp for eid, grp in df_mapping.groupby('EVENT_ID')}
+    step4_tasks = [
+        (
+            inn_id, inn_events, client_id, sub_paths,
+            {eid: mapping_by_event[eid] for eid in inn_events['EVENT_ID'] if eid in mapping_by_event}
+        )
+        for inn_id, inn_events in df_did[df_did['INTERNAL_LIFT'] > 0].groupby('INN_ID')
+    ]
+
+    return {
+        'step3': (step3._process_inn_group_did_cached, step3_tasks),
+        'step4': (step4._process_inn_group_substitute_cached, step4_tasks)
+    }
+
+
+def results_frame(step: str, results: List[Any]) -> pd.DataFrame:
+    """Записи результатів INN у DataFrame (для порівняння режимів)."""
+    if step == 'step3':
+        records = [record for r in results for record in r['did_results'] + r['substitute_mappings']]
+    else:
+        records = [record for r in results for record in r]
+    return pd.DataFrame(records)
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def _timed_map(func: Callable[..., Any], tasks: List[tuple], mode: str, n_workers: int, repeat: int):
+    """Мінімальний час map_inn_groups з repeat запусків та результат."""
+    best = float('inf')
+    results = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = map_inn_groups(func, tasks, executor=mode, max_workers=n_workers, use_cache=False)
+        best = min(best, time.perf_counter() - start)
+    return results, best
+
+
+def run_benchmark(client_id: int, worker_counts: List[int], repeat: int = DEFAULT_REPEAT) -> List[Dict[str, Any]]:
+    """
+    Запустити benchmark для ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        worker_counts: Кількості workers для threads / processes
+        repeat: Повторів на конфігурацію (береться мінімум)
+
+    Returns:
+        List[Dict]: Рядки результатів (step, mode, workers, sec, speedup, efficiency)
+
+    Raises:
+        AssertionError: Якщо результати режиму відрізняються від serial
+    """
+    rows = []
+
+    for step, (func, tasks) in build_workloads(client_id).items():
+        expected, serial_sec = _timed_map(func, tasks, 'serial', 1, repeat)
+        expected_df = results_frame(step, expected)
+        rows.append({
+            'step': step, 'inn_groups': len(tasks), 'mode': 'serial', 'workers': 1,
+            'sec': serial_sec, 'speedup': 1.0, 'efficiency': 1.0
+        })
+
+        for mode in MODES:
+            for n_workers in worker_counts:
+                # Прогрів (старт пулу процесів, імпорти) — не вимірюється
+                map_inn_groups(func, tasks[:n_workers], executor=mode, max_workers=n_workers, use_cache=False)
+
+                results, sec = _timed_map(func, tasks, mode, n_workers, repeat)
+                assert results_frame(step, results).equals(expected_df), \
+                    f"{step} {mode}×{n_workers}: результати відрізняються від serial"
+
+                speedup = serial_sec / sec if sec > 0 else 0.0
+                rows.append({
+                    'step': step, 'inn_groups': len(tasks), 'mode': mode, 'workers': n_workers,
+                    'sec': sec, 'speedup': speedup, 'efficiency': speedup / n_workers
+                })
+
+    shutdown_inn_executor()
+    return rows
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark INN-рівневого паралелізму Steps 3-4 (serial / threads / processes)'
+    )
+    parser.add_argument('--market-id', type=int, default=None,
+                        help='CLIENT_ID обробленого ринку (default: перший з target_pharmacies)')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Кількості workers (default: 2, 4, ... до кількості CPU)')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT,
+                        help=f'Повторів на конфігурацію (default: {DEFAULT_REPEAT})')
+    args = parser.parse_args()
+
+    client_id = args.market_id if args.market_id is not None else load_target_pharmacies()[0]
+    worker_counts = args.workers or default_worker_counts()
+
+    print("=" * 60)
+    print("BENCHMARK: intra-market executor (Steps 3-4, INN groups)")
+    print("=" * 60)
+    print(f"Ринок: {client_id}")
+    print(f"CPU: {os.cpu_count()} logical, workers: {worker_counts}")
+
+    rows = run_benchmark(client_id, worker_counts, args.repeat)
+
+    print(f"\nЕквівалентність (усі режими = serial): OK\n")
+    print(f"  {'step':<6} {'INN':>5} {'mode':<10} {'workers':>7} {'sec':>9} {'speedup':>8} {'eff.':>6}")
+    for row in rows:
+        print(
+            f"  {row['step']:<6} {row['inn_groups']:>5} {row['mode']:<10} {row['workers']:>7} "
+            f"{row['sec']:>9.3f} {row['speedup']:>7.2f}x {row['efficiency']:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# =============================================================================
+# BENCHMARK: NUMERIC PARSING - cross_pharm_market_analysis
+# =============================================================================
+# Файл: benchmarks/bench_numeric_parsing.py
+# Дата: 2026-10-17
+# Опис: Еквівалентність та прискорення парсингу Q/V з десятковою комою
+# =============================================================================
+
+"""
+Benchmark парсингу Q/V raw файлів: reader з десятковою комою
+(RAW_NUMERIC_OPTIONS: decimal=',', float_precision='round_trip') проти
+попереднього шляху (читання рядками + str.replace(',', '.').astype(float)).
+
+Що перевіряється:
+    1. Еквівалентність: float64 значення побітово збігаються (порівняння
+       int64-представлень, NaN на тих самих позиціях)
+    2. Прискорення: час read_csv + convert_numeric_columns
+    3. Пам'ять: пік алокацій (tracemalloc) — рядковий шлях створює
+       Python str на кожну клітинку Q та V
+
+Синтетичний файл має формат Rd2_*.csv (';' роздільник, кома в Q/V):
+значення з 0-2 знаками після коми (як у реальних даних) та частка
+значень з довгою дробовою частиною, на яких неточні режими парсера
+відхиляються в останньому біті.
+
+Використання:
+    python benchmarks/bench_numeric_parsing.py
+    python benchmarks/bench_numeric_parsing.py --rows 5000000
+"""
+
+import sys
+import time
+import argparse
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Додаємо project root до sys.path для імпортів
+SCRIPT_PATH = Path(__file__).resolve()
+PROJECT_ROOT = SCRIPT_PATH.parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from project_core.data_config.column_mapping import NUMERIC_COLUMNS
+from project_core.data_config.paths_config import CSV_SEPARATOR
+from project_core.utility_functions.etl_utils import convert_numeric_columns
+from project_core.utility_functions.raw_ingest import RAW_NUMERIC_OPTIONS
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_ROWS = 2_000_000
+DEFAULT_SEED = 42
+
+# Частка значень з довгою дробовою частиною (до 15 знаків)
+LONG_FRACTION_SHARE = 0.05
+
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+
+def _format_decimal_comma(values: np.ndarray, decimals: np.ndarray) -> np.ndarray:
+    """
+    Форматувати числа з заданою кількістю знаків та комою замість крапки.
+
+    Args:
+        values: Значення
+        decimals: Кількість знаків після коми per значення
+
+    Returns:
+        np.ndarray: Рядки ('12,5', '3', ...)
+    """
+    text = np.empty(len(values), dtype=object)
+    for n in np.unique(decimals):
+        mask = decimals == n
+        text[mask] = [f"{v:.{n}f}".replace('.', ',') for v in values[mask]]
+    return text
+
+
+def write_raw_numeric_file(file_path: Path, n_rows: int, seed: int = DEFAULT_SEED) -> None:
+    """
+    Записати синтетичний raw файл з колонками ID, Q, V.
+
+    Args:
+        file_path: Шлях до CSV
+        n_rows: Кількість рядків
+        seed: Seed генератора
+    """
+    rng = np.random.default_rng(seed)
+
+    q = rng.gamma(1.5, 2.0, n_rows)
+    v = q * rng.uniform(20.0, 400.0, n_rows)
+
+    q_decimals = rng.integers(0, 3, n_rows)
+    v_decimals = np.full(n_rows, 2)
+    long_mask = rng.random(n_rows) < LONG_FRACTION_SHARE
+    q_decimals[long_mask] = rng.integers(3, 16, long_mask.sum())
+    v_decimals[long_mask] = rng.integers(3, 16, long_mask.sum())
+
+    df = pd.DataFrame({
+        'DRUGS_ID': rng.integers(100_000, 999_999, n_rows),
+        'Q': _format_decimal_comma(q, q_decimals),
+        'V': _format_decimal_comma(v, v_decimals)
+    })
+
+    # Пропуски (порожні клітинки) — обидва шляхи повинні дати NaN
+    df.loc[rng.random(n_rows) < 0.001, 'V'] = ''
+
+    df.to_csv(file_path, sep=CSV_SEPARATOR, index=False)
+
+
+# =============================================================================
+# PARSERS
+# =============================================================================
+
+def parse_legacy(file_path: Path) -> pd.DataFrame:
+    """Попередній шлях: Q/V рядками → str.replace(',', '.') → float."""
+    df = pd.read_csv(file_path, sep=CSV_SEPARATOR, dtype={col: str for col in NUMERIC_COLUMNS})
+    for col in NUMERIC_COLUMNS:
+        df[col] = df[col].astype(str).str.replace(',', '.').astype(float)
+    return df
+
+
+def parse_native(file_path: Path) -> pd.DataFrame:
+    """Новий шлях: reader з RAW_NUMERIC_OPTIONS → convert_numeric_columns."""
+    df = pd.read_csv(file_path, sep=CSV_SEPARATOR, **RAW_NUMERIC_OPTIONS)
+    return convert_numeric_columns(df, NUMERIC_COLUMNS, verbose=False)
+
+
+# =============================================================================
+# BENCHMARK
+# =============================================================================
+
+def _measured(func, *args):
+    """Виконати функцію та повернути (результат, секунди, пік алокацій у МБ)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def assert_bit_identical(expected: pd.DataFrame, actual: pd.DataFrame) -> None:
+    """
+    Перевірити побітову рівність Q/V (включно з позиціями NaN).
+
+    Args:
+        expected: Результат попереднього шляху
+        actual: Результат нового шляху
+
+    Raises:
+        AssertionError: Якщо хоча б одне значення відрізняється
+    """
+    for col in NUMERIC_COLUMNS:
+        assert actual[col].dtype == np.float64, f"{col}: {actual[col].dtype} != float64"
+
+        a = expected[col].to_numpy()
+        b = actual[col].to_numpy()
+        nan_a, nan_b = np.isnan(a), np.isnan(b)
+        assert np.array_equal(nan_a, nan_b), f"{col}: NaN на різних позиціях"
+
+        mismatch = a[~nan_a].view(np.int64) != b[~nan_b].view(np.int64)
+        assert not mismatch.any(), f"{col}: {int(mismatch.sum())} значень відрізняються"
+
+
+def run_benchmark(n_rows: int = DEFAULT_ROWS, seed: int = DEFAULT_SEED) -> Dict[str, float]:
+    """
+    Запустити benchmark парсингу Q/V.
+
+    Args:
+        n_rows: Кількість рядків синтетичного файлу
+        seed: Seed генератора
+
+    Returns:
+        Dict: Метрики (часи, пік пам'яті, прискорення)
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = Path(tmp_dir) / "Rd2_bench.csv"
+        write_raw_numeric_file(file_path, n_rows, seed)
+        file_mb = file_path.stat().st_size / 1024 / 1024
+
+        expected, legacy_sec, legacy_peak_mb = _measured(parse_legacy, file_path)
+        actual, native_sec, native_peak_mb = _measured(parse_native, file_path)
+
+    assert_bit_identical(expected, actual)
+
+    return {
+        'rows': n_rows,
+        'file_mb': file_mb,
+        'legacy_sec': legacy_sec,
+        'native_sec': native_sec,
+        'legacy_peak_mb': legacy_peak_mb,
+        'native_peak_mb': native_peak_mb,
+        'speedup': legacy_sec / native_sec
+    }
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark парсингу Q/V з десятковою комою (reader vs str.replace)'
+    )
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS,
+                        help=f'Кількість рядків (default: {DEFAULT_ROWS:,})')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'Seed генератора (default: {DEFAULT_SEED})')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("BENCHMARK: numeric parsing (Q, V)")
+    print("=" * 60)
+
+    metrics = run_benchmark(args.rows, args.seed)
+
+    print(f"\nРядків: {metrics['rows']:,} ({metrics['file_mb']:.1f} МБ CSV)")
+    print(f"Еквівалентність (побітово, {', '.join(NUMERIC_COLUMNS)}): OK")
+    print(f"\n  str.replace + astype: {metrics['legacy_sec']:8.2f} сек, пік {metrics['legacy_peak_mb']:8.1f} МБ")
+    print(f"  reader (decimal=','): {metrics['native_sec']:8.2f} сек, пік {metrics['native_peak_mb']:8.1f} МБ")
+    print(f"\nПрискорення: x{metrics['speedup']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
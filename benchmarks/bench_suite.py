@@ -0,0 +1,873 @@
+# =============================================================================
+# BENCHMARK SUITE - cross_pharm_market_analysis
+# =============================================================================
+# Файл: benchmarks/bench_suite.py
+# Дата: 2026-10-17
+# Опис: End-to-end бенчмарки на синтетичних ринках з порівнянням з baseline
+# =============================================================================
+
+"""
+Набір бенчмарків пайплайну з регресійним контролем.
+
+Кожен case вимірюється на синтетичних ринках (synthetic_markets) заданого
+розміру і звітує час та пропускну здатність (rows/sec, events/sec):
+
+    fill_gaps                  — etl_utils.fill_gaps (серії make_series_frame)
+    identify_stockout_periods  — Step 2, детекція stock-out по серіях препаратів
+    calculate_did_for_event    — Step 3, per-event DiD (POST-період +
+                                 find_valid_substitutes + calculate_did_for_event)
+    calculate_lifts_for_event  — Step 4, LIFT per substitute per event
+    create_excel_report        — Step 5, запис Technical Report (xlsx)
+    single_market              — Steps 1-5 одного ринку (в процесі)
+    all_markets                — run_full_pipeline.py на всіх ринках (Steps 1-5)
+
+Розміри (--sizes): small (3 ринки з 3-6 конкурентами), medium (10 ринків профілю за
+замовчуванням ≈ поточний обсяг), large (30 великих ринків).
+
+Ізоляція: project_core та exec_scripts копіюються у робочу папку
+(--workdir, за замовчуванням тимчасова), тому дані та результати репозиторію
+не змінюються — шляхи paths_config рахуються від розташування коду.
+
+Результати зберігаються у benchmarks/results/bench_{TIMESTAMP}.json і
+порівнюються з benchmarks/baseline.json: case з часом більше
+baseline × (1 + поріг) — регресія (exit code 1). Пороги — REGRESSION_THRESHOLDS.
+Порівнюються тільки cases з тим самим розміром входу (rows); baseline,
+записаний на іншій машині, порівнюється з попередженням.
+
+Використання:
+    # Швидкий набір (small) з порівнянням з baseline:
+    python benchmarks/bench_suite.py
+
+    # Кілька розмірів, тільки мікро-бенчмарки:
+    python benchmarks/bench_suite.py --sizes small medium --cases fill_gaps calculate_did_for_event
+
+    # Оновити baseline після прийнятої оптимізації:
+    python benchmarks/bench_suite.py --sizes small medium --update-baseline
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib
+import contextlib
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# =============================================================================
+# PATHS
+# =============================================================================
+
+SCRIPT_PATH = Path(__file__).resolve()
+BENCHMARKS_DIR = SCRIPT_PATH.parent
+PROJECT_ROOT = BENCHMARKS_DIR.parent
+
+BASELINE_PATH = BENCHMARKS_DIR / "baseline.json"
+RESULTS_DIR = BENCHMARKS_DIR / "results"
+
+# Код, що копіюється у робочу папку
+WORKSPACE_DIRS = ['project_core', 'exec_scripts']
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+DEFAULT_SEED = 42
+DEFAULT_REPEAT = 3
+
+# Розміри наборів: кількість ринків, профіль synthetic_markets та кількість
+# серій для fill_gaps
+SIZES = {
+    'small': {
+        'markets': 3,
+        'profile': {'competitors': (3, 6)},
+        'fill_gaps_series': 100_000
+    },
+    'medium': {
+        'markets': 10,
+        'profile': {},
+        'fill_gaps_series': 500_000
+    },
+    'large': {
+        'markets': 30,
+        'profile': {'competitors': (12, 20), 'skus_per_inn': (30, 60)},
+        'fill_gaps_series': 2_000_000
+    }
+}
+
+MICRO_CASES = [
+    'fill_gaps',
+    'identify_stockout_periods',
+    'calculate_did_for_event',
+    'calculate_lifts_for_event',
+    'create_excel_report'
+]
+PIPELINE_CASES = ['single_market', 'all_markets']
+ALL_CASES = MICRO_CASES + PIPELINE_CASES
+
+# Допустиме сповільнення відносно baseline (частка). Повні запуски мають
+# більший шум (диск, планувальник процесів), тому поріг ширший.
+REGRESSION_THRESHOLDS = {
+    'default': 0.25,
+    'single_market': 0.30,
+    'all_markets': 0.35
+}
+
+# Прискорення більше цієї частки позначається як improved
+IMPROVEMENT_THRESHOLD = 0.10
+
+# Часи коротші за цей поріг не порівнюються (шум таймера)
+MIN_COMPARABLE_SEC = 0.05
+
+
+# =============================================================================
+# WORKSPACE
+# =============================================================================
+
+def prepare_workspace(workdir: Path) -> Path:
+    """
+    Скопіювати код пайплайну у робочу папку та імпортувати project_core з неї.
+
+    Args:
+        workdir: Робоча папка бенчмарку
+
+    Returns:
+        Path: Корінь копії (PROJECT_ROOT для пайплайну)
+
+    Raises:
+        RuntimeError: Якщо project_core вже імпортовано з іншого місця
+    """
+    tree = workdir / "tree"
+    for name in WORKSPACE_DIRS:
+        target = tree / name
+        if target.exists():
+            shutil.rmtree(target)
+        shutil.copytree(
+            PROJECT_ROOT / name,
+            target,
+            ignore=shutil.ignore_patterns('__pycache__', '*.pyc')
+        )
+
+    sys.path.insert(0, str(tree))
+    import project_core
+    if Path(project_core.__file__).resolve().parent != (tree / 'project_core').resolve():
+        raise RuntimeError(f"project_core імпортовано не з робочої папки: {project_core.__file__}")
+
+    from project_core.utility_functions.parallel_runner import ensure_import_paths
+    ensure_import_paths()
+
+    return tree
+
+
+def reset_workspace_data(tree: Path) -> None:
+    """
+    Видалити дані та результати попереднього розміру в робочій папці.
+
+    Args:
+        tree: Корінь копії
+    """
+    for name in ('data', 'results'):
+        if (tree / name).exists():
+            shutil.rmtree(tree / name)
+
+
+def generate_size_data(size: str, seed: int) -> pd.DataFrame:
+    """
+    Згенерувати синтетичні ринки розміру у data/raw робочої папки.
+
+    Args:
+        size: Назва розміру (SIZES)
+        seed: Seed synthetic_markets
+
+    Returns:
+        pd.DataFrame: Статистика згенерованих ринків
+    """
+    from project_core.utility_functions.synthetic_markets import generate_markets
+
+    spec = SIZES[size]
+    return generate_markets(spec['markets'], profile=spec['profile'], seed=seed)
+
+
+@contextlib.contextmanager
+def quiet():
+    """Приховати stdout/stderr кроків пайплайну (print та tqdm)."""
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink), contextlib.redirect_stderr(sink):
+        yield sink
+
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+
+def _timed(func: Callable[[], Any], repeat: int = 1) -> Tuple[Any, float]:
+    """
+    Виконати функцію repeat разів і повернути (результат, мінімальний час).
+
+    Args:
+        func: Функція без аргументів
+        repeat: Кількість повторів
+
+    Returns:
+        Tuple (результат останнього виклику, мінімальний час у секундах)
+    """
+    best = float('inf')
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def make_record(seconds: float, rows: int, events: Optional[int] = None, repeat: int = 1) -> Dict[str, Any]:
+    """
+    Сформувати запис результату case з пропускною здатністю.
+
+    Args:
+        seconds: Час виконання (мінімум по повторах)
+        rows: Кількість оброблених рядків
+        events: Кількість оброблених подій (None — case без подій)
+        repeat: Кількість повторів
+
+    Returns:
+        Dict з seconds, rows, events, rows_per_sec, events_per_sec, repeat
+    """
+    return {
+        'seconds': round(seconds, 4),
+        'rows': int(rows),
+        'events': None if events is None else int(events),
+        'rows_per_sec': round(rows / seconds, 1) if seconds > 0 else None,
+        'events_per_sec': round(events / seconds, 1) if events is not None and seconds > 0 else None,
+        'repeat': repeat
+    }
+
+
+def _step(name: str):
+    """Імпортувати модуль кроку за назвою файлу (01_preproc, 02_03_did_analysis, ...)."""
+    return importlib.import_module(name)
+
+
+def count_market_events(client_ids: List[int]) -> int:
+    """
+    Кількість stock-out подій (вихід Step 2) по ринках.
+
+    Args:
+        client_ids: ID цільових аптек
+
+    Returns:
+        int: Сума подій
+    """
+    step3 = _step('02_03_did_analysis')
+    total = 0
+    for client_id in client_ids:
+        try:
+            total += len(step3.load_stockout_events(client_id, step3.get_did_paths(client_id)))
+        except FileNotFoundError:
+            pass
+    return total
+
+
+# =============================================================================
+# PIPELINE CASES
+# =============================================================================
+
+def bench_all_markets(tree: Path, workers: Optional[int], log_path: Path, raw_rows: int) -> Dict[str, Any]:
+    """
+    Запустити run_full_pipeline.py (preprocessing + Steps 1-5) у робочій папці.
+
+    Час — total_time Steps 1-5 з маніфесту запуску (run_manifest), без
+    preprocessing та Phase 2.
+
+    Args:
+        tree: Корінь копії
+        workers: Кількість workers (None = OPTIMAL_WORKERS)
+        log_path: Файл для виводу пайплайну
+        raw_rows: Рядки raw файлів усіх ринків
+
+    Returns:
+        Dict: Запис результату (make_record) з wall_seconds процесу
+              (rows — raw рядки, events — stock-out події)
+
+    Raises:
+        RuntimeError: Якщо пайплайн завершився з помилкою
+    """
+    from project_core.utility_functions.run_manifest import list_runs, load_run
+    from project_core.data_config.paths_config import load_target_pharmacies
+
+    command = [sys.executable, str(tree / 'exec_scripts' / 'run_full_pipeline.py'), '--force']
+    if workers is not None:
+        command += ['--workers', str(workers)]
+
+    start = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log:
+        completed = subprocess.run(command, cwd=tree, stdout=log, stderr=subprocess.STDOUT)
+    wall_seconds = time.perf_counter() - start
+
+    if completed.returncode != 0:
+        raise RuntimeError(f"run_full_pipeline.py завершився з кодом {completed.returncode} (лог: {log_path})")
+
+    runs = list_runs()
+    if not runs:
+        raise RuntimeError(f"Маніфест запуску не знайдено (лог: {log_path})")
+    summary = load_run(runs[-1])['summary']
+
+    client_ids = load_target_pharmacies()
+    record = make_record(summary['total_time'], raw_rows, count_market_events(client_ids))
+    record['wall_seconds'] = round(wall_seconds, 2)
+    record['markets'] = len(client_ids)
+    record['workers'] = summary.get('max_workers')
+    return record
+
+
+def run_preprocessing_quiet() -> None:
+    """Preprocessing у робочій папці (потрібен для Steps 1-5 без all_markets)."""
+    with quiet():
+        _step('01_preproc').run_preprocessing()
+
+
+def bench_single_market(client_id: int, raw_rows: int) -> Dict[str, Any]:
+    """
+    Steps 1-5 одного ринку в поточному процесі (process_single_market_pipeline).
+
+    Args:
+        client_id: ID цільової аптеки
+        raw_rows: Рядки raw файлу ринку
+
+    Returns:
+        Dict: Запис результату (rows — raw рядки, events — stock-out події)
+
+    Raises:
+        RuntimeError: Якщо ринок завершився з помилкою
+    """
+    from project_core.utility_functions.parallel_runner import process_single_market_pipeline
+
+    with quiet():
+        result, seconds = _timed(lambda: process_single_market_pipeline(client_id))
+
+    if result.get('status') != 'success':
+        raise RuntimeError(f"Ринок {client_id}: {result.get('status')} ({result.get('error')})")
+
+    return make_record(seconds, raw_rows, count_market_events([client_id]))
+
+
+# =============================================================================
+# MICRO CASES
+# =============================================================================
+
+def bench_fill_gaps(n_series: int, seed: int, repeat: int) -> Dict[str, Any]:
+    """
+    etl_utils.fill_gaps на n_series синтетичних серіях (PHARM_ID, DRUGS_ID).
+
+    Args:
+        n_series: Кількість серій
+        seed: Seed генератора
+        repeat: Кількість повторів
+
+    Returns:
+        Dict: Запис результату (rows — рядки входу)
+    """
+    from project_core.utility_functions.etl_utils import fill_gaps
+    from bench_fill_gaps import make_series_frame
+
+    df = make_series_frame(n_series, seed)
+    with quiet():
+        _, seconds = _timed(lambda: fill_gaps(df), repeat)
+    return make_record(seconds, len(df), repeat=repeat)
+
+
+def bench_identify_stockout_periods(client_id: int, repeat: int) -> Dict[str, Any]:
+    """
+    Step 2: identify_stockout_periods по всіх серіях препаратів TARGET аптеки.
+
+    Args:
+        client_id: ID цільової аптеки
+        repeat: Кількість повторів
+
+    Returns:
+        Dict: Запис результату (rows — тижні серій, events — знайдені stock-out періоди)
+    """
+    from project_core.utility_functions.market_store import list_store_inns, load_inn_data
+
+    step2 = _step('02_02_stockout_detection')
+
+    series = []
+    for inn_id in list_store_inns(client_id):
+        df_inn = load_inn_data(client_id, inn_id)
+        series.extend(df_drug for _, df_drug in df_inn.groupby('DRUGS_ID', sort=False))
+
+    def run() -> int:
+        return sum(len(step2.identify_stockout_periods(df_drug)) for df_drug in series)
+
+    periods, seconds = _timed(run, repeat)
+    return make_record(seconds, sum(len(df_drug) for df_drug in series), periods, repeat)
+
+
+def bench_calculate_did_for_event(client_id: int, repeat: int) -> Dict[str, Any]:
+    """
+    Step 3: per-event DiD (референсний шлях до calculate_did_batch).
+
+    Для кожної події: process_event_post_period, для валідних —
+    find_valid_substitutes + calculate_did_for_event. Читання даних INN
+    та побудова тензорів — поза вимірюванням.
+
+    Args:
+        client_id: ID цільової аптеки
+        repeat: Кількість повторів
+
+    Returns:
+        Dict: Запис результату (rows — пари подія × substitute, events — події)
+    """
+    from project_core.utility_functions.inn_tensor import build_inn_tensor
+
+    step3 = _step('02_03_did_analysis')
+    paths = step3.get_did_paths(client_id)
+    df_events = step3.load_stockout_events(client_id, paths)
+
+    tasks = []
+    for inn_id, inn_events in df_events.groupby('INN_ID'):
+        df_inn = step3.load_inn_data(inn_id, client_id, paths)
+        if df_inn.empty:
+            continue
+        inn_tensor = build_inn_tensor(df_inn[df_inn['PHARM_ID'] == client_id])
+        tasks.extend((event, df_inn, inn_tensor) for _, event in inn_events.iterrows())
+
+    def run() -> int:
+        pairs = 0
+        for event, df_inn, inn_tensor in tasks:
+            post = step3.process_event_post_period(event, df_inn, client_id)
+            if not post['POST_VALID']:
+                continue
+            substitutes = step3.find_valid_substitutes(event, df_inn, client_id, inn_tensor)
+            step3.calculate_did_for_event(event, df_inn, client_id, substitutes, inn_tensor)
+            pairs += len(substitutes)
+        return pairs
+
+    pairs, seconds = _timed(run, repeat)
+    return make_record(seconds, pairs, len(tasks), repeat)
+
+
+def bench_calculate_lifts_for_event(client_id: int, repeat: int) -> Dict[str, Any]:
+    """
+    Step 4: calculate_lifts_for_event для подій з INTERNAL_LIFT > 0.
+
+    Args:
+        client_id: ID цільової аптеки
+        repeat: Кількість повторів
+
+    Returns:
+        Dict: Запис результату (rows — LIFT записи, events — події)
+    """
+    from project_core.utility_functions.inn_tensor import build_inn_tensor
+
+    step4 = _step('02_04_substitute_analysis')
+    paths = step4.get_substitute_paths(client_id)
+    df_did = step4.load_did_results(client_id, paths)
+    df_mapping = step4.load_substitute_mapping(client_id, paths)
+
+    df_did_valid = df_did[df_did['INTERNAL_LIFT'] > 0]
+    mapping_by_event = {eid: grp for eid, grp in df_mapping.groupby('EVENT_ID')}
+
+    tasks = []
+    for inn_id, inn_events in df_did_valid.groupby('INN_ID'):
+        df_agg = step4.load_aggregation_data(client_id, inn_id, paths)
+        inn_tensor = build_inn_tensor(df_agg)
+        tasks.extend(
+            (event, mapping_by_event[event['EVENT_ID']], df_agg, inn_tensor)
+            for _, event in inn_events.iterrows()
+            if event['EVENT_ID'] in mapping_by_event
+        )
+
+    def run() -> int:
+        return sum(len(step4.calculate_lifts_for_event(*task)) for task in tasks)
+
+    lifts, seconds = _timed(run, repeat)
+    return make_record(seconds, lifts, len(tasks), repeat)
+
+
+def bench_create_excel_report(client_id: int, workdir: Path, repeat: int) -> Dict[str, Any]:
+    """
+    Step 5: create_excel_report для Technical Report ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        workdir: Робоча папка (для вихідного xlsx)
+        repeat: Кількість повторів
+
+    Returns:
+        Dict: Запис результату (rows — рядки звіту)
+    """
+    step5 = _step('02_05_reports_cross_market')
+    drugs_summary, did_results, substitute_shares = step5.load_market_data(client_id)
+    base_df = step5.prepare_base_dataframe(drugs_summary, did_results, substitute_shares)
+    report_df = step5.build_report_rows(base_df, substitute_shares, step5.ALL_TECH_COLUMNS)
+
+    output_path = workdir / f"bench_report_{client_id}.xlsx"
+
+    def run() -> None:
+        with quiet():
+            step5.create_excel_report(report_df, step5.ALL_TECH_COLUMNS, str(output_path), 'Technical Report')
+
+    _, seconds = _timed(run, repeat)
+    return make_record(seconds, len(report_df), repeat=repeat)
+
+
+# =============================================================================
+# SUITE
+# =============================================================================
+
+def run_size(
+    size: str,
+    cases: List[str],
+    tree: Path,
+    workdir: Path,
+    seed: int,
+    repeat: int,
+    workers: Optional[int]
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Виконати вибрані cases на наборі одного розміру.
+
+    Набір генерується заново; single_market виконується завжди, якщо
+    потрібні виходи Steps 2-4 (мікро-бенчмарки кроків), але записується
+    тільки коли його вибрано.
+
+    Args:
+        size: Назва розміру (SIZES)
+        cases: Вибрані cases
+        tree: Корінь копії
+        workdir: Робоча папка
+        seed: Seed даних
+        repeat: Повтори мікро-бенчмарків
+        workers: Workers для all_markets
+
+    Returns:
+        Dict {"case[size]": запис результату}
+    """
+    results = {}
+
+    def record(case: str, value: Dict[str, Any]) -> None:
+        results[f"{case}[{size}]"] = value
+        events = f", {value['events_per_sec']:,.0f} events/s" if value['events_per_sec'] is not None else ""
+        print(f"  {case:<28} {value['seconds']:>9.3f}s  {value['rows_per_sec'] or 0:>12,.0f} rows/s{events}")
+
+    if 'fill_gaps' in cases:
+        record('fill_gaps', bench_fill_gaps(SIZES[size]['fill_gaps_series'], seed, repeat))
+
+    market_cases = [case for case in cases if case != 'fill_gaps']
+    if not market_cases:
+        return results
+
+    reset_workspace_data(tree)
+    with quiet():
+        df_stats = generate_size_data(size, seed)
+    print(f"  [{size}] {len(df_stats)} ринків, {df_stats['RECORDS_COUNT'].sum():,} raw рядків")
+
+    if 'all_markets' in cases:
+        log_path = workdir / f"all_markets_{size}.log"
+        record('all_markets', bench_all_markets(tree, workers, log_path, int(df_stats['RECORDS_COUNT'].sum())))
+    else:
+        run_preprocessing_quiet()
+
+    client_id = int(df_stats['CLIENT_ID'].iloc[0])
+    client_rows = int(df_stats['RECORDS_COUNT'].iloc[0])
+    needs_outputs = [case for case in market_cases if case not in PIPELINE_CASES]
+    if 'single_market' in cases or (needs_outputs and 'all_markets' not in cases):
+        single = bench_single_market(client_id, client_rows)
+        if 'single_market' in cases:
+            record('single_market', single)
+
+    if 'identify_stockout_periods' in cases:
+        record('identify_stockout_periods', bench_identify_stockout_periods(client_id, repeat))
+    if 'calculate_did_for_event' in cases:
+        record('calculate_did_for_event', bench_calculate_did_for_event(client_id, repeat))
+    if 'calculate_lifts_for_event' in cases:
+        record('calculate_lifts_for_event', bench_calculate_lifts_for_event(client_id, repeat))
+    if 'create_excel_report' in cases:
+        record('create_excel_report', bench_create_excel_report(client_id, workdir, repeat))
+
+    return results
+
+
+def machine_info() -> Dict[str, Any]:
+    """
+    Опис машини та середовища для результату бенчмарку.
+
+    Returns:
+        Dict: platform, python, cpu_count, numpy, pandas
+    """
+    return {
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Поточний commit репозиторію (None якщо git недоступний)."""
+    try:
+        completed = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+# =============================================================================
+# BASELINE
+# =============================================================================
+
+def load_baseline(path: Path = BASELINE_PATH) -> Optional[Dict[str, Any]]:
+    """
+    Завантажити baseline (None якщо файлу немає).
+
+    Args:
+        path: Шлях до baseline.json
+
+    Returns:
+        Optional[Dict]: Вміст baseline
+    """
+    if not path.exists():
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def get_threshold(key: str) -> float:
+    """
+    Допустиме сповільнення для case (REGRESSION_THRESHOLDS).
+
+    Args:
+        key: Ключ результату "case[size]"
+
+    Returns:
+        float: Поріг як частка baseline
+    """
+    case = key.split('[', 1)[0]
+    return REGRESSION_THRESHOLDS.get(case, REGRESSION_THRESHOLDS['default'])
+
+
+def compare_with_baseline(
+    results: Dict[str, Dict[str, Any]],
+    baseline_results: Dict[str, Dict[str, Any]]
+) -> pd.DataFrame:
+    """
+    Порівняти результати з baseline.
+
+    Статуси: ok, regression (час > baseline × (1 + поріг)), improved
+    (прискорення > IMPROVEMENT_THRESHOLD), new (немає в baseline),
+    input changed (інший розмір входу — порівняння некоректне),
+    too fast (обидва часи < MIN_COMPARABLE_SEC).
+
+    Args:
+        results: Поточні результати {"case[size]": запис}
+        baseline_results: Результати baseline
+
+    Returns:
+        pd.DataFrame: CASE, BASELINE_SEC, CURRENT_SEC, CHANGE_PCT, THRESHOLD_PCT, STATUS
+    """
+    rows = []
+    for key, current in results.items():
+        base = baseline_results.get(key)
+        threshold = get_threshold(key)
+        row = {
+            'CASE': key,
+            'BASELINE_SEC': None if base is None else base['seconds'],
+            'CURRENT_SEC': current['seconds'],
+            'CHANGE_PCT': None,
+            'THRESHOLD_PCT': round(threshold * 100),
+            'STATUS': 'new'
+        }
+        if base is not None:
+            change = current['seconds'] / base['seconds'] - 1 if base['seconds'] > 0 else 0.0
+            row['CHANGE_PCT'] = round(change * 100, 1)
+            if base['rows'] != current['rows']:
+                row['STATUS'] = 'input changed'
+            elif max(base['seconds'], current['seconds']) < MIN_COMPARABLE_SEC:
+                row['STATUS'] = 'too fast'
+            elif change > threshold:
+                row['STATUS'] = 'regression'
+            elif change < -IMPROVEMENT_THRESHOLD:
+                row['STATUS'] = 'improved'
+            else:
+                row['STATUS'] = 'ok'
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def update_baseline(
+    report: Dict[str, Any],
+    baseline: Optional[Dict[str, Any]],
+    path: Path = BASELINE_PATH
+) -> None:
+    """
+    Записати результати у baseline (cases інших розмірів зберігаються).
+
+    Args:
+        report: Поточний звіт бенчмарку
+        baseline: Попередній baseline (None = новий)
+        path: Шлях до baseline.json
+    """
+    merged = dict(baseline['results']) if baseline else {}
+    merged.update(report['results'])
+    data = {
+        'created_at': report['created_at'],
+        'commit': report['commit'],
+        'machine': report['machine'],
+        'results': dict(sorted(merged.items()))
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def save_report(report: Dict[str, Any], results_dir: Path = RESULTS_DIR) -> Path:
+    """
+    Зберегти звіт запуску у benchmarks/results/bench_{TIMESTAMP}.json.
+
+    Args:
+        report: Звіт бенчмарку
+        results_dir: Папка результатів
+
+    Returns:
+        Path: Шлях до файлу
+    """
+    results_dir.mkdir(parents=True, exist_ok=True)
+    path = results_dir / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return path
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="End-to-end benchmark suite on synthetic markets with baseline regression check"
+    )
+    parser.add_argument(
+        '--sizes',
+        nargs='+',
+        choices=list(SIZES),
+        default=['small'],
+        help='Dataset sizes (default: small)'
+    )
+    parser.add_argument(
+        '--cases',
+        nargs='+',
+        choices=ALL_CASES,
+        default=ALL_CASES,
+        help='Cases to run (default: all)'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=DEFAULT_REPEAT,
+        help=f'Repeats of micro cases, minimum time is reported (default: {DEFAULT_REPEAT})'
+    )
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Data seed (default: {DEFAULT_SEED})')
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Workers of the all_markets run (default: OPTIMAL_WORKERS)'
+    )
+    parser.add_argument(
+        '--workdir',
+        type=Path,
+        default=None,
+        help='Working folder for the code copy and data (default: temporary, removed)'
+    )
+    parser.add_argument(
+        '--baseline',
+        type=Path,
+        default=BASELINE_PATH,
+        help='Baseline file (default: benchmarks/baseline.json)'
+    )
+    parser.add_argument(
+        '--update-baseline',
+        action='store_true',
+        help='Write the results into the baseline instead of failing on regressions'
+    )
+    args = parser.parse_args()
+
+    workdir = args.workdir
+    temporary = workdir is None
+    if temporary:
+        workdir = Path(tempfile.mkdtemp(prefix='pharm_bench_'))
+    workdir = workdir.resolve()
+    workdir.mkdir(parents=True, exist_ok=True)
+
+    print("=" * 60)
+    print(f"BENCHMARK SUITE: sizes {', '.join(args.sizes)}")
+    print("=" * 60)
+    print(f"  Робоча папка: {workdir}")
+
+    results = {}
+    try:
+        tree = prepare_workspace(workdir)
+        for size in args.sizes:
+            print(f"\n[{size}]")
+            results.update(run_size(size, args.cases, tree, workdir, args.seed, args.repeat, args.workers))
+    finally:
+        if temporary:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'machine': machine_info(),
+        'options': {'sizes': args.sizes, 'cases': args.cases, 'repeat': args.repeat, 'seed': args.seed},
+        'results': results
+    }
+    report_path = save_report(report)
+    print(f"\n  Результати: {report_path}")
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        update_baseline(report, baseline, args.baseline)
+        print(f"  Baseline оновлено: {args.baseline}")
+        return
+
+    if baseline is None:
+        print(f"  Baseline не знайдено ({args.baseline}) — запустіть з --update-baseline")
+        return
+
+    if baseline.get('machine', {}).get('cpu_count') != report['machine']['cpu_count'] or \
+            baseline.get('machine', {}).get('platform') != report['machine']['platform']:
+        print(f"  УВАГА: baseline записано на іншій машині ({baseline.get('machine', {}).get('platform')}, "
+              f"{baseline.get('machine', {}).get('cpu_count')} CPU) — порівняння орієнтовне")
+
+    df_compare = compare_with_baseline(results, baseline['results'])
+    print(f"\nПорівняння з baseline (commit {baseline.get('commit')}):")
+    print(df_compare.to_string(index=False))
+
+    regressions = df_compare[df_compare['STATUS'] == 'regression']
+    if not regressions.empty:
+        print(f"\n  РЕГРЕСІЯ: {', '.join(regressions['CASE'])}")
+        sys.exit(1)
+    print("\n  Регресій немає")
+
+
+if __name__ == "__main__":
+    main()
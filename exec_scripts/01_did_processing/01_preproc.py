@@ -15,6 +15,14 @@ Preprocessing скрипт для мульти-ринкового аналізу
     3. Генерація статистики per market
     4. Збереження результатів для подальших етапів
 
+Файли читаються потоково (raw_ingest.iter_raw_chunks): унікальні
+значення та статистика накопичуються по chunks, тому пам'ять не
+залежить від розміру файлу.
+
+Файли обробляються паралельно (ProcessPoolExecutor, по файлу на
+задачу); унікальні набори INN/NFC/препаратів зводяться merge-reduce
+у порядку файлів, тому результат не залежить від кількості workers.
+
 Вхід:
     data/raw/Rd2_*.csv - файли локальних ринків
 
@@ -25,19 +33,24 @@ Preprocessing скрипт для мульти-ринкового аналізу
     - nfc2_list.csv - унікальні NFC2_ID
     - drugs_list.csv - унікальні DRUGS_ID + DRUGS_NAME
     - markets_statistics.csv - статистика по кожному локальному ринку
+    - period_table.csv - унікальні PERIOD_ID → PERIOD_DATE, Date (понеділок), WEEK_IDX
 
 Використання:
     python exec_scripts/01_did_processing/01_preproc.py
+    python exec_scripts/01_did_processing/01_preproc.py --workers 1   # послідовно
 
 Див. документацію:
     docs/01_did_processing/01_0_PREPROCESSING.md
 """
 
 import sys
+import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import Dict
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 
 # Додаємо project root до sys.path для імпортів
@@ -52,7 +65,27 @@ from project_core.data_config.paths_config import (
     RAW_FILE_PATTERN,
     CSV_SEPARATOR
 )
-from project_core.utility_functions.etl_utils import parse_period_id
+from project_core.utility_functions.etl_utils import decode_period_ids, build_period_table
+from project_core.utility_functions.raw_ingest import iter_raw_chunks, RAW_TEXT_COLUMNS
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Колонки raw файлу, потрібні для preprocessing (Q та V не читаються)
+PREPROC_COLUMNS: List[str] = [
+    'CLIENT_ID', 'ORG_ID', 'PERIOD_ID', 'DRUGS_ID', 'INN_ID', 'INN',
+    'Full medication name', 'NFC Code (1)', 'NFC Code (2)'
+]
+
+# Набори унікальних значень: ключ результату → колонки raw файлу
+UNIQUE_SETS: Dict[str, List[str]] = {
+    'inn': ['INN_ID', 'INN'],
+    'nfc1': ['NFC Code (1)'],
+    'nfc2': ['NFC Code (2)'],
+    'drugs': ['DRUGS_ID', 'Full medication name']
+}
 
 
 # =============================================================================
@@ -86,34 +119,55 @@ def process_single_file(file_path: Path) -> Dict:
     """
     print(f"  Обробка: {file_path.name}")
 
-    # Завантаження даних
-    df = pd.read_csv(file_path, sep=CSV_SEPARATOR)
-
-    # Отримання CLIENT_ID (цільова аптека)
-    client_id = df['CLIENT_ID'].iloc[0]
+    client_id = None
+    records_count = 0
+    period_ids = np.array([], dtype=np.int64)
+    all_org_ids = np.array([], dtype=np.int64)
+    drugs_ids = np.array([], dtype=np.int64)
+    inn_ids = np.array([], dtype=np.int64)
+    unique_parts: Dict[str, List[pd.DataFrame]] = {key: [] for key in UNIQUE_SETS}
+
+    # Потокове читання: унікальні значення накопичуються по chunks
+    for chunk in iter_raw_chunks(file_path, columns=PREPROC_COLUMNS, rename=False):
+        # Отримання CLIENT_ID (цільова аптека)
+        if client_id is None and len(chunk) > 0:
+            client_id = chunk['CLIENT_ID'].iloc[0]
+
+        records_count += len(chunk)
+        period_ids = np.union1d(period_ids, chunk['PERIOD_ID'].unique())
+        all_org_ids = np.union1d(all_org_ids, chunk['ORG_ID'].unique())
+        drugs_ids = np.union1d(drugs_ids, chunk['DRUGS_ID'].unique())
+        inn_ids = np.union1d(inn_ids, chunk['INN_ID'].unique())
+
+        for key, columns in UNIQUE_SETS.items():
+            unique_parts[key].append(chunk[columns].drop_duplicates())
+
+    # Унікальні значення для агрегації (порядок першої появи у файлі)
+    unique_data = {
+        key: pd.concat(parts, ignore_index=True).drop_duplicates().astype(
+            {col: object for col in UNIQUE_SETS[key] if col in RAW_TEXT_COLUMNS}
+        )
+        for key, parts in unique_parts.items()
+    }
 
-    # Парсинг дат з PERIOD_ID (використовуємо функцію з project_core)
-    period_ids = df['PERIOD_ID'].unique()
-    dates = [parse_period_id(pid) for pid in period_ids]
-    data_start = min(dates)
-    data_end = max(dates)
+    # Парсинг дат з PERIOD_ID (lookup по унікальних періодах)
+    dates = decode_period_ids(period_ids, align_monday=False)
+    data_start = pd.Timestamp(dates.min())
+    data_end = pd.Timestamp(dates.max())
 
     # Статистика
-    all_org_ids = df['ORG_ID'].unique()
     competitors_count = len(all_org_ids) - 1  # Мінус цільова аптека
 
-    drugs_count = df['DRUGS_ID'].nunique()
-    inn_count = df['INN_ID'].nunique()
-    records_count = len(df)
+    drugs_count = len(drugs_ids)
+    inn_count = len(inn_ids)
 
     days_range = (data_end - data_start).days
     weeks_range = calculate_weeks(data_start, data_end)
 
-    # Унікальні значення для агрегації
-    inn_data = df[['INN_ID', 'INN']].drop_duplicates()
-    nfc1_data = df[['NFC Code (1)']].drop_duplicates()
-    nfc2_data = df[['NFC Code (2)']].drop_duplicates()
-    drugs_data = df[['DRUGS_ID', 'Full medication name']].drop_duplicates()
+    inn_data = unique_data['inn']
+    nfc1_data = unique_data['nfc1']
+    nfc2_data = unique_data['nfc2']
+    drugs_data = unique_data['drugs']
 
     return {
         'statistics': {
@@ -132,17 +186,74 @@ def process_single_file(file_path: Path) -> Dict:
         'nfc1': nfc1_data,
         'nfc2': nfc2_data,
         'drugs': drugs_data,
+        'period_ids': period_ids,
         'client_id': client_id
     }
 
 
-def run_preprocessing() -> pd.DataFrame:
+def process_files(files: List[Path], max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Обробити raw файли (паралельно по файлах).
+
+    Args:
+        files: Raw файли
+        max_workers: Кількість процесів (None = OPTIMAL_WORKERS, 1 = послідовно)
+
+    Returns:
+        List[Dict]: Результати process_single_file у порядку files
+    """
+    if max_workers is None:
+        from project_core.calculation_parameters_config.machine_parameters import OPTIMAL_WORKERS
+        max_workers = OPTIMAL_WORKERS
+
+    max_workers = max(1, min(max_workers, len(files)))
+
+    if max_workers == 1:
+        return [process_single_file(file_path) for file_path in files]
+
+    # executor.map повертає результати у порядку files
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(process_single_file, files))
+
+
+def merge_file_results(results: List[Dict]) -> Dict[str, Any]:
+    """
+    Merge-reduce результатів файлів у загальні набори.
+
+    Унікальні набори об'єднуються у порядку файлів з дедуплікацією
+    (перша поява зберігається), тому результат той самий, що й при
+    послідовній обробці.
+
+    Args:
+        results: Результати process_single_file у порядку файлів
+
+    Returns:
+        Dict: statistics, client_ids, period_ids та унікальні набори
+              (inn, nfc1, nfc2, drugs) з оригінальними назвами колонок
+    """
+    merged = {
+        'statistics': [r['statistics'] for r in results],
+        'client_ids': [r['client_id'] for r in results],
+        'period_ids': np.unique(np.concatenate([r['period_ids'] for r in results]))
+    }
+
+    for key in UNIQUE_SETS:
+        merged[key] = pd.concat([r[key] for r in results], ignore_index=True).drop_duplicates()
+
+    return merged
+
+
+def run_preprocessing(max_workers: Optional[int] = None) -> pd.DataFrame:
     """
     Основна функція preprocessing.
 
     Сканує всі CSV файли, збирає статистику та унікальні значення,
     зберігає результати.
 
+    Args:
+        max_workers: Кількість процесів для обробки файлів
+                     (None = OPTIMAL_WORKERS, 1 = послідовно)
+
     Returns:
         pd.DataFrame: Статистика по ринках
 
@@ -171,36 +282,21 @@ def run_preprocessing() -> pd.DataFrame:
     print(f"\nЗнайдено файлів: {len(files)}")
     print("-" * 60)
 
-    # Обробка файлів
-    all_statistics = []
-    all_client_ids = []
-    all_inn = []
-    all_nfc1 = []
-    all_nfc2 = []
-    all_drugs = []
-
-    for file_path in files:
-        result = process_single_file(file_path)
-
-        all_statistics.append(result['statistics'])
-        all_client_ids.append(result['client_id'])
-        all_inn.append(result['inn'])
-        all_nfc1.append(result['nfc1'])
-        all_nfc2.append(result['nfc2'])
-        all_drugs.append(result['drugs'])
+    # Обробка файлів (паралельно) + merge-reduce унікальних наборів
+    merged = merge_file_results(process_files(files, max_workers))
 
     print("-" * 60)
     print("\nАгрегація результатів...")
 
     # 1. target_pharmacies_list.csv
-    df_pharmacies = pd.DataFrame({'CLIENT_ID': all_client_ids})
+    df_pharmacies = pd.DataFrame({'CLIENT_ID': merged['client_ids']})
     df_pharmacies = df_pharmacies.drop_duplicates().sort_values('CLIENT_ID')
     pharmacies_path = PREPROC_RESULTS_PATH / "target_pharmacies_list.csv"
     df_pharmacies.to_csv(pharmacies_path, index=False)
     print(f"  Збережено: {pharmacies_path.name} ({len(df_pharmacies)} записів)")
 
     # 2. inn_list.csv
-    df_inn = pd.concat(all_inn, ignore_index=True).drop_duplicates()
+    df_inn = merged['inn']
     df_inn = df_inn.rename(columns={'INN': 'INN_NAME'})
     df_inn = df_inn.sort_values('INN_ID')
     inn_path = PREPROC_RESULTS_PATH / "inn_list.csv"
@@ -208,7 +304,7 @@ def run_preprocessing() -> pd.DataFrame:
     print(f"  Збережено: {inn_path.name} ({len(df_inn)} записів)")
 
     # 3. nfc1_list.csv
-    df_nfc1 = pd.concat(all_nfc1, ignore_index=True).drop_duplicates()
+    df_nfc1 = merged['nfc1']
     df_nfc1 = df_nfc1.rename(columns={'NFC Code (1)': 'NFC1_ID'})
     df_nfc1 = df_nfc1.sort_values('NFC1_ID')
     nfc1_path = PREPROC_RESULTS_PATH / "nfc1_list.csv"
@@ -216,7 +312,7 @@ def run_preprocessing() -> pd.DataFrame:
     print(f"  Збережено: {nfc1_path.name} ({len(df_nfc1)} записів)")
 
     # 4. nfc2_list.csv
-    df_nfc2 = pd.concat(all_nfc2, ignore_index=True).drop_duplicates()
+    df_nfc2 = merged['nfc2']
     df_nfc2 = df_nfc2.rename(columns={'NFC Code (2)': 'NFC2_ID'})
     df_nfc2 = df_nfc2.sort_values('NFC2_ID')
     nfc2_path = PREPROC_RESULTS_PATH / "nfc2_list.csv"
@@ -224,7 +320,7 @@ def run_preprocessing() -> pd.DataFrame:
     print(f"  Збережено: {nfc2_path.name} ({len(df_nfc2)} записів)")
 
     # 5. drugs_list.csv
-    df_drugs = pd.concat(all_drugs, ignore_index=True).drop_duplicates()
+    df_drugs = merged['drugs']
     df_drugs = df_drugs.rename(columns={'Full medication name': 'DRUGS_NAME'})
     df_drugs = df_drugs.sort_values('DRUGS_ID')
     drugs_path = PREPROC_RESULTS_PATH / "drugs_list.csv"
@@ -232,11 +328,17 @@ def run_preprocessing() -> pd.DataFrame:
     print(f"  Збережено: {drugs_path.name} ({len(df_drugs)} записів)")
 
     # 6. markets_statistics.csv
-    df_stats = pd.DataFrame(all_statistics)
+    df_stats = pd.DataFrame(merged['statistics'])
     stats_path = PREPROC_RESULTS_PATH / "markets_statistics.csv"
     df_stats.to_csv(stats_path, index=False)
     print(f"  Збережено: {stats_path.name} ({len(df_stats)} записів)")
 
+    # 7. period_table.csv (вимір періодів для всіх ринків)
+    df_periods = build_period_table(merged['period_ids'])
+    periods_path = PREPROC_RESULTS_PATH / "period_table.csv"
+    df_periods.to_csv(periods_path, index=False)
+    print(f"  Збережено: {periods_path.name} ({len(df_periods)} записів)")
+
     # Підсумок
     print("\n" + "=" * 60)
     print("PREPROCESSING ЗАВЕРШЕНО")
@@ -258,8 +360,19 @@ def run_preprocessing() -> pd.DataFrame:
 
 def main():
     """Головна функція CLI."""
+    parser = argparse.ArgumentParser(
+        description='Preprocessing raw файлів (довідники та статистика ринків)'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Кількість процесів для обробки файлів (default: OPTIMAL_WORKERS, 1 = послідовно)'
+    )
+    args = parser.parse_args()
+
     try:
-        run_preprocessing()
+        run_preprocessing(max_workers=args.workers)
     except FileNotFoundError as e:
         print(f"ПОМИЛКА: {e}")
         sys.exit(1)
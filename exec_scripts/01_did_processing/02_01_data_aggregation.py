@@ -9,20 +9,26 @@
 Скрипт агрегації даних для мульти-ринкового аналізу.
 
 Функціонал:
-    1. Завантаження raw даних з Rd2_{CLIENT_ID}.csv
+    1. Завантаження raw даних з Rd2_{CLIENT_ID}.csv (явні типи колонок)
     2. Перейменування та конвертація колонок
-    3. Парсинг PERIOD_ID → Date (вирівняно по понеділках)
-    4. Обробка кожного INN окремо:
+    3. Парсинг PERIOD_ID → Date (вирівняно по понеділках) + WEEK_IDX
+    4. Обробка всіх INN одним згрупованим проходом (aggregate_market_single_pass):
        - Gap filling для часових рядів
        - Тижнева агрегація
+       - NOTSOLD_PERCENT, NOTSOLD фільтр та MARKET_TOTALS
     5. Збереження результатів та статистики
 
+Великі raw файли (> RAW_INMEMORY_MAX_MB або з --chunk-size) обробляються
+потоково: chunks → spill файли per INN (raw_ingest) → той самий
+aggregate_market_single_pass по одному INN. Результат ідентичний
+in-memory шляху, пік пам'яті — один chunk або один INN.
+
 Вхід:
     data/raw/Rd2_{CLIENT_ID}.csv
 
 Вихід:
     data/processed_data/01_per_market/{CLIENT_ID}/01_aggregation_{CLIENT_ID}/
-    ├── inn_{INN_ID}_{CLIENT_ID}.csv       # Агреговані дані per INN
+    ├── inn_store_{CLIENT_ID}/             # Parquet store, партиції INN_ID={INN_ID}
     └── stats_inn_{CLIENT_ID}/
         ├── summary_{CLIENT_ID}.csv        # Зведена статистика per DRUGS_ID
         └── inn_summary_{CLIENT_ID}.csv    # Агрегована статистика per INN
@@ -33,13 +39,16 @@
 
     # Обробка всіх ринків:
     python exec_scripts/01_did_processing/02_01_data_aggregation.py --all
+
+    # Потокова обробка (chunks по 200 000 рядків):
+    python exec_scripts/01_did_processing/02_01_data_aggregation.py --market_id 28670 --chunk-size 200000
 """
 
 import sys
 import argparse
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 
 import pandas as pd
 import numpy as np
@@ -60,7 +69,8 @@ from project_core.data_config.paths_config import (
 from project_core.data_config.column_mapping import (
     COLUMN_RENAME_MAP,
     NUMERIC_COLUMNS,
-    CATEGORICAL_COLUMNS
+    CATEGORICAL_COLUMNS,
+    RAW_REQUIRED_COLUMNS
 )
 from project_core.utility_functions.etl_utils import (
     load_raw_data,
@@ -68,7 +78,21 @@ from project_core.utility_functions.etl_utils import (
     rename_columns,
     add_date_column,
     fill_gaps,
-    aggregate_weekly
+    aggregate_weekly,
+    WEEK_IDX_COL
+)
+from project_core.utility_functions.market_store import (
+    reset_market_store,
+    write_inn_partition
+)
+from project_core.utility_functions.artifact_writer import write_csv
+from project_core.utility_functions.raw_ingest import (
+    raw_dtypes,
+    RAW_NUMERIC_OPTIONS,
+    should_stream,
+    spill_raw_by_inn,
+    load_spill_inn,
+    remove_spill
 )
 from project_core.did_config.stockout_params import (
     MIN_NOTSOLD_PERCENT,
@@ -109,6 +133,19 @@ def get_aggregation_paths(client_id: int) -> Dict[str, Path]:
     }
 
 
+def get_spill_folder(client_id: int) -> Path:
+    """
+    Отримати папку spill файлів потокової агрегації (тимчасова).
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Path: 01_aggregation_{CLIENT_ID}/_spill_{CLIENT_ID}
+    """
+    return get_aggregation_paths(client_id)['aggregation_folder'] / f"_spill_{client_id}"
+
+
 def ensure_aggregation_folders(client_id: int) -> Dict[str, Path]:
     """
     Створити необхідні папки для aggregation.
@@ -150,8 +187,15 @@ def load_and_prepare_data(client_id: int) -> pd.DataFrame:
     print(f"ЗАВАНТАЖЕННЯ ДАНИХ: CLIENT_ID = {client_id}")
     print(f"{'='*60}")
 
-    # 1. Завантажити raw дані
-    df = load_raw_data(raw_file, sep=CSV_SEPARATOR)
+    # 1. Завантажити raw дані (тільки потрібні колонки, явні типи,
+    #    Q/V парсяться reader-ом з десятковою комою)
+    df = load_raw_data(
+        raw_file,
+        sep=CSV_SEPARATOR,
+        usecols=RAW_REQUIRED_COLUMNS,
+        dtype=raw_dtypes(RAW_REQUIRED_COLUMNS, text_dtype=object),
+        **RAW_NUMERIC_OPTIONS
+    )
 
     # 2. Перейменувати колонки
     df = rename_columns(df, COLUMN_RENAME_MAP)
@@ -159,8 +203,10 @@ def load_and_prepare_data(client_id: int) -> pd.DataFrame:
     # 3. Конвертувати числові колонки (Q, V)
     df = convert_numeric_columns(df, NUMERIC_COLUMNS)
 
-    # 4. Додати колонку Date з PERIOD_ID
-    df = add_date_column(df, period_col='PERIOD_ID', date_col='Date', align_monday=True)
+    # 4. Додати колонки Date та WEEK_IDX з PERIOD_ID
+    df = add_date_column(
+        df, period_col='PERIOD_ID', date_col='Date', align_monday=True, week_col=WEEK_IDX_COL
+    )
 
     print(f"\nПідготовлено: {len(df):,} рядків, {df['INN_ID'].nunique()} INN груп")
 
@@ -251,6 +297,9 @@ def process_single_inn(
     """
     Обробити один INN: gap filling + aggregation + NOTSOLD + MARKET_TOTALS + statistics.
 
+    Референсна per-INN реалізація. process_market() використовує
+    aggregate_market_single_pass(), який дає ідентичний результат для всіх INN.
+
     Як в оригінальному проекті (01_05_market_preparation.ipynb):
     1. Gap filling
     2. Weekly aggregation
@@ -280,7 +329,7 @@ def process_single_inn(
     # Weekly aggregation (вже по тижнях після gap filling)
     df_aggregated = aggregate_weekly(
         df_filled,
-        group_cols=['PHARM_ID', 'DRUGS_ID', 'Date'],
+        group_cols=['PHARM_ID', 'DRUGS_ID', 'Date', WEEK_IDX_COL],
         sum_cols=['Q', 'V'],
         first_cols=['DRUGS_NAME', 'INN_NAME', 'INN_ID', 'NFC1_ID', 'NFC_ID']
     )
@@ -408,65 +457,313 @@ def calculate_inn_statistics(
     return pd.DataFrame(stats_list)
 
 
-def process_market(client_id: int) -> Dict:
+# =============================================================================
+# SINGLE-PASS ENGINE (всі INN за один прохід)
+# =============================================================================
+
+# Ключ серії у single-pass режимі: INN_ID замість циклу по INN
+SERIES_KEYS = ['INN_ID', 'PHARM_ID', 'DRUGS_ID']
+
+# Порядок колонок фінального датафрейму (як у process_single_inn)
+OUTPUT_COLUMNS = [
+    'PHARM_ID', 'DRUGS_ID', 'Date', WEEK_IDX_COL, 'Q', 'V',
+    'DRUGS_NAME', 'INN_NAME', 'INN_ID', 'NFC1_ID', 'NFC_ID',
+    'NOTSOLD_PERCENT', 'MARKET_TOTAL_DRUGS_PACK', 'MARKET_TOTAL_DRUGS_REVENUE'
+]
+
+
+def aggregate_market_single_pass(
+    df: pd.DataFrame,
+    client_id: int
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Обробити всі INN ринку одним згрупованим проходом.
+
+    Векторизований еквівалент циклу process_single_inn() по INN:
+    gap filling, тижнева агрегація, NOTSOLD_PERCENT, NOTSOLD фільтр та
+    MARKET_TOTALS рахуються на всьому ринку з INN_ID як частиною ключа
+    групування. Результат для кожного INN ідентичний process_single_inn().
+
+    Args:
+        df: Підготовлені raw дані ринку (вихід load_and_prepare_data)
+        client_id: ID цільової аптеки
+
+    Returns:
+        Tuple[final_df, stats_df]: Фінальні дані (тільки TARGET, всі INN,
+            відсортовані по INN_ID, DRUGS_ID, Date) та статистика per DRUGS_ID
+    """
+    inn_order = pd.unique(df['INN_ID'])
+
+    # =========================================
+    # Gap filling + тижнева агрегація
+    # =========================================
+    # Після gap filling ключ (INN, PHARM, DRUGS, Date) унікальний, тому
+    # тижнева агрегація зводиться до сортування
+    df_filled = fill_gaps(
+        df,
+        group_cols=SERIES_KEYS,
+        date_col='Date',
+        value_cols=['Q', 'V'],
+        categorical_cols=CATEGORICAL_COLUMNS,
+        show_progress=False
+    )
+    df_aggregated = df_filled.sort_values(
+        SERIES_KEYS + [WEEK_IDX_COL], kind='mergesort'
+    ).reset_index(drop=True)
+
+    # =========================================
+    # Розділення на Target / Competitors
+    # =========================================
+    is_target = df_aggregated['PHARM_ID'] == client_id
+    df_target = df_aggregated[is_target]
+    df_competitors = df_aggregated[~is_target]
+
+    # =========================================
+    # NOTSOLD_PERCENT (для TARGET) + фільтр
+    # =========================================
+    drug_keys = [df_target['INN_ID'], df_target['DRUGS_ID']]
+    total_weeks = df_target['Q'].groupby(drug_keys, sort=False).transform('count')
+    zero_weeks = df_target['Q'].eq(0).groupby(drug_keys, sort=False).transform('sum')
+    notsold = zero_weeks / total_weeks
+
+    is_valid = (notsold >= MIN_NOTSOLD_PERCENT) & (notsold <= MAX_NOTSOLD_PERCENT)
+    df_target = df_target[is_valid].assign(NOTSOLD_PERCENT=notsold[is_valid])
+
+    valid_keys = pd.MultiIndex.from_frame(df_target[['INN_ID', 'DRUGS_ID']].drop_duplicates())
+    competitor_keys = pd.MultiIndex.from_frame(df_competitors[['INN_ID', 'DRUGS_ID']])
+    df_competitors = df_competitors[competitor_keys.isin(valid_keys)]
+
+    # =========================================
+    # MARKET_TOTALS (з COMPETITORS) + об'єднання
+    # =========================================
+    # Ключ тижня — цілочисельний WEEK_IDX (взаємно однозначний з Date)
+    market_totals = df_competitors.groupby(
+        ['INN_ID', WEEK_IDX_COL, 'DRUGS_ID'], sort=False
+    )[['Q', 'V']].sum().reset_index()
+    market_totals.columns = [
+        'INN_ID', WEEK_IDX_COL, 'DRUGS_ID',
+        'MARKET_TOTAL_DRUGS_PACK', 'MARKET_TOTAL_DRUGS_REVENUE'
+    ]
+
+    df_final = df_target.merge(
+        market_totals,
+        on=['INN_ID', WEEK_IDX_COL, 'DRUGS_ID'],
+        how='left'
+    )
+    df_final['MARKET_TOTAL_DRUGS_PACK'] = df_final['MARKET_TOTAL_DRUGS_PACK'].fillna(0)
+    df_final['MARKET_TOTAL_DRUGS_REVENUE'] = df_final['MARKET_TOTAL_DRUGS_REVENUE'].fillna(0)
+    df_final = df_final[OUTPUT_COLUMNS]
+
+    # Статистика
+    stats = calculate_market_inn_statistics(df_final, inn_order, client_id)
+
+    return df_final, stats
+
+
+def calculate_market_inn_statistics(
+    df_target: pd.DataFrame,
+    inn_order: np.ndarray,
+    client_id: int
+) -> pd.DataFrame:
+    """
+    Векторизована calculate_inn_statistics() для всіх INN ринку.
+
+    Args:
+        df_target: TARGET дані всіх INN, відсортовані по INN_ID, DRUGS_ID, Date
+        inn_order: Порядок INN (як у циклі process_market)
+        client_id: ID цільової аптеки
+
+    Returns:
+        pd.DataFrame: Статистика (один рядок per INN_ID + DRUGS_ID)
+    """
+    if df_target.empty:
+        return pd.DataFrame()
+
+    # Межі груп (INN_ID, DRUGS_ID) у відсортованому датафреймі
+    inn_ids = df_target['INN_ID'].to_numpy()
+    drug_ids = df_target['DRUGS_ID'].to_numpy()
+    is_start = np.ones(len(df_target), dtype=bool)
+    is_start[1:] = (inn_ids[1:] != inn_ids[:-1]) | (drug_ids[1:] != drug_ids[:-1])
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], len(df_target))
+
+    dates = df_target['Date'].to_numpy()
+    q = df_target['Q'].to_numpy()
+    date_start = pd.to_datetime(dates[starts])
+    date_end = pd.to_datetime(dates[ends - 1])
+
+    weeks_total = ends - starts
+    weeks_with_sales = np.add.reduceat((q > 0).astype(np.int64), starts)
+
+    stats = pd.DataFrame({
+        'CLIENT_ID': client_id,
+        'INN_ID': inn_ids[starts],
+        'INN_NAME': df_target['INN_NAME'].to_numpy()[starts],
+        'DRUGS_ID': drug_ids[starts],
+        'DRUGS_NAME': df_target['DRUGS_NAME'].to_numpy()[starts],
+        'DATE_START': date_start.strftime('%Y-%m-%d'),
+        'DATE_END': date_end.strftime('%Y-%m-%d'),
+        'DATE_DIFF': (date_end - date_start).days + 1,
+        'WEEKS_TOTAL': weeks_total,
+        'WEEKS_WITH_SALES': weeks_with_sales,
+        'SALES_RATIO': np.round(weeks_with_sales / weeks_total, 3),
+        # Сума по зрізу (як Series.sum у calculate_inn_statistics) — побітово той самий результат
+        'TOTAL_Q': [q[start:end].sum() for start, end in zip(starts, ends)]
+    })
+
+    # Порядок INN як у циклі по df['INN_ID'].unique()
+    inn_rank = pd.Series(np.arange(len(inn_order)), index=inn_order)
+    stats = stats.iloc[np.argsort(inn_rank.loc[stats['INN_ID']].to_numpy(), kind='stable')]
+
+    return stats.reset_index(drop=True)
+
+
+def iter_market_inns(client_id: int) -> Tuple[np.ndarray, Iterator[Tuple[int, pd.DataFrame, pd.DataFrame]]]:
+    """
+    In-memory агрегація ринку: весь raw файл, один прохід по всіх INN.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Tuple[inn_ids, iterator]: INN у порядку raw файлу та ітератор
+            (inn_id, агреговані дані INN, статистика INN)
+    """
+    df = load_and_prepare_data(client_id)
+    inn_ids = df['INN_ID'].unique()
+
+    # Обробка всіх INN одним проходом
+    df_market, stats_df = aggregate_market_single_pass(df, client_id)
+    del df
+
+    # Розбиття результату по INN (df_market відсортований по INN_ID)
+    inn_frames = {
+        inn_id: df_inn
+        for inn_id, df_inn in df_market.groupby('INN_ID', sort=False)
+    }
+    inn_stats = (
+        {inn_id: df_stats for inn_id, df_stats in stats_df.groupby('INN_ID', sort=False)}
+        if not stats_df.empty else {}
+    )
+    empty_frame = df_market.iloc[0:0]
+    empty_stats = pd.DataFrame()
+
+    def iterate():
+        for inn_id in inn_ids:
+            yield inn_id, inn_frames.get(inn_id, empty_frame), inn_stats.get(inn_id, empty_stats)
+
+    return inn_ids, iterate()
+
+
+def iter_market_inns_streaming(
+    client_id: int,
+    spill_dir: Path,
+    chunk_size: Optional[int] = None
+) -> Tuple[List[int], Iterator[Tuple[int, pd.DataFrame, pd.DataFrame]]]:
+    """
+    Потокова агрегація ринку: raw chunks → spill per INN → INN по одному.
+
+    Серії (INN_ID, PHARM_ID, DRUGS_ID) не перетинають межі INN, тому
+    aggregate_market_single_pass на рядках одного INN дає той самий
+    результат, що й на всьому ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        spill_dir: Папка spill файлів
+        chunk_size: Рядків на chunk (None = RAW_CHUNK_ROWS)
+
+    Returns:
+        Tuple[inn_ids, iterator]: INN у порядку raw файлу та ітератор
+            (inn_id, агреговані дані INN, статистика INN)
+    """
+    raw_file = get_market_raw_file(client_id)
+
+    print(f"\n{'='*60}")
+    print(f"ПОТОКОВЕ ЗАВАНТАЖЕННЯ ДАНИХ: CLIENT_ID = {client_id}")
+    print(f"{'='*60}")
+
+    inn_ids = spill_raw_by_inn(raw_file, spill_dir, chunk_size=chunk_size)
+    print(f"Розкладено по INN: {len(inn_ids)} INN груп ({spill_dir.name})")
+
+    def iterate():
+        for inn_id in inn_ids:
+            df_inn = add_date_column(
+                load_spill_inn(spill_dir, inn_id),
+                period_col='PERIOD_ID', date_col='Date', align_monday=True,
+                week_col=WEEK_IDX_COL, verbose=False
+            )
+            df_aggregated, stats_df = aggregate_market_single_pass(df_inn, client_id)
+            yield inn_id, df_aggregated, stats_df
+
+    return inn_ids, iterate()
+
+
+def process_market(client_id: int, chunk_size: Optional[int] = None) -> Dict:
     """
     Повна обробка одного ринку.
 
     Args:
         client_id: ID цільової аптеки
+        chunk_size: Рядків на chunk для потокової обробки
+                    (None = потоково тільки файли > RAW_INMEMORY_MAX_MB)
 
     Returns:
         Dict: Результати обробки
     """
     start_time = datetime.now()
 
-    # Підготовка папок
-    paths = ensure_aggregation_folders(client_id)
+    raw_file = get_market_raw_file(client_id)
+    if not raw_file.exists():
+        raise FileNotFoundError(f"Raw файл не знайдено: {raw_file}")
 
-    # Завантаження даних
-    df = load_and_prepare_data(client_id)
+    # Підготовка папок (store перезаписується повністю)
+    paths = ensure_aggregation_folders(client_id)
+    reset_market_store(client_id)
 
-    # Отримати список INN
-    inn_ids = df['INN_ID'].unique()
-    print(f"\nОбробка {len(inn_ids)} INN груп...")
+    streaming = chunk_size is not None or should_stream(raw_file)
+    spill_dir = get_spill_folder(client_id)
 
     all_stats = []
     results = {
         'client_id': client_id,
-        'inn_count': len(inn_ids),
+        'inn_count': 0,
         'inn_processed': 0,
         'total_rows': 0,
+        'streaming': streaming,
         'files_created': []
     }
 
-    for i, inn_id in enumerate(inn_ids):
-        # Фільтрація по INN
-        df_inn = df[df['INN_ID'] == inn_id].copy()
+    try:
+        if streaming:
+            inn_ids, inn_results = iter_market_inns_streaming(client_id, spill_dir, chunk_size)
+        else:
+            inn_ids, inn_results = iter_market_inns(client_id)
 
-        # Обробка INN
-        df_aggregated, stats_df = process_single_inn(df_inn, inn_id, client_id)
+        results['inn_count'] = len(inn_ids)
+        print(f"\nОбробка {len(inn_ids)} INN груп...")
 
-        # Зберегти агреговані дані
-        output_file = paths['aggregation_folder'] / f"inn_{inn_id}_{client_id}.csv"
-        df_aggregated.to_csv(output_file, index=False)
-        results['files_created'].append(str(output_file))
-        results['total_rows'] += len(df_aggregated)
+        for i, (inn_id, df_aggregated, stats_df) in enumerate(inn_results):
+            if not stats_df.empty:
+                all_stats.append(stats_df)
 
-        # Збираємо статистику для summary (без збереження per-INN файлів)
-        if not stats_df.empty:
-            all_stats.append(stats_df)
+            # Зберегти агреговані дані у store (партиція INN_ID)
+            output_file = write_inn_partition(df_aggregated, client_id, inn_id)
+            results['files_created'].append(str(output_file))
+            results['total_rows'] += len(df_aggregated)
 
-        results['inn_processed'] += 1
+            results['inn_processed'] += 1
 
-        # Прогрес
-        if (i + 1) % 50 == 0 or (i + 1) == len(inn_ids):
-            print(f"  Оброблено {i + 1}/{len(inn_ids)} INN")
+            # Прогрес
+            if (i + 1) % 50 == 0 or (i + 1) == len(inn_ids):
+                print(f"  Оброблено {i + 1}/{len(inn_ids)} INN")
+    finally:
+        remove_spill(spill_dir)
 
     # Зберегти зведену статистику
     if all_stats:
         summary_df = pd.concat(all_stats, ignore_index=True)
         summary_file = paths['stats_folder'] / f"summary_{client_id}.csv"
-        summary_df.to_csv(summary_file, index=False)
+        write_csv(summary_df, summary_file)
         results['files_created'].append(str(summary_file))
 
         # Додаткова агрегована статистика per INN
@@ -488,7 +785,7 @@ def process_market(client_id: int) -> Dict:
         ]
 
         inn_summary_file = paths['stats_folder'] / f"inn_summary_{client_id}.csv"
-        inn_summary.to_csv(inn_summary_file, index=False)
+        write_csv(inn_summary, inn_summary_file)
         results['files_created'].append(str(inn_summary_file))
 
     # Час виконання
@@ -506,10 +803,13 @@ def process_market(client_id: int) -> Dict:
     return results
 
 
-def process_all_markets() -> List[Dict]:
+def process_all_markets(chunk_size: Optional[int] = None) -> List[Dict]:
     """
     Обробити всі ринки з preprocessing результатів.
 
+    Args:
+        chunk_size: Рядків на chunk для потокової обробки (див. process_market)
+
     Returns:
         List[Dict]: Результати по кожному ринку
     """
@@ -530,7 +830,7 @@ def process_all_markets() -> List[Dict]:
         print(f"\n[{i+1}/{len(target_pharmacies)}] Ринок {client_id}")
 
         try:
-            result = process_market(client_id)
+            result = process_market(client_id, chunk_size=chunk_size)
             all_results.append(result)
         except Exception as e:
             print(f"ПОМИЛКА при обробці ринку {client_id}: {e}")
@@ -585,12 +885,20 @@ def main():
         help='Обробити всі ринки'
     )
 
+    parser.add_argument(
+        '--chunk-size',
+        type=int,
+        default=None,
+        help='Потокова обробка raw файлу chunks по N рядків '
+             '(за замовчуванням — тільки для файлів > RAW_INMEMORY_MAX_MB)'
+    )
+
     args = parser.parse_args()
 
     if args.all:
-        process_all_markets()
+        process_all_markets(chunk_size=args.chunk_size)
     elif args.market_id:
-        process_market(args.market_id)
+        process_market(args.market_id, chunk_size=args.chunk_size)
     else:
         # За замовчуванням показати help
         parser.print_help()
@@ -20,7 +20,7 @@
 
 Вхід:
     data/processed_data/01_per_market/{CLIENT_ID}/01_aggregation_{CLIENT_ID}/
-    └── inn_{INN_ID}_{CLIENT_ID}.csv
+    └── inn_store_{CLIENT_ID}/             # Parquet store (через market_store loader)
 
 Вихід:
     data/processed_data/01_per_market/{CLIENT_ID}/02_stockout_{CLIENT_ID}/
@@ -39,8 +39,8 @@
 import sys
 import argparse
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from datetime import datetime
+from typing import Any, List, Dict, Optional, Tuple
 
 import pandas as pd
 import numpy as np
@@ -56,10 +56,29 @@ from project_core.data_config.paths_config import (
     load_target_pharmacies,
     get_market_paths
 )
+from project_core.utility_functions.market_store import (
+    store_exists,
+    list_store_inns
+)
+from project_core.utility_functions.market_context import (
+    get_inn_data,
+    put_frame,
+    save_artifact
+)
+from project_core.utility_functions.inn_cache import (
+    inn_cache_key,
+    load_inn_result,
+    save_inn_result
+)
+from project_core.utility_functions.run_trace import trace_span
 from project_core.did_config.stockout_params import (
     MIN_STOCKOUT_WEEKS,
     MIN_PRE_PERIOD_WEEKS
 )
+from project_core.utility_functions.etl_utils import (
+    WEEK_IDX_COL,
+    week_idx_to_dates
+)
 
 
 # =============================================================================
@@ -132,17 +151,17 @@ def identify_stockout_periods(
     Використовує vectorized diff/cumsum замість iterrows() для швидкості.
 
     Args:
-        df_drug: Дані одного препарату (DRUGS_ID) з колонками: Date, Q
+        df_drug: Дані одного препарату (DRUGS_ID) з колонками: WEEK_IDX, Q
         min_stockout_weeks: Мінімальна тривалість stock-out для реєстрації
 
     Returns:
-        List[Dict]: Список stock-out періодів з start, end, weeks
+        List[Dict]: Список stock-out періодів з start, end (WEEK_IDX), weeks
     """
     if len(df_drug) == 0:
         return []
 
-    # Сортуємо по датах
-    df_sorted = df_drug[['Date', 'Q']].sort_values('Date').reset_index(drop=True)
+    # Сортуємо по тижнях
+    df_sorted = df_drug[[WEEK_IDX_COL, 'Q']].sort_values(WEEK_IDX_COL).reset_index(drop=True)
 
     # Vectorized: визначаємо тижні без продажів
     is_zero = (df_sorted['Q'] == 0).astype(int)
@@ -164,8 +183,8 @@ def identify_stockout_periods(
     for _, group in zero_groups:
         weeks = len(group)
         if weeks >= min_stockout_weeks:
-            stockout_start = group['Date'].iloc[0]
-            stockout_end = group['Date'].iloc[-1]
+            stockout_start = int(group[WEEK_IDX_COL].iloc[0])
+            stockout_end = int(group[WEEK_IDX_COL].iloc[-1])
             stockout_periods.append({
                 'start': stockout_start,
                 'end': stockout_end,
@@ -182,10 +201,10 @@ def identify_stockout_periods(
 def validate_stockout_event(
     df_drug: pd.DataFrame,
     df_inn: pd.DataFrame,
-    stockout_start: pd.Timestamp,
-    stockout_end: pd.Timestamp,
-    pre_start: pd.Timestamp,
-    pre_end: pd.Timestamp,
+    stockout_start: int,
+    stockout_end: int,
+    pre_start: int,
+    pre_end: int,
     min_pre_weeks: int = MIN_PRE_PERIOD_WEEKS
 ) -> Tuple[bool, str, Dict]:
     """
@@ -202,10 +221,10 @@ def validate_stockout_event(
     Args:
         df_drug: Дані одного препарату (TARGET pharmacy)
         df_inn: Дані всієї INN групи (для Level 1 перевірки)
-        stockout_start: Початок stock-out
-        stockout_end: Кінець stock-out
-        pre_start: Початок PRE-періоду
-        pre_end: Кінець PRE-періоду
+        stockout_start: WEEK_IDX початку stock-out
+        stockout_end: WEEK_IDX кінця stock-out
+        pre_start: WEEK_IDX початку PRE-періоду
+        pre_end: WEEK_IDX кінця PRE-періоду
         min_pre_weeks: Мінімальна кількість тижнів у PRE-періоді
 
     Returns:
@@ -218,8 +237,8 @@ def validate_stockout_event(
     # Перевіряємо на рівні всієї INN для консистентності з MARKET_GROWTH в Step 3
     # (якщо INN група неактивна — це не stock-out, це відсутність попиту)
     df_inn_during = df_inn[
-        (df_inn['Date'] >= stockout_start) &
-        (df_inn['Date'] <= stockout_end)
+        (df_inn[WEEK_IDX_COL] >= stockout_start) &
+        (df_inn[WEEK_IDX_COL] <= stockout_end)
     ]
 
     # Сума продажів по всій INN групі на ринку
@@ -233,8 +252,8 @@ def validate_stockout_event(
     # Чи були продажі цього конкретного препарату до stock-out?
     # Перевіряємо на рівні препарату (суворіша перевірка для якості даних)
     df_pre = df_drug[
-        (df_drug['Date'] >= pre_start) &
-        (df_drug['Date'] <= pre_end)
+        (df_drug[WEEK_IDX_COL] >= pre_start) &
+        (df_drug[WEEK_IDX_COL] <= pre_end)
     ]
 
     pre_sales = df_pre['Q'].sum()
@@ -249,8 +268,8 @@ def validate_stockout_event(
     # Чи продавали конкуренти цей конкретний препарат під час stock-out?
     # Перевіряємо на рівні препарату (конкуренти мають альтернативу саме цього ліку)
     df_drug_during = df_drug[
-        (df_drug['Date'] >= stockout_start) &
-        (df_drug['Date'] <= stockout_end)
+        (df_drug[WEEK_IDX_COL] >= stockout_start) &
+        (df_drug[WEEK_IDX_COL] <= stockout_end)
     ]
     competitors_sales = df_drug_during['MARKET_TOTAL_DRUGS_PACK'].sum()
     details['competitors_sales'] = competitors_sales
@@ -263,16 +282,183 @@ def validate_stockout_event(
     return True, 'valid', details
 
 
+# =============================================================================
+# PROCESS SINGLE INN
+# =============================================================================
+
+def detect_inn_events(df: pd.DataFrame, inn_id: int, client_id: int) -> Dict[str, Any]:
+    """
+    Детекція та валідація stock-out подій однієї INN групи.
+
+    Args:
+        df: Агреговані дані INN (тільки TARGET аптека)
+        inn_id: ID INN групи
+        client_id: ID цільової аптеки
+
+    Returns:
+        Dict з ключами:
+            - events: List[Dict] — валідні події у порядку детекції (без
+              EVENT_ID — він присвоюється наскрізно по ринку)
+            - validation_stats: Dict — кількість подій по причинах валідації
+            - inn_stats: Dict — статистика INN (None якщо подій немає)
+    """
+    events = []
+    validation_stats = {
+        'valid': 0,
+        'no_market_activity': 0,
+        'no_pre_sales': 0,
+        'no_competitors': 0
+    }
+    result = {'events': events, 'validation_stats': validation_stats, 'inn_stats': None}
+
+    if df.empty:
+        return result
+
+    inn_name = df['INN_NAME'].iloc[0] if 'INN_NAME' in df.columns else ''
+
+    # Дані вже тільки TARGET (PHARM_ID == CLIENT_ID) після aggregation
+    # Отримуємо унікальні препарати
+    drugs_ids = df['DRUGS_ID'].unique()
+
+    raw_events_count = 0
+    valid_events_count = 0
+
+    for drug_id in drugs_ids:
+        df_drug = df[df['DRUGS_ID'] == drug_id].copy()
+
+        if len(df_drug) == 0:
+            continue
+
+        # Метадані препарату
+        drug_name = df_drug['DRUGS_NAME'].iloc[0]
+        nfc1_id = df_drug['NFC1_ID'].iloc[0] if 'NFC1_ID' in df_drug.columns else ''
+        nfc_id = df_drug['NFC_ID'].iloc[0] if 'NFC_ID' in df_drug.columns else ''
+
+        # Ідентифікуємо stock-out періоди
+        stockout_periods = identify_stockout_periods(df_drug, MIN_STOCKOUT_WEEKS)
+
+        for period in stockout_periods:
+            raw_events_count += 1
+
+            # Визначаємо PRE-період (WEEK_IDX)
+            pre_end = period['start'] - 1
+            pre_start = pre_end - (MIN_PRE_PERIOD_WEEKS - 1)
+
+            # Валідація
+            is_valid, reason, details = validate_stockout_event(
+                df_drug=df_drug,
+                df_inn=df,  # Повні дані INN групи для Level 1 валідації
+                stockout_start=period['start'],
+                stockout_end=period['end'],
+                pre_start=pre_start,
+                pre_end=pre_end,
+                min_pre_weeks=MIN_PRE_PERIOD_WEEKS
+            )
+
+            validation_stats[reason] += 1
+
+            if is_valid:
+                valid_events_count += 1
+
+                # Конвертація WEEK_IDX → дати тільки для експорту
+                so_start, so_end, pre_start_date, pre_end_date = week_idx_to_dates(
+                    [period['start'], period['end'], pre_start, pre_end]
+                )
+
+                events.append({
+                    'CLIENT_ID': client_id,
+                    'INN_ID': inn_id,
+                    'INN_NAME': inn_name,
+                    'DRUGS_ID': drug_id,
+                    'DRUGS_NAME': drug_name,
+                    'NFC1_ID': nfc1_id,
+                    'NFC_ID': nfc_id,
+                    'STOCKOUT_START': so_start.strftime('%Y-%m-%d'),
+                    'STOCKOUT_END': so_end.strftime('%Y-%m-%d'),
+                    'STOCKOUT_WEEKS': period['weeks'],
+                    'PRE_START': pre_start_date.strftime('%Y-%m-%d'),
+                    'PRE_END': pre_end_date.strftime('%Y-%m-%d'),
+                    'PRE_WEEKS': details['pre_weeks'],
+                    'PRE_AVG_Q': round(details['pre_avg_q'], 4),
+                    'MARKET_DURING_Q': round(details['market_during_inn'], 2)
+                })
+
+    # Статистика per INN
+    if raw_events_count > 0:
+        result['inn_stats'] = {
+            'INN_ID': inn_id,
+            'INN_NAME': inn_name,
+            'DRUGS_COUNT': len(drugs_ids),
+            'RAW_EVENTS': raw_events_count,
+            'VALID_EVENTS': valid_events_count,
+            'VALIDATION_RATE': round(valid_events_count / raw_events_count * 100, 1) if raw_events_count > 0 else 0
+        }
+
+    return result
+
+
+def _process_inn_stockout(
+    inn_id: int,
+    client_id: int,
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> Dict[str, Any]:
+    """
+    Stock-out події однієї INN групи (з per-INN кешем).
+
+    Ключ кешу — версія Step 2 + hash партиції INN, тому незмінений INN
+    не читається зі store і не обробляється повторно.
+
+    Args:
+        inn_id: ID INN групи
+        client_id: ID цільової аптеки
+        context: In-memory контекст ринку (кеш даних INN для Steps 3-4)
+        use_cache: Використовувати per-INN кеш (inn_cache)
+
+    Returns:
+        Dict: Результат detect_inn_events()
+    """
+    with trace_span('inn', client_id=client_id, step=2, inn_id=inn_id) as span:
+        cache_key = None
+        if use_cache:
+            cache_key = inn_cache_key(2, client_id, inn_id)
+            cached = load_inn_result(client_id, 2, inn_id, cache_key)
+            if cached is not None:
+                span.update(cache_hit=True, rows_out=len(cached['events']))
+                return cached
+
+        with trace_span('phase', 'load') as phase:
+            df = get_inn_data(context, client_id, inn_id)
+            phase['rows_out'] = len(df)
+        with trace_span('phase', 'detect') as phase:
+            inn_result = detect_inn_events(df, inn_id, client_id)
+            phase['rows_out'] = len(inn_result['events'])
+
+        if use_cache:
+            save_inn_result(client_id, 2, inn_id, cache_key, inn_result)
+
+        span.update(cache_hit=False, rows_in=len(df), rows_out=len(inn_result['events']))
+        return inn_result
+
+
 # =============================================================================
 # PROCESS SINGLE MARKET
 # =============================================================================
 
-def process_market_stockout(client_id: int) -> Dict:
+def process_market_stockout(
+    client_id: int,
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> Dict:
     """
     Повна обробка stock-out для одного ринку.
 
     Args:
         client_id: ID цільової аптеки
+        context: In-memory контекст ринку (fused режим parallel_runner):
+                 дані INN кешуються для Steps 3-4, події передаються
+                 через context['frames'] (None = тільки CSV)
+        use_cache: Брати події незмінених INN з per-INN кешу (inn_cache)
 
     Returns:
         Dict: Результати обробки
@@ -286,22 +472,16 @@ def process_market_stockout(client_id: int) -> Dict:
     print(f"STOCKOUT DETECTION: CLIENT_ID = {client_id}")
     print(f"{'='*60}")
 
-    # Завантаження агрегованих файлів
-    aggregation_folder = paths['aggregation_folder']
-
-    if not aggregation_folder.exists():
+    # Завантаження агрегованих даних зі store
+    if not store_exists(client_id):
         raise FileNotFoundError(
-            f"Aggregation папка не знайдена: {aggregation_folder}\n"
+            f"Market store не знайдено для ринку {client_id}\n"
             f"Спочатку виконайте: python exec_scripts/01_did_processing/02_01_data_aggregation.py --market_id {client_id}"
         )
 
-    # Знаходимо всі inn_*.csv файли
-    inn_files = list(aggregation_folder.glob(f"inn_*_{client_id}.csv"))
+    inn_ids = list_store_inns(client_id)
 
-    if not inn_files:
-        raise FileNotFoundError(f"Не знайдено агрегованих файлів у {aggregation_folder}")
-
-    print(f"Знайдено {len(inn_files)} INN файлів")
+    print(f"Знайдено {len(inn_ids)} INN партицій")
 
     # Результати
     all_events = []
@@ -314,98 +494,28 @@ def process_market_stockout(client_id: int) -> Dict:
     inn_stats = []
     event_counter = 1
 
-    # Обробка кожного INN файлу
-    for inn_file in sorted(inn_files):
-        # Парсимо INN_ID з назви файлу
-        inn_id = int(inn_file.stem.split('_')[1])
-
-        # Завантаження даних
-        df = pd.read_csv(inn_file, parse_dates=['Date'])
-
-        if df.empty:
-            continue
-
-        inn_name = df['INN_NAME'].iloc[0] if 'INN_NAME' in df.columns else ''
-
-        # Дані вже тільки TARGET (PHARM_ID == CLIENT_ID) після aggregation
-        # Отримуємо унікальні препарати
-        drugs_ids = df['DRUGS_ID'].unique()
-
-        raw_events_count = 0
-        valid_events_count = 0
-
-        for drug_id in drugs_ids:
-            df_drug = df[df['DRUGS_ID'] == drug_id].copy()
+    # Обробка кожної INN партиції
+    for inn_id in inn_ids:
+        inn_result = _process_inn_stockout(inn_id, client_id, context, use_cache)
 
-            if len(df_drug) == 0:
-                continue
+        for key in validation_stats:
+            validation_stats[key] += inn_result['validation_stats'][key]
 
-            # Метадані препарату
-            drug_name = df_drug['DRUGS_NAME'].iloc[0]
-            nfc1_id = df_drug['NFC1_ID'].iloc[0] if 'NFC1_ID' in df_drug.columns else ''
-            nfc_id = df_drug['NFC_ID'].iloc[0] if 'NFC_ID' in df_drug.columns else ''
-
-            # Ідентифікуємо stock-out періоди
-            stockout_periods = identify_stockout_periods(df_drug, MIN_STOCKOUT_WEEKS)
-
-            for period in stockout_periods:
-                raw_events_count += 1
-
-                # Визначаємо PRE-період
-                pre_end = period['start'] - timedelta(days=7)
-                pre_start = pre_end - timedelta(weeks=MIN_PRE_PERIOD_WEEKS - 1)
-
-                # Валідація
-                is_valid, reason, details = validate_stockout_event(
-                    df_drug=df_drug,
-                    df_inn=df,  # Повні дані INN групи для Level 1 валідації
-                    stockout_start=period['start'],
-                    stockout_end=period['end'],
-                    pre_start=pre_start,
-                    pre_end=pre_end,
-                    min_pre_weeks=MIN_PRE_PERIOD_WEEKS
-                )
-
-                validation_stats[reason] += 1
-
-                if is_valid:
-                    valid_events_count += 1
-
-                    all_events.append({
-                        'EVENT_ID': f"{client_id}_{inn_id}_{event_counter:04d}",
-                        'CLIENT_ID': client_id,
-                        'INN_ID': inn_id,
-                        'INN_NAME': inn_name,
-                        'DRUGS_ID': drug_id,
-                        'DRUGS_NAME': drug_name,
-                        'NFC1_ID': nfc1_id,
-                        'NFC_ID': nfc_id,
-                        'STOCKOUT_START': period['start'].strftime('%Y-%m-%d'),
-                        'STOCKOUT_END': period['end'].strftime('%Y-%m-%d'),
-                        'STOCKOUT_WEEKS': period['weeks'],
-                        'PRE_START': pre_start.strftime('%Y-%m-%d'),
-                        'PRE_END': pre_end.strftime('%Y-%m-%d'),
-                        'PRE_WEEKS': details['pre_weeks'],
-                        'PRE_AVG_Q': round(details['pre_avg_q'], 4),
-                        'MARKET_DURING_Q': round(details['market_during_inn'], 2)
-                    })
-                    event_counter += 1
-
-        # Статистика per INN
-        if raw_events_count > 0:
-            inn_stats.append({
-                'INN_ID': inn_id,
-                'INN_NAME': inn_name,
-                'DRUGS_COUNT': len(drugs_ids),
-                'RAW_EVENTS': raw_events_count,
-                'VALID_EVENTS': valid_events_count,
-                'VALIDATION_RATE': round(valid_events_count / raw_events_count * 100, 1) if raw_events_count > 0 else 0
+        # EVENT_ID нумерується наскрізно по ринку
+        for event in inn_result['events']:
+            all_events.append({
+                'EVENT_ID': f"{client_id}_{inn_id}_{event_counter:04d}",
+                **event
             })
+            event_counter += 1
+
+        if inn_result['inn_stats'] is not None:
+            inn_stats.append(inn_result['inn_stats'])
 
     # Зберігаємо результати
     results = {
         'client_id': client_id,
-        'inn_count': len(inn_files),
+        'inn_count': len(inn_ids),
         'raw_events': sum(validation_stats.values()),
         'valid_events': len(all_events),
         'validation_stats': validation_stats,
@@ -415,24 +525,23 @@ def process_market_stockout(client_id: int) -> Dict:
     # Зберігаємо валідовані події
     if all_events:
         df_events = pd.DataFrame(all_events)
-        events_file = paths['stockout_folder'] / f"stockout_events_{client_id}.csv"
-        df_events.to_csv(events_file, index=False)
-        results['files_created'].append(str(events_file))
     else:
         # Створюємо пустий файл з правильними колонками
-        empty_df = pd.DataFrame(columns=[
+        df_events = pd.DataFrame(columns=[
             'EVENT_ID', 'CLIENT_ID', 'INN_ID', 'INN_NAME', 'DRUGS_ID', 'DRUGS_NAME',
             'NFC1_ID', 'NFC_ID', 'STOCKOUT_START', 'STOCKOUT_END', 'STOCKOUT_WEEKS',
             'PRE_START', 'PRE_END', 'PRE_WEEKS', 'PRE_AVG_Q', 'MARKET_DURING_Q'
         ])
-        events_file = paths['stockout_folder'] / f"stockout_events_{client_id}.csv"
-        empty_df.to_csv(events_file, index=False)
-        results['files_created'].append(str(events_file))
+
+    events_file = paths['stockout_folder'] / f"stockout_events_{client_id}.csv"
+    save_artifact(df_events, events_file, context)
+    put_frame(context, 'stockout_events', df_events)
+    results['files_created'].append(str(events_file))
 
     # Зберігаємо статистику
     summary_data = {
         'CLIENT_ID': client_id,
-        'INN_COUNT': len(inn_files),
+        'INN_COUNT': len(inn_ids),
         'TOTAL_RAW_EVENTS': sum(validation_stats.values()),
         'VALID_EVENTS': len(all_events),
         'REJECTED_NO_MARKET': validation_stats['no_market_activity'],
@@ -446,14 +555,14 @@ def process_market_stockout(client_id: int) -> Dict:
 
     df_summary = pd.DataFrame([summary_data])
     summary_file = paths['stats_folder'] / f"stockout_summary_{client_id}.csv"
-    df_summary.to_csv(summary_file, index=False)
+    save_artifact(df_summary, summary_file, context)
     results['files_created'].append(str(summary_file))
 
     # Зберігаємо статистику per INN
     if inn_stats:
         df_inn_stats = pd.DataFrame(inn_stats)
         inn_stats_file = paths['stats_folder'] / f"stockout_per_inn_{client_id}.csv"
-        df_inn_stats.to_csv(inn_stats_file, index=False)
+        save_artifact(df_inn_stats, inn_stats_file, context)
         results['files_created'].append(str(inn_stats_file))
 
     # Час виконання
@@ -466,7 +575,7 @@ def process_market_stockout(client_id: int) -> Dict:
     print(f"  MIN_PRE_PERIOD_WEEKS: {MIN_PRE_PERIOD_WEEKS}")
 
     print(f"\nРезультати:")
-    print(f"  INN груп оброблено: {len(inn_files)}")
+    print(f"  INN груп оброблено: {len(inn_ids)}")
     print(f"  Сирих подій: {sum(validation_stats.values())}")
     print(f"  Валідних подій: {len(all_events)}")
 
@@ -22,7 +22,7 @@
     └── stockout_events_{CLIENT_ID}.csv
 
     data/processed_data/01_per_market/{CLIENT_ID}/01_aggregation_{CLIENT_ID}/
-    └── inn_{INN_ID}_{CLIENT_ID}.csv
+    └── inn_store_{CLIENT_ID}/             # Parquet store (через market_store loader)
 
 Вихід:
     data/processed_data/01_per_market/{CLIENT_ID}/03_did_analysis_{CLIENT_ID}/
@@ -46,7 +46,6 @@ import argparse
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple, Any
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pandas as pd
 import numpy as np
@@ -68,7 +67,9 @@ from project_core.did_config.stockout_params import (
     MIN_TOTAL_FOR_SHARE
 )
 from project_core.did_config.nfc_compatibility import (
-    is_compatible,
+    compatible_mask,
+    same_nfc1_mask,
+    encode_nfc1,
     get_compatibility_group
 )
 from project_core.did_config.classification_thresholds import (
@@ -83,8 +84,37 @@ from project_core.utility_functions.did_utils import (
     calculate_lift,
     calculate_shares,
     nfc_decomposition,
+    calculate_did_batch,
     validate_did_invariants
 )
+from project_core.utility_functions.market_context import (
+    get_inn_data,
+    get_inn_tensor,
+    get_frame,
+    put_frame,
+    save_artifact
+)
+from project_core.utility_functions.etl_utils import (
+    add_week_idx_columns,
+    week_idx_to_dates
+)
+from project_core.utility_functions.inn_executor import map_inn_groups
+from project_core.utility_functions.run_trace import begin_span, end_span, trace_span
+from project_core.utility_functions.inn_cache import (
+    frame_digest,
+    inn_cache_key,
+    load_inn_result,
+    save_inn_result,
+    localize_event_ids,
+    restore_event_ids
+)
+from project_core.utility_functions.inn_tensor import (
+    build_inn_tensor,
+    window_sum,
+    window_count,
+    window_total,
+    active_in_window
+)
 
 
 # =============================================================================
@@ -93,6 +123,9 @@ from project_core.utility_functions.did_utils import (
 
 PER_MARKET_FOLDER = "01_per_market"
 
+# Межі періодів події; для кожної додається {COL}_IDX (WEEK_IDX)
+EVENT_PERIOD_COLUMNS = ['STOCKOUT_START', 'STOCKOUT_END', 'PRE_START', 'PRE_END']
+
 
 # =============================================================================
 # PATH FUNCTIONS
@@ -154,7 +187,7 @@ def load_stockout_events(client_id: int, paths: Dict[str, Path]) -> pd.DataFrame
         paths: Словник шляхів
 
     Returns:
-        pd.DataFrame: Stock-out події
+        pd.DataFrame: Stock-out події (з колонками {PERIOD}_IDX для логіки періодів)
     """
     events_file = paths['stockout_folder'] / f"stockout_events_{client_id}.csv"
 
@@ -164,11 +197,35 @@ def load_stockout_events(client_id: int, paths: Dict[str, Path]) -> pd.DataFrame
             f"Спочатку виконайте: python exec_scripts/01_did_processing/02_02_stockout_detection.py --market_id {client_id}"
         )
 
-    df = pd.read_csv(events_file, parse_dates=['STOCKOUT_START', 'STOCKOUT_END', 'PRE_START', 'PRE_END'])
-    return df
+    df = pd.read_csv(events_file, parse_dates=EVENT_PERIOD_COLUMNS)
+    return add_week_idx_columns(df, EVENT_PERIOD_COLUMNS)
 
 
-def load_inn_data(inn_id: int, client_id: int, paths: Dict[str, Path]) -> pd.DataFrame:
+def prepare_stockout_events(df_events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Підготувати in-memory stock-out події Step 2 (fused режим).
+
+    Та сама підготовка, що й у load_stockout_events() після read_csv:
+    дати періодів → datetime64 + колонки {PERIOD}_IDX.
+
+    Args:
+        df_events: Події у форматі stockout_events CSV (дати як рядки)
+
+    Returns:
+        pd.DataFrame: Stock-out події (копія, вхід не змінюється)
+    """
+    df = df_events.copy()
+    for col in EVENT_PERIOD_COLUMNS:
+        df[col] = pd.to_datetime(df[col])
+    return add_week_idx_columns(df, EVENT_PERIOD_COLUMNS)
+
+
+def load_inn_data(
+    inn_id: int,
+    client_id: int,
+    paths: Dict[str, Path],
+    context: Optional[Dict] = None
+) -> pd.DataFrame:
     """
     Завантажити агреговані дані для INN групи.
 
@@ -176,17 +233,12 @@ def load_inn_data(inn_id: int, client_id: int, paths: Dict[str, Path]) -> pd.Dat
         inn_id: ID INN групи
         client_id: ID цільової аптеки
         paths: Словник шляхів
+        context: In-memory контекст ринку (дані INN вже прочитані Step 2)
 
     Returns:
-        pd.DataFrame: Агреговані дані INN групи
+        pd.DataFrame: Агреговані дані INN групи (порожній якщо партиції немає)
     """
-    inn_file = paths['aggregation_folder'] / f"inn_{inn_id}_{client_id}.csv"
-
-    if not inn_file.exists():
-        return pd.DataFrame()
-
-    df = pd.read_csv(inn_file, parse_dates=['Date'])
-    return df
+    return get_inn_data(context, client_id, inn_id)
 
 
 # =============================================================================
@@ -214,7 +266,7 @@ def process_event_post_period(
         Dict з POST-періодом та статусом
     """
     drug_id = event['DRUGS_ID']
-    stockout_end = event['STOCKOUT_END']
+    stockout_end = event['STOCKOUT_END_IDX']
 
     # Фільтруємо дані тільки TARGET аптеки
     df_target = df_inn[df_inn['PHARM_ID'] == client_id]
@@ -256,11 +308,14 @@ def find_valid_substitutes(
     event: pd.Series,
     df_inn: pd.DataFrame,
     client_id: int,
-    drug_index: Optional[Dict[int, pd.DataFrame]] = None
+    inn_tensor: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Знайти валідні substitutes для stock-out події.
 
+    Скалярна референсна реалізація; _process_inn_group_did() використовує
+    build_substitute_masks() для всіх подій INN одразу.
+
     Фільтри:
     1. NFC Compatibility: форма випуску повинна бути сумісною
     2. Phantom Filter: substitute повинен мати дані під час stock-out
@@ -269,46 +324,36 @@ def find_valid_substitutes(
         event: Інформація про подію
         df_inn: Агреговані дані INN групи
         client_id: ID цільової аптеки
-        drug_index: Попередньо побудований індекс {DRUGS_ID: DataFrame}
-                    для TARGET аптеки (опціонально, для оптимізації)
+        inn_tensor: Попередньо побудований тензор INN для TARGET аптеки
+                    (опціонально, будується з df_inn якщо не передано)
 
     Returns:
         List[Dict]: Список валідних substitutes
     """
     target_drug_id = event['DRUGS_ID']
     target_nfc1 = event['NFC1_ID']
-    stockout_start = event['STOCKOUT_START']
-    stockout_end = event['STOCKOUT_END']
+    stockout_start = event['STOCKOUT_START_IDX']
+    stockout_end = event['STOCKOUT_END_IDX']
 
-    # Побудова індексу якщо не передано
-    if drug_index is None:
-        df_target = df_inn[df_inn['PHARM_ID'] == client_id]
-        drug_index = {did: grp for did, grp in df_target.groupby('DRUGS_ID')}
+    # Побудова тензора якщо не передано
+    if inn_tensor is None:
+        inn_tensor = build_inn_tensor(df_inn[df_inn['PHARM_ID'] == client_id])
 
     valid_substitutes = []
+    nfc_group = get_compatibility_group(target_nfc1)
 
-    for drug_id, df_sub in drug_index.items():
-        if drug_id == target_drug_id:
-            continue
-
-        if len(df_sub) == 0:
-            continue
+    # ФІЛЬТР 1: NFC Compatibility (одна маска на всі препарати INN)
+    compatible = compatible_mask(target_nfc1, inn_tensor['nfc1_code'])
 
-        sub_nfc1 = df_sub['NFC1_ID'].iloc[0]
-        sub_name = df_sub['DRUGS_NAME'].iloc[0]
+    # ФІЛЬТР 2: Phantom Filter - повинні бути дані під час stock-out
+    has_data_during = active_in_window(inn_tensor, stockout_start, stockout_end)
 
-        # ФІЛЬТР 1: NFC Compatibility
-        if not is_compatible(target_nfc1, sub_nfc1):
+    for row, drug_id in enumerate(inn_tensor['drug_ids']):
+        if drug_id == target_drug_id or not (compatible[row] and has_data_during[row]):
             continue
 
-        # ФІЛЬТР 2: Phantom Filter - повинні бути дані під час stock-out
-        df_during = df_sub[
-            (df_sub['Date'] >= stockout_start) &
-            (df_sub['Date'] <= stockout_end)
-        ]
-
-        if len(df_during) == 0:
-            continue
+        sub_nfc1 = inn_tensor['nfc1_id'][row]
+        sub_name = inn_tensor['drugs_name'][row]
 
         # Substitute валідний
         valid_substitutes.append({
@@ -316,7 +361,7 @@ def find_valid_substitutes(
             'SUBSTITUTE_DRUGS_NAME': sub_name,
             'SUBSTITUTE_NFC1_ID': sub_nfc1,
             'SAME_NFC1': target_nfc1 == sub_nfc1,
-            'NFC_GROUP': get_compatibility_group(target_nfc1)
+            'NFC_GROUP': nfc_group
         })
 
     return valid_substitutes
@@ -331,18 +376,24 @@ def calculate_did_for_event(
     df_inn: pd.DataFrame,
     client_id: int,
     valid_substitutes: List[Dict],
-    drug_index: Optional[Dict[int, pd.DataFrame]] = None
+    inn_tensor: Optional[Dict[str, Any]] = None
 ) -> Dict[str, Any]:
     """
     Розрахувати DiD метрики для однієї stock-out події.
 
+    Суми за PRE та stock-out вікна беруться з prefix sums тензора INN
+    (O(1) на вікно) замість фільтрації DataFrame по WEEK_IDX.
+
+    Скалярна референсна реалізація; _process_inn_group_did() використовує
+    calculate_did_batch() для всіх подій INN одразу.
+
     Args:
         event: Інформація про подію (включаючи POST період)
         df_inn: Агреговані дані INN групи
         client_id: ID цільової аптеки
         valid_substitutes: Список валідних substitutes
-        drug_index: Попередньо побудований індекс {DRUGS_ID: DataFrame}
-                    для TARGET аптеки (опціонально, для оптимізації)
+        inn_tensor: Попередньо побудований тензор INN для TARGET аптеки
+                    (опціонально, будується з df_inn якщо не передано)
 
     Returns:
         Dict з DiD результатами
@@ -350,30 +401,22 @@ def calculate_did_for_event(
     target_drug_id = event['DRUGS_ID']
     target_nfc1 = event['NFC1_ID']
 
-    pre_start = event['PRE_START']
-    pre_end = event['PRE_END']
-    stockout_start = event['STOCKOUT_START']
-    stockout_end = event['STOCKOUT_END']
+    # Межі періодів — WEEK_IDX
+    pre_start = event['PRE_START_IDX']
+    pre_end = event['PRE_END_IDX']
+    stockout_start = event['STOCKOUT_START_IDX']
+    stockout_end = event['STOCKOUT_END_IDX']
 
-    # Побудова індексу якщо не передано
-    if drug_index is None:
-        df_target = df_inn[df_inn['PHARM_ID'] == client_id]
-        drug_index = {did: grp for did, grp in df_target.groupby('DRUGS_ID')}
+    # Побудова тензора якщо не передано
+    if inn_tensor is None:
+        inn_tensor = build_inn_tensor(df_inn[df_inn['PHARM_ID'] == client_id])
 
-    # === 1. MARKET_GROWTH ===
-    # Ринкові продажі в PRE-періоді (весь ринок, не тільки TARGET)
-    df_market_pre = df_inn[
-        (df_inn['Date'] >= pre_start) &
-        (df_inn['Date'] <= pre_end)
-    ]
-    market_pre = df_market_pre['MARKET_TOTAL_DRUGS_PACK'].sum()
+    drug_rows = inn_tensor['drug_rows']
 
-    # Ринкові продажі під час stock-out (весь ринок)
-    df_market_during = df_inn[
-        (df_inn['Date'] >= stockout_start) &
-        (df_inn['Date'] <= stockout_end)
-    ]
-    market_during = df_market_during['MARKET_TOTAL_DRUGS_PACK'].sum()
+    # === 1. MARKET_GROWTH ===
+    # Ринкові продажі в PRE-періоді та під час stock-out (всі препарати INN)
+    market_pre = window_total(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', pre_start, pre_end)
+    market_during = window_total(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', stockout_start, stockout_end)
 
     market_growth = calculate_market_growth(market_pre, market_during, MIN_MARKET_PRE)
 
@@ -384,24 +427,13 @@ def calculate_did_for_event(
         sub_drug_id = sub['SUBSTITUTE_DRUGS_ID']
         sub_nfc1 = sub['SUBSTITUTE_NFC1_ID']
 
-        # Використовуємо pre-indexed lookup замість фільтрації
-        df_sub = drug_index.get(sub_drug_id)
-        if df_sub is None or len(df_sub) == 0:
+        row = drug_rows.get(sub_drug_id)
+        if row is None:
             continue
 
-        # Продажі substitute в PRE-періоді
-        df_sub_pre = df_sub[
-            (df_sub['Date'] >= pre_start) &
-            (df_sub['Date'] <= pre_end)
-        ]
-        sales_pre = df_sub_pre['Q'].sum()
-
-        # Продажі substitute під час stock-out
-        df_sub_during = df_sub[
-            (df_sub['Date'] >= stockout_start) &
-            (df_sub['Date'] <= stockout_end)
-        ]
-        sales_during = df_sub_during['Q'].sum()
+        # Продажі substitute в PRE-періоді та під час stock-out
+        sales_pre = window_sum(inn_tensor, 'Q', row, pre_start, pre_end)
+        sales_during = window_sum(inn_tensor, 'Q', row, stockout_start, stockout_end)
 
         # Очікувані та LIFT
         expected = calculate_expected(sales_pre, market_growth)
@@ -420,29 +452,20 @@ def calculate_did_for_event(
     substitutes_with_lift = sum(1 for s in substitutes_lifts if s['lift'] > 0)
 
     # === 3. LOST_SALES (target препарат у конкурентів) ===
-    # Використовуємо pre-indexed lookup
-    df_target_drug = drug_index.get(target_drug_id)
+    target_row = drug_rows.get(target_drug_id)
 
-    if df_target_drug is not None and len(df_target_drug) > 0:
+    if target_row is not None:
         # В PRE-періоді
-        df_drug_pre = df_target_drug[
-            (df_target_drug['Date'] >= pre_start) &
-            (df_target_drug['Date'] <= pre_end)
-        ]
-        if len(df_drug_pre) > 0 and 'MARKET_TOTAL_DRUGS_PACK' in df_drug_pre.columns:
-            market_total_pre = df_drug_pre['MARKET_TOTAL_DRUGS_PACK'].sum()
-            target_pre = df_drug_pre['Q'].sum()
+        if window_count(inn_tensor, target_row, pre_start, pre_end) > 0:
+            market_total_pre = window_sum(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', target_row, pre_start, pre_end)
+            target_pre = window_sum(inn_tensor, 'Q', target_row, pre_start, pre_end)
             comp_pre = max(0, market_total_pre - target_pre)
         else:
             comp_pre = 0
 
         # Під час stock-out
-        df_drug_during = df_target_drug[
-            (df_target_drug['Date'] >= stockout_start) &
-            (df_target_drug['Date'] <= stockout_end)
-        ]
-        if len(df_drug_during) > 0 and 'MARKET_TOTAL_DRUGS_PACK' in df_drug_during.columns:
-            comp_during = df_drug_during['MARKET_TOTAL_DRUGS_PACK'].sum()
+        if window_count(inn_tensor, target_row, stockout_start, stockout_end) > 0:
+            comp_during = window_sum(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', target_row, stockout_start, stockout_end)
         else:
             comp_during = 0
     else:
@@ -482,29 +505,117 @@ def calculate_did_for_event(
 
 
 # =============================================================================
-# INN-GROUP PROCESSING (для ThreadPoolExecutor)
+# INN-GROUP PROCESSING (для виконавця INN-груп, inn_executor)
 # =============================================================================
 
+def build_substitute_masks(
+    inn_tensor: Dict[str, Any],
+    events: pd.DataFrame
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Побудувати маски substitutes [events, drugs] для batched DiD.
+
+    Векторизований еквівалент find_valid_substitutes() для всіх подій:
+    NFC сумісність (compatible_mask по int кодах NFC1) + phantom
+    filter (є дані під час stock-out) + виключення самого target.
+
+    Args:
+        inn_tensor: Тензор INN для TARGET аптеки
+        events: Події INN (з колонками DRUGS_ID, NFC1_ID, STOCKOUT_*_IDX)
+
+    Returns:
+        Tuple[target_rows, substitute_mask, same_nfc1_mask]:
+            - target_rows: рядок тензора target препарату (-1 якщо немає)
+            - substitute_mask: bool [events, drugs] — валідні substitutes
+            - same_nfc1_mask: bool [events, drugs] — NFC1 substitute == NFC1 target
+    """
+    drug_ids = inn_tensor['drug_ids']
+    drug_rows = inn_tensor['drug_rows']
+    target_ids = events['DRUGS_ID'].to_numpy()
+    target_rows = np.array([drug_rows.get(int(d), -1) for d in target_ids], dtype=np.int64)
+
+    # NFC1 як int коди: сумісність — lookup у NFC1_COMPATIBILITY_MATRIX
+    target_codes = encode_nfc1(events['NFC1_ID'])[:, np.newaxis]
+    drug_codes = inn_tensor['nfc1_code'][np.newaxis, :]
+
+    # Phantom filter: дані substitute під час stock-out (інтервальний індекс)
+    has_data_during = active_in_window(
+        inn_tensor,
+        events['STOCKOUT_START_IDX'].to_numpy(),
+        events['STOCKOUT_END_IDX'].to_numpy()
+    )
+
+    substitute_mask = (
+        compatible_mask(target_codes, drug_codes)
+        & (drug_ids[np.newaxis, :] != target_ids[:, np.newaxis])
+        & has_data_during
+    )
+    same_mask = same_nfc1_mask(target_codes, drug_codes)
+
+    return target_rows, substitute_mask, same_mask
+
+
+def _did_result_from_batch(batch: Dict[str, np.ndarray], i: int) -> Dict[str, Any]:
+    """
+    Сформувати DiD результат події i з batched метрик.
+
+    Ті самі колонки та округлення, що й у calculate_did_for_event().
+
+    Args:
+        batch: Результат calculate_did_batch()
+        i: Номер події в batch
+
+    Returns:
+        Dict з DiD результатами
+    """
+    def _round(key: str, digits: int) -> float:
+        return round(float(batch[key][i]), digits)
+
+    def _round_share(key: str) -> float:
+        value = float(batch[key][i])
+        return round(value, 6) if not np.isnan(value) else np.nan
+
+    return {
+        'MARKET_PRE': _round('market_pre', 2),
+        'MARKET_DURING': _round('market_during', 2),
+        'MARKET_GROWTH': _round('market_growth', 6),
+        'INTERNAL_LIFT': _round('internal_lift', 4),
+        'LOST_SALES': _round('lost_sales', 4),
+        'TOTAL_EFFECT': _round('total_effect', 4),
+        'SHARE_INTERNAL': _round_share('share_internal'),
+        'SHARE_LOST': _round_share('share_lost'),
+        'SUBSTITUTES_COUNT': int(batch['substitutes_count'][i]),
+        'SUBSTITUTES_WITH_LIFT': int(batch['substitutes_with_lift'][i]),
+        'LIFT_SAME_NFC1': _round('lift_same_nfc1', 4),
+        'LIFT_DIFF_NFC1': _round('lift_diff_nfc1', 4),
+        'SHARE_SAME_NFC1': _round_share('share_same_nfc1'),
+        'SHARE_DIFF_NFC1': _round_share('share_diff_nfc1')
+    }
+
+
 def _process_inn_group_did(
     inn_id: int,
     inn_events: pd.DataFrame,
     client_id: int,
-    paths: Dict[str, Path]
+    paths: Dict[str, Path],
+    context: Optional[Dict] = None
 ) -> Dict[str, Any]:
     """
     Обробка однієї INN-групи для DiD аналізу.
 
-    Ця функція виконується в окремому потоці (ThreadPoolExecutor).
-    Не має shared state — повертає локальні результати для merge.
+    Виконується виконавцем INN-груп (inn_executor: потік, процес або
+    послідовно). Не має shared state — повертає локальні результати для merge.
 
-    Формули розрахунків НЕ змінені — викликаються ті самі
-    find_valid_substitutes(), calculate_did_for_event() та ін.
+    Формули розрахунків НЕ змінені: substitutes та DiD метрики для всіх
+    подій INN рахуються одним викликом calculate_did_batch() — batched
+    еквівалентом find_valid_substitutes() + calculate_did_for_event().
 
     Args:
         inn_id: ID INN групи
         inn_events: DataFrame подій для цієї INN
         client_id: ID цільової аптеки
         paths: Словник шляхів
+        context: In-memory контекст ринку (кеш даних та тензорів INN)
 
     Returns:
         Dict з ключами:
@@ -520,50 +631,76 @@ def _process_inn_group_did(
         'no_substitutes': 0,
         'no_effect': 0
     }
+    empty_result = {
+        'did_results': did_results,
+        'substitute_mappings': substitute_mappings,
+        'validation_stats': validation_stats
+    }
 
     # Завантажуємо дані INN
-    df_inn = load_inn_data(inn_id, client_id, paths)
+    phase = begin_span('phase', 'load')
+    df_inn = load_inn_data(inn_id, client_id, paths, context)
+    end_span(phase, rows_out=len(df_inn))
 
     if df_inn.empty:
-        return {
-            'did_results': did_results,
-            'substitute_mappings': substitute_mappings,
-            'validation_stats': validation_stats
-        }
-
-    # Pre-index: побудова словника {DRUGS_ID: DataFrame} для TARGET аптеки
-    df_target_inn = df_inn[df_inn['PHARM_ID'] == client_id]
-    drug_index = {did: grp for did, grp in df_target_inn.groupby('DRUGS_ID')}
+        return empty_result
 
-    # Обробка кожної події
-    for idx, event in inn_events.iterrows():
-        event_id = event['EVENT_ID']
-
-        # 1. Визначення POST-періоду
-        post_result = process_event_post_period(event, df_inn, client_id)
+    # Щільний тензор (препарати × тижні) з prefix sums для TARGET аптеки
+    phase = begin_span('phase', 'tensor')
+    inn_tensor = get_inn_tensor(
+        context, inn_id,
+        lambda: build_inn_tensor(df_inn[df_inn['PHARM_ID'] == client_id])
+    )
+    end_span(phase)
 
-        if not post_result['POST_VALID']:
-            validation_stats['no_post_period'] += 1
-            continue
+    # 1. Визначення POST-періоду для кожної події
+    phase = begin_span('phase', 'post_period')
+    post_results = [
+        process_event_post_period(event, df_inn, client_id)
+        for _, event in inn_events.iterrows()
+    ]
+    end_span(phase, rows_in=len(inn_events))
+    is_post_valid = np.array([r['POST_VALID'] for r in post_results], dtype=bool)
+    validation_stats['no_post_period'] = int((~is_post_valid).sum())
+
+    events = inn_events[is_post_valid]
+    post_results = [r for r, is_valid in zip(post_results, is_post_valid) if is_valid]
+
+    if events.empty:
+        return empty_result
+
+    # 2. Маски валідних substitutes [events, drugs]
+    phase = begin_span('phase', 'did_batch')
+    target_rows, substitute_mask, same_mask = build_substitute_masks(inn_tensor, events)
+
+    # 3. DiD розрахунки для всіх подій одним batched викликом
+    batch = calculate_did_batch(
+        inn_tensor,
+        target_rows=target_rows,
+        pre_start=events['PRE_START_IDX'].to_numpy(),
+        pre_end=events['PRE_END_IDX'].to_numpy(),
+        stockout_start=events['STOCKOUT_START_IDX'].to_numpy(),
+        stockout_end=events['STOCKOUT_END_IDX'].to_numpy(),
+        substitute_mask=substitute_mask,
+        same_nfc1_mask=same_mask,
+        min_market_pre=MIN_MARKET_PRE,
+        min_total=MIN_TOTAL_FOR_SHARE
+    )
+    end_span(phase, rows_in=len(events))
 
-        # Додаємо POST до event
-        event_with_post = event.copy()
-        event_with_post['POST_START'] = post_result['POST_START']
-        event_with_post['POST_END'] = post_result['POST_END']
-        event_with_post['POST_WEEKS'] = post_result['POST_WEEKS']
-        event_with_post['POST_STATUS'] = post_result['POST_STATUS']
-        event_with_post['POST_VALID'] = post_result['POST_VALID']
-
-        # 2. Пошук валідних substitutes (з pre-indexed drug_index)
-        valid_substitutes = find_valid_substitutes(
-            event_with_post, df_inn, client_id, drug_index=drug_index
-        )
+    # 4. Збір результатів у порядку подій
+    phase = begin_span('phase', 'records')
+    for i, (_, event) in enumerate(events.iterrows()):
+        event_id = event['EVENT_ID']
+        post_result = post_results[i]
+        sub_rows = np.flatnonzero(substitute_mask[i])
+        nfc_group = get_compatibility_group(event['NFC1_ID'])
 
-        if len(valid_substitutes) == 0:
+        if len(sub_rows) == 0:
             validation_stats['no_substitutes'] += 1
 
         # Зберігаємо substitute mapping
-        for sub in valid_substitutes:
+        for row in sub_rows:
             substitute_mappings.append({
                 'EVENT_ID': event_id,
                 'CLIENT_ID': client_id,
@@ -572,14 +709,14 @@ def _process_inn_group_did(
                 'TARGET_DRUGS_ID': event['DRUGS_ID'],
                 'TARGET_DRUGS_NAME': event['DRUGS_NAME'],
                 'TARGET_NFC1_ID': event['NFC1_ID'],
-                **sub
+                'SUBSTITUTE_DRUGS_ID': inn_tensor['drug_ids'][row],
+                'SUBSTITUTE_DRUGS_NAME': inn_tensor['drugs_name'][row],
+                'SUBSTITUTE_NFC1_ID': inn_tensor['nfc1_id'][row],
+                'SAME_NFC1': bool(same_mask[i, row]),
+                'NFC_GROUP': nfc_group
             })
 
-        # 3. DiD розрахунки (з pre-indexed drug_index)
-        did_result = calculate_did_for_event(
-            event_with_post, df_inn, client_id, valid_substitutes,
-            drug_index=drug_index
-        )
+        did_result = _did_result_from_batch(batch, i)
 
         # Перевірка чи є ефект
         if did_result['TOTAL_EFFECT'] < MIN_TOTAL_FOR_SHARE:
@@ -605,14 +742,15 @@ def _process_inn_group_did(
             'PRE_END': event['PRE_END'].strftime('%Y-%m-%d'),
             'PRE_WEEKS': event['PRE_WEEKS'],
             'PRE_AVG_Q': event['PRE_AVG_Q'],
-            'POST_START': post_result['POST_START'].strftime('%Y-%m-%d'),
-            'POST_END': post_result['POST_END'].strftime('%Y-%m-%d'),
+            'POST_START': week_idx_to_dates(post_result['POST_START']).strftime('%Y-%m-%d'),
+            'POST_END': week_idx_to_dates(post_result['POST_END']).strftime('%Y-%m-%d'),
             'POST_WEEKS': post_result['POST_WEEKS'],
             'POST_STATUS': post_result['POST_STATUS'],
             **did_result
         }
 
         did_results.append(full_result)
+    end_span(phase, rows_out=len(did_results))
 
     return {
         'did_results': did_results,
@@ -621,16 +759,108 @@ def _process_inn_group_did(
     }
 
 
+def _process_inn_group_did_cached(
+    inn_id: int,
+    inn_events: pd.DataFrame,
+    client_id: int,
+    paths: Dict[str, Path],
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> Dict[str, Any]:
+    """
+    _process_inn_group_did() з per-INN кешем.
+
+    Ключ кешу — версія Step 3 + hash партиції INN + hash подій INN (без
+    EVENT_ID), тому зсув наскрізної нумерації EVENT_ID не інвалідує кеш.
+
+    Args:
+        inn_id: ID INN групи
+        inn_events: DataFrame подій для цієї INN
+        client_id: ID цільової аптеки
+        paths: Словник шляхів
+        context: In-memory контекст ринку
+        use_cache: Використовувати per-INN кеш (inn_cache)
+
+    Returns:
+        Dict: Результат _process_inn_group_did()
+    """
+    with trace_span('inn', client_id=client_id, step=3, inn_id=inn_id, rows_in=len(inn_events)) as span:
+        if not use_cache:
+            inn_result = _process_inn_group_did(inn_id, inn_events, client_id, paths, context)
+            span['rows_out'] = len(inn_result['did_results'])
+            return inn_result
+
+        event_ids = inn_events['EVENT_ID'].tolist()
+        cache_key = inn_cache_key(3, client_id, inn_id, frame_digest(inn_events, ['EVENT_ID']))
+
+        cached = load_inn_result(client_id, 3, inn_id, cache_key)
+        if cached is not None:
+            span.update(cache_hit=True, rows_out=len(cached['did_results']))
+            return {
+                'did_results': restore_event_ids(cached['did_results'], event_ids),
+                'substitute_mappings': restore_event_ids(cached['substitute_mappings'], event_ids),
+                'validation_stats': cached['validation_stats']
+            }
+
+        inn_result = _process_inn_group_did(inn_id, inn_events, client_id, paths, context)
+
+        save_inn_result(client_id, 3, inn_id, cache_key, {
+            'did_results': localize_event_ids(inn_result['did_results'], event_ids),
+            'substitute_mappings': localize_event_ids(inn_result['substitute_mappings'], event_ids),
+            'validation_stats': inn_result['validation_stats']
+        })
+
+        span.update(cache_hit=False, rows_out=len(inn_result['did_results']))
+        return inn_result
+
+
+def process_inn_did(
+    client_id: int,
+    inn_id: int,
+    inn_events: pd.DataFrame,
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> Dict[str, Any]:
+    """
+    DiD аналіз однієї INN групи ринку (задача INN-рівня market_scheduler).
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+        inn_events: Stock-out події INN (формат load_stockout_events)
+        context: In-memory контекст (кеш даних та тензора INN для Step 4)
+        use_cache: Використовувати per-INN кеш (inn_cache)
+
+    Returns:
+        Dict: Результат _process_inn_group_did() (did_results,
+              substitute_mappings, validation_stats)
+    """
+    paths = get_did_paths(client_id)
+    return _process_inn_group_did_cached(inn_id, inn_events, client_id, paths, context, use_cache)
+
+
 # =============================================================================
 # PROCESS SINGLE MARKET
 # =============================================================================
 
-def process_market_did(client_id: int) -> Dict:
+def process_market_did(
+    client_id: int,
+    context: Optional[Dict] = None,
+    use_cache: bool = False,
+    inn_results: Optional[Dict[int, Dict[str, Any]]] = None
+) -> Dict:
     """
     Повна обробка DiD аналізу для одного ринку.
 
     Args:
         client_id: ID цільової аптеки
+        context: In-memory контекст ринку (fused режим parallel_runner):
+                 події Step 2 та дані INN беруться з контексту, результати
+                 передаються у Step 4 через context['frames'] (None = тільки CSV)
+        use_cache: Брати результати незмінених INN з per-INN кешу (inn_cache)
+        inn_results: Готові результати INN груп {INN_ID: process_inn_did()},
+                     обчислені задачами market_scheduler; тут рахуються
+                     тільки INN без результату (None = всі)
 
     Returns:
         Dict: Результати обробки
@@ -644,8 +874,12 @@ def process_market_did(client_id: int) -> Dict:
     print(f"DiD ANALYSIS: CLIENT_ID = {client_id}")
     print(f"{'='*60}")
 
-    # Завантаження stock-out подій
-    df_events = load_stockout_events(client_id, paths)
+    # Завантаження stock-out подій (з контексту Step 2 або з CSV)
+    events_frame = get_frame(context, 'stockout_events')
+    if events_frame is not None:
+        df_events = prepare_stockout_events(events_frame)
+    else:
+        df_events = load_stockout_events(client_id, paths)
 
     if df_events.empty:
         print("Немає stock-out подій для аналізу")
@@ -662,53 +896,33 @@ def process_market_did(client_id: int) -> Dict:
     inn_groups = df_events.groupby('INN_ID')
     inn_group_list = [(inn_id, inn_events) for inn_id, inn_events in inn_groups]
 
-    # Завантажуємо параметр INN-паралелізму
-    from project_core.calculation_parameters_config.machine_parameters import OPTIMAL_THREADS
-    n_threads = min(OPTIMAL_THREADS, len(inn_group_list))
-
-    # Обробка INN-груп (паралельно якщо n_threads > 1, інакше послідовно)
-    if n_threads > 1:
-        # === ПАРАЛЕЛЬНА ОБРОБКА INN-ГРУП (ThreadPoolExecutor) ===
-        all_did_results = []
-        all_substitute_mappings = []
-        validation_stats = {
-            'valid': 0,
-            'no_post_period': 0,
-            'no_substitutes': 0,
-            'no_effect': 0
-        }
-
-        with ThreadPoolExecutor(max_workers=n_threads) as pool:
-            futures = {
-                pool.submit(
-                    _process_inn_group_did, inn_id, inn_events, client_id, paths
-                ): inn_id
-                for inn_id, inn_events in inn_group_list
-            }
+    # INN без готового результату (scheduler) обчислюються виконавцем
+    # INN-груп (INTRA_MARKET_EXECUTOR); результати — у порядку INN_ID
+    pending = [
+        (inn_id, inn_events, client_id, paths)
+        for inn_id, inn_events in inn_group_list
+        if inn_results is None or inn_id not in inn_results
+    ]
+    computed = dict(zip(
+        [task[0] for task in pending],
+        map_inn_groups(_process_inn_group_did_cached, pending, context=context, use_cache=use_cache)
+    ))
 
-            for future in as_completed(futures):
-                inn_result = future.result()
-                all_did_results.extend(inn_result['did_results'])
-                all_substitute_mappings.extend(inn_result['substitute_mappings'])
-                for key in validation_stats:
-                    validation_stats[key] += inn_result['validation_stats'][key]
-    else:
-        # === ПОСЛІДОВНА ОБРОБКА (fallback, n_threads == 1) ===
-        all_did_results = []
-        all_substitute_mappings = []
-        validation_stats = {
-            'valid': 0,
-            'no_post_period': 0,
-            'no_substitutes': 0,
-            'no_effect': 0
-        }
+    all_did_results = []
+    all_substitute_mappings = []
+    validation_stats = {
+        'valid': 0,
+        'no_post_period': 0,
+        'no_substitutes': 0,
+        'no_effect': 0
+    }
 
-        for inn_id, inn_events in inn_group_list:
-            inn_result = _process_inn_group_did(inn_id, inn_events, client_id, paths)
-            all_did_results.extend(inn_result['did_results'])
-            all_substitute_mappings.extend(inn_result['substitute_mappings'])
-            for key in validation_stats:
-                validation_stats[key] += inn_result['validation_stats'][key]
+    for inn_id, _ in inn_group_list:
+        inn_result = computed[inn_id] if inn_id in computed else inn_results[inn_id]
+        all_did_results.extend(inn_result['did_results'])
+        all_substitute_mappings.extend(inn_result['substitute_mappings'])
+        for key in validation_stats:
+            validation_stats[key] += inn_result['validation_stats'][key]
 
     # Збереження результатів
     results = {
@@ -723,18 +937,20 @@ def process_market_did(client_id: int) -> Dict:
     if all_did_results:
         df_did = pd.DataFrame(all_did_results)
         did_file = paths['did_folder'] / f"did_results_{client_id}.csv"
-        df_did.to_csv(did_file, index=False)
+        save_artifact(df_did, did_file, context)
+        put_frame(context, 'did_results', df_did)
         results['files_created'].append(str(did_file))
 
         # Зберігаємо substitute mapping
         if all_substitute_mappings:
             df_subs = pd.DataFrame(all_substitute_mappings)
             subs_file = paths['did_folder'] / f"substitute_mapping_{client_id}.csv"
-            df_subs.to_csv(subs_file, index=False)
+            save_artifact(df_subs, subs_file, context)
+            put_frame(context, 'substitute_mapping', df_subs)
             results['files_created'].append(str(subs_file))
 
         # Генеруємо статистику
-        generate_did_statistics(df_did, client_id, paths)
+        generate_did_statistics(df_did, client_id, paths, context)
         results['files_created'].append(str(paths['stats_folder'] / f"did_summary_{client_id}.csv"))
         results['files_created'].append(str(paths['stats_folder'] / f"drugs_summary_{client_id}.csv"))
         results['files_created'].append(str(paths['stats_folder'] / f"did_metadata_{client_id}.csv"))
@@ -753,7 +969,8 @@ def process_market_did(client_id: int) -> Dict:
         ]
         empty_df = pd.DataFrame(columns=empty_columns)
         did_file = paths['did_folder'] / f"did_results_{client_id}.csv"
-        empty_df.to_csv(did_file, index=False)
+        save_artifact(empty_df, did_file, context)
+        put_frame(context, 'did_results', empty_df)
         results['files_created'].append(str(did_file))
 
     # Час виконання
@@ -800,7 +1017,8 @@ def process_market_did(client_id: int) -> Dict:
 def generate_did_statistics(
     df_did: pd.DataFrame,
     client_id: int,
-    paths: Dict[str, Path]
+    paths: Dict[str, Path],
+    context: Optional[Dict] = None
 ) -> None:
     """
     Генерувати статистику DiD аналізу.
@@ -809,6 +1027,7 @@ def generate_did_statistics(
         df_did: Результати DiD
         client_id: ID цільової аптеки
         paths: Словник шляхів
+        context: In-memory контекст ринку (режим запису артефактів)
     """
     # === 1. Per INN Summary ===
     inn_summary = df_did.groupby(['INN_ID', 'INN_NAME']).agg({
@@ -828,7 +1047,7 @@ def generate_did_statistics(
     ]
 
     inn_summary_file = paths['stats_folder'] / f"did_summary_{client_id}.csv"
-    inn_summary.to_csv(inn_summary_file, index=False)
+    save_artifact(inn_summary, inn_summary_file, context)
 
     # === 2. Per DRUGS Summary with Classification ===
     drugs_summary = df_did.groupby(['DRUGS_ID', 'DRUGS_NAME', 'INN_ID', 'INN_NAME', 'NFC1_ID']).agg({
@@ -858,7 +1077,7 @@ def generate_did_statistics(
     )
 
     drugs_summary_file = paths['stats_folder'] / f"drugs_summary_{client_id}.csv"
-    drugs_summary.to_csv(drugs_summary_file, index=False)
+    save_artifact(drugs_summary, drugs_summary_file, context)
 
     # === 3. Metadata ===
     classification_counts = drugs_summary['CLASSIFICATION'].value_counts().to_dict()
@@ -902,7 +1121,7 @@ def generate_did_statistics(
 
     df_metadata = pd.DataFrame(metadata)
     metadata_file = paths['stats_folder'] / f"did_metadata_{client_id}.csv"
-    df_metadata.to_csv(metadata_file, index=False)
+    save_artifact(df_metadata, metadata_file, context)
 
     print(f"\nКласифікація препаратів:")
     print(f"  CRITICAL: {classification_counts.get('CRITICAL', 0)}")
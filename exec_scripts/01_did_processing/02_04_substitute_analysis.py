@@ -27,7 +27,7 @@
     └── substitute_mapping_{CLIENT_ID}.csv
 
     data/processed_data/01_per_market/{CLIENT_ID}/01_aggregation_{CLIENT_ID}/
-    └── inn_{INN_ID}_{CLIENT_ID}.csv
+    └── inn_store_{CLIENT_ID}/             # Parquet store (через market_store loader)
 
 Вихід:
     data/processed_data/01_per_market/{CLIENT_ID}/04_substitute_shares_{CLIENT_ID}/
@@ -48,7 +48,6 @@ import sys
 import argparse
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional, Any, Tuple
 
 import pandas as pd
@@ -65,7 +64,31 @@ from project_core.data_config.paths_config import (
     load_target_pharmacies
 )
 from project_core.utility_functions.did_utils import (
-    calculate_substitute_lift
+    calculate_expected,
+    calculate_lift
+)
+from project_core.utility_functions.market_context import (
+    get_inn_data,
+    get_inn_tensor,
+    get_frame,
+    save_artifact
+)
+from project_core.utility_functions.etl_utils import (
+    add_week_idx_columns
+)
+from project_core.utility_functions.inn_executor import map_inn_groups
+from project_core.utility_functions.run_trace import begin_span, end_span, trace_span
+from project_core.utility_functions.inn_cache import (
+    frame_digest,
+    inn_cache_key,
+    load_inn_result,
+    save_inn_result,
+    localize_event_ids,
+    restore_event_ids
+)
+from project_core.utility_functions.inn_tensor import (
+    build_inn_tensor,
+    window_sum
 )
 
 
@@ -140,14 +163,30 @@ def load_did_results(client_id: int, paths: Dict[str, Path]) -> pd.DataFrame:
         paths: Словник шляхів
 
     Returns:
-        DataFrame з DiD результатами
+        DataFrame з DiD результатами (з колонками {PERIOD}_IDX для логіки періодів)
     """
     did_file = paths['did_folder'] / f"did_results_{client_id}.csv"
 
     if not did_file.exists():
         raise FileNotFoundError(f"DiD результати не знайдені: {did_file}")
 
-    df = pd.read_csv(did_file)
+    return prepare_did_results(pd.read_csv(did_file))
+
+
+def prepare_did_results(df_did: pd.DataFrame) -> pd.DataFrame:
+    """
+    Підготувати DiD результати до розрахунку LIFT.
+
+    Використовується як після read_csv (load_did_results), так і для
+    in-memory результатів Step 3 у fused режимі.
+
+    Args:
+        df_did: DiD результати у форматі did_results CSV (дати як рядки)
+
+    Returns:
+        DataFrame з датами періодів (datetime64) та колонками {PERIOD}_IDX
+    """
+    df = df_did.copy()
 
     # Конвертуємо дати
     date_cols = ['STOCKOUT_START', 'STOCKOUT_END', 'PRE_START', 'PRE_END']
@@ -155,7 +194,7 @@ def load_did_results(client_id: int, paths: Dict[str, Path]) -> pd.DataFrame:
         if col in df.columns:
             df[col] = pd.to_datetime(df[col])
 
-    return df
+    return add_week_idx_columns(df, date_cols)
 
 
 def load_substitute_mapping(client_id: int, paths: Dict[str, Path]) -> pd.DataFrame:
@@ -177,7 +216,12 @@ def load_substitute_mapping(client_id: int, paths: Dict[str, Path]) -> pd.DataFr
     return pd.read_csv(mapping_file)
 
 
-def load_aggregation_data(client_id: int, inn_id: int, paths: Dict[str, Path]) -> pd.DataFrame:
+def load_aggregation_data(
+    client_id: int,
+    inn_id: int,
+    paths: Dict[str, Path],
+    context: Optional[Dict] = None
+) -> pd.DataFrame:
     """
     Завантажити агреговані дані для INN групи.
 
@@ -185,21 +229,12 @@ def load_aggregation_data(client_id: int, inn_id: int, paths: Dict[str, Path]) -
         client_id: ID цільової аптеки
         inn_id: ID INN групи
         paths: Словник шляхів
+        context: In-memory контекст ринку (дані INN вже прочитані Step 2)
 
     Returns:
-        DataFrame з агрегованими даними
+        DataFrame з агрегованими даними (порожній якщо партиції немає)
     """
-    agg_file = paths['aggregation_folder'] / f"inn_{inn_id}_{client_id}.csv"
-
-    if not agg_file.exists():
-        return pd.DataFrame()
-
-    df = pd.read_csv(agg_file)
-
-    if 'Date' in df.columns:
-        df['Date'] = pd.to_datetime(df['Date'])
-
-    return df
+    return get_inn_data(context, client_id, inn_id)
 
 
 # =============================================================================
@@ -210,17 +245,20 @@ def calculate_lifts_for_event(
     event: pd.Series,
     event_subs: pd.DataFrame,
     df_agg: pd.DataFrame,
-    drug_index: Optional[Dict[int, pd.DataFrame]] = None
+    inn_tensor: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
     """
     Розрахунок LIFT для кожного substitute в одній stock-out події.
 
+    Продажі за PRE та stock-out вікна — O(1) різниці prefix sums тензора
+    INN (та сама формула, що й calculate_substitute_lift).
+
     Args:
         event: Рядок з did_results (одна подія)
         event_subs: Substitute mapping для цієї конкретної події
         df_agg: Агреговані дані INN групи
-        drug_index: Попередньо побудований індекс {DRUGS_ID: DataFrame}
-                    (опціонально, для оптимізації)
+        inn_tensor: Попередньо побудований тензор INN
+                    (опціонально, будується з df_agg якщо не передано)
 
     Returns:
         List of dicts з LIFT per substitute
@@ -232,18 +270,20 @@ def calculate_lifts_for_event(
     stockout_nfc1 = event['NFC1_ID']
     market_growth = event['MARKET_GROWTH']
 
-    pre_start = event['PRE_START']
-    pre_end = event['PRE_END']
-    stockout_start = event['STOCKOUT_START']
-    stockout_end = event['STOCKOUT_END']
+    # Межі періодів — WEEK_IDX
+    pre_start = event['PRE_START_IDX']
+    pre_end = event['PRE_END_IDX']
+    stockout_start = event['STOCKOUT_START_IDX']
+    stockout_end = event['STOCKOUT_END_IDX']
 
     if len(event_subs) == 0:
         return []
 
-    # Побудова індексу якщо не передано
-    if drug_index is None:
-        drug_index = {did: grp for did, grp in df_agg.groupby('DRUGS_ID')}
+    # Побудова тензора якщо не передано
+    if inn_tensor is None:
+        inn_tensor = build_inn_tensor(df_agg)
 
+    drug_rows = inn_tensor['drug_rows']
     results = []
 
     for _, sub in event_subs.iterrows():
@@ -252,32 +292,16 @@ def calculate_lifts_for_event(
         sub_nfc1 = sub['SUBSTITUTE_NFC1_ID']
         same_nfc1 = sub['SAME_NFC1']
 
-        # Використовуємо pre-indexed lookup замість фільтрації
-        df_sub = drug_index.get(sub_drug_id)
+        row = drug_rows.get(sub_drug_id)
 
-        if df_sub is None or len(df_sub) == 0:
+        if row is None:
             continue
 
-        # Розрахунок LIFT
-        try:
-            lift_result = calculate_substitute_lift(
-                df_substitute=df_sub,
-                pre_start=pre_start,
-                pre_end=pre_end,
-                during_start=stockout_start,
-                during_end=stockout_end,
-                market_growth=market_growth,
-                date_col='Date',
-                quantity_col='Q'
-            )
-            lift = lift_result['lift']
-        except (KeyError, ValueError, TypeError) as e:
-            # Очікувані помилки при відсутності даних - встановлюємо LIFT=0
-            lift = 0.0
-        except Exception as e:
-            # Неочікувані помилки - логуємо для дебагу
-            print(f"    УВАГА: Помилка розрахунку LIFT для substitute {sub_drug_id}: {type(e).__name__}: {e}")
-            lift = 0.0
+        # Розрахунок LIFT (EXPECTED = SALES_PRE × MARKET_GROWTH)
+        sales_pre = window_sum(inn_tensor, 'Q', row, pre_start, pre_end)
+        sales_during = window_sum(inn_tensor, 'Q', row, stockout_start, stockout_end)
+        expected = calculate_expected(sales_pre, market_growth)
+        lift = calculate_lift(sales_during, expected)
 
         results.append({
             'EVENT_ID': event['EVENT_ID'],
@@ -517,7 +541,7 @@ def generate_metadata(
 
 
 # =============================================================================
-# INN-GROUP PROCESSING (для ThreadPoolExecutor)
+# INN-GROUP PROCESSING (для виконавця INN-груп, inn_executor)
 # =============================================================================
 
 def _process_inn_group_substitute(
@@ -525,13 +549,14 @@ def _process_inn_group_substitute(
     inn_events: pd.DataFrame,
     client_id: int,
     paths: Dict[str, Path],
-    mapping_by_event: Dict[str, pd.DataFrame]
+    mapping_by_event: Dict[str, pd.DataFrame],
+    context: Optional[Dict] = None
 ) -> List[Dict[str, Any]]:
     """
     Обробка однієї INN-групи для Substitute analysis.
 
-    Ця функція виконується в окремому потоці (ThreadPoolExecutor).
-    Не має shared state — повертає локальні результати для merge.
+    Виконується виконавцем INN-груп (inn_executor: потік, процес або
+    послідовно). Не має shared state — повертає локальні результати для merge.
 
     Формули розрахунків НЕ змінені — викликається той самий
     calculate_lifts_for_event().
@@ -542,6 +567,7 @@ def _process_inn_group_substitute(
         client_id: ID цільової аптеки
         paths: Словник шляхів
         mapping_by_event: Dict {EVENT_ID: DataFrame} з substitute mapping
+        context: In-memory контекст ринку (кеш даних та тензорів INN з Step 3)
 
     Returns:
         List[Dict] — LIFT записи для всіх подій цієї INN
@@ -549,15 +575,20 @@ def _process_inn_group_substitute(
     event_lifts = []
 
     # Завантажуємо агреговані дані для цього INN
-    df_agg = load_aggregation_data(client_id, inn_id, paths)
+    phase = begin_span('phase', 'load')
+    df_agg = load_aggregation_data(client_id, inn_id, paths, context)
+    end_span(phase, rows_out=len(df_agg))
 
     if len(df_agg) == 0:
         return event_lifts
 
-    # Pre-index по DRUGS_ID
-    drug_index = {did: grp for did, grp in df_agg.groupby('DRUGS_ID')}
+    # Щільний тензор (препарати × тижні) з prefix sums
+    phase = begin_span('phase', 'tensor')
+    inn_tensor = get_inn_tensor(context, inn_id, lambda: build_inn_tensor(df_agg))
+    end_span(phase)
 
     # Обробка кожної події
+    phase = begin_span('phase', 'lifts')
     for idx, event in inn_events.iterrows():
         event_id = event['EVENT_ID']
 
@@ -566,26 +597,142 @@ def _process_inn_group_substitute(
         if event_subs is None or len(event_subs) == 0:
             continue
 
-        # Розраховуємо LIFT для кожного substitute (з pre-indexed drug lookup)
+        # Розраховуємо LIFT для кожного substitute (з тензором INN)
         lifts = calculate_lifts_for_event(
             event, event_subs, df_agg,
-            drug_index=drug_index
+            inn_tensor=inn_tensor
         )
         event_lifts.extend(lifts)
+    end_span(phase, rows_in=len(inn_events), rows_out=len(event_lifts))
 
     return event_lifts
 
 
+def _process_inn_group_substitute_cached(
+    inn_id: int,
+    inn_events: pd.DataFrame,
+    client_id: int,
+    paths: Dict[str, Path],
+    mapping_by_event: Dict[str, pd.DataFrame],
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    _process_inn_group_substitute() з per-INN кешем.
+
+    Ключ кешу — версія Step 4 + hash партиції INN + hash DiD подій INN та
+    їх substitute mapping (EVENT_ID замінено порядковим номером події).
+
+    Args:
+        inn_id: ID INN групи
+        inn_events: DataFrame подій для цієї INN
+        client_id: ID цільової аптеки
+        paths: Словник шляхів
+        mapping_by_event: Dict {EVENT_ID: DataFrame} з substitute mapping
+        context: In-memory контекст ринку
+        use_cache: Використовувати per-INN кеш (inn_cache)
+
+    Returns:
+        List[Dict] — LIFT записи для всіх подій цієї INN
+    """
+    with trace_span('inn', client_id=client_id, step=4, inn_id=inn_id, rows_in=len(inn_events)) as span:
+        if not use_cache:
+            inn_lifts = _process_inn_group_substitute(
+                inn_id, inn_events, client_id, paths, mapping_by_event, context
+            )
+            span['rows_out'] = len(inn_lifts)
+            return inn_lifts
+
+        event_ids = inn_events['EVENT_ID'].tolist()
+        inn_mapping = [
+            mapping_by_event[event_id].assign(EVENT_ID=i)
+            for i, event_id in enumerate(event_ids)
+            if event_id in mapping_by_event
+        ]
+        mapping_digest = frame_digest(pd.concat(inn_mapping, ignore_index=True)) if inn_mapping else ''
+        cache_key = inn_cache_key(
+            4, client_id, inn_id, frame_digest(inn_events, ['EVENT_ID']), mapping_digest
+        )
+
+        cached = load_inn_result(client_id, 4, inn_id, cache_key)
+        if cached is not None:
+            span.update(cache_hit=True, rows_out=len(cached))
+            return restore_event_ids(cached, event_ids)
+
+        inn_lifts = _process_inn_group_substitute(
+            inn_id, inn_events, client_id, paths, mapping_by_event, context
+        )
+        save_inn_result(client_id, 4, inn_id, cache_key, localize_event_ids(inn_lifts, event_ids))
+
+        span.update(cache_hit=False, rows_out=len(inn_lifts))
+        return inn_lifts
+
+
+def process_inn_substitute(
+    client_id: int,
+    inn_id: int,
+    did_results: List[Dict[str, Any]],
+    substitute_mappings: List[Dict[str, Any]],
+    context: Optional[Dict] = None,
+    use_cache: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    LIFT розрахунок однієї INN групи ринку (задача INN-рівня market_scheduler).
+
+    Вхід — записи Step 3 цієї INN (process_inn_did), підготовка та
+    фільтр INTERNAL_LIFT > 0 ті самі, що й у process_market().
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+        did_results: DiD записи INN (формат did_results CSV)
+        substitute_mappings: Substitute mapping записи INN
+        context: In-memory контекст (дані та тензор INN з Step 3)
+        use_cache: Використовувати per-INN кеш (inn_cache)
+
+    Returns:
+        List[Dict] — LIFT записи для всіх подій цієї INN
+    """
+    if not did_results or not substitute_mappings:
+        return []
+
+    df_did = prepare_did_results(pd.DataFrame(did_results))
+    inn_events = df_did[df_did['INTERNAL_LIFT'] > 0].copy()
+
+    if len(inn_events) == 0:
+        return []
+
+    df_mapping = pd.DataFrame(substitute_mappings)
+    mapping_by_event = {eid: grp for eid, grp in df_mapping.groupby('EVENT_ID')}
+
+    paths = get_substitute_paths(client_id)
+    return _process_inn_group_substitute_cached(
+        inn_id, inn_events, client_id, paths, mapping_by_event, context, use_cache
+    )
+
+
 # =============================================================================
 # MAIN PROCESSING
 # =============================================================================
 
-def process_market(client_id: int) -> Dict[str, Any]:
+def process_market(
+    client_id: int,
+    context: Optional[Dict] = None,
+    use_cache: bool = False,
+    inn_lifts: Optional[Dict[int, List[Dict[str, Any]]]] = None
+) -> Dict[str, Any]:
     """
     Обробка одного ринку (цільової аптеки).
 
     Args:
         client_id: ID цільової аптеки
+        context: In-memory контекст ринку (fused режим parallel_runner):
+                 DiD результати, substitute mapping та дані INN беруться
+                 з контексту Step 3 (None = тільки CSV)
+        use_cache: Брати LIFT записи незмінених INN з per-INN кешу (inn_cache)
+        inn_lifts: Готові LIFT записи INN груп {INN_ID: process_inn_substitute()},
+                   обчислені задачами market_scheduler; тут рахуються
+                   тільки INN без результату (None = всі)
 
     Returns:
         Dict з результатами та статистикою
@@ -602,15 +749,26 @@ def process_market(client_id: int) -> Dict[str, Any]:
     # === 1. Завантаження даних ===
     print("\n[1/4] Завантаження даних...")
 
+    did_frame = get_frame(context, 'did_results')
+
     try:
-        df_did = load_did_results(client_id, paths)
+        if did_frame is not None:
+            df_did = prepare_did_results(did_frame)
+        else:
+            df_did = load_did_results(client_id, paths)
         print(f"  DiD результатів: {len(df_did):,}")
     except FileNotFoundError as e:
         print(f"  ПОМИЛКА: {e}")
         return {'status': 'error', 'error': str(e)}
 
     try:
-        df_mapping = load_substitute_mapping(client_id, paths)
+        if did_frame is not None:
+            # Step 3 не створює substitute_mapping, якщо немає валідних подій
+            df_mapping = get_frame(context, 'substitute_mapping')
+            if df_mapping is None:
+                raise FileNotFoundError(f"Substitute mapping не створений Step 3 для ринку {client_id}")
+        else:
+            df_mapping = load_substitute_mapping(client_id, paths)
         print(f"  Substitute mapping: {len(df_mapping):,}")
     except FileNotFoundError as e:
         print(f"  ПОМИЛКА: {e}")
@@ -636,35 +794,24 @@ def process_market(client_id: int) -> Dict[str, Any]:
         for inn_id, inn_events in df_did_valid.groupby('INN_ID')
     ]
 
-    # Завантажуємо параметр INN-паралелізму
-    from project_core.calculation_parameters_config.machine_parameters import OPTIMAL_THREADS
-    n_threads = min(OPTIMAL_THREADS, len(inn_event_groups))
-
-    if n_threads > 1:
-        # === ПАРАЛЕЛЬНА ОБРОБКА INN-ГРУП (ThreadPoolExecutor) ===
-        all_event_lifts = []
-
-        with ThreadPoolExecutor(max_workers=n_threads) as pool:
-            futures = {
-                pool.submit(
-                    _process_inn_group_substitute,
-                    inn_id, inn_events, client_id, paths, mapping_by_event
-                ): inn_id
-                for inn_id, inn_events in inn_event_groups
-            }
-
-            for future in as_completed(futures):
-                inn_lifts = future.result()
-                all_event_lifts.extend(inn_lifts)
-    else:
-        # === ПОСЛІДОВНА ОБРОБКА (fallback, n_threads == 1) ===
-        all_event_lifts = []
+    # INN без готових LIFT записів (scheduler) обчислюються виконавцем
+    # INN-груп (INTRA_MARKET_EXECUTOR); mapping передається тільки подій INN
+    pending = [
+        (
+            inn_id, inn_events, client_id, paths,
+            {eid: mapping_by_event[eid] for eid in inn_events['EVENT_ID'] if eid in mapping_by_event}
+        )
+        for inn_id, inn_events in inn_event_groups
+        if inn_lifts is None or inn_id not in inn_lifts
+    ]
+    computed = dict(zip(
+        [task[0] for task in pending],
+        map_inn_groups(_process_inn_group_substitute_cached, pending, context=context, use_cache=use_cache)
+    ))
 
-        for inn_id, inn_events in inn_event_groups:
-            inn_lifts = _process_inn_group_substitute(
-                inn_id, inn_events, client_id, paths, mapping_by_event
-            )
-            all_event_lifts.extend(inn_lifts)
+    all_event_lifts = []
+    for inn_id, _ in inn_event_groups:
+        all_event_lifts.extend(computed[inn_id] if inn_id in computed else inn_lifts[inn_id])
 
     print(f"  Розраховано LIFT записів: {len(all_event_lifts):,}")
 
@@ -701,13 +848,13 @@ def process_market(client_id: int) -> Dict[str, Any]:
 
     # Substitute shares
     shares_file = paths['substitute_folder'] / f"substitute_shares_{client_id}.csv"
-    df_shares.to_csv(shares_file, index=False)
+    save_artifact(df_shares, shares_file, context)
     print(f"  {shares_file.name}: {len(df_shares):,} записів")
 
     # Summary statistics
     df_summary = generate_substitute_summary(df_shares, client_id)
     summary_file = paths['stats_folder'] / f"substitute_summary_{client_id}.csv"
-    df_summary.to_csv(summary_file, index=False)
+    save_artifact(df_summary, summary_file, context)
     print(f"  {summary_file.name}")
 
     # Metadata
@@ -721,7 +868,7 @@ def process_market(client_id: int) -> Dict[str, Any]:
         processing_time=processing_time
     )
     metadata_file = paths['stats_folder'] / f"substitute_metadata_{client_id}.csv"
-    df_metadata.to_csv(metadata_file, index=False)
+    save_artifact(df_metadata, metadata_file, context)
     print(f"  {metadata_file.name}")
 
     # Статистика
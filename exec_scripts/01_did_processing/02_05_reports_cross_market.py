@@ -38,6 +38,10 @@ from project_core.data_config.paths_config import (
     get_market_paths,
     load_target_pharmacies
 )
+from project_core.utility_functions.artifact_writer import (
+    write_csv,
+    save_workbook
+)
 
 
 # ============================================================================
@@ -479,8 +483,8 @@ def create_excel_report(
     ws.row_dimensions[1].height = 20
     ws.row_dimensions[2].height = 40
 
-    # Зберегти
-    wb.save(output_path)
+    # Зберегти (фоновий атомарний запис)
+    save_workbook(wb, output_path)
 
 
 def create_sub_coef_csv(
@@ -522,7 +526,7 @@ def create_sub_coef_csv(
     cross_df = cross_df[available_columns]
 
     # Зберігаємо
-    cross_df.to_csv(output_path, index=False)
+    write_csv(cross_df, output_path)
 
 
 def create_sub_drugs_csv(
@@ -599,7 +603,7 @@ def create_sub_drugs_csv(
                 })
 
     result_df = pd.DataFrame(rows)
-    result_df.to_csv(output_path, index=False)
+    write_csv(result_df, output_path)
 
     return len(result_df)
 
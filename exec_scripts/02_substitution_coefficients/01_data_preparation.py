@@ -40,6 +40,7 @@ from project_core.data_config.paths_config import (
     RESULTS_PATH,
     load_target_pharmacies
 )
+from project_core.utility_functions.raw_ingest import iter_raw_chunks
 from project_core.sub_coef_config.coverage_thresholds import (
     COVERAGE_HIGH,
     COVERAGE_MEDIUM,
@@ -97,21 +98,30 @@ def load_all_drugs_from_raw() -> pd.DataFrame:
 
     for raw_file in raw_files:
         try:
-            # Читаємо тільки потрібні колонки (raw файли використовують ; як роздільник)
-            df = pd.read_csv(raw_file, sep=';', usecols=RAW_COLUMNS_ORIGINAL, encoding='utf-8-sig')
+            # Читаємо потоково тільки потрібні колонки; у пам'яті — лише
+            # унікальні препарати кожного chunk
+            rows_count = 0
+            file_drugs = []
+            for chunk in iter_raw_chunks(raw_file, columns=RAW_COLUMNS_ORIGINAL, rename=False):
+                rows_count += len(chunk)
+                file_drugs.append(chunk.drop_duplicates(subset=['DRUGS_ID']))
+            if not file_drugs:
+                continue
             # Перейменовуємо колонки
-            df = df.rename(columns=RAW_COLUMN_RENAME)
-            all_drugs.append(df)
-            print(f"  {raw_file.name}: {len(df)} рядків")
+            df = pd.concat(file_drugs, ignore_index=True).rename(columns=RAW_COLUMN_RENAME)
+            all_drugs.append(df.drop_duplicates(subset=['DRUGS_ID']))
+            print(f"  {raw_file.name}: {rows_count} рядків")
         except Exception as e:
             print(f"  ПОМИЛКА при читанні {raw_file.name}: {e}")
 
     if not all_drugs:
         raise ValueError("Не знайдено жодного raw файлу!")
 
-    # Об'єднуємо та дедуплікуємо
+    # Об'єднуємо та дедуплікуємо (назви як рядки, не category)
     combined = pd.concat(all_drugs, ignore_index=True)
-    unique_drugs = combined.drop_duplicates(subset=['DRUGS_ID']).copy()
+    unique_drugs = combined.drop_duplicates(subset=['DRUGS_ID']).astype(
+        {'DRUGS_NAME': object, 'INN_NAME': object}
+    )
 
     # Сортуємо по DRUGS_ID
     unique_drugs = unique_drugs.sort_values('DRUGS_ID').reset_index(drop=True)
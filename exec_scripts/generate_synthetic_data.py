@@ -0,0 +1,153 @@
+# =============================================================================
+# SYNTHETIC DATA GENERATOR - cross_pharm_market_analysis
+# =============================================================================
+# Файл: exec_scripts/generate_synthetic_data.py
+# Дата: 2026-10-17
+# Опис: Генерація синтетичних raw файлів Rd2_*.csv для відтворення та scale-тестів
+# =============================================================================
+
+"""
+Генерація синтетичних ринків (synthetic_markets) у форматі Rd2_{CLIENT_ID}.csv.
+
+Набір детермінований (seed): ринок i однаковий для будь-якої кількості
+ринків, тому --scale 10 містить набір --scale 1 як перші 10 ринків.
+
+Використання:
+    # Поточний обсяг (10 ринків) у data/raw:
+    python exec_scripts/generate_synthetic_data.py
+
+    # 10× та 100× набори для бенчмарків паралельного масштабування:
+    python exec_scripts/generate_synthetic_data.py --scale 10 --output /data/syn_10x
+    python exec_scripts/generate_synthetic_data.py --scale 100 --output /data/syn_100x
+
+    # Великі ринки (тест пам'яті):
+    python exec_scripts/generate_synthetic_data.py --competitors 30 40 --skus-per-inn 40 80
+
+    # Потім — пайплайн на згенерованих даних:
+    python exec_scripts/run_full_pipeline.py
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+
+# =============================================================================
+# PATHS
+# =============================================================================
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+
+# Додаємо project root до sys.path
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    from project_core.utility_functions.synthetic_markets import (
+        BASE_MARKETS,
+        DEFAULT_SEED,
+        FIRST_CLIENT_ID,
+        generate_markets
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic raw market files (Rd2_{CLIENT_ID}.csv)"
+    )
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument(
+        '--markets',
+        type=int,
+        default=None,
+        help=f'Number of markets (default: {BASE_MARKETS})'
+    )
+    size.add_argument(
+        '--scale',
+        type=int,
+        default=None,
+        help=f'Dataset scale: {BASE_MARKETS} × SCALE markets'
+    )
+    parser.add_argument(
+        '--output',
+        type=Path,
+        default=None,
+        help='Output folder (default: data/raw)'
+    )
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help=f'Seed (default: {DEFAULT_SEED})')
+    parser.add_argument(
+        '--first-client-id',
+        type=int,
+        default=FIRST_CLIENT_ID,
+        help=f'CLIENT_ID of the first market (default: {FIRST_CLIENT_ID})'
+    )
+    parser.add_argument('--competitors', type=int, nargs=2, metavar=('MIN', 'MAX'), help='Competitors per market')
+    parser.add_argument('--inns', type=int, help='INN groups in the drug catalog')
+    parser.add_argument('--skus-per-inn', type=int, nargs=2, metavar=('MIN', 'MAX'), help='Drugs per INN')
+    parser.add_argument('--weeks', type=int, help='Weeks of data')
+    parser.add_argument('--stockouts-per-year', type=float, help='Stock-out windows per target drug per year')
+    parser.add_argument('--stockout-weeks', type=int, nargs=2, metavar=('MIN', 'MAX'), help='Stock-out window length')
+    parser.add_argument('--decimal', choices=[',', '.'], help="Decimal separator of Q / V (default: ',')")
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='Processes (default: OPTIMAL_WORKERS, 1 = sequential)'
+    )
+    parser.add_argument(
+        '--overwrite',
+        action='store_true',
+        help='Allow writing into a folder that contains other Rd2_*.csv files'
+    )
+    args = parser.parse_args()
+
+    n_markets = BASE_MARKETS
+    if args.markets is not None:
+        n_markets = args.markets
+    elif args.scale is not None:
+        n_markets = BASE_MARKETS * args.scale
+
+    overrides = {
+        'competitors': args.competitors,
+        'inn_count': args.inns,
+        'skus_per_inn': args.skus_per_inn,
+        'weeks': args.weeks,
+        'stockouts_per_year': args.stockouts_per_year,
+        'stockout_weeks': args.stockout_weeks,
+        'decimal': args.decimal
+    }
+    profile = {key: value for key, value in overrides.items() if value is not None}
+
+    print("=" * 60)
+    print(f"SYNTHETIC DATA: {n_markets} markets, seed {args.seed}")
+    print("=" * 60)
+
+    try:
+        df_stats = generate_markets(
+            n_markets,
+            output_dir=args.output,
+            profile=profile,
+            seed=args.seed,
+            first_client_id=args.first_client_id,
+            max_workers=args.workers,
+            overwrite=args.overwrite
+        )
+    except (FileExistsError, ValueError) as e:
+        print(f"ПОМИЛКА: {e}")
+        sys.exit(1)
+
+    print(df_stats.head(20).to_string(index=False))
+    if len(df_stats) > 20:
+        print(f"... ще {len(df_stats) - 20} ринків")
+    print("-" * 60)
+    print(f"  Ринків:  {len(df_stats)}")
+    print(f"  Рядків:  {df_stats['RECORDS_COUNT'].sum():,}")
+    print(f"  Розмір:  {df_stats['SIZE_MB'].sum():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
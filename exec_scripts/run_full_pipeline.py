@@ -11,7 +11,7 @@
 
 Порядок виконання:
     Phase 1 — Per-Market DiD Processing:
-        Step 0: Preprocessing (довідники, списки INN/NFC/аптек) — ПОСЛІДОВНО
+        Step 0: Preprocessing (довідники, списки INN/NFC/аптек) — ПАРАЛЕЛЬНО по файлах
         Steps 1-5: Per-market обробка — ПАРАЛЕЛЬНО (ProcessPoolExecutor)
             Step 1: Data Aggregation (тижнева агрегація per market)
             Step 2: Stockout Detection (виявлення стокаутів)
@@ -38,13 +38,43 @@
     # Тільки Phase 2 (якщо Phase 1 вже виконано):
     python exec_scripts/run_full_pipeline.py --from-step 7
 
+    # Fused Steps 2-4 (без CSV round-trips, артефакти в кінці ринку):
+    python exec_scripts/run_full_pipeline.py --fused --artifacts deferred
+
+    # Перерахувати всі кроки, навіть якщо входи не змінились:
+    python exec_scripts/run_full_pipeline.py --force
+
+    # Ринок на задачу (без розкладу Steps 3-4 на задачі INN):
+    python exec_scripts/run_full_pipeline.py --scheduler market
+
+    # Продовжити перерваний запуск (тільки незавершені кроки ринків):
+    python exec_scripts/run_full_pipeline.py --resume 20261017_101500
+
 Примітки:
     - Перед запуском помістіть raw-файли (Rd2_*.csv) в data/raw/
-    - Step 0 (preprocessing) завжди виконується послідовно
-    - Steps 1-5 виконуються паралельно для кожного ринку
-    - Step 6 (Phase 2) виконується послідовно після Steps 1-5
+    - Step 0 (preprocessing) виконується в процесі runner-а, raw файли
+      обробляються паралельно (--sequential: окремий процес, по одному файлу)
+    - Steps 1-5 виконуються паралельно: Steps 3-4 розкладаються на задачі
+      (ринок, INN), що видаються найбільшими першими (market_scheduler);
+      Step 5 — після всіх INN ринку (--scheduler market: ринок на задачу)
+    - Step 6 (Phase 2) виконується послідовно після Steps 1-5, у процесі
+      runner-а (--sequential: окремий процес)
+    - Workers Steps 1-5 — постійний пул (parallel_runner.get_worker_pool):
+      модулі кроків імпортуються один раз на worker; повторні виклики
+      run_pipeline в одному процесі (sweep параметрів) використовують
+      ті самі workers
     - При помилці на preprocessing пайплайн зупиняється
     - Помилка одного ринку в Steps 1-5 не зупиняє решту
+    - Steps 1-5 інкрементальні: крок ринку пропускається, якщо raw файл,
+      його конфігурація та код не змінились (step_fingerprint);
+      --force вимикає пропуск (legacy --sequential завжди перераховує)
+    - Кожен запуск Steps 1-5 пише маніфест (data/processed_data/_runs/
+      {RUN_ID}/, run_manifest): завершені кроки ринків з checksum виходів;
+      --resume RUN_ID з параметрами того запуску видає тільки незавершені
+      кроки (без preprocessing), потім Phase 2
+    - Spans ринків / кроків / INN (час, CPU, RSS, рядки, I/O) пишуться у
+      _runs/{RUN_ID}/trace/ (run_trace, TRACE_LEVEL); підсумок:
+      python exec_scripts/trace_summary.py RUN_ID
 """
 
 import sys
@@ -82,12 +112,14 @@ SEQUENTIAL_STEPS = {
     0: {
         "name": "Preprocessing",
         "script": PHASE1_DIR / "01_preproc.py",
+        "entry": "run_preprocessing",
         "args": [],
         "description": "Довідники: INN, NFC, drugs, аптеки, статистика ринків",
     },
     7: {
         "name": "Data Preparation (Coefficients)",
         "script": PHASE2_DIR / "01_data_preparation.py",
+        "entry": "main",
         "args": [],
         "description": "Коефіцієнти субституції (трикутна матриця, xlsx бізнес-звіт)",
     },
@@ -125,6 +157,49 @@ def format_time(seconds: float) -> str:
     return f"{minutes}m {secs:.1f}s"
 
 
+def run_in_process_step(step_info: dict, **kwargs) -> bool:
+    """
+    Запустити послідовний крок (Step 0 / Step 7) у процесі runner-а.
+
+    Модуль кроку імпортується один раз на процес (повторні виклики
+    run_pipeline не платять за старт Python та імпорти), викликається
+    його entry-функція. Step 0 обробляє raw файли паралельно
+    (ProcessPoolExecutor у 01_preproc).
+
+    Args:
+        step_info: Опис кроку з SEQUENTIAL_STEPS (script, entry)
+        **kwargs: Аргументи entry-функції (напр. max_workers для Step 0)
+
+    Returns:
+        True якщо крок завершився успішно.
+    """
+    name = step_info["name"]
+    script = step_info["script"]
+    options = ", ".join(f"{k}: {'auto' if v is None else v}" for k, v in kwargs.items())
+
+    print()
+    print("=" * 70)
+    print(f"  {name}")
+    print(f"  {step_info['description']}")
+    print(f"  Script: {script.relative_to(PROJECT_ROOT)} (in-process{', ' + options if options else ''})")
+    print(f"  Started: {datetime.now().strftime('%H:%M:%S')}")
+    print("=" * 70)
+
+    import importlib
+    if str(script.parent) not in sys.path:
+        sys.path.insert(0, str(script.parent))
+
+    try:
+        module = importlib.import_module(script.stem)
+        getattr(module, step_info["entry"])(**kwargs)
+    except Exception as e:
+        print(f"\n  [FAILED] {name}: {type(e).__name__}: {e}")
+        return False
+
+    print(f"\n  [OK] {name} — completed successfully")
+    return True
+
+
 def run_sequential_step(step_info: dict, python_exe: str) -> bool:
     """
     Запустити один послідовний крок пайплайну.
@@ -177,7 +252,15 @@ def run_sequential_step(step_info: dict, python_exe: str) -> bool:
 def run_pipeline(
     from_step: int = 1,
     parallel: bool = True,
-    max_workers: int = None
+    max_workers: int = None,
+    fused: bool = False,
+    write_mode: str = 'immediate',
+    async_writes: bool = True,
+    incremental: bool = True,
+    scheduler: str = 'inn',
+    memory_budget_gb: float = None,
+    timeout_per_market: int = None,
+    resume_run_id: str = None
 ) -> bool:
     """
     Запустити повний пайплайн.
@@ -186,12 +269,37 @@ def run_pipeline(
         from_step: Номер кроку з якого починати (1-7).
         parallel: Використовувати паралельне виконання для Steps 1-5.
         max_workers: Кількість workers (None = auto).
+        fused: In-memory передача даних між Steps 2-4 (per-market у
+               процесі; з parallel=False — послідовно по ринках).
+        write_mode: Запис CSV артефактів Steps 2-4 у fused режимі
+                    ('immediate', 'deferred', 'none').
+        async_writes: Фоновий атомарний запис CSV/Excel артефактів Steps 1-5.
+        incremental: Пропускати per-market кроки з незмінним fingerprint
+                     входів (тільки parallel / fused виконання).
+        scheduler: Гранулярність паралельних задач: 'inn' — задачі
+                   (ринок, INN) для Steps 3-4, найбільші першими
+                   (market_scheduler); 'market' — ринок на задачу.
+        memory_budget_gb: Бюджет пам'яті ринків у роботі, ГБ (None = auto:
+                          AVAILABLE_RAM_GB з machine_parameters).
+        timeout_per_market: Таймаут задачі ринку, секунди (None =
+                            MARKET_TIMEOUT_SEC, 0 = без таймауту).
+        resume_run_id: ID записаного запуску Steps 1-5: preprocessing
+                       пропускається, ринки та кроки — з маніфесту,
+                       виконуються тільки незавершені кроки.
 
     Returns:
         True якщо всі кроки завершились успішно.
     """
     python_exe = sys.executable
     mode_str = "PARALLEL" if parallel else "SEQUENTIAL"
+    if parallel and scheduler == 'inn':
+        mode_str += " (INN TASKS)"
+    if fused:
+        mode_str += f" + FUSED 2-4 (artifacts: {write_mode})"
+    if not incremental:
+        mode_str += " + FORCE"
+    if resume_run_id:
+        mode_str += f" + RESUME {resume_run_id}"
 
     print()
     print("#" * 70)
@@ -216,13 +324,20 @@ def run_pipeline(
 
     pipeline_start = time.time()
     step_timings = []
+    run_id = resume_run_id
 
     # =====================================================
-    # STEP 0: Preprocessing (завжди послідовно)
+    # STEP 0: Preprocessing (паралельно по raw файлах)
     # =====================================================
-    if from_step <= 1:
+    if from_step <= 1 and not resume_run_id:
         step_start = time.time()
-        success = run_sequential_step(SEQUENTIAL_STEPS[0], python_exe)
+        if parallel:
+            success = run_in_process_step(SEQUENTIAL_STEPS[0], max_workers=max_workers)
+        else:
+            success = run_sequential_step({
+                **SEQUENTIAL_STEPS[0],
+                "args": ["--workers", "1"]
+            }, python_exe)
         elapsed = time.time() - step_start
         step_timings.append(("Step 0: Preprocessing", elapsed, success))
 
@@ -241,29 +356,80 @@ def run_pipeline(
 
         step_start = time.time()
 
-        if parallel:
-            # === ПАРАЛЕЛЬНЕ ВИКОНАННЯ ===
-            from project_core.utility_functions.parallel_runner import run_markets_parallel
+        if parallel or fused:
+            # === ПАРАЛЕЛЬНЕ ВИКОНАННЯ (або fused послідовно по ринках) ===
+            from project_core.utility_functions.parallel_runner import (
+                run_markets_parallel,
+                run_markets_sequential
+            )
+            from project_core.utility_functions.market_scheduler import run_markets_scheduled
             from project_core.data_config.paths_config import load_target_pharmacies
 
             try:
-                target_pharmacies = load_target_pharmacies()
+                if resume_run_id:
+                    from project_core.utility_functions.run_manifest import load_run
+                    target_pharmacies = load_run(resume_run_id)['market_ids']
+                else:
+                    target_pharmacies = load_target_pharmacies()
             except FileNotFoundError as e:
                 print(f"\n  [ERROR] {e}")
                 print("  Run preprocessing first: python exec_scripts/run_full_pipeline.py --from-step 1")
                 return False
 
-            summary = run_markets_parallel(
-                market_ids=target_pharmacies,
-                steps=per_market_steps_to_run,
-                max_workers=max_workers,
-                show_progress=True
-            )
+            try:
+                if parallel and scheduler == 'inn':
+                    summary = run_markets_scheduled(
+                        market_ids=target_pharmacies,
+                        steps=per_market_steps_to_run,
+                        max_workers=max_workers,
+                        show_progress=True,
+                        fused=fused,
+                        write_mode=write_mode,
+                        async_writes=async_writes,
+                        incremental=incremental,
+                        memory_budget_gb=memory_budget_gb,
+                        timeout_per_market=timeout_per_market,
+                        run_id=resume_run_id
+                    )
+                elif parallel:
+                    summary = run_markets_parallel(
+                        market_ids=target_pharmacies,
+                        steps=per_market_steps_to_run,
+                        max_workers=max_workers,
+                        show_progress=True,
+                        fused=fused,
+                        write_mode=write_mode,
+                        async_writes=async_writes,
+                        incremental=incremental,
+                        memory_budget_gb=memory_budget_gb,
+                        timeout_per_market=timeout_per_market,
+                        run_id=resume_run_id
+                    )
+                else:
+                    summary = run_markets_sequential(
+                        market_ids=target_pharmacies,
+                        steps=per_market_steps_to_run,
+                        show_progress=True,
+                        fused=fused,
+                        write_mode=write_mode,
+                        async_writes=async_writes,
+                        incremental=incremental,
+                        run_id=resume_run_id
+                    )
+            except ValueError as e:
+                print(f"\n  [ERROR] {e}")
+                return False
 
+            run_id = summary['run_id']
             elapsed = time.time() - step_start
             steps_label = f"Steps {per_market_steps_to_run[0]}-{per_market_steps_to_run[-1]}"
+            run_label = "parallel" if parallel else "sequential"
+            if parallel and scheduler == 'inn':
+                run_label += ", INN tasks"
+            if fused:
+                run_label += ", fused"
             step_timings.append((
-                f"{steps_label} (parallel, {summary['max_workers']}w, {summary['successful_count']}/{summary['total_markets']} ok)",
+                f"{steps_label} ({run_label}, {summary['max_workers']}w, {summary['successful_count']}/{summary['total_markets']} ok)",
                 elapsed,
                 summary['failed_count'] == 0
             ))
@@ -296,7 +462,10 @@ def run_pipeline(
     # =====================================================
     if from_step <= 7:
         step_start = time.time()
-        success = run_sequential_step(SEQUENTIAL_STEPS[7], python_exe)
+        if parallel:
+            success = run_in_process_step(SEQUENTIAL_STEPS[7])
+        else:
+            success = run_sequential_step(SEQUENTIAL_STEPS[7], python_exe)
         elapsed = time.time() - step_start
         step_timings.append(("Step 7: Phase 2 Data Preparation", elapsed, success))
 
@@ -327,6 +496,9 @@ def run_pipeline(
     print(f"    Market reports:    results/data_reports/")
     print(f"    Cross-market data: results/cross_market_data/market_substitution_*/")
     print(f"    Coefficients:      results/substitution_research/01_preparation/")
+    if run_id:
+        print(f"    Run manifest:      data/processed_data/_runs/{run_id}/")
+        print(f"    Trace summary:     python exec_scripts/trace_summary.py {run_id}")
     print()
 
     all_success = all(s for _, _, s in step_timings)
@@ -352,15 +524,36 @@ Steps:
   7  Data Preparation       — коефіцієнти субституції (Phase 2)
 
 Modes:
-  Default (parallel):   Steps 1-5 run in parallel via ProcessPoolExecutor
+  Default (parallel):   Preprocessing and Phase 2 run in-process, raw files in parallel;
+                        Steps 1-5 run in parallel on a persistent pool of warm workers
   --sequential:         All steps run sequentially (legacy mode, for debugging)
+  --fused:              Steps 2-4 pass DataFrames in memory (no CSV round-trips)
+  --artifacts MODE:     CSV artifacts of Steps 2-4 in fused mode:
+                        immediate (default), deferred (at market end),
+                        none (only without Reports & Export)
+  --sync-writes:        Write artifacts synchronously (default: background writer thread)
+  --force:              Recompute all per-market steps (default: skip steps whose
+                        raw file, config and code fingerprint is unchanged)
+  --scheduler MODE:     inn (default): Steps 3-4 split into (market, INN) tasks,
+                        dispatched largest first; market: one task per market
+  --memory-budget GB:   Memory budget for markets in flight (default: detected
+                        available RAM); a market is admitted only if it fits
+  --market-timeout SEC: Per-market task timeout (default: MARKET_TIMEOUT_SEC);
+                        a hung worker is killed and the market retried once
+  --resume RUN_ID:      Resume a Steps 1-5 run from its manifest with the same
+                        options: only incomplete steps of incomplete markets
 
 Examples:
   python exec_scripts/run_full_pipeline.py              # Full pipeline, parallel
   python exec_scripts/run_full_pipeline.py --sequential  # Full pipeline, sequential
   python exec_scripts/run_full_pipeline.py --from-step 3  # From stockout detection
   python exec_scripts/run_full_pipeline.py --workers 3    # Limit parallel workers
+  python exec_scripts/run_full_pipeline.py --memory-budget 24  # Admit markets within 24 GB
+  python exec_scripts/run_full_pipeline.py --market-timeout 600  # Stop markets hung > 10 min
   python exec_scripts/run_full_pipeline.py --from-step 7  # Phase 2 only
+  python exec_scripts/run_full_pipeline.py --fused --artifacts deferred
+  python exec_scripts/run_full_pipeline.py --force        # Ignore step fingerprints
+  python exec_scripts/run_full_pipeline.py --resume 20261017_101500  # Resume a crashed run
         """
     )
 
@@ -384,16 +577,103 @@ Examples:
         type=int,
         default=None,
         metavar='N',
-        help='Number of parallel workers (default: auto from machine_parameters)'
+        help='Number of parallel workers (default: auto from detected CPU and memory)'
+    )
+
+    parser.add_argument(
+        '--memory-budget',
+        type=float,
+        default=None,
+        metavar='GB',
+        help='Memory budget for markets in flight, GB (default: AVAILABLE_RAM_GB)'
+    )
+
+    parser.add_argument(
+        '--market-timeout',
+        type=int,
+        default=None,
+        metavar='SEC',
+        help='Per-market task timeout in seconds, 0 = none (default: MARKET_TIMEOUT_SEC)'
+    )
+
+    parser.add_argument(
+        '--fused',
+        action='store_true',
+        help='Run Steps 2-4 in memory per market (no intermediate CSV round-trips)'
+    )
+
+    parser.add_argument(
+        '--artifacts',
+        choices=['immediate', 'deferred', 'none'],
+        default='immediate',
+        help='CSV artifacts of Steps 2-4 in fused mode (default: immediate)'
+    )
+
+    parser.add_argument(
+        '--sync-writes',
+        action='store_true',
+        help='Write CSV/Excel artifacts synchronously (disable background writer)'
+    )
+
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Recompute all per-market steps (ignore step fingerprints)'
+    )
+
+    parser.add_argument(
+        '--scheduler',
+        choices=['inn', 'market'],
+        default='inn',
+        help='Parallel task granularity: inn (market × INN tasks, largest first) '
+             'or market (one task per market). Default: inn'
+    )
+
+    parser.add_argument(
+        '--resume',
+        default=None,
+        metavar='RUN_ID',
+        help='Resume a Steps 1-5 run (data/processed_data/_runs/RUN_ID) with its options; '
+             'only incomplete market steps are dispatched'
     )
 
     args = parser.parse_args()
 
-    parallel = not args.sequential
+    pipeline_kwargs = {
+        'from_step': args.from_step,
+        'parallel': not args.sequential,
+        'fused': args.fused,
+        'write_mode': args.artifacts,
+        'async_writes': not args.sync_writes,
+        'incremental': not args.force,
+        'scheduler': args.scheduler
+    }
+
+    if args.resume:
+        # Параметри виконання — з маніфесту запуску (ресурси — з CLI)
+        from project_core.utility_functions.run_manifest import load_run
+        try:
+            run = load_run(args.resume)
+        except FileNotFoundError as e:
+            print(f"\n  [ERROR] {e}")
+            sys.exit(1)
+        options = run['options']
+        pipeline_kwargs = {
+            'from_step': min(run['steps']),
+            'parallel': options['scheduler'] != 'sequential',
+            'fused': options['fused'],
+            'write_mode': options['write_mode'],
+            'async_writes': options['async_writes'],
+            'incremental': options['incremental'],
+            'scheduler': options['scheduler'] if options['scheduler'] != 'sequential' else 'inn',
+            'resume_run_id': args.resume
+        }
+
     success = run_pipeline(
-        from_step=args.from_step,
-        parallel=parallel,
-        max_workers=args.workers
+        max_workers=args.workers,
+        memory_budget_gb=args.memory_budget,
+        timeout_per_market=args.market_timeout,
+        **pipeline_kwargs
     )
     sys.exit(0 if success else 1)
 
@@ -0,0 +1,103 @@
+# =============================================================================
+# TRACE SUMMARY - cross_pharm_market_analysis
+# =============================================================================
+# Файл: exec_scripts/trace_summary.py
+# Дата: 2026-10-17
+# Опис: Підсумок trace запуску Steps 1-5: найповільніші кроки, фази та INN
+# =============================================================================
+
+"""
+Підсумок trace spans запуску (run_trace).
+
+Кожен запуск Steps 1-5 пише spans (ринок → крок → INN → фаза) у
+data/processed_data/_runs/{RUN_ID}/trace/. Скрипт виводить:
+    - частку wall time кожного кроку (Steps 1-5)
+    - фази INN груп (читання, тензор, DiD kernel, збір записів, LIFT)
+    - найповільніші INN групи та ринки
+
+Використання:
+    # Останній запуск:
+    python exec_scripts/trace_summary.py
+
+    # Конкретний запуск, топ-20 INN:
+    python exec_scripts/trace_summary.py 20261017_101500 --top 20
+
+    # Експорт усіх spans у CSV:
+    python exec_scripts/trace_summary.py 20261017_101500 --csv spans.csv
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+
+# =============================================================================
+# PATHS
+# =============================================================================
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SCRIPT_DIR.parent
+
+# Додаємо project root до sys.path
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+
+# =============================================================================
+# CLI
+# =============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize the trace of a Steps 1-5 run (slowest steps, phases, INNs)"
+    )
+    parser.add_argument(
+        'run_id',
+        nargs='?',
+        default=None,
+        help='Run ID (data/processed_data/_runs/RUN_ID; default: latest run)'
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=10,
+        help='Number of slowest INNs / markets to show (default: 10)'
+    )
+    parser.add_argument(
+        '--csv',
+        type=Path,
+        default=None,
+        help='Also export all spans to this CSV file'
+    )
+    args = parser.parse_args()
+
+    from project_core.utility_functions.run_manifest import list_runs
+    from project_core.utility_functions.run_trace import (
+        load_trace,
+        summarize_trace,
+        print_trace_summary
+    )
+
+    run_id = args.run_id
+    if run_id is None:
+        runs = list_runs()
+        if not runs:
+            print("\n  [ERROR] Запусків не знайдено (data/processed_data/_runs/)")
+            sys.exit(1)
+        run_id = runs[-1]
+
+    try:
+        df_spans = load_trace(run_id)
+    except FileNotFoundError as e:
+        print(f"\n  [ERROR] {e}")
+        sys.exit(1)
+
+    print_trace_summary(run_id, summarize_trace(df_spans, top=args.top))
+
+    if args.csv is not None:
+        df_spans.to_csv(args.csv, index=False)
+        print(f"\n  Spans ({len(df_spans)}): {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,4 +6,5 @@
 
 Модулі:
     machine_parameters: CPU, RAM, workers для паралельних обчислень
+    hardware_detection: Визначення CPU (квота cgroup) та пам'яті під час запуску
 """
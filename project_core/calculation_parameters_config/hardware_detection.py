@@ -0,0 +1,286 @@
+# =============================================================================
+# HARDWARE DETECTION - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/calculation_parameters_config/hardware_detection.py
+# Дата: 2026-10-17
+# Опис: Визначення CPU та пам'яті машини під час запуску (з урахуванням cgroup)
+# =============================================================================
+"""
+Визначення ресурсів машини під час запуску.
+
+Ручні значення machine_parameters описують одну машину (MacBook, 6 ядер,
+16 ГБ). У контейнері вони або недовантажують 32-ядерний сервер, або
+перевищують ліміт пам'яті cgroup (OOM kill workers). Тут визначаються:
+    - CPU: логічні ядра, фізичні ядра, affinity процесу, квота cgroup
+      (cpu.max у v2, cpu.cfs_quota_us / cpu.cfs_period_us у v1)
+    - RAM: загальна та доступна пам'ять (/proc/meminfo MemAvailable),
+      обмежені лімітом cgroup (memory.max − memory.current у v2,
+      memory.limit_in_bytes − memory.usage_in_bytes у v1)
+
+Тільки стандартна бібліотека (конфігурація імпортується до pandas).
+Значення, які не вдалося визначити, повертаються як None —
+machine_parameters використовує для них ручні значення.
+
+Використання:
+    from project_core.calculation_parameters_config.hardware_detection import detect_machine
+
+    machine = detect_machine()
+    print(machine['cpu_effective'], machine['available_ram_gb'])
+
+Перевірка на машині:
+    python project_core/calculation_parameters_config/hardware_detection.py
+"""
+
+import math
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+
+# Ліміт пам'яті cgroup v1 без обмеження — близький до 2^63
+CGROUP_V1_UNLIMITED_BYTES = 1 << 60
+
+BYTES_PER_GB = 1024 ** 3
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def _read_text(path: Path) -> Optional[str]:
+    """Прочитати файл як рядок (None якщо файл недоступний)."""
+    try:
+        return path.read_text().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _read_int(path: Path) -> Optional[int]:
+    """Прочитати ціле число з файлу (None якщо файл недоступний або не число)."""
+    text = _read_text(path)
+    if text is None:
+        return None
+    try:
+        return int(text)
+    except ValueError:
+        return None
+
+
+def _sysctl_int(name: str) -> Optional[int]:
+    """Значення sysctl (macOS) як int (None якщо недоступне)."""
+    try:
+        output = subprocess.run(
+            ['sysctl', '-n', name], capture_output=True, text=True, timeout=5, check=True
+        ).stdout
+        return int(output.strip())
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def _cgroup_v2_dir() -> Path:
+    """Папка cgroup v2 поточного процесу (рядок '0::/path' у /proc/self/cgroup)."""
+    text = _read_text(Path("/proc/self/cgroup")) or ""
+    for line in text.splitlines():
+        if line.startswith("0::"):
+            candidate = CGROUP_ROOT / line[3:].lstrip("/")
+            if candidate.is_dir():
+                return candidate
+    return CGROUP_ROOT
+
+
+# =============================================================================
+# CPU
+# =============================================================================
+
+def detect_cpu_quota() -> Optional[float]:
+    """
+    Квота CPU cgroup у ядрах (напр. 4.0 для '400000 100000').
+
+    Returns:
+        float або None якщо квота не встановлена / cgroup недоступний
+    """
+    # cgroup v2: "max 100000" або "400000 100000"
+    text = _read_text(_cgroup_v2_dir() / "cpu.max")
+    if text:
+        parts = text.split()
+        if len(parts) == 2 and parts[0] != "max":
+            try:
+                return int(parts[0]) / int(parts[1])
+            except (ValueError, ZeroDivisionError):
+                return None
+        return None
+
+    # cgroup v1: quota = -1 означає без обмеження
+    quota = _read_int(CGROUP_ROOT / "cpu" / "cpu.cfs_quota_us")
+    period = _read_int(CGROUP_ROOT / "cpu" / "cpu.cfs_period_us")
+    if quota is not None and period and quota > 0:
+        return quota / period
+    return None
+
+
+def detect_physical_cores() -> Optional[int]:
+    """
+    Кількість фізичних ядер (Linux: /proc/cpuinfo, macOS: sysctl hw.physicalcpu).
+
+    Returns:
+        int або None якщо не вдалося визначити
+    """
+    if sys.platform == "darwin":
+        return _sysctl_int("hw.physicalcpu")
+
+    text = _read_text(Path("/proc/cpuinfo"))
+    if not text:
+        return None
+
+    cores = set()
+    physical_id = core_id = None
+    for line in text.splitlines() + [""]:
+        if not line.strip():
+            if core_id is not None:
+                cores.add((physical_id, core_id))
+            physical_id = core_id = None
+        elif line.startswith("physical id"):
+            physical_id = line.split(":", 1)[1].strip()
+        elif line.startswith("core id"):
+            core_id = line.split(":", 1)[1].strip()
+
+    return len(cores) or None
+
+
+def detect_cpu() -> Dict[str, Any]:
+    """
+    Визначити CPU ресурси процесу.
+
+    cpu_effective — ядра, які процес реально може використати:
+    min(affinity, ceil(квота cgroup)).
+
+    Returns:
+        Dict: cpu_logical, cpu_physical, cpu_affinity, cpu_quota, cpu_effective
+    """
+    logical = os.cpu_count()
+    affinity = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else logical
+    quota = detect_cpu_quota()
+
+    effective = affinity
+    if effective is not None and quota is not None:
+        effective = max(1, min(effective, math.ceil(quota)))
+
+    physical = detect_physical_cores()
+    if physical is not None and effective is not None:
+        # Affinity / квота менші за фізичні ядра — доступні лише effective
+        physical = min(physical, effective)
+
+    return {
+        'cpu_logical': logical,
+        'cpu_physical': physical,
+        'cpu_affinity': affinity,
+        'cpu_quota': quota,
+        'cpu_effective': effective
+    }
+
+
+# =============================================================================
+# MEMORY
+# =============================================================================
+
+def _meminfo_bytes() -> Dict[str, int]:
+    """Поля /proc/meminfo у байтах (MemTotal, MemAvailable, ...)."""
+    text = _read_text(Path("/proc/meminfo")) or ""
+    values = {}
+    for line in text.splitlines():
+        key, _, rest = line.partition(":")
+        parts = rest.split()
+        if parts and parts[0].isdigit():
+            values[key] = int(parts[0]) * 1024
+    return values
+
+
+def detect_cgroup_memory() -> Dict[str, Optional[int]]:
+    """
+    Ліміт та поточне використання пам'яті cgroup (байти).
+
+    Returns:
+        Dict: limit (None = без обмеження), usage
+    """
+    cgroup_dir = _cgroup_v2_dir()
+    limit_text = _read_text(cgroup_dir / "memory.max")
+    if limit_text is not None:
+        limit = None if limit_text == "max" else _read_int(cgroup_dir / "memory.max")
+        return {'limit': limit, 'usage': _read_int(cgroup_dir / "memory.current")}
+
+    limit = _read_int(CGROUP_ROOT / "memory" / "memory.limit_in_bytes")
+    if limit is not None and limit >= CGROUP_V1_UNLIMITED_BYTES:
+        limit = None
+    return {'limit': limit, 'usage': _read_int(CGROUP_ROOT / "memory" / "memory.usage_in_bytes")}
+
+
+def detect_memory() -> Dict[str, Optional[float]]:
+    """
+    Визначити загальну та доступну пам'ять (ГБ) з урахуванням ліміту cgroup.
+
+    Returns:
+        Dict: total_ram_gb, available_ram_gb, cgroup_limit_gb
+              (None — не вдалося визначити / ліміту немає)
+    """
+    if sys.platform == "darwin":
+        total = _sysctl_int("hw.memsize")
+        return {
+            'total_ram_gb': total / BYTES_PER_GB if total else None,
+            'available_ram_gb': None,
+            'cgroup_limit_gb': None
+        }
+
+    meminfo = _meminfo_bytes()
+    total = meminfo.get('MemTotal')
+    available = meminfo.get('MemAvailable')
+
+    cgroup = detect_cgroup_memory()
+    if cgroup['limit'] is not None:
+        total = min(total, cgroup['limit']) if total else cgroup['limit']
+        cgroup_free = cgroup['limit'] - (cgroup['usage'] or 0)
+        available = min(available, cgroup_free) if available else cgroup_free
+
+    return {
+        'total_ram_gb': total / BYTES_PER_GB if total else None,
+        'available_ram_gb': max(0, available) / BYTES_PER_GB if available is not None else None,
+        'cgroup_limit_gb': cgroup['limit'] / BYTES_PER_GB if cgroup['limit'] is not None else None
+    }
+
+
+def detect_available_ram_gb() -> Optional[float]:
+    """Поточна доступна пам'ять (ГБ) — для повторної перевірки під час запуску."""
+    return detect_memory()['available_ram_gb']
+
+
+# =============================================================================
+# MACHINE
+# =============================================================================
+
+def detect_machine() -> Dict[str, Any]:
+    """
+    Визначити CPU та пам'ять машини (процесу).
+
+    Returns:
+        Dict: поля detect_cpu() та detect_memory()
+    """
+    machine = detect_cpu()
+    machine.update(detect_memory())
+    return machine
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("HARDWARE DETECTION - cross_pharm_market_analysis")
+    print("=" * 60)
+    for key, value in detect_machine().items():
+        if isinstance(value, float):
+            value = f"{value:.2f}"
+        print(f"  {key:<18} {value}")
@@ -9,27 +9,44 @@
 Конфігуратор параметрів обчислювальної машини.
 
 ІНСТРУКЦІЯ ДЛЯ НОВОГО ВИКОНАВЦЯ:
-    При виконанні розрахунків на іншій машині змініть значення нижче
-    відповідно до характеристик вашого обладнання.
+    За замовчуванням (HARDWARE_AUTODETECT = True) ядра, квота CPU cgroup
+    та доступна пам'ять визначаються під час запуску (hardware_detection).
+    Ручні значення нижче використовуються, якщо автовизначення вимкнено
+    або конкретне значення визначити не вдалося.
+
+    Перевірка визначених значень:
+        python project_core/calculation_parameters_config/hardware_detection.py
 
     Документація: docs/_project_tech_parameters/_computing_machine_parameters.md
 
-Поточна машина:
+Ручні значення (машина розробки):
     MacBook Pro, 2.6 GHz 6-Core Intel Core i7, 16 GB DDR4, SSD
 """
 
+from project_core.calculation_parameters_config.hardware_detection import detect_machine
+
+
+# =============================================================================
+# HARDWARE AUTO-DETECTION
+# =============================================================================
+
+# True — CPU_PHYSICAL_CORES, CPU_LOGICAL_CORES, TOTAL_RAM_GB та AVAILABLE_RAM_GB
+# визначаються під час запуску (affinity процесу, квота cgroup, MemAvailable,
+# ліміт пам'яті cgroup). False — використовуються ручні значення нижче.
+HARDWARE_AUTODETECT = True
+
 
 # =============================================================================
 # CPU PARAMETERS
 # =============================================================================
 
-# Кількість фізичних ядер процесора
+# Кількість фізичних ядер процесора (ручне значення)
 # (Intel i7-9750H: 6 фізичних ядер, 12 логічних з Hyper-Threading)
 # Де перевірити: macOS → About This Mac → Processor
 # Або в терміналі: sysctl -n hw.physicalcpu
 CPU_PHYSICAL_CORES = 6
 
-# Кількість логічних ядер (з урахуванням Hyper-Threading)
+# Кількість логічних ядер (з урахуванням Hyper-Threading, ручне значення)
 # Або в терміналі: sysctl -n hw.logicalcpu
 CPU_LOGICAL_CORES = 12
 
@@ -38,38 +55,108 @@ CPU_LOGICAL_CORES = 12
 # MEMORY PARAMETERS
 # =============================================================================
 
-# Загальний обсяг оперативної пам'яті (ГБ)
+# Загальний обсяг оперативної пам'яті (ГБ, ручне значення)
 # Де перевірити: macOS → About This Mac → Memory
 TOTAL_RAM_GB = 16
 
-# Максимальний обсяг RAM, який можна використовувати для обчислень (ГБ)
+# Максимальний обсяг RAM, який можна використовувати для обчислень (ГБ, ручне значення)
 # Рекомендація: TOTAL_RAM_GB - 4 ГБ (залишаємо для ОС та інших процесів)
 AVAILABLE_RAM_GB = 12
 
+# Резерв пам'яті для ОС та процесу-координатора (ГБ) при автовизначенні:
+# AVAILABLE_RAM_GB = min(доступна пам'ять, TOTAL_RAM_GB - RAM_RESERVE_GB)
+RAM_RESERVE_GB = 2
+
 # Очікуваний пік пам'яті на один worker-процес (ГБ)
 # Залежить від розміру найбільшого ринку та складності обчислень
 # Для типового ринку: 300–500 МБ, для великого: до 800 МБ
+# Використовується для OPTIMAL_WORKERS; runner-и уточнюють кількість workers
+# та допуск ринків за оцінкою пам'яті кожного ринку (див. нижче)
 RAM_PER_WORKER_GB = 0.5
 
 
+# =============================================================================
+# APPLY DETECTION (перезаписує ручні значення визначеними)
+# =============================================================================
+
+# Результат визначення ({} якщо HARDWARE_AUTODETECT = False)
+DETECTED_MACHINE = detect_machine() if HARDWARE_AUTODETECT else {}
+
+if DETECTED_MACHINE.get('cpu_physical'):
+    CPU_PHYSICAL_CORES = DETECTED_MACHINE['cpu_physical']
+
+# Логічні ядра, доступні процесу: min(affinity, квота cgroup)
+if DETECTED_MACHINE.get('cpu_effective'):
+    CPU_LOGICAL_CORES = DETECTED_MACHINE['cpu_effective']
+
+if DETECTED_MACHINE.get('total_ram_gb'):
+    TOTAL_RAM_GB = round(DETECTED_MACHINE['total_ram_gb'], 1)
+    AVAILABLE_RAM_GB = round(max(RAM_PER_WORKER_GB, TOTAL_RAM_GB - RAM_RESERVE_GB), 1)
+
+if DETECTED_MACHINE.get('available_ram_gb') is not None:
+    AVAILABLE_RAM_GB = round(
+        max(RAM_PER_WORKER_GB, min(DETECTED_MACHINE['available_ram_gb'], TOTAL_RAM_GB - RAM_RESERVE_GB)),
+        1
+    )
+
+
+# =============================================================================
+# PER-MARKET MEMORY ESTIMATE (допуск ринків до пулу)
+# =============================================================================
+
+# Допуск ринку до worker-а тільки якщо сума оцінок пам'яті ринків у роботі
+# разом з новим ринком ≤ AVAILABLE_RAM_GB (project_core/utility_functions/market_memory.py).
+# Ринок, що не вміщується, чекає, поки завершаться інші (менші ринки
+# допускаються раніше); якщо в роботі нічого немає — ринок допускається завжди.
+MEMORY_ADMISSION = True
+
+# Оцінка піку пам'яті ринку (ГБ):
+#   WORKER_BASE_RAM_GB
+#   + RAW_MEMORY_FACTOR × розмір raw файлу   (файли ≤ RAW_INMEMORY_MAX_MB читаються цілком;
+#                                             більші — chunks по RAW_CHUNK_ROWS рядків)
+#   + RAM_BYTES_PER_RECORD × RECORDS_COUNT    (markets_statistics.csv Step 0)
+# Без markets_statistics.csv: RECORDS_COUNT ≈ розмір raw / RAW_BYTES_PER_RECORD.
+# Калібрування (3 тестові ринки, 7-10 МБ raw): worker після імпортів ~170 МБ,
+# пік ринку ~186 МБ; оцінка ~270 МБ (запас ~1.5×).
+WORKER_BASE_RAM_GB = 0.2
+
+# In-memory DataFrame raw файлу займає ~5-8× розміру CSV
+RAW_MEMORY_FACTOR = 6
+
+# Робочі дані Steps 1-5 (агрегація, тензори, події, результати) на запис raw
+RAM_BYTES_PER_RECORD = 500
+
+# Середній розмір запису raw CSV (байт) — для оцінки без markets_statistics.csv
+RAW_BYTES_PER_RECORD = 300
+
+
 # =============================================================================
 # PARALLEL PROCESSING PARAMETERS
 # =============================================================================
 
-# Максимальна кількість паралельних worker-процесів
-# Формула: min(CPU_PHYSICAL_CORES - 1, AVAILABLE_RAM_GB // RAM_PER_WORKER_GB)
-# Для поточної машини: min(5, 24) = 5
+# Ручний ліміт паралельних worker-процесів (None = без ліміту)
+# Кількість workers: min(CPU_PHYSICAL_CORES - 1, AVAILABLE_RAM_GB // RAM_PER_WORKER_GB, MAX_WORKERS)
+# Для машини розробки: min(5, 24) = 5; для 32-ядерного сервера: 31 (якщо дозволяє RAM)
 # УВАГА: значення > CPU_PHYSICAL_CORES не дає приросту і може сповільнити
-MAX_WORKERS = 5
+MAX_WORKERS = None
 
 # Мінімальна кількість workers (fallback якщо auto-detection не спрацює)
 MIN_WORKERS = 1
 
-# Таймаут на обробку одного ринку (секунди)
-# Якщо обробка ринку перевищує цей час — worker буде зупинений
+# Таймаут на обробку одного ринку (секунди; 0 = без таймауту)
+# Якщо обробка ринку перевищує цей час — worker буде зупинений (kill) та замінений
+# новим, ринок записується як timeout (market_watchdog). У market_scheduler
+# таймаут застосовується до кожної задачі ринку (prepare / INN / finalize).
 # 600 сек = 10 хв — достатньо навіть для найбільших ринків після оптимізації
 MARKET_TIMEOUT_SEC = 600
 
+# Кількість повторів ринку після таймауту (0 = без повторів)
+MARKET_TIMEOUT_RETRIES = 1
+
+# Режим INN-груп для повтору після таймауту (зменшений INN-паралелізм:
+# без потоків / процесів всередині ринку)
+TIMEOUT_RETRY_INTRA_EXECUTOR = 'serial'
+
 # Чи показувати прогрес-бар при паралельних обчисленнях
 SHOW_PROGRESS = True
 
@@ -78,20 +165,65 @@ SHOW_PROGRESS = True
 # INTRA-MARKET PARALLELISM (INN-рівневий паралелізм)
 # =============================================================================
 
-# Кількість потоків для INN-рівневого паралелізму всередині одного market worker.
-# Кожен worker-процес (inter-market) може запускати threads для обробки INN-груп.
-# ThreadPoolExecutor використовується тому що pandas звільняє GIL при C-операціях.
+# Кількість workers для INN-рівневого паралелізму всередині одного market worker.
+# Кожен worker-процес (inter-market) може запускати threads або процеси для
+# обробки INN-груп Steps 3-4 (див. INTRA_MARKET_EXECUTOR нижче).
 #
-# Формула: min(4, max(1, CPU_LOGICAL_CORES // MAX_WORKERS))
-# Для поточної машини: min(4, 12 // 5) = 2
+# Формула: min(4, max(1, CPU_LOGICAL_CORES // OPTIMAL_WORKERS))
+# Для машини розробки: min(4, 12 // 5) = 2
 #
-# Загальний ліміт активних потоків: MAX_WORKERS × THREADS_PER_WORKER
-# Для поточної машини: 5 × 2 = 10 (менше 12 logical cores — ок)
+# Загальний ліміт активних потоків: OPTIMAL_WORKERS × THREADS_PER_WORKER
+# Для машини розробки: 5 × 2 = 10 (менше 12 logical cores — ок)
 #
 # УВАГА: Якщо INN-груп менше ніж THREADS_PER_WORKER, зайві потоки не створюються.
 # Значення 1 = відключити INN-паралелізм (послідовна обробка як раніше).
 THREADS_PER_WORKER = 2
 
+# Виконавець INN-груп всередині ринку (project_core/utility_functions/inn_executor.py):
+#   'threads'   — ThreadPoolExecutor. Обробка INN групи — здебільшого Python-рівень
+#                 (iterrows, dict записи, зрізи малих DataFrame) і тримає GIL,
+#                 тому приріст є лише на numpy/pyarrow частинах
+#   'processes' — постійний пул процесів (spawn) у кожному market worker; дані INN
+#                 процеси читають зі store напряму (спільний page cache), по IPC —
+#                 тільки події та записи результату. Загальна кількість процесів:
+#                 MAX_WORKERS × (1 + THREADS_PER_WORKER)
+#   'serial'    — без INN-паралелізму
+# Реальне масштабування на конкретній машині:
+#   python benchmarks/bench_intra_market_executor.py --market-id <CLIENT_ID>
+# Із INN scheduler (run_full_pipeline.py, --scheduler inn) Steps 3-4 вже розкладені
+# на задачі (ринок, INN) між workers — цей рівень працює для --scheduler market
+# та окремих запусків кроків (--market_id / --all).
+INTRA_MARKET_EXECUTOR = 'threads'
+
+
+# =============================================================================
+# RAW INGESTION PARAMETERS (потокове читання Rd2_*.csv)
+# =============================================================================
+
+# Кількість рядків raw файлу, що читаються за один раз (chunk).
+# Пік пам'яті читання ≈ RAW_CHUNK_ROWS × ~200 байт (11 колонок, назви як category),
+# тобто ~100 МБ на 500 000 рядків — незалежно від розміру файлу.
+RAW_CHUNK_ROWS = 500_000
+
+# Raw файли, більші за цей розмір (МБ), агрегуються у Step 1 потоково:
+# chunks → spill файли per INN → агрегація по одному INN.
+# Менші файли читаються цілком (один векторизований прохід по ринку).
+# In-memory DataFrame займає ~5-8× розміру CSV, тому 64 МБ CSV ≈ RAM_PER_WORKER_GB.
+RAW_INMEMORY_MAX_MB = 64
+
+
+# =============================================================================
+# INSTRUMENTATION (trace spans per run)
+# =============================================================================
+
+# Детальність trace запуску (run_trace → _runs/{RUN_ID}/trace/*.jsonl):
+#   'off'    — без trace
+#   'market' — задачі ринків
+#   'step'   — + кроки (Steps 1-5)
+#   'inn'    — + INN групи Steps 2-4
+#   'phase'  — + фази INN (читання, тензор, DiD kernel, збір записів)
+TRACE_LEVEL = 'phase'
+
 
 # =============================================================================
 # DISK PARAMETERS
@@ -113,7 +245,7 @@ def get_optimal_workers() -> int:
     Враховує:
         - Кількість фізичних ядер (залишаємо 1 для системи)
         - Доступну RAM (ділимо на пік пам'яті per worker)
-        - Не менше MIN_WORKERS, не більше MAX_WORKERS
+        - Не менше MIN_WORKERS, не більше MAX_WORKERS (якщо задано)
 
     Returns:
         int: Оптимальна кількість workers
@@ -121,7 +253,9 @@ def get_optimal_workers() -> int:
     cpu_based = max(1, CPU_PHYSICAL_CORES - 1)
     ram_based = max(1, int(AVAILABLE_RAM_GB / RAM_PER_WORKER_GB))
 
-    optimal = min(cpu_based, ram_based, MAX_WORKERS)
+    optimal = min(cpu_based, ram_based)
+    if MAX_WORKERS is not None:
+        optimal = min(optimal, MAX_WORKERS)
     optimal = max(optimal, MIN_WORKERS)
 
     return optimal
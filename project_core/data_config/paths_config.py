@@ -58,7 +58,8 @@ PREPROC_FILES = {
     'nfc1_list': PREPROC_RESULTS_PATH / "nfc1_list.csv",
     'nfc2_list': PREPROC_RESULTS_PATH / "nfc2_list.csv",
     'drugs_list': PREPROC_RESULTS_PATH / "drugs_list.csv",
-    'markets_statistics': PREPROC_RESULTS_PATH / "markets_statistics.csv"
+    'markets_statistics': PREPROC_RESULTS_PATH / "markets_statistics.csv",
+    'period_table': PREPROC_RESULTS_PATH / "period_table.csv"
 }
 
 # =============================================================================
@@ -69,6 +70,10 @@ PREPROC_FILES = {
 PER_MARKET_FOLDER = "01_per_market"
 CROSS_MARKET_FOLDER = "02_cross_market"
 
+# Партиціонований Parquet store агрегованих даних (вихід Step 1)
+MARKET_STORE_PARTITION_KEY = "INN_ID"
+MARKET_STORE_FILE_NAME = "part-0.parquet"
+
 
 def get_market_folder(client_id: int) -> Path:
     """
@@ -96,6 +101,19 @@ def get_market_raw_file(client_id: int) -> Path:
     return RAW_DATA_PATH / f"Rd2_{client_id}.csv"
 
 
+def get_market_store_path(client_id: int) -> Path:
+    """
+    Отримати шлях до партиціонованого store агрегованих даних ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Path: 01_aggregation_{CLIENT_ID}/inn_store_{CLIENT_ID}/
+    """
+    return get_market_folder(client_id) / f"01_aggregation_{client_id}" / f"inn_store_{client_id}"
+
+
 def get_market_paths(client_id: int) -> Dict[str, Path]:
     """
     Отримати всі шляхи для обробки конкретного ринку.
@@ -103,6 +121,7 @@ def get_market_paths(client_id: int) -> Dict[str, Path]:
     Структура папок (узгоджена):
         01_per_market/{CLIENT_ID}/
         ├── 01_aggregation_{CLIENT_ID}/
+        │   └── inn_store_{CLIENT_ID}/INN_ID={INN_ID}/part-0.parquet
         ├── 02_stockout_{CLIENT_ID}/
         ├── 03_did_analysis_{CLIENT_ID}/
         └── 04_substitute_shares_{CLIENT_ID}/
@@ -121,6 +140,7 @@ def get_market_paths(client_id: int) -> Dict[str, Path]:
 
         # Етап 1: Агрегація
         'aggregation': market_folder / f"01_aggregation_{client_id}",
+        'market_store': get_market_store_path(client_id),
 
         # Етап 2: Stock-out detection
         'stockout': market_folder / f"02_stockout_{client_id}",
@@ -139,6 +159,9 @@ def get_market_paths(client_id: int) -> Dict[str, Path]:
 
 CROSS_MARKET_PATH = PROCESSED_DATA_PATH / CROSS_MARKET_FOLDER
 
+# Маніфести запусків Steps 1-5 (run_manifest, --resume RUN_ID)
+RUN_MANIFESTS_PATH = PROCESSED_DATA_PATH / "_runs"
+
 CROSS_MARKET_PATHS = {
     'collected_results': CROSS_MARKET_PATH / "01_collected_results",
     'coverage_analysis': CROSS_MARKET_PATH / "02_coverage_analysis",
@@ -225,6 +248,27 @@ def load_markets_statistics() -> pd.DataFrame:
     return pd.read_csv(file_path)
 
 
+def load_period_table() -> pd.DataFrame:
+    """
+    Завантажити таблицю-вимір періодів (PERIOD_ID → PERIOD_DATE, Date, WEEK_IDX).
+
+    Returns:
+        pd.DataFrame: Один рядок на PERIOD_ID (дати як datetime64)
+
+    Raises:
+        FileNotFoundError: Якщо файл не знайдено
+    """
+    file_path = PREPROC_FILES['period_table']
+
+    if not file_path.exists():
+        raise FileNotFoundError(
+            f"Файл {file_path} не знайдено. "
+            f"Спочатку виконайте preprocessing: python exec_scripts/01_did_processing/01_preproc.py"
+        )
+
+    return pd.read_csv(file_path, parse_dates=['PERIOD_DATE', 'Date'])
+
+
 def ensure_market_folders(client_id: int) -> Dict[str, Path]:
     """
     Створити всі необхідні папки для обробки ринку.
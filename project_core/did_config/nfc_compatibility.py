@@ -18,15 +18,29 @@
     - EXACT_MATCH: інші форми замінюються тільки на себе
     - EXCLUDED: не для медичного використання
 
+Векторизована сумісність:
+    NFC1 інтернуються в малі int коди (encode_nfc1) при завантаженні
+    даних, а NFC1_COMPATIBILITY_MATRIX будується один раз при імпорті з
+    ORAL_GROUP / EXCLUDE_FORMS. compatible_mask() повертає маску target
+    форми проти масиву форм одним lookup у матриці, без рядкових
+    порівнянь у циклі DiD.
+
 Використання:
     from project_core.did_config.nfc_compatibility import (
         is_compatible,
         get_compatibility_group,
         ORAL_GROUP
     )
+
+    codes = encode_nfc1(df['NFC1_ID'])
+    mask = compatible_mask(target_nfc1, codes)
 """
 
-from typing import List
+import threading
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
 
 
 # =============================================================================
@@ -59,6 +73,107 @@ ALL_NFC1_CATEGORIES: List[str] = [
 ]
 
 
+# =============================================================================
+# NFC1 CODES
+# =============================================================================
+
+# Код для пропущеного NFC1 (NaN) — не сумісний ні з чим, включно з собою
+MISSING_NFC1_CODE: int = -1
+
+# Стабільні коди відомих категорій: індекс у ALL_NFC1_CATEGORIES
+NFC1_CODES: Dict[str, int] = {form: code for code, form in enumerate(ALL_NFC1_CATEGORIES)}
+
+# Кількість відомих категорій (рядки/колонки NFC1_COMPATIBILITY_MATRIX)
+N_KNOWN_NFC1: int = len(ALL_NFC1_CATEGORIES)
+
+# Реєстр кодів: відомі категорії + невідомі форми, інтерновані під час роботи
+# (коди >= N_KNOWN_NFC1, для них діє тільки Exact Match)
+_nfc1_registry: Dict[str, int] = dict(NFC1_CODES)
+_nfc1_registry_lock = threading.Lock()
+
+
+def _build_compatibility_matrix() -> np.ndarray:
+    """
+    Побудувати булеву матрицю сумісності відомих категорій NFC1.
+
+    Returns:
+        np.ndarray: bool [N_KNOWN_NFC1, N_KNOWN_NFC1], matrix[a, b] = is_compatible(a, b)
+    """
+    is_oral = np.array([form in ORAL_GROUP for form in ALL_NFC1_CATEGORIES])
+    is_excluded = np.array([form in EXCLUDE_FORMS for form in ALL_NFC1_CATEGORIES])
+
+    matrix = np.eye(N_KNOWN_NFC1, dtype=bool) | (is_oral[:, np.newaxis] & is_oral[np.newaxis, :])
+    matrix &= ~is_excluded[:, np.newaxis] & ~is_excluded[np.newaxis, :]
+    matrix.setflags(write=False)
+
+    return matrix
+
+
+# Матриця сумісності відомих категорій (будується один раз при імпорті)
+NFC1_COMPATIBILITY_MATRIX: np.ndarray = _build_compatibility_matrix()
+
+
+def intern_nfc1(form) -> int:
+    """
+    Отримати int код форми випуску NFC1.
+
+    Відомі категорії мають стабільні коди з NFC1_CODES, невідома форма
+    отримує наступний вільний код (однаковий для всіх викликів процесу).
+
+    Args:
+        form: NFC1_ID форми випуску (str або NaN)
+
+    Returns:
+        int: Код форми (MISSING_NFC1_CODE для NaN)
+    """
+    if not isinstance(form, str):
+        return MISSING_NFC1_CODE
+
+    code = _nfc1_registry.get(form)
+    if code is not None:
+        return code
+
+    with _nfc1_registry_lock:
+        return _nfc1_registry.setdefault(form, len(_nfc1_registry))
+
+
+def encode_nfc1(forms) -> np.ndarray:
+    """
+    Інтернувати масив форм випуску NFC1 у int коди.
+
+    Рядкова робота виконується один раз на унікальне значення
+    (pd.factorize), решта — індексація масиву.
+
+    Args:
+        forms: Масив / Series / Categorical значень NFC1_ID
+
+    Returns:
+        np.ndarray: int32 коди (MISSING_NFC1_CODE для NaN)
+    """
+    codes, uniques = pd.factorize(np.asarray(forms, dtype=object))
+    unique_codes = np.array([intern_nfc1(form) for form in uniques], dtype=np.int32)
+
+    result = np.full(len(codes), MISSING_NFC1_CODE, dtype=np.int32)
+    result[codes >= 0] = unique_codes[codes[codes >= 0]]
+
+    return result
+
+
+def _as_nfc1_codes(forms) -> np.ndarray:
+    """Привести форми (рядки або вже коди) до int масиву кодів."""
+    if isinstance(forms, str) or not np.ndim(forms):
+        return np.asarray(
+            forms if isinstance(forms, (int, np.integer)) else intern_nfc1(forms),
+            dtype=np.int64
+        )
+
+    values = np.asarray(forms)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.int64, copy=False)
+
+    return encode_nfc1(values.ravel()).reshape(values.shape).astype(np.int64)
+
+
 # =============================================================================
 # COMPATIBILITY FUNCTIONS
 # =============================================================================
@@ -161,6 +276,59 @@ def filter_compatible_substitutes(
     return [nfc1 for nfc1 in substitutes_nfc1 if is_compatible(target_nfc1, nfc1)]
 
 
+def compatible_mask(
+    target_form: Union[str, int, np.ndarray],
+    forms: Union[List[str], np.ndarray]
+) -> np.ndarray:
+    """
+    Векторизована перевірка сумісності target форми з масивом форм.
+
+    Еквівалент [is_compatible(target_form, f) for f in forms] через
+    lookup у NFC1_COMPATIBILITY_MATRIX. Приймає як рядки NFC1_ID, так і
+    коди з encode_nfc1(); target_form може бути масивом (broadcast з
+    forms), напр. target_codes[:, None] проти drug_codes[None, :] дає
+    маску [events, drugs].
+
+    Args:
+        target_form: NFC1 target препарату (рядок, код або масив кодів)
+        forms: NFC1 потенційних substitutes (рядки або коди)
+
+    Returns:
+        np.ndarray: bool маска сумісних форм
+    """
+    target_codes, codes = np.broadcast_arrays(_as_nfc1_codes(target_form), _as_nfc1_codes(forms))
+
+    both_known = (
+        (target_codes >= 0) & (target_codes < N_KNOWN_NFC1)
+        & (codes >= 0) & (codes < N_KNOWN_NFC1)
+    )
+    mask = np.zeros(target_codes.shape, dtype=bool)
+    mask[both_known] = NFC1_COMPATIBILITY_MATRIX[target_codes[both_known], codes[both_known]]
+
+    # Невідомі форми: тільки Exact Match
+    mask |= (target_codes >= N_KNOWN_NFC1) & (codes == target_codes)
+
+    return mask
+
+
+def same_nfc1_mask(
+    target_form: Union[str, int, np.ndarray],
+    forms: Union[List[str], np.ndarray]
+) -> np.ndarray:
+    """
+    Векторизована перевірка однаковості форм (target_nfc1 == sub_nfc1).
+
+    Args:
+        target_form: NFC1 target препарату (рядок, код або масив кодів)
+        forms: NFC1 потенційних substitutes (рядки або коди)
+
+    Returns:
+        np.ndarray: bool маска (NaN не дорівнює нічому)
+    """
+    target_codes, codes = np.broadcast_arrays(_as_nfc1_codes(target_form), _as_nfc1_codes(forms))
+    return (codes == target_codes) & (target_codes != MISSING_NFC1_CODE)
+
+
 # =============================================================================
 # STATISTICS
 # =============================================================================
@@ -216,6 +384,13 @@ def validate_matrix() -> bool:
                 print(f"ПОМИЛКА: Асиметрія для {form_a} і {form_b}")
                 return False
 
+    # Перевірка що NFC1_COMPATIBILITY_MATRIX збігається з is_compatible
+    for form_a in ALL_NFC1_CATEGORIES:
+        for form_b in ALL_NFC1_CATEGORIES:
+            if NFC1_COMPATIBILITY_MATRIX[NFC1_CODES[form_a], NFC1_CODES[form_b]] != is_compatible(form_a, form_b):
+                print(f"ПОМИЛКА: Матриця не збігається з is_compatible для {form_a} і {form_b}")
+                return False
+
     return True
 
 
@@ -8,6 +8,20 @@
     - etl_utils: ETL функції (Extract-Transform-Load)
     - did_utils: DiD функції (Difference-in-Differences)
     - parallel_runner: Паралельне виконання per-market обробки
+    - market_scheduler: Задачі рівня (ринок, INN) для Steps 3-4, найбільші першими
+    - inn_executor: Виконавець INN-груп всередині ринку (serial / threads / processes)
+    - market_memory: Оцінка пам'яті ринку, адаптивний пул та допуск ринків за пам'яттю
+    - market_watchdog: Таймаути задач пулу workers (старт задач, kill завислого worker-а)
+    - run_manifest: Маніфест запуску Steps 1-5 (завершені кроки, checksums, resume)
+    - run_trace: Trace spans запуску (ринок → крок → INN → фаза) та підсумок
+    - market_store: Партиціонований Parquet store агрегованих даних per market
+    - inn_tensor: Щільний тензор (препарати × тижні) з prefix sums per INN
+    - market_context: In-memory контекст ринку для fused Steps 2-4
+    - artifact_writer: Фоновий атомарний запис CSV/Excel артефактів
+    - step_fingerprint: Fingerprints входів per-market кроків (інкрементальний запуск)
+    - inn_cache: Per-INN кеш результатів Steps 2-4
+    - raw_ingest: Потокове (chunked) читання raw файлів Rd2_*.csv
+    - synthetic_markets: Генератор синтетичних raw файлів Rd2_*.csv (seeded)
 
 Використання:
     from project_core.utility_functions.etl_utils import (
@@ -19,10 +33,70 @@
     from project_core.utility_functions.parallel_runner import (
         run_markets_parallel, process_single_market_pipeline
     )
+    from project_core.utility_functions.market_scheduler import (
+        run_markets_scheduled
+    )
+    from project_core.utility_functions.inn_executor import (
+        map_inn_groups
+    )
+    from project_core.utility_functions.market_memory import (
+        estimate_markets_memory, can_admit
+    )
+    from project_core.utility_functions.market_watchdog import (
+        submit_tracked, expired_tokens, kill_worker
+    )
+    from project_core.utility_functions.run_manifest import (
+        start_run, record_market_steps, finish_run
+    )
+    from project_core.utility_functions.run_trace import (
+        trace_span, load_trace, summarize_trace
+    )
+    from project_core.utility_functions.market_store import (
+        list_store_inns, load_inn_data
+    )
+    from project_core.utility_functions.inn_tensor import (
+        build_inn_tensor, window_sum
+    )
+    from project_core.utility_functions.market_context import (
+        create_market_context, flush_artifacts
+    )
+    from project_core.utility_functions.artifact_writer import (
+        write_csv, flush_writes
+    )
+    from project_core.utility_functions.step_fingerprint import (
+        compute_step_fingerprints, is_step_current
+    )
+    from project_core.utility_functions.inn_cache import (
+        inn_cache_key, load_inn_result
+    )
+    from project_core.utility_functions.raw_ingest import (
+        iter_raw_chunks, spill_raw_by_inn
+    )
+    from project_core.utility_functions.synthetic_markets import (
+        generate_market, generate_markets
+    )
 """
 
 from . import etl_utils
 from . import did_utils
 from . import parallel_runner
+from . import market_scheduler
+from . import inn_executor
+from . import market_memory
+from . import market_watchdog
+from . import run_manifest
+from . import run_trace
+from . import market_store
+from . import inn_tensor
+from . import market_context
+from . import artifact_writer
+from . import step_fingerprint
+from . import inn_cache
+from . import raw_ingest
+from . import synthetic_markets
 
-__all__ = ['etl_utils', 'did_utils', 'parallel_runner']
+__all__ = [
+    'etl_utils', 'did_utils', 'parallel_runner', 'market_scheduler', 'inn_executor',
+    'market_memory', 'market_watchdog', 'run_manifest', 'run_trace', 'market_store', 'inn_tensor', 'market_context', 'artifact_writer',
+    'step_fingerprint', 'inn_cache', 'raw_ingest', 'synthetic_markets'
+]
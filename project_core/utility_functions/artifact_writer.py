@@ -0,0 +1,245 @@
+# =============================================================================
+# ARTIFACT WRITER - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/artifact_writer.py
+# Дата: 2026-10-17
+# Опис: Фоновий запис CSV/Excel артефактів (черга + writer thread)
+# =============================================================================
+
+"""
+Сервіс фонового запису артефактів пайплайну (CSV та Excel).
+
+Кроки не блокуються на to_csv / wb.save: запис ставиться в обмежену
+чергу, яку розбирає окремий writer thread, тому серіалізація
+перекривається з обчисленням наступного INN або кроку. Повна черга
+блокує постановку (backpressure), тож пам'ять під незаписані
+артефакти обмежена.
+
+Гарантії:
+    - Атомарність: файл пишеться у тимчасовий файл поруч і
+      перейменовується (os.replace) — читач ніколи не бачить
+      напівзаписаний артефакт
+    - Flush barrier: flush_writes() чекає запису всього, що поставлено
+      в чергу, і піднімає помилку, якщо якийсь запис не вдався
+      (parallel_runner викликає його перед кроками, що читають CSV,
+      та в кінці кожного ринку)
+    - Без запущеного writer (standalone скрипти) запис синхронний,
+      але так само атомарний
+
+Використання:
+    from project_core.utility_functions.artifact_writer import (
+        start_writer,
+        write_csv,
+        flush_writes
+    )
+
+    start_writer()
+    write_csv(df_did, did_file)
+    flush_writes()
+"""
+
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Максимум артефактів у черзі (далі постановка блокується)
+DEFAULT_QUEUE_SIZE = 32
+
+# Writer процесу (один на worker-процес)
+_writer: Optional[Dict[str, Any]] = None
+_writer_lock = threading.Lock()
+
+
+# =============================================================================
+# ATOMIC WRITE
+# =============================================================================
+
+def _temp_path(file_path: Path) -> Path:
+    """
+    Тимчасовий файл поруч з артефактом (той самий каталог → атомарний rename).
+
+    Розширення зберігається (.csv / .xlsx), бо writers можуть на нього
+    орієнтуватися.
+    """
+    return file_path.with_name(f".{file_path.stem}.{os.getpid()}.tmp{file_path.suffix}")
+
+
+def atomic_write(file_path: Path, write_fn: Callable[[Path], Any]) -> Path:
+    """
+    Записати файл атомарно: тимчасовий файл → os.replace.
+
+    Args:
+        file_path: Шлях до артефакту
+        write_fn: Функція запису, отримує шлях тимчасового файлу
+
+    Returns:
+        Path: Шлях до артефакту
+    """
+    file_path = Path(file_path)
+    tmp_path = _temp_path(file_path)
+
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if tmp_path.exists():
+            tmp_path.unlink()
+        raise
+
+    return file_path
+
+
+# =============================================================================
+# WRITER THREAD
+# =============================================================================
+
+def _writer_loop(writer: Dict[str, Any]) -> None:
+    """Розбирати чергу записів до sentinel (None)."""
+    write_queue = writer['queue']
+
+    while True:
+        item = write_queue.get()
+        try:
+            if item is None:
+                return
+            file_path, write_fn = item
+            atomic_write(file_path, write_fn)
+        except Exception as e:
+            writer['errors'].append((item[0], e))
+        finally:
+            write_queue.task_done()
+
+
+def start_writer(queue_size: int = DEFAULT_QUEUE_SIZE) -> Dict[str, Any]:
+    """
+    Запустити writer thread процесу (ідемпотентно).
+
+    Args:
+        queue_size: Розмір черги артефактів
+
+    Returns:
+        Dict: Стан writer (queue, thread, errors)
+    """
+    global _writer
+
+    with _writer_lock:
+        if _writer is None:
+            writer = {
+                'queue': queue.Queue(maxsize=queue_size),
+                'errors': [],
+                'thread': None
+            }
+            thread = threading.Thread(
+                target=_writer_loop, args=(writer,), name='artifact-writer', daemon=True
+            )
+            writer['thread'] = thread
+            thread.start()
+            _writer = writer
+
+        return _writer
+
+
+def writer_active() -> bool:
+    """Чи запущений фоновий writer у цьому процесі."""
+    return _writer is not None
+
+
+def submit_write(file_path: Path, write_fn: Callable[[Path], Any]) -> Path:
+    """
+    Поставити запис артефакту в чергу (або записати одразу без writer).
+
+    Args:
+        file_path: Шлях до артефакту
+        write_fn: Функція запису, отримує шлях тимчасового файлу.
+                  Об'єкт, який вона пише, не повинен змінюватись після виклику.
+
+    Returns:
+        Path: Шлях до артефакту
+    """
+    writer = _writer
+    if writer is None:
+        return atomic_write(file_path, write_fn)
+
+    writer['queue'].put((Path(file_path), write_fn))
+    return Path(file_path)
+
+
+def flush_writes() -> None:
+    """
+    Flush barrier: дочекатись запису всіх артефактів у черзі.
+
+    Raises:
+        RuntimeError: Якщо хоча б один запис не вдався (помилки скидаються)
+    """
+    writer = _writer
+    if writer is None:
+        return
+
+    writer['queue'].join()
+
+    if writer['errors']:
+        errors: List[Tuple[Path, Exception]] = list(writer['errors'])
+        writer['errors'].clear()
+        details = '; '.join(f"{path}: {type(e).__name__}: {e}" for path, e in errors)
+        raise RuntimeError(f"Не вдалося записати {len(errors)} артефакт(ів): {details}")
+
+
+def stop_writer() -> None:
+    """Записати чергу та зупинити writer thread процесу."""
+    global _writer
+
+    with _writer_lock:
+        writer = _writer
+        if writer is None:
+            return
+        _writer = None
+
+    writer['queue'].put(None)
+    writer['thread'].join()
+
+    if writer['errors']:
+        details = '; '.join(f"{path}: {e}" for path, e in writer['errors'])
+        raise RuntimeError(f"Не вдалося записати артефакти: {details}")
+
+
+# =============================================================================
+# ARTIFACT TYPES
+# =============================================================================
+
+def write_csv(df: pd.DataFrame, file_path: Path, **to_csv_kwargs) -> Path:
+    """
+    Записати DataFrame у CSV через writer (index=False за замовчуванням).
+
+    Args:
+        df: DataFrame (не змінюється після виклику)
+        file_path: Шлях до CSV
+        **to_csv_kwargs: Аргументи DataFrame.to_csv
+
+    Returns:
+        Path: Шлях до CSV
+    """
+    to_csv_kwargs.setdefault('index', False)
+    return submit_write(file_path, lambda tmp_path: df.to_csv(tmp_path, **to_csv_kwargs))
+
+
+def save_workbook(wb: Any, file_path: Path) -> Path:
+    """
+    Зберегти openpyxl Workbook через writer.
+
+    Args:
+        wb: openpyxl Workbook (не змінюється після виклику)
+        file_path: Шлях до .xlsx
+
+    Returns:
+        Path: Шлях до файлу
+    """
+    return submit_write(file_path, wb.save)
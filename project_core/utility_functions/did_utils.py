@@ -16,6 +16,7 @@ DiD утиліти для проекту cross_pharm_market_analysis.
     - calculate_lift(): Розрахунок LIFT (додаткові продажі)
     - calculate_shares(): Розрахунок SHARE_INTERNAL, SHARE_LOST
     - nfc_decomposition(): Декомпозиція по NFC1
+    - calculate_did_batch(): Batched DiD для всіх подій INN (NumPy broadcasting)
     - validate_did_invariants(): Валідація результатів
 
 Використання:
@@ -28,9 +29,14 @@ DiD утиліти для проекту cross_pharm_market_analysis.
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Tuple, Any
 
+from project_core.utility_functions.inn_tensor import (
+    window_sum,
+    window_count,
+    window_total
+)
+
 
 # =============================================================================
 # POST-PERIOD DEFINITION
@@ -38,35 +44,36 @@ from typing import Optional, List, Dict, Tuple, Any
 
 def define_post_period(
     df_drug: pd.DataFrame,
-    stockout_end: datetime,
+    stockout_end: int,
     min_post_weeks: int = 4,
     max_gap_weeks: int = 2,
-    date_col: str = 'Date',
+    week_col: str = 'WEEK_IDX',
     quantity_col: str = 'Q'
-) -> Tuple[Optional[datetime], Optional[datetime], int, str]:
+) -> Tuple[Optional[int], Optional[int], int, str]:
     """
     Визначення POST-періоду для stock-out події.
 
     POST-період починається коли продажі відновлюються після stock-out
-    і триває мінімум min_post_weeks тижнів.
+    і триває мінімум min_post_weeks тижнів. Межі періодів — WEEK_IDX
+    (цілі тижні від WEEK_EPOCH), конвертація у дати тільки при експорті.
 
     Args:
         df_drug: Датафрейм препарату
-        stockout_end: Дата закінчення stock-out
+        stockout_end: WEEK_IDX закінчення stock-out
         min_post_weeks: Мінімальна тривалість POST-періоду
         max_gap_weeks: Максимальний gap до відновлення продажів
-        date_col: Назва колонки з датою
+        week_col: Назва колонки з WEEK_IDX
         quantity_col: Назва колонки з кількістю
 
     Returns:
         Tuple: (post_start, post_end, post_weeks, status)
-        - post_start: Дата початку POST-періоду (або None)
-        - post_end: Дата кінця POST-періоду (або None)
+        - post_start: WEEK_IDX початку POST-періоду (або None)
+        - post_end: WEEK_IDX кінця POST-періоду (або None)
         - post_weeks: Кількість тижнів POST-періоду
         - status: 'valid', 'no_recovery', 'insufficient_data', 'gap_too_large'
     """
     # Дані після stock-out
-    df_after = df_drug[df_drug[date_col] > stockout_end].sort_values(date_col)
+    df_after = df_drug[df_drug[week_col] > stockout_end].sort_values(week_col)
 
     if len(df_after) == 0:
         return None, None, 0, 'no_recovery'
@@ -77,27 +84,24 @@ def define_post_period(
     if len(df_with_sales) == 0:
         return None, None, 0, 'no_recovery'
 
-    first_sale_date = df_with_sales[date_col].min()
+    first_sale_week = int(df_with_sales[week_col].min())
 
     # Перевіряємо gap між stock-out та відновленням
-    gap_weeks = (first_sale_date - stockout_end).days // 7
+    gap_weeks = first_sale_week - int(stockout_end)
     if gap_weeks > max_gap_weeks:
         return None, None, 0, 'gap_too_large'
 
     # POST-період починається з першого продажу
-    post_start = first_sale_date
-
-    # Шукаємо кінець POST-періоду (мінімум min_post_weeks тижнів)
-    min_post_end = post_start + timedelta(weeks=min_post_weeks - 1)
+    post_start = first_sale_week
 
     # Дані в POST-періоді
-    df_post = df_after[df_after[date_col] >= post_start]
+    df_post = df_after[df_after[week_col] >= post_start]
 
     if len(df_post) < min_post_weeks:
         return None, None, len(df_post), 'insufficient_data'
 
     # POST-період = перші min_post_weeks тижнів з продажами
-    post_end = df_post[date_col].iloc[min_post_weeks - 1]
+    post_end = int(df_post[week_col].iloc[min_post_weeks - 1])
     post_weeks = min_post_weeks
 
     return post_start, post_end, post_weeks, 'valid'
@@ -105,9 +109,9 @@ def define_post_period(
 
 def validate_post_period(
     df_drug: pd.DataFrame,
-    post_start: datetime,
-    post_end: datetime,
-    date_col: str = 'Date',
+    post_start: int,
+    post_end: int,
+    week_col: str = 'WEEK_IDX',
     quantity_col: str = 'Q',
     min_sales_weeks_ratio: float = 0.5
 ) -> Tuple[bool, str]:
@@ -118,9 +122,9 @@ def validate_post_period(
 
     Args:
         df_drug: Датафрейм препарату
-        post_start: Початок POST-періоду
-        post_end: Кінець POST-періоду
-        date_col: Назва колонки з датою
+        post_start: WEEK_IDX початку POST-періоду
+        post_end: WEEK_IDX кінця POST-періоду
+        week_col: Назва колонки з WEEK_IDX
         quantity_col: Назва колонки з кількістю
         min_sales_weeks_ratio: Мінімальна частка тижнів з продажами
 
@@ -128,8 +132,8 @@ def validate_post_period(
         Tuple: (is_valid, reason)
     """
     df_post = df_drug[
-        (df_drug[date_col] >= post_start) &
-        (df_drug[date_col] <= post_end)
+        (df_drug[week_col] >= post_start) &
+        (df_drug[week_col] <= post_end)
     ]
 
     if len(df_post) == 0:
@@ -175,9 +179,9 @@ def calculate_market_growth(
 
 def calculate_market_totals_for_period(
     df: pd.DataFrame,
-    start_date: datetime,
-    end_date: datetime,
-    date_col: str = 'Date',
+    start_week: int,
+    end_week: int,
+    week_col: str = 'WEEK_IDX',
     market_col: str = 'MARKET_TOTAL_DRUGS_PACK'
 ) -> float:
     """
@@ -185,17 +189,17 @@ def calculate_market_totals_for_period(
 
     Args:
         df: Датафрейм з даними
-        start_date: Початок періоду
-        end_date: Кінець періоду
-        date_col: Назва колонки з датою
+        start_week: WEEK_IDX початку періоду
+        end_week: WEEK_IDX кінця періоду
+        week_col: Назва колонки з WEEK_IDX
         market_col: Назва колонки з ринковими продажами
 
     Returns:
         float: Сума продажів ринку за період
     """
     df_period = df[
-        (df[date_col] >= start_date) &
-        (df[date_col] <= end_date)
+        (df[week_col] >= start_week) &
+        (df[week_col] <= end_week)
     ]
 
     return df_period[market_col].sum()
@@ -245,12 +249,12 @@ def calculate_lift(
 
 def calculate_substitute_lift(
     df_substitute: pd.DataFrame,
-    pre_start: datetime,
-    pre_end: datetime,
-    during_start: datetime,
-    during_end: datetime,
+    pre_start: int,
+    pre_end: int,
+    during_start: int,
+    during_end: int,
     market_growth: float,
-    date_col: str = 'Date',
+    week_col: str = 'WEEK_IDX',
     quantity_col: str = 'Q'
 ) -> Dict[str, float]:
     """
@@ -258,25 +262,25 @@ def calculate_substitute_lift(
 
     Args:
         df_substitute: Дані substitute препарату
-        pre_start, pre_end: PRE-період
-        during_start, during_end: Період stock-out
+        pre_start, pre_end: PRE-період (WEEK_IDX)
+        during_start, during_end: Період stock-out (WEEK_IDX)
         market_growth: Коефіцієнт росту ринку
-        date_col, quantity_col: Назви колонок
+        week_col, quantity_col: Назви колонок
 
     Returns:
         Dict з ключами: sales_pre, sales_during, expected, lift
     """
     # Продажі в PRE-періоді
     df_pre = df_substitute[
-        (df_substitute[date_col] >= pre_start) &
-        (df_substitute[date_col] <= pre_end)
+        (df_substitute[week_col] >= pre_start) &
+        (df_substitute[week_col] <= pre_end)
     ]
     sales_pre = df_pre[quantity_col].sum()
 
     # Продажі під час stock-out
     df_during = df_substitute[
-        (df_substitute[date_col] >= during_start) &
-        (df_substitute[date_col] <= during_end)
+        (df_substitute[week_col] >= during_start) &
+        (df_substitute[week_col] <= during_end)
     ]
     sales_during = df_during[quantity_col].sum()
 
@@ -332,12 +336,12 @@ def calculate_shares(
 def calculate_lost_sales(
     df_competitors: pd.DataFrame,
     drug_id: int,
-    pre_start: datetime,
-    pre_end: datetime,
-    during_start: datetime,
-    during_end: datetime,
+    pre_start: int,
+    pre_end: int,
+    during_start: int,
+    during_end: int,
     market_growth: float,
-    date_col: str = 'Date',
+    week_col: str = 'WEEK_IDX',
     drug_col: str = 'DRUGS_ID',
     quantity_col: str = 'MARKET_TOTAL_DRUGS_PACK'
 ) -> float:
@@ -347,10 +351,10 @@ def calculate_lost_sales(
     Args:
         df_competitors: Датафрейм з ринковими даними
         drug_id: ID target препарату
-        pre_start, pre_end: PRE-період
-        during_start, during_end: Період stock-out
+        pre_start, pre_end: PRE-період (WEEK_IDX)
+        during_start, during_end: Період stock-out (WEEK_IDX)
         market_growth: Коефіцієнт росту ринку
-        date_col, drug_col, quantity_col: Назви колонок
+        week_col, drug_col, quantity_col: Назви колонок
 
     Returns:
         float: LOST_SALES (LIFT конкурентів)
@@ -359,15 +363,15 @@ def calculate_lost_sales(
 
     # PRE-період
     df_pre = df_drug[
-        (df_drug[date_col] >= pre_start) &
-        (df_drug[date_col] <= pre_end)
+        (df_drug[week_col] >= pre_start) &
+        (df_drug[week_col] <= pre_end)
     ]
     comp_pre = df_pre[quantity_col].sum()
 
     # Період stock-out
     df_during = df_drug[
-        (df_drug[date_col] >= during_start) &
-        (df_drug[date_col] <= during_end)
+        (df_drug[week_col] >= during_start) &
+        (df_drug[week_col] <= during_end)
     ]
     comp_during = df_during[quantity_col].sum()
 
@@ -438,6 +442,148 @@ def nfc_decomposition(
     }
 
 
+# =============================================================================
+# BATCHED DiD KERNEL
+# =============================================================================
+
+def _sequential_row_sum(values: np.ndarray) -> np.ndarray:
+    """
+    Сума по рядках у порядку колонок (як sum() по списку в Python).
+
+    np.sum використовує pairwise summation і може відрізнятись в
+    останньому біті; cumsum додає строго зліва направо.
+
+    Args:
+        values: Масив [events, drugs]
+
+    Returns:
+        np.ndarray: Суми [events]
+    """
+    if values.shape[1] == 0:
+        return np.zeros(values.shape[0], dtype=np.float64)
+    return np.cumsum(values, axis=1)[:, -1]
+
+
+def calculate_did_batch(
+    inn_tensor: Dict[str, Any],
+    target_rows: np.ndarray,
+    pre_start: np.ndarray,
+    pre_end: np.ndarray,
+    stockout_start: np.ndarray,
+    stockout_end: np.ndarray,
+    substitute_mask: np.ndarray,
+    same_nfc1_mask: np.ndarray,
+    min_market_pre: float = 1.0,
+    min_total: float = 0.001
+) -> Dict[str, np.ndarray]:
+    """
+    Batched DiD розрахунок для всіх подій INN × всіх препаратів INN.
+
+    Векторизований еквівалент циклу calculate_did_for_event() по подіях
+    та substitutes: MARKET_GROWTH, LIFT per substitute, INTERNAL_LIFT,
+    LOST_SALES, SHARE та NFC декомпозиція рахуються NumPy broadcasting
+    по матриці [events, drugs]. Формули ті самі, що й у скалярних
+    calculate_market_growth / calculate_expected / calculate_lift /
+    calculate_shares / nfc_decomposition.
+
+    Args:
+        inn_tensor: Тензор INN (build_inn_tensor) для TARGET аптеки
+        target_rows: Рядок тензора target препарату per event (-1 = немає даних)
+        pre_start, pre_end: PRE-період per event (WEEK_IDX)
+        stockout_start, stockout_end: Період stock-out per event (WEEK_IDX)
+        substitute_mask: bool [events, drugs] — валідні substitutes
+            (NFC сумісність + phantom filter, без самого target)
+        same_nfc1_mask: bool [events, drugs] — NFC1 substitute == NFC1 target
+        min_market_pre: Мінімальний MARKET_PRE (інакше MARKET_GROWTH = 1.0)
+        min_total: Мінімальний TOTAL для розрахунку SHARE
+
+    Returns:
+        Dict[str, np.ndarray]: Метрики per event (market_pre, market_during,
+            market_growth, internal_lift, lost_sales, total_effect,
+            share_internal, share_lost, substitutes_count,
+            substitutes_with_lift, lift_same_nfc1, lift_diff_nfc1,
+            share_same_nfc1, share_diff_nfc1) та lift [events, drugs]
+    """
+    pre_start = np.asarray(pre_start, dtype=np.int64)
+    pre_end = np.asarray(pre_end, dtype=np.int64)
+    stockout_start = np.asarray(stockout_start, dtype=np.int64)
+    stockout_end = np.asarray(stockout_end, dtype=np.int64)
+    target_rows = np.asarray(target_rows, dtype=np.int64)
+
+    n_events = len(pre_start)
+    drug_rows = np.arange(len(inn_tensor['drug_ids']))[np.newaxis, :]
+
+    # === 1. MARKET_GROWTH ===
+    market_pre = window_total(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', pre_start, pre_end)
+    market_during = window_total(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', stockout_start, stockout_end)
+
+    has_pre = market_pre >= min_market_pre
+    growth = np.divide(market_during, market_pre, out=np.ones(n_events), where=has_pre)
+    market_growth = np.where(has_pre, np.maximum(0.0, growth), 1.0)
+
+    # === 2. LIFT per substitute [events, drugs] ===
+    sales_pre = window_sum(inn_tensor, 'Q', drug_rows, pre_start[:, np.newaxis], pre_end[:, np.newaxis])
+    sales_during = window_sum(inn_tensor, 'Q', drug_rows, stockout_start[:, np.newaxis], stockout_end[:, np.newaxis])
+
+    expected = np.maximum(0.0, sales_pre * market_growth[:, np.newaxis])
+    lift = np.where(substitute_mask, np.maximum(0.0, sales_during - expected), 0.0)
+
+    internal_lift = _sequential_row_sum(lift)
+    substitutes_with_lift = (lift > 0).sum(axis=1)
+
+    # === 3. LOST_SALES (target препарат у конкурентів) ===
+    has_target = target_rows >= 0
+    rows = np.where(has_target, target_rows, 0)
+
+    if len(drug_rows[0]) > 0:
+        count_pre = window_count(inn_tensor, rows, pre_start, pre_end)
+        count_during = window_count(inn_tensor, rows, stockout_start, stockout_end)
+        market_target_pre = window_sum(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', rows, pre_start, pre_end)
+        q_target_pre = window_sum(inn_tensor, 'Q', rows, pre_start, pre_end)
+        market_target_during = window_sum(inn_tensor, 'MARKET_TOTAL_DRUGS_PACK', rows, stockout_start, stockout_end)
+
+        comp_pre = np.where(has_target & (count_pre > 0), np.maximum(0.0, market_target_pre - q_target_pre), 0.0)
+        comp_during = np.where(has_target & (count_during > 0), market_target_during, 0.0)
+    else:
+        comp_pre = np.zeros(n_events)
+        comp_during = np.zeros(n_events)
+
+    comp_expected = np.maximum(0.0, comp_pre * market_growth)
+    lost_sales = np.maximum(0.0, comp_during - comp_expected)
+
+    # === 4. SHARE CALCULATIONS ===
+    total_effect = internal_lift + lost_sales
+    has_effect = total_effect >= min_total
+    share_internal = np.divide(internal_lift, total_effect, out=np.full(n_events, np.nan), where=has_effect)
+    share_lost = np.divide(lost_sales, total_effect, out=np.full(n_events, np.nan), where=has_effect)
+
+    # === 5. NFC DECOMPOSITION ===
+    lift_same = _sequential_row_sum(np.where(same_nfc1_mask, lift, 0.0))
+    lift_diff = _sequential_row_sum(np.where(same_nfc1_mask, 0.0, lift))
+    nfc_total = lift_same + lift_diff
+    has_nfc = nfc_total > 0
+    share_same = np.divide(lift_same, nfc_total, out=np.full(n_events, np.nan), where=has_nfc)
+    share_diff = np.divide(lift_diff, nfc_total, out=np.full(n_events, np.nan), where=has_nfc)
+
+    return {
+        'market_pre': market_pre,
+        'market_during': market_during,
+        'market_growth': market_growth,
+        'internal_lift': internal_lift,
+        'lost_sales': lost_sales,
+        'total_effect': total_effect,
+        'share_internal': share_internal,
+        'share_lost': share_lost,
+        'substitutes_count': substitute_mask.sum(axis=1),
+        'substitutes_with_lift': substitutes_with_lift,
+        'lift_same_nfc1': lift_same,
+        'lift_diff_nfc1': lift_diff,
+        'share_same_nfc1': share_same,
+        'share_diff_nfc1': share_diff,
+        'lift': lift
+    }
+
+
 # =============================================================================
 # VALIDATION
 # =============================================================================
@@ -12,6 +12,10 @@ ETL утиліти для проекту cross_pharm_market_analysis.
 Функції:
     - load_raw_data(): Завантаження та базова трансформація
     - parse_period_id(): Парсинг PERIOD_ID → datetime
+    - decode_period_ids(): PERIOD_ID → Date через lookup унікальних періодів
+    - build_period_table(): Таблиця-вимір періодів (PERIOD_ID → Date, WEEK_IDX)
+    - dates_to_week_idx(): Date → WEEK_IDX (тижні від епохи)
+    - week_idx_to_dates(): WEEK_IDX → Date (для експорту)
     - fill_gaps(): GAP FILLING для часових рядів
     - calculate_notsold(): Розрахунок NOTSOLD_PERCENT
     - convert_numeric_columns(): Конвертація Q, V у float
@@ -27,17 +31,39 @@ ETL утиліти для проекту cross_pharm_market_analysis.
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Tuple
+from typing import Any, Optional, List, Dict, Tuple
 from pathlib import Path
 
 
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Цілочисельна вісь часу: WEEK_IDX = кількість тижнів від понеділка-епохи
+WEEK_IDX_COL = 'WEEK_IDX'
+WEEK_EPOCH = pd.Timestamp('2000-01-03')  # понеділок
+
+_WEEK_EPOCH_DAY = WEEK_EPOCH.to_datetime64().astype('datetime64[D]').astype(np.int64)
+
+# Колонки таблиці-виміру періодів (build_period_table)
+PERIOD_TABLE_COLUMNS = ['PERIOD_ID', 'PERIOD_DATE', 'Date', WEEK_IDX_COL]
+
+# Кеш процесу: PERIOD_ID → день (від 1970-01-01) без вирівнювання.
+# Різних PERIOD_ID у даних сотні, тому кеш спільний для всіх ринків
+# та INN, які обробляє процес.
+_period_day_cache: Dict[int, int] = {}
+
+
 # =============================================================================
 # DATA LOADING
 # =============================================================================
 
 def load_raw_data(
     file_path: str | Path,
-    sep: str = ';'
+    sep: str = ';',
+    usecols: Optional[List[str]] = None,
+    dtype: Optional[Dict[str, Any]] = None,
+    **read_csv_kwargs: Any
 ) -> pd.DataFrame:
     """
     Завантаження сирих даних з CSV файлу.
@@ -45,25 +71,36 @@ def load_raw_data(
     Args:
         file_path: Шлях до CSV файлу
         sep: Роздільник (за замовчуванням ';')
+        usecols: Колонки для читання (None = всі)
+        dtype: Явні типи колонок (None = автовизначення pandas)
+        **read_csv_kwargs: Інші аргументи pd.read_csv (напр. RAW_NUMERIC_OPTIONS)
 
     Returns:
         pd.DataFrame: Завантажений датафрейм
     """
-    df = pd.read_csv(file_path, sep=sep)
+    df = pd.read_csv(file_path, sep=sep, usecols=usecols, dtype=dtype, **read_csv_kwargs)
     print(f"Завантажено {len(df):,} рядків, {len(df.columns)} колонок")
     return df
 
 
 def convert_numeric_columns(
     df: pd.DataFrame,
-    columns: List[str] = ['Q', 'V']
+    columns: List[str] = ['Q', 'V'],
+    verbose: bool = True
 ) -> pd.DataFrame:
     """
     Конвертація колонок з рядків (з комою) у float.
 
+    Колонки, які reader вже розпарсив як числа (read_csv з
+    decimal=',' та float_precision='round_trip'), лише приводяться до
+    float64 — без створення рядка на кожну клітинку. round_trip парсер
+    використовує той самий алгоритм, що й float(str), тому результат
+    побітово збігається з рядковим шляхом.
+
     Args:
         df: Вхідний датафрейм
         columns: Список колонок для конвертації
+        verbose: Друкувати конвертовані колонки
 
     Returns:
         pd.DataFrame: Датафрейм з конвертованими колонками
@@ -71,9 +108,15 @@ def convert_numeric_columns(
     df = df.copy()
     for col in columns:
         if col in df.columns:
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].astype(float)
+                if verbose:
+                    print(f"  Конвертовано {col}: {df[col].dtype} (розпарсено при читанні)")
+                continue
             # Заміна коми на крапку та конвертація у float
             df[col] = df[col].astype(str).str.replace(',', '.').astype(float)
-            print(f"  Конвертовано {col}: str → float")
+            if verbose:
+                print(f"  Конвертовано {col}: str → float")
     return df
 
 
@@ -151,63 +194,220 @@ def parse_period_id(period_id: int) -> datetime:
     return target_date
 
 
-def parse_period_id_series(series: pd.Series) -> pd.Series:
+def _period_ids_to_days(period_ids: np.ndarray) -> np.ndarray:
     """
-    Парсинг серії PERIOD_ID у datetime (векторизовано).
+    Унікальні PERIOD_ID → день від 1970-01-01 (без вирівнювання).
 
-    Використовує pandas vectorized string operations замість .apply()
-    для значного прискорення на великих серіях.
+    Та сама арифметика, що й у parse_period_id: 1 січня року YYYY +
+    NNNNN днів (тиждень × 7 + день тижня). Результати кешуються у
+    _period_day_cache.
 
     Args:
-        series: pd.Series з PERIOD_ID
+        period_ids: Унікальні PERIOD_ID (int64)
 
     Returns:
-        pd.Series: Серія datetime
+        np.ndarray[int64]: Дні від епохи Unix
     """
-    s = series.astype(str)
-    year = s.str[:4].astype(int)
-    week_day_code = s.str[4:].astype(int)
+    missing = np.array([p for p in period_ids.tolist() if p not in _period_day_cache], dtype=np.int64)
 
-    week = week_day_code // 7
-    day_of_week = week_day_code % 7
+    if len(missing) > 0:
+        # YYYY — перші 4 цифри, NNNNN — решта (довжина коду може відрізнятися)
+        scale = 10 ** (np.char.str_len(missing.astype(str)).astype(np.int64) - 4)
+        year = missing // scale
+        week_day_code = missing % scale
 
-    # Базова дата: 1 січня відповідного року
-    base_dates = pd.to_datetime(year.astype(str) + '-01-01')
+        first_day = (year - 1970).astype('datetime64[Y]').astype('datetime64[D]').astype(np.int64)
+        _period_day_cache.update(zip(missing.tolist(), (first_day + week_day_code).tolist()))
 
-    # Додаємо тижні та дні
-    result = base_dates + pd.to_timedelta(week * 7 + day_of_week, unit='D')
+    return np.array([_period_day_cache[p] for p in period_ids.tolist()], dtype=np.int64)
 
-    return result
+
+def _align_days_to_monday(days: np.ndarray) -> np.ndarray:
+    """Дні від 1970-01-01 (четвер) → понеділок того ж тижня."""
+    return days - (days + 3) % 7
+
+
+def decode_period_ids(period_ids, align_monday: bool = True) -> np.ndarray:
+    """
+    PERIOD_ID → datetime64[ns] через lookup унікальних значень.
+
+    Унікальних PERIOD_ID у ринку сотні при мільйонах рядків, тому
+    дата рахується один раз на період (np.unique з inverse) і
+    розповсюджується на всі рядки індексуванням.
+
+    Args:
+        period_ids: Масив / Series PERIOD_ID
+        align_monday: Вирівняти дати по понеділках
+
+    Returns:
+        np.ndarray[datetime64[ns]]: Дата для кожного рядка
+    """
+    uniques, inverse = np.unique(np.asarray(period_ids, dtype=np.int64), return_inverse=True)
+
+    days = _period_ids_to_days(uniques)
+    if align_monday:
+        days = _align_days_to_monday(days)
+
+    dates = days.astype('datetime64[D]').astype('datetime64[ns]')
+    return dates[inverse.reshape(-1)]
+
+
+def build_period_table(period_ids) -> pd.DataFrame:
+    """
+    Таблиця-вимір періодів: унікальні PERIOD_ID → дати та WEEK_IDX.
+
+    Колонки:
+        - PERIOD_ID
+        - PERIOD_DATE: дата PERIOD_ID (parse_period_id)
+        - Date: PERIOD_DATE, вирівняна по понеділку (як у Step 1)
+        - WEEK_IDX: тижні від WEEK_EPOCH
+
+    Args:
+        period_ids: Масив / Series PERIOD_ID (можуть повторюватись)
+
+    Returns:
+        pd.DataFrame: Один рядок на PERIOD_ID, відсортовано по PERIOD_ID
+    """
+    uniques = np.unique(np.asarray(period_ids, dtype=np.int64))
+    days = _period_ids_to_days(uniques)
+    monday_days = _align_days_to_monday(days)
+
+    return pd.DataFrame({
+        'PERIOD_ID': uniques,
+        'PERIOD_DATE': days.astype('datetime64[D]').astype('datetime64[ns]'),
+        'Date': monday_days.astype('datetime64[D]').astype('datetime64[ns]'),
+        WEEK_IDX_COL: ((monday_days - _WEEK_EPOCH_DAY) // 7).astype(np.int32)
+    })[PERIOD_TABLE_COLUMNS]
+
+
+def parse_period_id_series(series: pd.Series) -> pd.Series:
+    """
+    Парсинг серії PERIOD_ID у datetime (векторизовано).
+
+    Дата рахується один раз на унікальний PERIOD_ID (decode_period_ids).
+
+    Args:
+        series: pd.Series з PERIOD_ID
+
+    Returns:
+        pd.Series: Серія datetime
+    """
+    return pd.Series(
+        decode_period_ids(series.to_numpy(), align_monday=False),
+        index=series.index,
+        name=series.name
+    )
 
 
 def add_date_column(
     df: pd.DataFrame,
     period_col: str = 'PERIOD_ID',
     date_col: str = 'Date',
-    align_monday: bool = True
+    align_monday: bool = True,
+    week_col: Optional[str] = WEEK_IDX_COL,
+    verbose: bool = True
 ) -> pd.DataFrame:
     """
-    Додавання колонки Date на основі PERIOD_ID.
+    Додавання колонки Date (та WEEK_IDX) на основі PERIOD_ID.
+
+    WEEK_IDX — канонічна цілочисельна вісь часу для всіх кроків pipeline:
+    періоди (PRE, stock-out, POST) задаються як діапазони WEEK_IDX,
+    а Date використовується тільки при експорті.
 
     Args:
         df: Вхідний датафрейм
         period_col: Назва колонки з PERIOD_ID
         date_col: Назва нової колонки для дати
         align_monday: Вирівнювати дати по понеділках (за замовчуванням True)
+        week_col: Назва колонки WEEK_IDX (None = не створювати)
+        verbose: Друкувати створені колонки
 
     Returns:
-        pd.DataFrame: Датафрейм з новою колонкою Date
+        pd.DataFrame: Датафрейм з новими колонками Date та WEEK_IDX
     """
     df = df.copy()
-    df[date_col] = parse_period_id_series(df[period_col])
+    # Lookup по унікальних PERIOD_ID (вирівнювання теж на рівні періодів)
+    df[date_col] = decode_period_ids(df[period_col].to_numpy(), align_monday=align_monday)
 
     if align_monday:
-        # Vectorized: dt.weekday повертає 0=Mon, 6=Sun
-        df[date_col] = df[date_col] - pd.to_timedelta(df[date_col].dt.weekday, unit='D')
-        print(f"  Створено колонку {date_col} з {period_col} (вирівняно по понеділках)")
-    else:
+        if verbose:
+            print(f"  Створено колонку {date_col} з {period_col} (вирівняно по понеділках)")
+    elif verbose:
         print(f"  Створено колонку {date_col} з {period_col}")
 
+    if week_col is not None:
+        df[week_col] = dates_to_week_idx(df[date_col])
+        if verbose:
+            print(f"  Створено колонку {week_col} (тижні від {WEEK_EPOCH.strftime('%Y-%m-%d')})")
+
+    return df
+
+
+# =============================================================================
+# WEEK INDEX (цілочисельна вісь часу)
+# =============================================================================
+
+def dates_to_week_idx(dates):
+    """
+    Конвертація дат у WEEK_IDX (кількість тижнів від WEEK_EPOCH).
+
+    Для дат, вирівняних по понеділках, конвертація точна і взаємно
+    однозначна: week_idx_to_dates(dates_to_week_idx(d)) == d.
+
+    Args:
+        dates: Timestamp / datetime (скаляр) або Series / масив дат
+
+    Returns:
+        int для скаляра, np.ndarray[int32] для серії/масиву
+    """
+    if isinstance(dates, (pd.Timestamp, datetime, np.datetime64)):
+        days = pd.Timestamp(dates).to_datetime64().astype('datetime64[D]').astype(np.int64)
+        return int((days - _WEEK_EPOCH_DAY) // 7)
+
+    values = np.asarray(dates, dtype='datetime64[ns]').astype('datetime64[D]').astype(np.int64)
+    return ((values - _WEEK_EPOCH_DAY) // 7).astype(np.int32)
+
+
+def week_idx_to_dates(week_idx):
+    """
+    Конвертація WEEK_IDX назад у дату понеділка (для експорту).
+
+    Args:
+        week_idx: int (скаляр) або Series / масив WEEK_IDX
+
+    Returns:
+        pd.Timestamp для скаляра, pd.DatetimeIndex для серії/масиву
+    """
+    if np.ndim(week_idx) == 0:
+        return WEEK_EPOCH + pd.Timedelta(weeks=int(week_idx))
+
+    weeks = np.asarray(week_idx, dtype=np.int64)
+    return pd.DatetimeIndex(WEEK_EPOCH.to_datetime64() + weeks * np.timedelta64(7, 'D'))
+
+
+def add_week_idx_columns(
+    df: pd.DataFrame,
+    date_cols: List[str],
+    suffix: str = '_IDX'
+) -> pd.DataFrame:
+    """
+    Додати WEEK_IDX колонки для колонок-дат (межі періодів подій).
+
+    Наприклад, STOCKOUT_START → STOCKOUT_START_IDX. Використовується
+    при завантаженні stockout_events / did_results, щоб вся логіка
+    періодів працювала з цілими числами.
+
+    Args:
+        df: Датафрейм з колонками-датами (datetime64)
+        date_cols: Колонки для конвертації (відсутні пропускаються)
+        suffix: Суфікс нових колонок
+
+    Returns:
+        pd.DataFrame: Датафрейм з доданими колонками {col}{suffix}
+    """
+    for col in date_cols:
+        if col in df.columns:
+            df[f"{col}{suffix}"] = dates_to_week_idx(df[col])
     return df
 
 
@@ -283,13 +483,105 @@ def fill_gaps_for_group(
     return result
 
 
+def _build_weekly_skeleton(
+    date_ranges: pd.DataFrame,
+    group_cols: List[str],
+    date_col: str
+) -> pd.DataFrame:
+    """
+    Побудова повного тижневого skeleton для всіх груп без циклу по групах.
+
+    Для кожної групи кількість тижнів = (max - min) // 7 днів + 1
+    (як pd.date_range(min, max, freq='7D')). Ключі групи розмножуються
+    через np.repeat, тижневий зсув — cumulative arange в межах групи.
+
+    Args:
+        date_ranges: Датафрейм з group_cols + колонки 'min', 'max'
+        group_cols: Колонки групування
+        date_col: Назва колонки з датою
+
+    Returns:
+        pd.DataFrame: Skeleton (date_col + group_cols), групи підряд, дати зростають
+    """
+    # datetime64[ns] — як у pd.date_range попередньої реалізації
+    min_dates = date_ranges['min'].to_numpy().astype('datetime64[ns]')
+    max_dates = date_ranges['max'].to_numpy().astype('datetime64[ns]')
+
+    week = np.timedelta64(7, 'D')
+    n_weeks = ((max_dates - min_dates) // week).astype(np.int64) + 1
+
+    # Зсув тижня в межах групи: 0, 1, ..., n_weeks-1 для кожної групи
+    group_starts = np.cumsum(n_weeks) - n_weeks
+    week_offsets = np.arange(n_weeks.sum(), dtype=np.int64) - np.repeat(group_starts, n_weeks)
+
+    skeleton = pd.DataFrame({
+        date_col: np.repeat(min_dates, n_weeks) + week_offsets * week
+    })
+    for col in group_cols:
+        skeleton[col] = np.repeat(date_ranges[col].to_numpy(), n_weeks)
+
+    return skeleton
+
+
+def _fill_categorical_within_groups(
+    df: pd.DataFrame,
+    group_ids: np.ndarray,
+    columns: List[str]
+) -> pd.DataFrame:
+    """
+    Forward/backward fill категоріальних колонок в межах груп (без lambda).
+
+    Еквівалент groupby(...).transform(lambda x: x.ffill().bfill()) для
+    датафрейму, де рядки кожної групи йдуть підряд. Пропуск отримує
+    останнє попереднє значення групи; пропуски на початку групи отримують
+    перше не-null значення групи (broadcast).
+
+    Args:
+        df: Датафрейм (рядки груп підряд)
+        group_ids: Номер групи для кожного рядка (неспадний)
+        columns: Колонки для заповнення
+
+    Returns:
+        pd.DataFrame: Датафрейм з заповненими колонками
+    """
+    n_rows = len(df)
+    positions = np.arange(n_rows)
+
+    is_group_start = np.ones(n_rows, dtype=bool)
+    is_group_start[1:] = group_ids[1:] != group_ids[:-1]
+    row_group_start = np.maximum.accumulate(np.where(is_group_start, positions, 0))
+
+    is_group_end = np.ones(n_rows, dtype=bool)
+    is_group_end[:-1] = group_ids[1:] != group_ids[:-1]
+    row_group_end = np.minimum.accumulate(np.where(is_group_end, positions, n_rows)[::-1])[::-1]
+
+    for col in columns:
+        values = df[col]
+        has_value = values.notna().to_numpy()
+
+        # Останнє не-null значення до поточного рядка (forward fill)
+        prev_valid = np.maximum.accumulate(np.where(has_value, positions, -1))
+        # Перше не-null значення від поточного рядка (для початку групи)
+        next_valid = np.minimum.accumulate(np.where(has_value, positions, n_rows)[::-1])[::-1]
+
+        source = np.where(prev_valid >= row_group_start, prev_valid, next_valid)
+        is_filled = source <= row_group_end
+
+        filled = values.iloc[np.where(is_filled, source, 0)]
+        filled.index = df.index
+        df[col] = filled.where(is_filled)
+
+    return df
+
+
 def fill_gaps(
     df: pd.DataFrame,
     group_cols: List[str] = ['PHARM_ID', 'DRUGS_ID'],
     date_col: str = 'Date',
     value_cols: List[str] = ['Q', 'V'],
     categorical_cols: Optional[List[str]] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    week_col: Optional[str] = WEEK_IDX_COL
 ) -> pd.DataFrame:
     """
     GAP FILLING для всього датафрейму (оптимізована версія).
@@ -297,8 +589,9 @@ def fill_gaps(
     Заповнює пропущені тижні нулями для кожної пари (PHARM_ID, DRUGS_ID).
     Використовує vectorized batch-підхід:
     1. Агрегація дублікатів одним викликом groupby
-    2. Побудова повного date range для кожної групи через MultiIndex
+    2. Побудова повного skeleton через np.repeat + цілочисельні тижневі зсуви
     3. Merge замість ітерації per group
+    4. Forward/backward fill категоріальних колонок без lambda
 
     Args:
         df: Вхідний датафрейм
@@ -307,6 +600,8 @@ def fill_gaps(
         value_cols: Колонки для заповнення нулями
         categorical_cols: Категоріальні колонки для forward fill
         show_progress: Показувати прогрес
+        week_col: Колонка WEEK_IDX — якщо є у df, заповнюється і для
+            доданих тижнів (None = не переносити)
 
     Returns:
         pd.DataFrame: Датафрейм з заповненими пропусками
@@ -316,10 +611,6 @@ def fill_gaps(
 
     existing_value_cols = [c for c in value_cols if c in df.columns]
     existing_cat_cols = [c for c in categorical_cols if c in df.columns]
-    total_groups = df.groupby(group_cols).ngroups
-
-    if show_progress:
-        print(f"GAP FILLING для {total_groups:,} груп (vectorized)...")
 
     original_len = len(df)
 
@@ -333,20 +624,17 @@ def fill_gaps(
     # Отримуємо min/max дату для кожної групи
     date_ranges = df_agg.groupby(group_cols)[date_col].agg(['min', 'max']).reset_index()
 
-    # Генеруємо повні тижневі ranges для всіх груп
-    skeleton_rows = []
-    for _, row in date_ranges.iterrows():
-        full_dates = pd.date_range(start=row['min'], end=row['max'], freq='7D')
-        group_key_vals = {col: row[col] for col in group_cols}
-        chunk = pd.DataFrame({date_col: full_dates})
-        for col in group_cols:
-            chunk[col] = group_key_vals[col]
-        skeleton_rows.append(chunk)
-
-    if not skeleton_rows:
+    if show_progress:
+        print(f"GAP FILLING для {len(date_ranges):,} груп (vectorized)...")
+
+    if date_ranges.empty:
         return df.copy()
 
-    skeleton = pd.concat(skeleton_rows, ignore_index=True)
+    skeleton = _build_weekly_skeleton(date_ranges, group_cols, date_col)
+
+    # WEEK_IDX однозначно визначається датою — рахуємо для всього skeleton
+    if week_col is not None and week_col in df.columns and week_col not in all_group_keys:
+        skeleton.insert(1, week_col, dates_to_week_idx(skeleton[date_col]))
 
     # --- Крок 3: Left join skeleton з реальними даними ---
     result = skeleton.merge(df_agg, on=all_group_keys, how='left')
@@ -358,9 +646,11 @@ def fill_gaps(
 
     # Категоріальні — forward/backward fill в межах групи
     if existing_cat_cols:
-        result[existing_cat_cols] = result.groupby(group_cols)[existing_cat_cols].transform(
-            lambda x: x.ffill().bfill()
-        )
+        n_weeks = (
+            (date_ranges['max'] - date_ranges['min']) // pd.Timedelta(days=7)
+        ).to_numpy(dtype=np.int64) + 1
+        group_ids = np.repeat(np.arange(len(date_ranges)), n_weeks)
+        result = _fill_categorical_within_groups(result, group_ids, existing_cat_cols)
 
     if show_progress:
         added_rows = len(result) - original_len
@@ -0,0 +1,210 @@
+# =============================================================================
+# INN CACHE - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/inn_cache.py
+# Дата: 2026-10-17
+# Опис: Per-INN кеш результатів Steps 2-4 (ключ — hash вхідного зрізу INN)
+# =============================================================================
+
+"""
+Кеш per-INN результатів Steps 2-4 на рівні (CLIENT_ID, INN_ID).
+
+Одиниця кешування — обробка однієї INN групи (детекція подій INN у
+Step 2, _process_inn_group_did у Step 3, _process_inn_group_substitute
+у Step 4). Ключ — sha256 від:
+    - версії кроку (step_fingerprint.get_step_version: конфігурація + код)
+    - hash партиції INN у store (market_store.partition_hash)
+    - hash вхідних подій INN (frame_digest, без EVENT_ID)
+
+Виправлення raw даних одного INN змінює тільки його партицію, тому
+Steps 2-4 перераховують лише цей INN, а market-level CSV збираються
+з кешованих результатів решти INN.
+
+EVENT_ID нумерується наскрізно по ринку (Step 2), тому зміна кількості
+подій одного INN зсуває EVENT_ID наступних. Кешовані результати
+зберігають замість EVENT_ID порядковий номер події всередині INN
+(localize_event_ids) і отримують поточні EVENT_ID при відновленні
+(restore_event_ids).
+
+Структура:
+    01_per_market/{CLIENT_ID}/_inn_cache/step_{N}/{INN_ID}.pkl
+    (один запис на INN — останній результат; старий ключ перезаписується)
+
+Використання:
+    from project_core.utility_functions.inn_cache import (
+        inn_cache_key,
+        load_inn_result,
+        save_inn_result
+    )
+
+    key = inn_cache_key(3, client_id, inn_id, frame_digest(inn_events, ['EVENT_ID']))
+    result = load_inn_result(client_id, 3, inn_id, key)
+    if result is None:
+        result = compute()
+        save_inn_result(client_id, 3, inn_id, key, result)
+"""
+
+import hashlib
+import pickle
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from project_core.data_config.paths_config import get_market_folder
+from project_core.utility_functions.artifact_writer import submit_write
+from project_core.utility_functions.market_store import partition_hash
+from project_core.utility_functions.step_fingerprint import get_step_version
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+INN_CACHE_FOLDER = "_inn_cache"
+
+
+# =============================================================================
+# KEYS
+# =============================================================================
+
+def frame_digest(df: pd.DataFrame, exclude_columns: Sequence[str] = ()) -> str:
+    """
+    sha256 вмісту DataFrame (значення + назви колонок, без індексу).
+
+    Args:
+        df: DataFrame
+        exclude_columns: Колонки, що не входять у hash (напр. EVENT_ID)
+
+    Returns:
+        str: hex digest
+    """
+    columns = [c for c in df.columns if c not in exclude_columns]
+    digest = hashlib.sha256('\x1f'.join(map(str, columns)).encode('utf-8'))
+
+    if columns and len(df) > 0:
+        digest.update(pd.util.hash_pandas_object(df[columns], index=False).to_numpy().tobytes())
+
+    return digest.hexdigest()
+
+
+def inn_cache_key(step: int, client_id: int, inn_id: int, *digests: str) -> str:
+    """
+    Ключ per-INN результату кроку.
+
+    Args:
+        step: Номер кроку (2-4)
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+        *digests: Hash інших входів INN (події, mapping)
+
+    Returns:
+        str: hex digest
+    """
+    parts = [get_step_version(step), str(partition_hash(client_id, inn_id)), *digests]
+    return hashlib.sha256('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+# =============================================================================
+# STORAGE
+# =============================================================================
+
+def get_inn_cache_path(client_id: int, step: int, inn_id: int) -> Path:
+    """
+    Отримати шлях до кешованого результату INN.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку
+        inn_id: ID INN групи
+
+    Returns:
+        Path: 01_per_market/{CLIENT_ID}/_inn_cache/step_{N}/{INN_ID}.pkl
+    """
+    return get_market_folder(client_id) / INN_CACHE_FOLDER / f"step_{step}" / f"{int(inn_id)}.pkl"
+
+
+def load_inn_result(client_id: int, step: int, inn_id: int, key: str) -> Optional[Any]:
+    """
+    Завантажити кешований результат INN, якщо ключ збігається.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку
+        inn_id: ID INN групи
+        key: Поточний ключ (inn_cache_key)
+
+    Returns:
+        Результат INN або None (немає запису, інший ключ, пошкоджений файл)
+    """
+    file_path = get_inn_cache_path(client_id, step, inn_id)
+
+    if not file_path.exists():
+        return None
+
+    try:
+        with open(file_path, 'rb') as f:
+            entry = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+    if not isinstance(entry, dict) or entry.get('key') != key:
+        return None
+
+    return entry['result']
+
+
+def save_inn_result(client_id: int, step: int, inn_id: int, key: str, result: Any) -> Path:
+    """
+    Записати результат INN у кеш (атомарно, через artifact_writer).
+
+    Результат серіалізується одразу, тому його можна змінювати після виклику.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку
+        inn_id: ID INN групи
+        key: Ключ (inn_cache_key)
+        result: Результат INN (picklable)
+
+    Returns:
+        Path: Шлях до запису кешу
+    """
+    file_path = get_inn_cache_path(client_id, step, inn_id)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    payload = pickle.dumps({'key': key, 'result': result}, protocol=pickle.HIGHEST_PROTOCOL)
+    return submit_write(file_path, lambda tmp_path: Path(tmp_path).write_bytes(payload))
+
+
+# =============================================================================
+# EVENT_ID
+# =============================================================================
+
+def localize_event_ids(records: List[Dict[str, Any]], event_ids: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Замінити EVENT_ID записів на порядковий номер події всередині INN.
+
+    Args:
+        records: Записи результату (з ключем EVENT_ID)
+        event_ids: EVENT_ID подій INN у порядку вхідного DataFrame
+
+    Returns:
+        List[Dict]: Копії записів з EVENT_ID = номер події
+    """
+    position = {event_id: i for i, event_id in enumerate(event_ids)}
+    return [{**record, 'EVENT_ID': position[record['EVENT_ID']]} for record in records]
+
+
+def restore_event_ids(records: List[Dict[str, Any]], event_ids: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Повернути поточні EVENT_ID у кешовані записи (обернена localize_event_ids).
+
+    Args:
+        records: Кешовані записи (EVENT_ID = номер події)
+        event_ids: Поточні EVENT_ID подій INN у порядку вхідного DataFrame
+
+    Returns:
+        List[Dict]: Записи з EVENT_ID
+    """
+    return [{**record, 'EVENT_ID': event_ids[record['EVENT_ID']]} for record in records]
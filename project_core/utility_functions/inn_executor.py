@@ -0,0 +1,224 @@
+# =============================================================================
+# INN EXECUTOR - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/inn_executor.py
+# Дата: 2026-10-17
+# Опис: Виконавець INN-груп всередині ринку (serial / threads / processes)
+# =============================================================================
+
+"""
+Виконавець INN-груп всередині ринку (другий рівень паралелізму Steps 3-4).
+
+Обробка INN групи (_process_inn_group_did, _process_inn_group_substitute)
+— це в основному Python-рівень: iterrows, побудова dict записів, зрізи
+малих DataFrame. Такий код тримає GIL, тому потоки дають приріст лише
+на numpy/pyarrow частинах (читання партиції, batched DiD kernel).
+Режим задається INTRA_MARKET_EXECUTOR (machine_parameters):
+    - 'serial'    — по черзі в процесі ринку
+    - 'threads'   — ThreadPoolExecutor (OPTIMAL_THREADS потоків)
+    - 'processes' — постійний ProcessPoolExecutor процесу ринку
+                    (OPTIMAL_THREADS процесів, spawn)
+
+Процеси не отримують in-memory контекст ринку (context=None): вхідні
+дані INN — партиції Parquet store, спільні для всіх процесів через
+page cache ОС, тому по IPC передаються тільки події INN та записи
+результату. Fused режим у процесах втрачає лише перевикористання
+тензорів Step 3 у Step 4 (результати ті самі).
+
+Результати повертаються у порядку задач (INN_ID) для всіх режимів —
+CSV артефакти не залежать від режиму та кількості workers.
+
+Режим для окремого ринку можна перевизначити (set_executor_override):
+повтор ринку після таймауту виконується з 'serial' (market_watchdog).
+
+Використання:
+    from project_core.utility_functions.inn_executor import map_inn_groups
+
+    results = map_inn_groups(
+        _process_inn_group_did_cached,
+        [(inn_id, inn_events, client_id, paths) for inn_id, inn_events in groups],
+        context=context,
+        use_cache=use_cache
+    )
+
+Benchmark:
+    python benchmarks/bench_intra_market_executor.py --market-id 28670
+"""
+
+import atexit
+import multiprocessing
+import multiprocessing.util
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from project_core.calculation_parameters_config.machine_parameters import (
+    INTRA_MARKET_EXECUTOR,
+    OPTIMAL_THREADS
+)
+from project_core.utility_functions.parallel_runner import ensure_import_paths
+from project_core.utility_functions.run_trace import call_traced, get_trace_run_id
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+INTRA_MARKET_EXECUTORS = ('serial', 'threads', 'processes')
+
+# spawn: дочірні процеси не успадковують writer thread (artifact_writer)
+# та стан пулу worker-а ринку
+PROCESS_START_METHOD = 'spawn'
+
+
+# =============================================================================
+# EXECUTOR OVERRIDE (per-market режим)
+# =============================================================================
+
+# Режим, перевизначений для поточного ринку (None — INTRA_MARKET_EXECUTOR)
+_executor_override: Optional[str] = None
+
+
+def set_executor_override(executor: Optional[str]) -> Optional[str]:
+    """
+    Перевизначити режим за замовчуванням для поточного процесу.
+
+    Args:
+        executor: Режим ('serial', 'threads', 'processes'; None — скинути)
+
+    Returns:
+        Попереднє перевизначення (для відновлення)
+    """
+    global _executor_override
+    previous = _executor_override
+    _executor_override = executor
+    return previous
+
+
+# =============================================================================
+# PROCESS POOL (постійний, один на процес ринку)
+# =============================================================================
+
+# Поточний пул: {'executor': ProcessPoolExecutor, 'max_workers': int}
+_process_pool: Optional[Dict[str, Any]] = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Отримати постійний пул процесів INN-груп (створюється при першому виклику).
+
+    Args:
+        max_workers: Кількість процесів
+
+    Returns:
+        ProcessPoolExecutor: Пул процесів
+    """
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is not None and _process_pool['max_workers'] != max_workers:
+            _process_pool['executor'].shutdown(wait=True)
+            _process_pool = None
+
+        if _process_pool is None:
+            _process_pool = {
+                'executor': ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    mp_context=multiprocessing.get_context(PROCESS_START_METHOD),
+                    initializer=ensure_import_paths
+                ),
+                'max_workers': max_workers
+            }
+            # Worker ринку (дочірній процес пулу) завершується через
+            # multiprocessing, а не atexit: пул закривається до join дочірніх
+            # процесів і до закриття черг (Queue finalizer має exitpriority=10)
+            multiprocessing.util.Finalize(None, shutdown_inn_executor, exitpriority=20)
+
+        return _process_pool['executor']
+
+
+def shutdown_inn_executor() -> None:
+    """Закрити пул процесів INN-груп (якщо створений)."""
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool['executor'].shutdown(wait=True)
+            _process_pool = None
+
+
+atexit.register(shutdown_inn_executor)
+
+
+# =============================================================================
+# MAP
+# =============================================================================
+
+def resolve_executor(executor: Optional[str], max_workers: Optional[int], n_tasks: int) -> tuple:
+    """
+    Визначити режим та кількість workers для набору INN задач.
+
+    Args:
+        executor: Режим (None = перевизначення або INTRA_MARKET_EXECUTOR)
+        max_workers: Кількість workers (None = OPTIMAL_THREADS)
+        n_tasks: Кількість INN задач
+
+    Returns:
+        Tuple (режим, кількість workers); 'serial' якщо workers <= 1
+
+    Raises:
+        ValueError: Якщо режим невідомий
+    """
+    if executor is None:
+        executor = _executor_override or INTRA_MARKET_EXECUTOR
+    if max_workers is None:
+        max_workers = OPTIMAL_THREADS
+
+    if executor not in INTRA_MARKET_EXECUTORS:
+        raise ValueError(f"Невідомий INTRA_MARKET_EXECUTOR: {executor} (допустимі: {INTRA_MARKET_EXECUTORS})")
+
+    n_workers = min(max_workers, n_tasks)
+    if executor == 'serial' or n_workers <= 1:
+        return 'serial', 1
+
+    return executor, n_workers
+
+
+def map_inn_groups(
+    func: Callable[..., Any],
+    tasks: Sequence[tuple],
+    context: Optional[Dict[str, Any]] = None,
+    executor: Optional[str] = None,
+    max_workers: Optional[int] = None,
+    **kwargs: Any
+) -> List[Any]:
+    """
+    Виконати func(*task, context=..., **kwargs) для кожної INN задачі.
+
+    Args:
+        func: Функція обробки INN групи (module-level для 'processes')
+        tasks: Позиційні аргументи per INN (picklable для 'processes')
+        context: In-memory контекст ринку (у процеси не передається)
+        executor: Режим ('serial', 'threads', 'processes'; None = конфігурація)
+        max_workers: Кількість workers (None = OPTIMAL_THREADS)
+        **kwargs: Спільні іменовані аргументи (напр. use_cache)
+
+    Returns:
+        List: Результати у порядку tasks
+    """
+    mode, n_workers = resolve_executor(executor, max_workers, len(tasks))
+
+    if mode == 'serial':
+        return [func(*task, context=context, **kwargs) for task in tasks]
+
+    if mode == 'threads':
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            futures = [pool.submit(func, *task, context=context, **kwargs) for task in tasks]
+            return [future.result() for future in futures]
+
+    # Дочірні процеси пишуть INN spans у trace запуску процесу-батька
+    pool = _get_process_pool(n_workers)
+    run_id = get_trace_run_id()
+    futures = [pool.submit(call_traced, run_id, func, *task, context=None, **kwargs) for task in tasks]
+    return [future.result() for future in futures]
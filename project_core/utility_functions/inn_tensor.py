@@ -0,0 +1,313 @@
+# =============================================================================
+# INN TENSOR - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/inn_tensor.py
+# Дата: 2026-10-17
+# Опис: Щільне тижневе представлення серій TARGET аптеки per INN
+# =============================================================================
+
+"""
+Щільний тензор (препарати × тижні) для однієї INN групи TARGET аптеки.
+
+Замість фільтрації DataFrame препарату булевою маскою по датах для
+кожної події (PRE, stock-out) дані INN один раз розкладаються в 2-D
+масиви: рядок = DRUGS_ID, колонка = WEEK_IDX - week_start. Для кожного
+масиву рахуються prefix sums по осі тижнів, тому сума за будь-яке
+вікно [start, end] — це O(1) різниця двох елементів.
+
+Структура (dict):
+    - drug_ids: np.ndarray — DRUGS_ID у порядку рядків (відсортовані)
+    - drug_rows: Dict[int, int] — DRUGS_ID → номер рядка
+    - week_start: int — WEEK_IDX першої колонки
+    - n_weeks: int — кількість колонок
+    - drugs_name, nfc1_id: np.ndarray — метадані препарату (перше значення)
+    - nfc1_code: np.ndarray — nfc1_id, інтерновані в int коди (encode_nfc1)
+    - present: bool[drugs, weeks] — чи є рядок даних за тиждень (bitmap тижнів)
+    - first_week, last_week: np.ndarray — інтервал активності препарату (WEEK_IDX)
+    - contiguous: bool[drugs] — дані є в кожному тижні інтервалу (без пропусків)
+    - Q, MARKET_TOTAL_DRUGS_PACK: [drugs, weeks] — значення (0 де даних немає)
+    - cumsum: Dict[str, np.ndarray] — prefix sums [drugs, weeks + 1] (float64)
+    - total_cumsum: Dict[str, np.ndarray] — prefix sums суми по всіх препаратах [weeks + 1]
+
+Використання:
+    from project_core.utility_functions.inn_tensor import (
+        build_inn_tensor,
+        window_sum,
+        window_count,
+        active_in_window
+    )
+
+    tensor = build_inn_tensor(df_inn)
+    row = tensor['drug_rows'][drug_id]
+    sales_pre = window_sum(tensor, 'Q', row, pre_start, pre_end)
+    has_data = active_in_window(tensor, stockout_start, stockout_end)
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from project_core.utility_functions.etl_utils import WEEK_IDX_COL
+from project_core.did_config.nfc_compatibility import encode_nfc1
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Колонки тензора та їх тип. Q зберігається у store як float32 (без втрат),
+# MARKET_TOTAL_DRUGS_PACK — float64 (сума по конкурентах, float32 змінив би
+# MARKET_PRE на рівні округлення звітів)
+TENSOR_VALUE_COLUMNS: Dict[str, type] = {
+    'Q': np.float32,
+    'MARKET_TOTAL_DRUGS_PACK': np.float64
+}
+
+# Ключ лічильника тижнів з даними (для prefix sums по present)
+PRESENT_KEY = 'present'
+
+
+# =============================================================================
+# BUILD
+# =============================================================================
+
+def build_inn_tensor(
+    df_inn: pd.DataFrame,
+    value_cols: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Побудувати щільний тензор (препарати × тижні) для даних INN.
+
+    Очікує не більше одного рядка на (DRUGS_ID, WEEK_IDX) — як у store
+    після Step 1 (тільки TARGET аптека, тижневі дані).
+
+    Args:
+        df_inn: Агреговані дані INN (колонки DRUGS_ID, WEEK_IDX + value_cols)
+        value_cols: Колонки значень (None = TENSOR_VALUE_COLUMNS)
+
+    Returns:
+        Dict: Тензор INN (див. опис модуля)
+    """
+    if value_cols is None:
+        value_cols = [c for c in TENSOR_VALUE_COLUMNS if c in df_inn.columns]
+
+    drug_codes, drug_ids = pd.factorize(df_inn['DRUGS_ID'], sort=True)
+    drug_ids = np.asarray(drug_ids)
+    weeks = df_inn[WEEK_IDX_COL].to_numpy(dtype=np.int64)
+
+    n_drugs = len(drug_ids)
+    week_start = int(weeks.min()) if len(weeks) else 0
+    n_weeks = int(weeks.max()) - week_start + 1 if len(weeks) else 0
+    cols = weeks - week_start
+
+    # Метадані препарату — перше значення в порядку рядків df_inn
+    first_pos = np.full(n_drugs, -1, dtype=np.int64)
+    positions = np.arange(len(df_inn))
+    first_pos[drug_codes[::-1]] = positions[::-1]
+
+    tensor = {
+        'drug_ids': drug_ids,
+        'drug_rows': {int(drug_id): row for row, drug_id in enumerate(drug_ids)},
+        'week_start': week_start,
+        'n_weeks': n_weeks,
+        'cumsum': {},
+        'total_cumsum': {}
+    }
+
+    for meta_col, key in [('DRUGS_NAME', 'drugs_name'), ('NFC1_ID', 'nfc1_id')]:
+        if meta_col in df_inn.columns:
+            tensor[key] = df_inn[meta_col].to_numpy(dtype=object)[first_pos]
+
+    # NFC1 інтернується один раз — фільтр сумісності працює з int кодами
+    if 'nfc1_id' in tensor:
+        tensor['nfc1_code'] = encode_nfc1(tensor['nfc1_id'])
+
+    present = np.zeros((n_drugs, n_weeks), dtype=bool)
+    present[drug_codes, cols] = True
+    tensor[PRESENT_KEY] = present
+    _add_prefix_sums(tensor, PRESENT_KEY, present, np.int64)
+    _add_activity_index(tensor, drug_codes, weeks)
+
+    for col in value_cols:
+        dtype = TENSOR_VALUE_COLUMNS.get(col, np.float64)
+        values = np.zeros((n_drugs, n_weeks), dtype=dtype)
+        values[drug_codes, cols] = df_inn[col].to_numpy(dtype=dtype)
+        tensor[col] = values
+        _add_prefix_sums(tensor, col, values, np.float64)
+
+    return tensor
+
+
+def _add_prefix_sums(
+    tensor: Dict[str, Any],
+    key: str,
+    values: np.ndarray,
+    dtype: type
+) -> None:
+    """
+    Додати prefix sums (per drug та сумарні по INN) для масиву тензора.
+
+    cumsum[row, k] = сума values[row, :k], тому сума тижнів [a, b) =
+    cumsum[row, b] - cumsum[row, a].
+
+    Args:
+        tensor: Тензор INN (змінюється на місці)
+        key: Назва масиву
+        values: Масив [drugs, weeks]
+        dtype: Тип акумулятора (float64 для значень, int64 для лічильників)
+    """
+    n_drugs, n_weeks = values.shape
+
+    cumsum = np.zeros((n_drugs, n_weeks + 1), dtype=dtype)
+    np.cumsum(values, axis=1, dtype=dtype, out=cumsum[:, 1:])
+    tensor['cumsum'][key] = cumsum
+
+    total_cumsum = np.zeros(n_weeks + 1, dtype=dtype)
+    np.cumsum(values.sum(axis=0, dtype=dtype), dtype=dtype, out=total_cumsum[1:])
+    tensor['total_cumsum'][key] = total_cumsum
+
+
+def _add_activity_index(
+    tensor: Dict[str, Any],
+    drug_codes: np.ndarray,
+    weeks: np.ndarray
+) -> None:
+    """
+    Додати інтервальний індекс активності препаратів (phantom filter).
+
+    Для кожного препарату — перший / останній тиждень з даними та ознака
+    відсутності пропусків між ними. Для безперервних серій (після
+    fill_gaps) перетин інтервалів з вікном вже є точною відповіддю.
+
+    Args:
+        tensor: Тензор INN (змінюється на місці)
+        drug_codes: Номер рядка тензора для кожного рядка даних
+        weeks: WEEK_IDX кожного рядка даних
+    """
+    n_drugs = len(tensor['drug_ids'])
+
+    first_week = np.full(n_drugs, np.iinfo(np.int64).max, dtype=np.int64)
+    last_week = np.full(n_drugs, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(first_week, drug_codes, weeks)
+    np.maximum.at(last_week, drug_codes, weeks)
+
+    n_present = tensor['cumsum'][PRESENT_KEY][:, -1]
+
+    tensor['first_week'] = first_week
+    tensor['last_week'] = last_week
+    tensor['contiguous'] = n_present == last_week - first_week + 1
+
+
+# =============================================================================
+# WINDOW QUERIES
+# =============================================================================
+
+def _window_columns(tensor: Dict[str, Any], start_week, end_week):
+    """
+    Конвертувати вікно WEEK_IDX [start, end] у межі prefix sums [lo, hi).
+
+    Args:
+        tensor: Тензор INN
+        start_week: Початок вікна (WEEK_IDX, включно) — скаляр або масив
+        end_week: Кінець вікна (WEEK_IDX, включно) — скаляр або масив
+
+    Returns:
+        Tuple[lo, hi]: Індекси колонок cumsum (обрізані до меж тензора)
+    """
+    n_weeks = tensor['n_weeks']
+    lo = np.clip(np.asarray(start_week, dtype=np.int64) - tensor['week_start'], 0, n_weeks)
+    hi = np.clip(np.asarray(end_week, dtype=np.int64) - tensor['week_start'] + 1, 0, n_weeks)
+    return lo, np.maximum(hi, lo)
+
+
+def window_sum(tensor: Dict[str, Any], key: str, rows, start_week, end_week):
+    """
+    Сума значень препарату (препаратів) за вікно тижнів [start, end].
+
+    Аргументи rows / start_week / end_week можуть бути скалярами або
+    масивами однакової (broadcast-сумісної) форми.
+
+    Args:
+        tensor: Тензор INN
+        key: Назва масиву ('Q', 'MARKET_TOTAL_DRUGS_PACK', 'present')
+        rows: Номер рядка (drug_rows[DRUGS_ID]) або масив
+        start_week: Початок вікна (WEEK_IDX, включно)
+        end_week: Кінець вікна (WEEK_IDX, включно)
+
+    Returns:
+        float (або np.ndarray для масивів)
+    """
+    lo, hi = _window_columns(tensor, start_week, end_week)
+    cumsum = tensor['cumsum'][key]
+    result = cumsum[rows, hi] - cumsum[rows, lo]
+    return result if np.ndim(result) else result.item()
+
+
+def window_count(tensor: Dict[str, Any], rows, start_week, end_week):
+    """
+    Кількість тижнів з даними препарату за вікно [start, end].
+
+    Еквівалент len(df_drug[(WEEK_IDX >= start) & (WEEK_IDX <= end)]).
+
+    Args:
+        tensor: Тензор INN
+        rows: Номер рядка або масив
+        start_week: Початок вікна (WEEK_IDX, включно)
+        end_week: Кінець вікна (WEEK_IDX, включно)
+
+    Returns:
+        int (або np.ndarray для масивів)
+    """
+    return window_sum(tensor, PRESENT_KEY, rows, start_week, end_week)
+
+
+def window_total(tensor: Dict[str, Any], key: str, start_week, end_week):
+    """
+    Сума значень по всіх препаратах INN за вікно [start, end].
+
+    Args:
+        tensor: Тензор INN
+        key: Назва масиву
+        start_week: Початок вікна (WEEK_IDX, включно)
+        end_week: Кінець вікна (WEEK_IDX, включно)
+
+    Returns:
+        float (або np.ndarray для масивів)
+    """
+    lo, hi = _window_columns(tensor, start_week, end_week)
+    total_cumsum = tensor['total_cumsum'][key]
+    result = total_cumsum[hi] - total_cumsum[lo]
+    return result if np.ndim(result) else result.item()
+
+
+def active_in_window(tensor: Dict[str, Any], start_week, end_week) -> np.ndarray:
+    """
+    Маска препаратів INN, що мають дані у вікні [start, end].
+
+    Векторизований phantom filter: перетин інтервалу активності
+    [first_week, last_week] з вікном; bitmap тижнів (prefix sums по
+    present) перевіряється тільки для препаратів з пропусками.
+
+    Args:
+        tensor: Тензор INN
+        start_week: Початок вікна (WEEK_IDX, включно) — скаляр або масив [events]
+        end_week: Кінець вікна (WEEK_IDX, включно) — скаляр або масив [events]
+
+    Returns:
+        np.ndarray: bool [drugs] (або [events, drugs] для масивів вікон)
+    """
+    start = np.asarray(start_week, dtype=np.int64)[..., np.newaxis]
+    end = np.asarray(end_week, dtype=np.int64)[..., np.newaxis]
+
+    active = (tensor['first_week'] <= end) & (tensor['last_week'] >= start)
+
+    # Препарати з пропусками: інтервал перетинається, але тижнів може не бути
+    gapped = active & ~tensor['contiguous']
+    if gapped.any():
+        rows = np.nonzero(gapped)[-1]
+        starts = np.broadcast_to(start, active.shape)[gapped]
+        ends = np.broadcast_to(end, active.shape)[gapped]
+        active[gapped] = window_count(tensor, rows, starts, ends) > 0
+
+    return active
@@ -0,0 +1,237 @@
+# =============================================================================
+# MARKET CONTEXT - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/market_context.py
+# Дата: 2026-10-17
+# Опис: In-memory контекст ринку для fused виконання Steps 2-4
+# =============================================================================
+
+"""
+In-memory контекст одного ринку для fused виконання Steps 2-4.
+
+Без контексту кожен крок перечитує входи з диску: Step 2 читає store,
+Step 3 — stockout_events CSV та store ще раз, Step 4 — did_results,
+substitute_mapping CSV та store втретє. У fused режимі
+(parallel_runner, fused=True) кроки передають DataFrames через
+контекст: дані INN читаються зі store один раз, тензори INN з Step 3
+перевикористовуються у Step 4.
+
+Структура контексту (dict):
+    - client_id: int — ID ринку
+    - write_mode: str — режим запису артефактів (WRITE_MODES)
+    - inn_data: Dict[int, pd.DataFrame] — дані INN зі store (кеш)
+    - inn_tensors: Dict[int, Dict] — тензори INN TARGET аптеки (кеш)
+    - frames: Dict[str, pd.DataFrame] — виходи кроків (stockout_events,
+      did_results, substitute_mapping) у тому вигляді, в якому вони
+      пишуться у CSV; наступний крок застосовує ту саму підготовку,
+      що й його loader після read_csv
+    - pending_writes: List[Tuple[Path, pd.DataFrame]] — відкладені CSV
+
+Режими запису артефактів:
+    - 'immediate': CSV пишуться одразу (як без контексту)
+    - 'deferred': CSV пишуться в кінці ринку (flush_artifacts)
+    - 'none': CSV не пишуться (тільки якщо Step 5 не виконується)
+
+Використання:
+    from project_core.utility_functions.market_context import (
+        create_market_context,
+        save_artifact,
+        flush_artifacts
+    )
+
+    context = create_market_context(client_id, write_mode='deferred')
+    step2.process_market_stockout(client_id, context=context)
+    step3.process_market_did(client_id, context=context)
+    flush_artifacts(context)
+"""
+
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from project_core.utility_functions.market_store import load_inn_data
+from project_core.utility_functions.artifact_writer import write_csv
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+WRITE_MODES: List[str] = ['immediate', 'deferred', 'none']
+DEFAULT_WRITE_MODE = 'immediate'
+
+
+# =============================================================================
+# CONTEXT
+# =============================================================================
+
+def create_market_context(
+    client_id: int,
+    write_mode: str = DEFAULT_WRITE_MODE
+) -> Dict[str, Any]:
+    """
+    Створити порожній in-memory контекст ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        write_mode: Режим запису артефактів ('immediate', 'deferred', 'none')
+
+    Returns:
+        Dict: Контекст ринку
+
+    Raises:
+        ValueError: Якщо write_mode невідомий
+    """
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Невідомий write_mode: {write_mode} (допустимі: {WRITE_MODES})")
+
+    return {
+        'client_id': client_id,
+        'write_mode': write_mode,
+        'inn_data': {},
+        'inn_tensors': {},
+        'frames': {},
+        'pending_writes': []
+    }
+
+
+def get_inn_data(
+    context: Optional[Dict[str, Any]],
+    client_id: int,
+    inn_id: int
+) -> pd.DataFrame:
+    """
+    Отримати дані INN зі store (з кешуванням у контексті).
+
+    Args:
+        context: Контекст ринку (None = читання зі store без кешу)
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+
+    Returns:
+        pd.DataFrame: Дані INN (порожній якщо партиції немає)
+    """
+    if context is None:
+        return load_inn_data(client_id, inn_id)
+
+    df = context['inn_data'].get(inn_id)
+    if df is None:
+        df = load_inn_data(client_id, inn_id)
+        context['inn_data'][inn_id] = df
+
+    return df
+
+
+def get_inn_tensor(
+    context: Optional[Dict[str, Any]],
+    inn_id: int,
+    build: Callable[[], Dict[str, Any]]
+) -> Dict[str, Any]:
+    """
+    Отримати тензор INN (з кешуванням у контексті).
+
+    Тензор будується тільки з даних TARGET аптеки, тому однаковий для
+    Steps 3 та 4 і будується один раз на ринок.
+
+    Args:
+        context: Контекст ринку (None = побудова без кешу)
+        inn_id: ID INN групи
+        build: Функція побудови тензора (без аргументів)
+
+    Returns:
+        Dict: Тензор INN
+    """
+    if context is None:
+        return build()
+
+    tensor = context['inn_tensors'].get(inn_id)
+    if tensor is None:
+        tensor = build()
+        context['inn_tensors'][inn_id] = tensor
+
+    return tensor
+
+
+def get_frame(context: Optional[Dict[str, Any]], name: str) -> Optional[pd.DataFrame]:
+    """
+    Отримати вихід попереднього кроку з контексту.
+
+    Args:
+        context: Контекст ринку
+        name: Назва ('stockout_events', 'did_results', 'substitute_mapping')
+
+    Returns:
+        pd.DataFrame або None (немає контексту або крок не виконувався)
+    """
+    if context is None:
+        return None
+    return context['frames'].get(name)
+
+
+def put_frame(context: Optional[Dict[str, Any]], name: str, df: pd.DataFrame) -> None:
+    """
+    Зберегти вихід кроку в контексті (no-op без контексту).
+
+    Args:
+        context: Контекст ринку
+        name: Назва виходу
+        df: DataFrame артефакту (як для CSV)
+    """
+    if context is not None:
+        context['frames'][name] = df
+
+
+# =============================================================================
+# ARTIFACTS
+# =============================================================================
+
+def save_artifact(
+    df: pd.DataFrame,
+    file_path: Path,
+    context: Optional[Dict[str, Any]] = None
+) -> Path:
+    """
+    Записати CSV артефакт кроку з урахуванням режиму контексту.
+
+    Запис іде через artifact_writer: атомарно, у фоні якщо writer
+    запущений (parallel_runner), інакше синхронно.
+
+    Args:
+        df: DataFrame для запису (не змінюється після виклику)
+        file_path: Шлях до CSV
+        context: Контекст ринку (None = запис одразу)
+
+    Returns:
+        Path: Шлях до артефакту (для files_created)
+    """
+    write_mode = context['write_mode'] if context is not None else 'immediate'
+
+    if write_mode == 'immediate':
+        write_csv(df, file_path)
+    elif write_mode == 'deferred':
+        context['pending_writes'].append((file_path, df))
+
+    return file_path
+
+
+def flush_artifacts(context: Optional[Dict[str, Any]]) -> List[Path]:
+    """
+    Записати відкладені CSV артефакти ринку (через artifact_writer).
+
+    Args:
+        context: Контекст ринку
+
+    Returns:
+        List[Path]: Записані файли
+    """
+    if context is None:
+        return []
+
+    written = []
+    while context['pending_writes']:
+        file_path, df = context['pending_writes'].pop(0)
+        write_csv(df, file_path)
+        written.append(file_path)
+
+    return written
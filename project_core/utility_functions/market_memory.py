@@ -0,0 +1,213 @@
+# =============================================================================
+# MARKET MEMORY - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/market_memory.py
+# Дата: 2026-10-17
+# Опис: Оцінка пам'яті ринку та допуск ринків до пулу workers за пам'яттю
+# =============================================================================
+
+"""
+Оцінка пам'яті ринку та адаптивний розмір пулу / допуск ринків.
+
+Кількість workers за CPU не враховує, що ринки різного розміру: кілька
+великих ринків одночасно перевищують ліміт пам'яті контейнера (OOM kill
+worker-а). Тут:
+    - estimate_market_memory_gb: оцінка піку пам'яті ринку з розміру raw
+      файлу та RECORDS_COUNT (markets_statistics.csv Step 0) за
+      параметрами machine_parameters (WORKER_BASE_RAM_GB,
+      RAW_MEMORY_FACTOR, RAM_BYTES_PER_RECORD)
+    - adaptive_worker_count: розмір пулу — не більше, ніж вміщує бюджет
+      пам'яті для типового (медіанного) ринку
+    - can_admit: допуск ринку (або задачі ринку) до вільного worker-а —
+      сума оцінок у роботі + новий ринок ≤ бюджет, і поточна доступна
+      пам'ять машини не менша за оцінку нового ринку
+
+Якщо в роботі нічого немає, ринок допускається завжди (інакше ринок,
+більший за бюджет, не виконався б ніколи).
+
+Використання:
+    from project_core.utility_functions.market_memory import (
+        estimate_markets_memory,
+        get_memory_budget_gb,
+        can_admit
+    )
+
+    estimates = estimate_markets_memory(market_ids)
+    budget = get_memory_budget_gb()
+    if can_admit(estimates[client_id], memory_in_use, budget, len(in_flight)):
+        ...
+"""
+
+import math
+from statistics import median
+from typing import Any, Dict, List, Optional
+
+from project_core.calculation_parameters_config.hardware_detection import detect_available_ram_gb
+from project_core.calculation_parameters_config.machine_parameters import (
+    AVAILABLE_RAM_GB,
+    MEMORY_ADMISSION,
+    RAM_BYTES_PER_RECORD,
+    RAM_PER_WORKER_GB,
+    RAW_BYTES_PER_RECORD,
+    RAW_CHUNK_ROWS,
+    RAW_INMEMORY_MAX_MB,
+    RAW_MEMORY_FACTOR,
+    WORKER_BASE_RAM_GB
+)
+from project_core.data_config.paths_config import get_market_raw_file, load_markets_statistics
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+BYTES_PER_GB = 1024 ** 3
+
+# Пам'ять chunk потокового читання на рядок (назви як category, див. RAW_CHUNK_ROWS)
+CHUNK_BYTES_PER_ROW = 200
+
+
+# =============================================================================
+# ESTIMATE
+# =============================================================================
+
+def load_records_counts() -> Dict[int, int]:
+    """
+    RECORDS_COUNT per ринок з markets_statistics.csv.
+
+    Returns:
+        Dict: {CLIENT_ID: RECORDS_COUNT} (порожній, якщо preprocessing не виконаний)
+    """
+    try:
+        df_stats = load_markets_statistics()
+    except FileNotFoundError:
+        return {}
+    return dict(zip(df_stats['CLIENT_ID'].astype(int), df_stats['RECORDS_COUNT'].astype(int)))
+
+
+def estimate_market_memory_gb(client_id: int, records_count: Optional[int] = None) -> float:
+    """
+    Оцінити пік пам'яті worker-а на ринку (ГБ).
+
+    Args:
+        client_id: ID цільової аптеки
+        records_count: RECORDS_COUNT ринку (None = оцінка з розміру raw файлу)
+
+    Returns:
+        float: Оцінка піку пам'яті (ГБ); RAM_PER_WORKER_GB без raw файлу та статистики
+    """
+    raw_file = get_market_raw_file(client_id)
+    raw_bytes = raw_file.stat().st_size if raw_file.exists() else 0
+
+    if raw_bytes == 0 and records_count is None:
+        return RAM_PER_WORKER_GB
+
+    if records_count is None:
+        records_count = raw_bytes / RAW_BYTES_PER_RECORD
+
+    # Step 1: файл цілком або chunks (потокове читання великих файлів)
+    if raw_bytes > RAW_INMEMORY_MAX_MB * 1024 * 1024:
+        read_bytes = RAW_CHUNK_ROWS * CHUNK_BYTES_PER_ROW
+    else:
+        read_bytes = RAW_MEMORY_FACTOR * raw_bytes
+
+    work_bytes = RAM_BYTES_PER_RECORD * records_count
+
+    return WORKER_BASE_RAM_GB + (read_bytes + work_bytes) / BYTES_PER_GB
+
+
+def estimate_markets_memory(market_ids: List[int]) -> Dict[int, float]:
+    """
+    Оцінити пік пам'яті для списку ринків (markets_statistics читається один раз).
+
+    Args:
+        market_ids: Список ID цільових аптек
+
+    Returns:
+        Dict: {CLIENT_ID: оцінка (ГБ)}
+    """
+    records = load_records_counts()
+    return {
+        client_id: estimate_market_memory_gb(client_id, records.get(int(client_id)))
+        for client_id in market_ids
+    }
+
+
+# =============================================================================
+# POOL SIZE / ADMISSION
+# =============================================================================
+
+def get_memory_budget_gb(memory_budget_gb: Optional[float] = None) -> float:
+    """
+    Бюджет пам'яті для ринків у роботі (ГБ).
+
+    Args:
+        memory_budget_gb: Явний бюджет (None = AVAILABLE_RAM_GB, або без
+                          обмеження якщо MEMORY_ADMISSION = False)
+
+    Returns:
+        float: Бюджет (math.inf — допуск за пам'яттю вимкнено)
+    """
+    if memory_budget_gb is not None:
+        return float(memory_budget_gb)
+    return float(AVAILABLE_RAM_GB) if MEMORY_ADMISSION else math.inf
+
+
+def adaptive_worker_count(estimates: Dict[int, float], max_workers: int, budget_gb: float) -> int:
+    """
+    Розмір пулу з урахуванням пам'яті типового ринку.
+
+    Args:
+        estimates: {CLIENT_ID: оцінка пам'яті (ГБ)}
+        max_workers: Верхня межа (OPTIMAL_WORKERS — CPU та RAM_PER_WORKER_GB)
+        budget_gb: Бюджет пам'яті (ГБ)
+
+    Returns:
+        int: Кількість workers (≥ 1, ≤ max_workers, ≤ кількості ринків)
+    """
+    n_workers = max_workers
+    if estimates:
+        n_workers = min(n_workers, len(estimates))
+        if math.isfinite(budget_gb):
+            n_workers = min(n_workers, int(budget_gb // median(estimates.values())))
+    return max(1, n_workers)
+
+
+def can_admit(need_gb: float, in_use_gb: float, budget_gb: float, in_flight: int) -> bool:
+    """
+    Чи допустити ринок (задачу) до вільного worker-а.
+
+    Args:
+        need_gb: Оцінка пам'яті нового ринку (задачі)
+        in_use_gb: Сума оцінок ринків (задач) у роботі
+        budget_gb: Бюджет пам'яті
+        in_flight: Кількість ринків (задач) у роботі
+
+    Returns:
+        bool: True якщо пам'яті достатньо (або в роботі нічого немає)
+    """
+    if in_flight == 0 or not math.isfinite(budget_gb):
+        return True
+    if in_use_gb + need_gb > budget_gb:
+        return False
+
+    # Поточна доступна пам'ять (інші процеси машини / контейнера)
+    available_gb = detect_available_ram_gb()
+    return available_gb is None or need_gb <= available_gb
+
+
+def memory_summary(estimates: Dict[int, float], budget_gb: float) -> Dict[str, Any]:
+    """
+    Поля підсумку запуску про пам'ять.
+
+    Args:
+        estimates: {CLIENT_ID: оцінка пам'яті (ГБ)}
+        budget_gb: Бюджет пам'яті
+
+    Returns:
+        Dict: memory_budget_gb (None без обмеження), memory_estimate_max_gb
+    """
+    return {
+        'memory_budget_gb': round(budget_gb, 2) if math.isfinite(budget_gb) else None,
+        'memory_estimate_max_gb': round(max(estimates.values()), 2) if estimates else 0.0
+    }
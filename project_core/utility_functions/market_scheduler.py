@@ -0,0 +1,712 @@
+# =============================================================================
+# MARKET SCHEDULER - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/market_scheduler.py
+# Дата: 2026-10-17
+# Опис: Планувальник задач рівня (ринок, INN) для паралельної обробки ринків
+# =============================================================================
+
+"""
+Планувальник задач рівня (ринок, INN) для Steps 1-5.
+
+run_markets_parallel віддає worker-у цілий ринок: загальний час обмежений
+найбільшим ринком, поки решта workers простоює. Scheduler розкладає
+кожен ринок на задачі:
+    1. prepare  — Steps 1-2 ринку (агрегація, stock-out події)
+    2. inn      — Steps 3-4 однієї INN групи з подіями
+                  (process_inn_did → process_inn_substitute)
+    3. finalize — бар'єр ринку: Steps 3-4 збирають CSV з готових
+                  результатів INN (inn_results), потім Step 5
+
+Диспетчеризація:
+    - спільний постійний пул (parallel_runner.get_worker_pool)
+    - у польоті не більше max_workers задач: worker, що звільнився,
+      отримує найбільшу з готових задач (динамічний балансинг замість
+      статичного розподілу ринків між workers)
+    - пріоритет: prepare (відкриває задачі INN; більший raw файл —
+      раніше) → finalize → inn (більша оцінка вартості — раніше)
+    - вартість INN задачі: кількість подій INN × WEEKS_TOTAL з
+      inn_summary_{CLIENT_ID}.csv (WEEKS_TOTAL — сума тижнів по
+      препаратах INN, тобто ≈ DRUGS_COUNT × тижні)
+    - допуск за пам'яттю (market_memory): prepare / finalize мають
+      оцінку пам'яті ринку, INN задача — частку ринку за вартістю INN;
+      задача, що не вміщується в бюджет, чекає (наступна менша
+      задача видається раніше)
+    - таймаут (market_watchdog): задача, що виконується довше за
+      MARKET_TIMEOUT_SEC від старту, зупиняється (kill worker-а, заміна
+      пулу, задачі інших workers повертаються в чергу) і повторюється
+      до MARKET_TIMEOUT_RETRIES разів (prepare / finalize — з INN-групами
+      без паралелізму); після вичерпання повторів ринок невдалий
+    - маніфест запуску (run_manifest): prepare та finalize записують
+      завершені кроки ринку; resume видає ринку тільки незавершені кроки
+      (Steps 1-2 завершені — без prepare, Steps 3-4 — без задач INN)
+
+Результати ті самі, що й у run_markets_parallel: задачі INN викликають
+ті самі per-INN функції Steps 3-4 (з per-INN кешем у incremental режимі),
+finalize збирає їх у порядку INN_ID. Передача Step 3 → Step 4 всередині
+INN задачі — in-memory (як fused режим); Step 2 завжди пише CSV подій
+(вхід задач INN).
+
+Використання:
+    from project_core.utility_functions.market_scheduler import run_markets_scheduled
+
+    results = run_markets_scheduled(
+        market_ids=[28670, 28753, 79021],
+        steps=[1, 2, 3, 4, 5]
+    )
+
+Документація:
+    docs/_project_tech_parameters/_asynchronous_computing.md
+"""
+
+import heapq
+import importlib
+import itertools
+import time
+import traceback
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from tqdm import tqdm
+
+from project_core.calculation_parameters_config.machine_parameters import WORKER_BASE_RAM_GB
+from project_core.data_config.paths_config import get_market_raw_file
+from project_core.utility_functions.market_watchdog import (
+    collect_task_starts,
+    expired_tokens,
+    kill_worker,
+    next_wait_timeout,
+    submit_tracked
+)
+from project_core.utility_functions.market_memory import (
+    adaptive_worker_count,
+    can_admit,
+    estimate_markets_memory,
+    get_memory_budget_gb,
+    memory_summary
+)
+from project_core.utility_functions.run_manifest import finish_run, start_run
+from project_core.utility_functions.parallel_runner import (
+    ensure_import_paths,
+    get_worker_pool,
+    print_memory_plan,
+    print_run_plan,
+    print_run_summary,
+    process_single_market_pipeline,
+    shutdown_worker_pool,
+    validate_write_mode
+)
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+TASK_PREPARE = 'prepare'
+TASK_INN = 'inn'
+TASK_FINALIZE = 'finalize'
+
+# Порядок видачі готових задач (менше — раніше)
+TASK_RANKS = {
+    TASK_PREPARE: 0,
+    TASK_FINALIZE: 1,
+    TASK_INN: 2
+}
+
+# Кроки задачі prepare (решта кроків ринку — у finalize)
+PREPARE_STEPS = [1, 2]
+
+
+# =============================================================================
+# INN TASK (виконується у worker-процесах)
+# =============================================================================
+
+def process_inn_task(
+    client_id: int,
+    inn_id: int,
+    inn_events: pd.DataFrame,
+    with_substitutes: bool = True,
+    use_cache: bool = False,
+    async_writes: bool = True,
+    run_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Steps 3-4 однієї INN групи ринку.
+
+    Дані та тензор INN читаються один раз і передаються з Step 3 у
+    Step 4 через локальний контекст. Записи per-INN кешу завершені до
+    повернення результату.
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+        inn_events: Stock-out події INN (формат load_stockout_events)
+        with_substitutes: Рахувати Step 4 (LIFT записи INN)
+        use_cache: Використовувати per-INN кеш (inn_cache)
+        async_writes: Фоновий writer процесу для записів кешу
+        run_id: ID запуску — spans задачі пишуться у trace запуску (run_trace)
+
+    Returns:
+        Dict:
+            - client_id, inn_id
+            - did: результат process_inn_did()
+            - lifts: результат process_inn_substitute() (None без Step 4)
+            - elapsed_seconds: час задачі
+    """
+    start_time = time.time()
+    ensure_import_paths()
+
+    from project_core.utility_functions.artifact_writer import start_writer, flush_writes
+    from project_core.utility_functions.market_context import create_market_context
+    from project_core.utility_functions.run_trace import start_trace, trace_span
+
+    if async_writes:
+        start_writer()
+    start_trace(run_id)
+
+    # Кеш даних та тензора INN між Steps 3 і 4 (артефакти ринку пише finalize)
+    context = create_market_context(client_id, 'none')
+
+    with trace_span('step', client_id=client_id, step=3, inn_id=inn_id):
+        step3 = importlib.import_module('02_03_did_analysis')
+        did = step3.process_inn_did(client_id, inn_id, inn_events, context, use_cache)
+
+    lifts = None
+    if with_substitutes:
+        with trace_span('step', client_id=client_id, step=4, inn_id=inn_id):
+            step4 = importlib.import_module('02_04_substitute_analysis')
+            lifts = step4.process_inn_substitute(
+                client_id, inn_id, did['did_results'], did['substitute_mappings'],
+                context, use_cache
+            )
+
+    flush_writes()
+
+    return {
+        'client_id': client_id,
+        'inn_id': inn_id,
+        'did': did,
+        'lifts': lifts,
+        'elapsed_seconds': round(time.time() - start_time, 2)
+    }
+
+
+# =============================================================================
+# TASK PLANNING (процес-координатор)
+# =============================================================================
+
+def estimate_inn_costs(client_id: int, events_per_inn: Dict[int, int]) -> Dict[int, float]:
+    """
+    Оцінити вартість задач INN ринку.
+
+    Вартість = кількість подій INN × WEEKS_TOTAL (inn_summary Step 1).
+    Без inn_summary (або INN у ньому) — кількість подій.
+
+    Args:
+        client_id: ID цільової аптеки
+        events_per_inn: {INN_ID: кількість stock-out подій}
+
+    Returns:
+        Dict: {INN_ID: оцінка вартості}
+    """
+    step1 = importlib.import_module('02_01_data_aggregation')
+    summary_file = step1.get_aggregation_paths(client_id)['stats_folder'] / f"inn_summary_{client_id}.csv"
+
+    weeks_total: Dict[int, float] = {}
+    if summary_file.exists():
+        df_summary = pd.read_csv(summary_file, usecols=['INN_ID', 'WEEKS_TOTAL'])
+        weeks_total = dict(zip(df_summary['INN_ID'].astype(int), df_summary['WEEKS_TOTAL']))
+
+    return {
+        inn_id: float(n_events * weeks_total.get(inn_id, 1))
+        for inn_id, n_events in events_per_inn.items()
+    }
+
+
+def plan_inn_tasks(
+    client_id: int,
+    steps: List[int],
+    async_writes: bool = True,
+    incremental: bool = False,
+    run_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Розкласти Steps 3-4 ринку на задачі INN (після Steps 1-2).
+
+    Задач немає, якщо Step 3 не запитаний, подій немає, або (incremental)
+    Steps 3-4 ринку актуальні — тоді finalize виконує ринок як звичайно.
+
+    Args:
+        client_id: ID цільової аптеки
+        steps: Кроки пайплайну
+        async_writes: Фоновий запис у worker-і
+        incremental: Інкрементальний режим (per-INN кеш, пропуск кроків)
+        run_id: ID запуску (trace spans задач INN)
+
+    Returns:
+        List[Dict]: Задачі INN (kind, client_id, inn_id, cost, func, args)
+
+    Raises:
+        FileNotFoundError: Якщо немає stock-out подій Step 2
+    """
+    if 3 not in steps:
+        return []
+
+    ensure_import_paths()
+
+    if incremental:
+        from project_core.utility_functions.step_fingerprint import (
+            compute_step_fingerprints,
+            is_step_current
+        )
+        fingerprints = compute_step_fingerprints(client_id)
+        if all(is_step_current(client_id, step, fingerprints[step]) for step in (3, 4) if step in steps):
+            return []
+
+    step3 = importlib.import_module('02_03_did_analysis')
+    df_events = step3.load_stockout_events(client_id, step3.get_did_paths(client_id))
+
+    if df_events.empty:
+        return []
+
+    inn_groups = [(int(inn_id), inn_events) for inn_id, inn_events in df_events.groupby('INN_ID')]
+    costs = estimate_inn_costs(client_id, {inn_id: len(events) for inn_id, events in inn_groups})
+    with_substitutes = 4 in steps
+
+    return [
+        {
+            'kind': TASK_INN,
+            'client_id': client_id,
+            'inn_id': inn_id,
+            'cost': costs[inn_id],
+            'func': process_inn_task,
+            'args': (client_id, inn_id, inn_events, with_substitutes, incremental, async_writes),
+            'kwargs': {'run_id': run_id}
+        }
+        for inn_id, inn_events in inn_groups
+    ]
+
+
+# =============================================================================
+# SCHEDULER
+# =============================================================================
+
+def _new_market_result(client_id: int) -> Dict[str, Any]:
+    """Порожній результат ринку (формат process_single_market_pipeline)."""
+    return {
+        'client_id': client_id,
+        'status': 'success',
+        'steps_completed': [],
+        'steps_skipped': [],
+        'step_times': {},
+        'elapsed_seconds': 0,
+        'error': None,
+        'inn_tasks': 0
+    }
+
+
+def _merge_task_result(market_result: Dict[str, Any], task_result: Dict[str, Any]) -> None:
+    """Додати результат задачі prepare / finalize до результату ринку."""
+    market_result['steps_completed'].extend(task_result['steps_completed'])
+    market_result['steps_skipped'].extend(task_result['steps_skipped'])
+    market_result['step_times'].update(task_result['step_times'])
+    market_result['elapsed_seconds'] = round(
+        market_result['elapsed_seconds'] + task_result['elapsed_seconds'], 2
+    )
+    if task_result['status'] != 'success' and market_result['status'] == 'success':
+        market_result['status'] = task_result['status']
+        market_result['error'] = task_result['error']
+        market_result['traceback'] = task_result.get('traceback')
+
+
+def _fail_market(market_result: Dict[str, Any], error: str, tb: Optional[str] = None) -> None:
+    """Позначити ринок як невдалий (перша помилка зберігається)."""
+    if market_result['status'] == 'success':
+        market_result['status'] = 'error'
+        market_result['error'] = error
+        market_result['traceback'] = tb
+
+
+def run_markets_scheduled(
+    market_ids: List[int],
+    steps: Optional[List[int]] = None,
+    max_workers: Optional[int] = None,
+    timeout_per_market: Optional[int] = None,
+    show_progress: bool = True,
+    fused: bool = False,
+    write_mode: str = 'immediate',
+    async_writes: bool = True,
+    incremental: bool = False,
+    memory_budget_gb: Optional[float] = None,
+    run_id: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Паралельна обробка ринків задачами рівня (ринок, INN).
+
+    Args:
+        market_ids: Список ID цільових аптек
+        steps: Кроки пайплайну (1-5). None = всі.
+        max_workers: Кількість worker-процесів (None = OPTIMAL_WORKERS,
+                     обмежений бюджетом пам'яті для медіанного ринку)
+        timeout_per_market: Таймаут кожної задачі ринку (секунди, від старту
+                            у worker-і). None = MARKET_TIMEOUT_SEC, 0 = без таймауту
+        show_progress: Показувати прогрес
+        fused: In-memory передача Step 3 → Step 4 у finalize
+        write_mode: Запис артефактів Steps 3-4 у fused режимі
+                    ('immediate', 'deferred', 'none'); Step 2 пише CSV завжди
+        async_writes: Фоновий запис артефактів у workers
+        incremental: Пропускати кроки з незмінним fingerprint входів,
+                     per-INN кеш у задачах INN
+        memory_budget_gb: Бюджет пам'яті задач у роботі (ГБ).
+                          None = AVAILABLE_RAM_GB (market_memory)
+        run_id: ID запуску (run_manifest). None — новий запуск; ID
+                записаного маніфесту — resume: prepare / INN / finalize
+                тільки для незавершених кроків ринків
+
+    Returns:
+        Dict з результатами (формат run_markets_parallel) та лічильниками задач:
+            - tasks_count: всього задач
+            - inn_tasks_count: задач INN
+            - timeout_count, timeout_retries_count, requeued_count (market_watchdog)
+    """
+    if steps is None:
+        steps = [1, 2, 3, 4, 5]
+    if fused:
+        validate_write_mode(write_mode, steps)
+
+    from project_core.calculation_parameters_config.machine_parameters import (
+        OPTIMAL_WORKERS, MARKET_TIMEOUT_SEC, MARKET_TIMEOUT_RETRIES, TIMEOUT_RETRY_INTRA_EXECUTOR
+    )
+
+    run_id, market_steps = start_run(run_id, market_ids, steps, {
+        'scheduler': 'inn', 'fused': fused, 'write_mode': write_mode,
+        'async_writes': async_writes, 'incremental': incremental
+    })
+    resume_skipped = len(market_ids) - len(market_steps)
+    market_ids = list(market_steps)
+
+    estimates = estimate_markets_memory(market_ids)
+    budget_gb = get_memory_budget_gb(memory_budget_gb)
+
+    if max_workers is None:
+        max_workers = adaptive_worker_count(estimates, OPTIMAL_WORKERS, budget_gb)
+    if timeout_per_market is None:
+        timeout_per_market = MARKET_TIMEOUT_SEC
+
+    total_markets = len(market_ids)
+
+    if show_progress:
+        print()
+        print("=" * 70)
+        print("  SCHEDULED PIPELINE EXECUTION (market × INN tasks)")
+        print("=" * 70)
+        print(f"  Markets:     {total_markets}")
+        print(f"  Workers:     {max_workers}")
+        print(f"  Steps:       {steps}")
+        if fused:
+            print(f"  Fused:       Steps 3-4 in memory (artifacts: {write_mode})")
+        if incremental:
+            print(f"  Incremental: skip steps with unchanged inputs")
+        print(f"  Timeout:     {timeout_per_market}s per task")
+        print_run_plan(run_id, resume_skipped)
+        print_memory_plan(estimates, budget_gb)
+        print(f"  Started:     {datetime.now().strftime('%H:%M:%S')}")
+        print("=" * 70)
+
+    pipeline_start = time.time()
+
+    markets: Dict[int, Dict[str, Any]] = {}
+    ready: List[Any] = []
+    order = itertools.count()
+    in_flight: Dict[Any, Dict[str, Any]] = {}     # future → {'task', 'token', 'executor'}
+    successful = []
+    failed = []
+    counters = {'tasks': 0, 'inn_tasks': 0}
+    memory = {'in_use': 0.0, 'held': set()}
+
+    pbar = tqdm(
+        total=total_markets,
+        desc="  Markets",
+        unit="market",
+        disable=not show_progress,
+        bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
+    )
+
+    def push(task: Dict[str, Any]) -> None:
+        """Додати задачу до черги готових (найбільша вартість — першою)."""
+        heapq.heappush(ready, (TASK_RANKS[task['kind']], -task['cost'], next(order), task))
+        counters['tasks'] += 1
+        if task['kind'] == TASK_INN:
+            counters['inn_tasks'] += 1
+
+    def complete(client_id: int) -> None:
+        """Ринок завершено (успішно або з помилкою)."""
+        result = markets[client_id]['result']
+        if result['status'] == 'success':
+            successful.append(result)
+            status_str = f"OK ({result['elapsed_seconds']:.1f}s)"
+        else:
+            failed.append(result)
+            status_str = f"FAILED: {result['error']}"
+        pbar.update(1)
+        pbar.set_postfix_str(f"Market {client_id}: {status_str}")
+
+    def schedule_finalize(client_id: int) -> None:
+        """Бар'єр ринку: finalize з готовими результатами INN (або завершення)."""
+        state = markets[client_id]
+        finalize_steps = [s for s in state['steps'] if s not in PREPARE_STEPS]
+        if state['result']['status'] != 'success' or not finalize_steps:
+            complete(client_id)
+            return
+        push({
+            'kind': TASK_FINALIZE,
+            'client_id': client_id,
+            'cost': state['size'],
+            'memory_gb': estimates[client_id],
+            'func': process_single_market_pipeline,
+            'args': (
+                client_id, finalize_steps, fused, write_mode, async_writes, incremental,
+                state['inn_results'] or None
+            ),
+            'kwargs': {'run_id': run_id}
+        })
+
+    def schedule_after_prepare(client_id: int) -> None:
+        """Steps 1-2 готові: задачі INN ринку або одразу finalize."""
+        state = markets[client_id]
+        if state['result']['status'] != 'success':
+            complete(client_id)
+            return
+
+        try:
+            inn_tasks = plan_inn_tasks(client_id, state['steps'], async_writes, incremental, run_id)
+        except Exception:
+            # Без розкладу на INN — finalize виконає Steps 3-4 ринку цілком
+            inn_tasks = []
+
+        state['pending_inn'] = len(inn_tasks)
+        state['result']['inn_tasks'] = len(inn_tasks)
+        if not inn_tasks:
+            schedule_finalize(client_id)
+            return
+
+        # Пам'ять INN задачі — частка робочих даних ринку за вартістю INN
+        total_cost = sum(task['cost'] for task in inn_tasks) or 1.0
+        market_data_gb = max(0.0, estimates[client_id] - WORKER_BASE_RAM_GB)
+        for task in inn_tasks:
+            task['memory_gb'] = WORKER_BASE_RAM_GB + market_data_gb * task['cost'] / total_cost
+            push(task)
+
+    # Початкові задачі: prepare (або одразу планування, якщо Steps 1-2 не запитані)
+    for client_id in market_ids:
+        raw_file = get_market_raw_file(client_id)
+        markets[client_id] = {
+            'result': _new_market_result(client_id),
+            'size': raw_file.stat().st_size if raw_file.exists() else 0,
+            'steps': market_steps[client_id],
+            'inn_results': {},
+            'pending_inn': 0
+        }
+    for client_id in market_ids:
+        prepare_steps = [s for s in market_steps[client_id] if s in PREPARE_STEPS]
+        if prepare_steps:
+            push({
+                'kind': TASK_PREPARE,
+                'client_id': client_id,
+                'cost': markets[client_id]['size'],
+                'memory_gb': estimates[client_id],
+                'func': process_single_market_pipeline,
+                'args': (client_id, prepare_steps, False, 'immediate', async_writes, incremental),
+                'kwargs': {'run_id': run_id}
+            })
+        else:
+            schedule_after_prepare(client_id)
+
+    def task_done(task: Dict[str, Any], task_result: Optional[Dict[str, Any]]) -> None:
+        """Обробити завершену задачу (task_result=None — задача впала)."""
+        client_id = task['client_id']
+        state = markets[client_id]
+
+        if task['kind'] == TASK_PREPARE:
+            if task_result is not None:
+                _merge_task_result(state['result'], task_result)
+            schedule_after_prepare(client_id)
+
+        elif task['kind'] == TASK_INN:
+            if task_result is not None:
+                state['inn_results'][task['inn_id']] = {
+                    'did': task_result['did'],
+                    'lifts': task_result['lifts']
+                }
+                state['result']['elapsed_seconds'] = round(
+                    state['result']['elapsed_seconds'] + task_result['elapsed_seconds'], 2
+                )
+            state['pending_inn'] -= 1
+            if state['pending_inn'] == 0:
+                schedule_finalize(client_id)
+
+        else:
+            if task_result is not None:
+                _merge_task_result(state['result'], task_result)
+            complete(client_id)
+
+    def task_failed(task: Dict[str, Any], e: Exception) -> None:
+        """Задача впала з винятком — ринок невдалий, решта його задач дочікується."""
+        label = f"INN {task['inn_id']}: " if task['kind'] == TASK_INN else ""
+        _fail_market(
+            markets[task['client_id']]['result'],
+            f"{label}{type(e).__name__}: {e}",
+            traceback.format_exc()
+        )
+        task_done(task, None)
+
+    def requeue(task: Dict[str, Any]) -> None:
+        """Повернути задачу в чергу готових (повтор / зламаний пул), без лічильників."""
+        heapq.heappush(ready, (TASK_RANKS[task['kind']], -task['cost'], next(order), task))
+
+    def task_timed_out(task: Dict[str, Any]) -> None:
+        """Задача перевищила таймаут: повтор (зменшений INN-паралелізм) або помилка ринку."""
+        key = (task['kind'], task['client_id'], task.get('inn_id'))
+        timeout_attempts[key] = timeout_attempts.get(key, 0) + 1
+        watchdog['timeouts'] += 1
+
+        if timeout_attempts[key] <= MARKET_TIMEOUT_RETRIES:
+            watchdog['retries'] += 1
+            if task['func'] is process_single_market_pipeline:
+                task = {**task, 'kwargs': {**task['kwargs'], 'intra_executor': TIMEOUT_RETRY_INTRA_EXECUTOR}}
+            requeue(task)
+            return
+
+        label = f"INN {task['inn_id']}: " if task['kind'] == TASK_INN else f"{task['kind']}: "
+        result = markets[task['client_id']]['result']
+        _fail_market(result, f"{label}Timeout after {timeout_per_market}s ({timeout_attempts[key]} attempts)")
+        result['timed_out'] = True
+        task_done(task, None)
+
+    executor = get_worker_pool(max_workers)
+    starts: Dict[int, Any] = {}
+    timeout_attempts: Dict[Any, int] = {}
+    watchdog = {'timeouts': 0, 'retries': 0, 'requeued': 0}
+
+    while ready or in_flight:
+        # Вільні workers отримують найбільші готові задачі, що вміщуються в бюджет пам'яті
+        held_back = []
+        while ready and len(in_flight) < max_workers:
+            entry = heapq.heappop(ready)
+            task = entry[-1]
+            if not can_admit(task['memory_gb'], memory['in_use'], budget_gb, len(in_flight)):
+                memory['held'].add(task['client_id'])
+                held_back.append(entry)
+                continue
+            try:
+                future, token = submit_tracked(executor, task['func'], task['args'], task.get('kwargs'))
+            except BrokenProcessPool:
+                held_back.append(entry)
+                shutdown_worker_pool(wait=False)
+                executor = get_worker_pool(max_workers)
+                continue
+            in_flight[future] = {'task': task, 'token': token, 'executor': executor}
+            memory['in_use'] += task['memory_gb']
+        for entry in held_back:
+            heapq.heappush(ready, entry)
+
+        if not in_flight:
+            continue
+
+        collect_task_starts(starts)
+        tokens = [flight['token'] for flight in in_flight.values()]
+        done, _ = wait(
+            in_flight,
+            timeout=next_wait_timeout(starts, tokens, timeout_per_market),
+            return_when=FIRST_COMPLETED
+        )
+
+        pool_broken = False
+        for future in done:
+            flight = in_flight.pop(future)
+            starts.pop(flight['token'], None)
+            task = flight['task']
+            memory['in_use'] -= task['memory_gb']
+            try:
+                task_result = future.result()
+            except Exception as e:
+                # Задачі вже заміненого пулу не ламають поточний
+                if isinstance(e, BrokenProcessPool) and flight['executor'] is executor:
+                    pool_broken = True
+                task_failed(task, e)
+                continue
+            task_done(task, task_result)
+
+        # Watchdog: задачі, що перевищили таймаут від старту у worker-і
+        collect_task_starts(starts)
+        expired = set(expired_tokens(
+            starts, [flight['token'] for flight in in_flight.values()], timeout_per_market
+        ))
+
+        if expired:
+            for token in expired:
+                kill_worker(starts[token][0])
+
+            # Вбитий worker ламає пул — дочікуємось усіх задач у роботі
+            wait(in_flight)
+            pool_broken = True
+
+            for future, flight in list(in_flight.items()):
+                del in_flight[future]
+                starts.pop(flight['token'], None)
+                task = flight['task']
+                memory['in_use'] -= task['memory_gb']
+
+                if flight['token'] in expired:
+                    task_timed_out(task)
+                elif future.exception() is None:
+                    # Задача завершилась до kill
+                    task_done(task, future.result())
+                else:
+                    # Задача іншого worker-а зламаного пулу — виконується знову
+                    watchdog['requeued'] += 1
+                    requeue(task)
+
+        if pool_broken:
+            shutdown_worker_pool(wait=False)
+            executor = get_worker_pool(max_workers)
+
+    pbar.close()
+
+    pipeline_elapsed = time.time() - pipeline_start
+
+    summary = {
+        'run_id': run_id,
+        'resume_skipped_count': resume_skipped,
+        'successful': successful,
+        'failed': failed,
+        'total_markets': total_markets,
+        'successful_count': len(successful),
+        'failed_count': len(failed),
+        'total_time': round(pipeline_elapsed, 2),
+        'markets_per_second': round(total_markets / pipeline_elapsed, 3) if pipeline_elapsed > 0 else 0,
+        'max_workers': max_workers,
+        'steps': steps,
+        'fused': fused,
+        'write_mode': write_mode,
+        'incremental': incremental,
+        'reuse_pool': True,
+        'scheduler': 'inn',
+        'tasks_count': counters['tasks'],
+        'inn_tasks_count': counters['inn_tasks'],
+        'skipped_steps_count': sum(len(r.get('steps_skipped', [])) for r in successful + failed),
+        'memory_held_count': len(memory['held']),
+        'timeout_count': watchdog['timeouts'],
+        'timeout_retries_count': watchdog['retries'],
+        'requeued_count': watchdog['requeued'],
+        **memory_summary(estimates, budget_gb)
+    }
+    finish_run(run_id, summary)
+
+    if show_progress:
+        print_run_summary(summary)
+
+    return summary
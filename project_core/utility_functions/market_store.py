@@ -0,0 +1,356 @@
+# =============================================================================
+# MARKET STORE - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/market_store.py
+# Дата: 2026-10-16
+# Опис: Партиціонований Parquet store агрегованих даних per market
+# =============================================================================
+
+"""
+Колонковий store агрегованих даних для кожного ринку.
+
+Замінює fan-out inn_{INN_ID}_{CLIENT_ID}.csv: Step 1 пише один
+партиціонований Parquet dataset на ринок, Steps 2-4 читають його
+через єдиний loader API.
+
+Структура:
+    01_aggregation_{CLIENT_ID}/inn_store_{CLIENT_ID}/
+    ├── INN_ID=350/part-0.parquet
+    ├── INN_ID=2733/part-0.parquet
+    └── ...
+
+Типи колонок:
+    - Date: datetime64 (timestamp[ns])
+    - WEEK_IDX: int32 (тижні від WEEK_EPOCH — вісь часу для логіки періодів)
+    - PHARM_ID, DRUGS_ID, INN_ID: int32 (INN_ID — ключ партиції)
+    - Q, V: float32 (при читанні повертаються як float64 для розрахунків)
+    - DRUGS_NAME, INN_NAME, NFC1_ID, NFC_ID: dictionary-encoded (pandas category)
+
+Використання:
+    from project_core.utility_functions.market_store import (
+        write_inn_partition,
+        list_store_inns,
+        load_inn_data
+    )
+
+    for inn_id in list_store_inns(client_id):
+        df_inn = load_inn_data(client_id, inn_id)
+"""
+
+import hashlib
+import shutil
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from project_core.data_config.paths_config import (
+    get_market_store_path,
+    MARKET_STORE_PARTITION_KEY,
+    MARKET_STORE_FILE_NAME
+)
+from project_core.utility_functions.etl_utils import (
+    WEEK_IDX_COL,
+    dates_to_week_idx
+)
+
+
+# =============================================================================
+# SCHEMA
+# =============================================================================
+
+# Порядок колонок як у legacy inn_{INN_ID}_{CLIENT_ID}.csv (+ WEEK_IDX після Date)
+STORE_COLUMNS: List[str] = [
+    'PHARM_ID', 'DRUGS_ID', 'Date', WEEK_IDX_COL, 'Q', 'V',
+    'DRUGS_NAME', 'INN_NAME', 'INN_ID', 'NFC1_ID', 'NFC_ID',
+    'NOTSOLD_PERCENT', 'MARKET_TOTAL_DRUGS_PACK', 'MARKET_TOTAL_DRUGS_REVENUE'
+]
+
+_DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+# Схема файлу партиції (без INN_ID — він закодований у назві партиції)
+STORE_SCHEMA = pa.schema([
+    ('PHARM_ID', pa.int32()),
+    ('DRUGS_ID', pa.int32()),
+    ('Date', pa.timestamp('ns')),
+    (WEEK_IDX_COL, pa.int32()),
+    ('Q', pa.float32()),
+    ('V', pa.float32()),
+    ('DRUGS_NAME', _DICT_STRING),
+    ('INN_NAME', _DICT_STRING),
+    ('NFC1_ID', _DICT_STRING),
+    ('NFC_ID', _DICT_STRING),
+    ('NOTSOLD_PERCENT', pa.float64()),
+    ('MARKET_TOTAL_DRUGS_PACK', pa.float64()),
+    ('MARKET_TOTAL_DRUGS_REVENUE', pa.float64())
+])
+
+PARTITION_SCHEMA = pa.schema([(MARKET_STORE_PARTITION_KEY, pa.int32())])
+
+# Колонки, що зберігаються як float32, але повертаються як float64
+_FLOAT32_COLUMNS: List[str] = ['Q', 'V']
+
+
+# =============================================================================
+# PATHS
+# =============================================================================
+
+def get_inn_partition_path(client_id: int, inn_id: int) -> Path:
+    """
+    Отримати шлях до файлу партиції INN.
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+
+    Returns:
+        Path: .../inn_store_{CLIENT_ID}/INN_ID={INN_ID}/part-0.parquet
+    """
+    partition = f"{MARKET_STORE_PARTITION_KEY}={int(inn_id)}"
+    return get_market_store_path(client_id) / partition / MARKET_STORE_FILE_NAME
+
+
+def partition_hash(client_id: int, inn_id: int) -> Optional[str]:
+    """
+    sha256 файлу партиції INN (ключ вхідного зрізу INN для per-INN кешу).
+
+    Запис Parquet детермінований, тому однакові агреговані дані дають
+    однаковий hash між запусками Step 1.
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+
+    Returns:
+        str: hex digest (None якщо партиції немає)
+    """
+    file_path = get_inn_partition_path(client_id, inn_id)
+
+    if not file_path.exists():
+        return None
+
+    return hashlib.sha256(file_path.read_bytes()).hexdigest()
+
+
+def store_exists(client_id: int) -> bool:
+    """
+    Перевірити чи існує store ринку (чи виконано Step 1).
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        bool: True якщо є хоча б одна партиція
+    """
+    store_path = get_market_store_path(client_id)
+    return store_path.exists() and any(store_path.glob(f"{MARKET_STORE_PARTITION_KEY}=*"))
+
+
+# =============================================================================
+# WRITE
+# =============================================================================
+
+def reset_market_store(client_id: int) -> Path:
+    """
+    Очистити store ринку перед повторним записом Step 1.
+
+    Видаляє партиції попереднього запуску, щоб INN, які зникли з raw
+    даних, не залишались у store.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Path: Шлях до (порожнього) store
+    """
+    store_path = get_market_store_path(client_id)
+
+    if store_path.exists():
+        shutil.rmtree(store_path)
+
+    store_path.mkdir(parents=True, exist_ok=True)
+    return store_path
+
+
+def _to_store_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Привести агрегований датафрейм INN до схеми store.
+
+    Args:
+        df: Вихід Step 1 для одного INN (колонки STORE_COLUMNS)
+
+    Returns:
+        pa.Table: Таблиця зі схемою STORE_SCHEMA
+    """
+    columns = {}
+
+    for field in STORE_SCHEMA:
+        if field.name in df.columns:
+            values = df[field.name]
+        elif field.name == WEEK_IDX_COL and 'Date' in df.columns:
+            # WEEK_IDX однозначно визначається датою
+            values = pd.Series(dates_to_week_idx(df['Date']), index=df.index)
+        else:
+            values = pd.Series([None] * len(df), index=df.index)
+
+        if field.name == 'Date':
+            values = pd.to_datetime(values)
+        elif pa.types.is_dictionary(field.type):
+            values = values.astype(object)
+
+        columns[field.name] = pa.array(values, type=field.type, from_pandas=True)
+
+    return pa.Table.from_pydict(columns, schema=STORE_SCHEMA)
+
+
+def write_inn_partition(df: pd.DataFrame, client_id: int, inn_id: int) -> Path:
+    """
+    Записати агреговані дані одного INN у store ринку.
+
+    Порожній датафрейм також записується (порожня партиція), щоб
+    кількість INN у store відповідала кількості INN у raw даних.
+
+    Args:
+        df: Агреговані дані INN (вихід process_single_inn)
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+
+    Returns:
+        Path: Шлях до записаного файлу партиції
+    """
+    file_path = get_inn_partition_path(client_id, inn_id)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    pq.write_table(_to_store_table(df), file_path)
+
+    return file_path
+
+
+# =============================================================================
+# READ (LOADER API)
+# =============================================================================
+
+def _to_frame(table: pa.Table, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Конвертувати таблицю store у pandas з legacy порядком колонок.
+
+    Args:
+        table: Arrow таблиця (з колонкою INN_ID)
+        columns: Підмножина колонок (None = всі)
+
+    Returns:
+        pd.DataFrame: Датафрейм для розрахунків
+    """
+    df = table.to_pandas()
+
+    for col in _FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('float64')
+
+    order = [c for c in (columns or STORE_COLUMNS) if c in df.columns]
+    return df[order]
+
+
+def list_store_inns(client_id: int) -> List[int]:
+    """
+    Отримати список INN_ID, записаних у store ринку.
+
+    Порядок відповідає сортуванню legacy файлів inn_{INN_ID}_{CLIENT_ID}.csv,
+    тому нумерація EVENT_ID у Step 2 не змінюється.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        List[int]: Список INN_ID
+    """
+    store_path = get_market_store_path(client_id)
+
+    if not store_path.exists():
+        return []
+
+    prefix = f"{MARKET_STORE_PARTITION_KEY}="
+    inn_ids = [
+        int(p.name[len(prefix):])
+        for p in store_path.glob(f"{prefix}*")
+        if (p / MARKET_STORE_FILE_NAME).exists()
+    ]
+
+    return sorted(inn_ids, key=lambda inn_id: f"{inn_id}_")
+
+
+def load_inn_data(
+    client_id: int,
+    inn_id: int,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Завантажити агреговані дані одного INN зі store.
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_id: ID INN групи
+        columns: Підмножина колонок (None = всі)
+
+    Returns:
+        pd.DataFrame: Дані INN (порожній DataFrame якщо партиції немає)
+    """
+    file_path = get_inn_partition_path(client_id, inn_id)
+
+    if not file_path.exists():
+        return pd.DataFrame()
+
+    read_columns = None
+    if columns is not None:
+        read_columns = [c for c in columns if c in STORE_SCHEMA.names]
+
+    table = pq.read_table(file_path, columns=read_columns)
+
+    if columns is None or MARKET_STORE_PARTITION_KEY in columns:
+        inn_col = pa.array([int(inn_id)] * table.num_rows, type=pa.int32())
+        table = table.append_column(MARKET_STORE_PARTITION_KEY, inn_col)
+
+    return _to_frame(table, columns)
+
+
+def load_market_data(
+    client_id: int,
+    inn_ids: Optional[List[int]] = None,
+    columns: Optional[List[str]] = None
+) -> pd.DataFrame:
+    """
+    Завантажити агреговані дані всього ринку (або підмножини INN) одним читанням.
+
+    Args:
+        client_id: ID цільової аптеки
+        inn_ids: Список INN_ID для фільтрації (None = всі)
+        columns: Підмножина колонок (None = всі)
+
+    Returns:
+        pd.DataFrame: Дані ринку
+
+    Raises:
+        FileNotFoundError: Якщо store не існує
+    """
+    if not store_exists(client_id):
+        raise FileNotFoundError(
+            f"Market store не знайдено: {get_market_store_path(client_id)}\n"
+            f"Спочатку виконайте: python exec_scripts/01_did_processing/02_01_data_aggregation.py --market_id {client_id}"
+        )
+
+    dataset = ds.dataset(
+        get_market_store_path(client_id),
+        format='parquet',
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor='hive')
+    )
+
+    filter_expr = None
+    if inn_ids is not None:
+        filter_expr = ds.field(MARKET_STORE_PARTITION_KEY).isin([int(i) for i in inn_ids])
+
+    table = dataset.to_table(columns=columns, filter=filter_expr)
+
+    return _to_frame(table, columns)
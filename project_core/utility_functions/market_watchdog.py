@@ -0,0 +1,250 @@
+# =============================================================================
+# MARKET WATCHDOG - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/market_watchdog.py
+# Дата: 2026-10-17
+# Опис: Дедлайни задач пулу workers: старт задач, пошук прострочених, kill worker-а
+# =============================================================================
+
+"""
+Watchdog дедлайнів задач у пулі workers (run_markets_parallel, market_scheduler).
+
+future.result(timeout=...) після as_completed ніколи не спрацьовує: future
+вже завершений. ProcessPoolExecutor не скасовує задачу, що виконується,
+тому завислий ринок тримав worker назавжди. Тут:
+    - worker повідомляє старт задачі (token, PID, час) у спільну чергу
+      (initializer пулу отримує чергу, run_tracked пише в неї)
+    - координатор чекає futures з таймаутом до найближчого дедлайну,
+      знаходить прострочені задачі (expired_tokens) і вбиває їхні
+      worker-процеси разом з дочірніми (kill_worker)
+    - вбитий worker ламає пул (BrokenProcessPool для всіх задач у
+      роботі): runner замінює пул новим, задачі інших ринків повертає
+      в чергу, прострочений ринок записує як timeout і (за
+      MARKET_TIMEOUT_RETRIES) повторює зі зменшеним INN-паралелізмом
+
+Дедлайн відраховується від фактичного старту задачі у worker-і, а не
+від submit (після заміни пулу workers стартують не одразу).
+
+Використання:
+    from project_core.utility_functions.market_watchdog import (
+        submit_tracked,
+        collect_task_starts,
+        expired_tokens,
+        kill_worker
+    )
+
+    future, token = submit_tracked(executor, process_single_market_pipeline, args)
+    collect_task_starts(starts)
+    for token in expired_tokens(starts, [token], timeout_sec):
+        kill_worker(starts[token][0])
+"""
+
+import itertools
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from concurrent.futures import Executor, Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Інтервал перевірки, поки стартовані не всі задачі у роботі (секунди)
+WATCHDOG_POLL_SEC = 1.0
+
+# Сигнал для завислого worker-а (SIGKILL недоступний на Windows)
+KILL_SIGNAL = getattr(signal, 'SIGKILL', signal.SIGTERM)
+
+
+# =============================================================================
+# WORKER SIDE
+# =============================================================================
+
+# Черга старту задач у worker-процесі (задається initializer-ом пулу)
+_worker_queue: Optional[Any] = None
+
+
+def init_worker_status(status_queue: Optional[Any]) -> None:
+    """
+    Запам'ятати чергу старту задач у worker-процесі (initializer пулу).
+
+    Args:
+        status_queue: multiprocessing.Queue координатора (None — без watchdog)
+    """
+    global _worker_queue
+    _worker_queue = status_queue
+
+
+def run_tracked(token: int, func: Callable[..., Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """
+    Виконати задачу у worker-і, повідомивши її старт координатору.
+
+    Args:
+        token: Ідентифікатор задачі (submit_tracked)
+        func: Функція задачі (module-level)
+        args: Позиційні аргументи
+        kwargs: Іменовані аргументи
+
+    Returns:
+        Результат func
+    """
+    if _worker_queue is not None:
+        _worker_queue.put((token, os.getpid(), time.time()))
+    return func(*args, **kwargs)
+
+
+# =============================================================================
+# COORDINATOR SIDE
+# =============================================================================
+
+# Черга старту задач процесу-координатора (спільна для всіх пулів)
+_status_queue: Optional[Any] = None
+_tokens = itertools.count(1)
+
+
+def get_status_queue() -> Any:
+    """
+    Черга старту задач (створюється при першому виклику, initargs пулу).
+
+    Returns:
+        multiprocessing.Queue
+    """
+    global _status_queue
+    if _status_queue is None:
+        _status_queue = multiprocessing.Queue()
+    return _status_queue
+
+
+def submit_tracked(
+    executor: Executor,
+    func: Callable[..., Any],
+    args: tuple,
+    kwargs: Optional[Dict[str, Any]] = None
+) -> Tuple[Future, int]:
+    """
+    Submit задачі з повідомленням старту (run_tracked).
+
+    Args:
+        executor: Пул workers (initializer з init_worker_status)
+        func: Функція задачі (module-level)
+        args: Позиційні аргументи
+        kwargs: Іменовані аргументи
+
+    Returns:
+        Tuple (future, token)
+    """
+    token = next(_tokens)
+    return executor.submit(run_tracked, token, func, args, kwargs or {}), token
+
+
+def collect_task_starts(starts: Dict[int, Tuple[int, float]]) -> None:
+    """
+    Перенести повідомлення старту задач з черги у starts.
+
+    Args:
+        starts: {token: (PID worker-а, час старту)} — оновлюється на місці
+    """
+    status_queue = get_status_queue()
+    while True:
+        try:
+            token, pid, started = status_queue.get_nowait()
+        except queue.Empty:
+            return
+        starts[token] = (pid, started)
+
+
+def expired_tokens(
+    starts: Dict[int, Tuple[int, float]],
+    tokens: Iterable[int],
+    timeout_sec: Optional[float],
+    now: Optional[float] = None
+) -> List[int]:
+    """
+    Задачі у роботі, що перевищили таймаут від старту.
+
+    Args:
+        starts: {token: (PID, час старту)}
+        tokens: Токени задач у роботі
+        timeout_sec: Таймаут задачі (None або ≤ 0 — без таймауту)
+        now: Поточний час (None = time.time())
+
+    Returns:
+        List[int]: Прострочені токени
+    """
+    if not timeout_sec or timeout_sec <= 0:
+        return []
+    if now is None:
+        now = time.time()
+    return [t for t in tokens if t in starts and now - starts[t][1] > timeout_sec]
+
+
+def next_wait_timeout(
+    starts: Dict[int, Tuple[int, float]],
+    tokens: Iterable[int],
+    timeout_sec: Optional[float],
+    now: Optional[float] = None
+) -> Optional[float]:
+    """
+    Скільки чекати futures до наступної перевірки дедлайнів.
+
+    Args:
+        starts: {token: (PID, час старту)}
+        tokens: Токени задач у роботі
+        timeout_sec: Таймаут задачі (None або ≤ 0 — без таймауту)
+        now: Поточний час (None = time.time())
+
+    Returns:
+        float (секунди) або None — чекати без обмеження
+    """
+    if not timeout_sec or timeout_sec <= 0:
+        return None
+    if now is None:
+        now = time.time()
+
+    tokens = list(tokens)
+    remaining = [starts[t][1] + timeout_sec - now for t in tokens if t in starts]
+    if len(remaining) < len(tokens):
+        # Старт частини задач ще не отримано — перевіряємо періодично
+        remaining.append(WATCHDOG_POLL_SEC)
+    return max(0.0, min(remaining)) if remaining else WATCHDOG_POLL_SEC
+
+
+def _child_pids(pid: int) -> List[int]:
+    """Дочірні процеси (рекурсивно, Linux /proc; порожньо на інших ОС)."""
+    children = []
+    for task_dir in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            text = (task_dir / "children").read_text()
+        except OSError:
+            continue
+        for child in text.split():
+            children.append(int(child))
+            children.extend(_child_pids(int(child)))
+    return children
+
+
+def kill_worker(pid: int) -> bool:
+    """
+    Вбити worker-процес разом з дочірніми (пул INN процесів, resource tracker).
+
+    Args:
+        pid: PID worker-а
+
+    Returns:
+        bool: True якщо сигнал надіслано worker-у
+    """
+    for child in _child_pids(pid):
+        try:
+            os.kill(child, KILL_SIGNAL)
+        except OSError:
+            pass
+    try:
+        os.kill(pid, KILL_SIGNAL)
+        return True
+    except OSError:
+        return False
@@ -14,6 +14,32 @@
     - Кожен worker обробляє один повний ринок (Steps 1-5)
     - Контроль пам'яті: обмеження по кількості workers через machine_parameters
     - Fail-safe: помилка одного ринку не зупиняє решту
+    - Fused режим (fused=True): Steps 2-4 передають DataFrames через
+      in-memory контекст ринку (market_context) замість CSV round-trips;
+      запис артефактів — одразу, в кінці ринку або вимкнено (write_mode)
+    - Фоновий запис артефактів (async_writes=True): CSV/Excel пишуться
+      writer thread процесу (artifact_writer), flush barrier — перед
+      кроками, що читають CSV попередніх кроків, та в кінці ринку
+    - Інкрементальний режим (incremental=True): крок пропускається, якщо
+      fingerprint його входів (raw файл, конфігурація, версія коду) не
+      змінився з останнього успішного запуску (step_fingerprint); у
+      кроках, що виконуються, незмінені INN беруться з per-INN кешу
+      (inn_cache)
+    - Постійний пул (reuse_pool=True): workers створюються один раз на
+      процес-координатор (get_worker_pool), initializer імпортує модулі
+      кроків та прогріває версії кроків; повторні виклики
+      run_markets_parallel (sweep параметрів, повторні запуски окремих
+      ринків) використовують ті самі прогріті workers
+    - Допуск за пам'яттю (market_memory): розмір пулу обмежений бюджетом
+      пам'яті для типового ринку, ринок видається вільному worker-у
+      тільки якщо сума оцінок пам'яті ринків у роботі дозволяє
+    - Таймаути (market_watchdog): worker, що перевищив MARKET_TIMEOUT_SEC
+      від старту ринку, вбивається, пул замінюється новим, ринки інших
+      workers повертаються в чергу; ринок з таймаутом повторюється
+      (MARKET_TIMEOUT_RETRIES) з INN-групами без паралелізму
+    - Маніфест запуску (run_manifest): worker записує завершені кроки
+      ринку з checksum виходів у data/processed_data/_runs/{RUN_ID}/;
+      run_id записаного запуску (resume) видає тільки незавершені кроки
 
 Використання:
     from project_core.utility_functions.parallel_runner import (
@@ -26,17 +52,33 @@
         steps=[1, 2, 3, 4, 5]
     )
 
+    # Повторний запуск окремого ринку — той самий пул, без старту workers
+    results = run_markets_parallel(market_ids=[28670], steps=[2, 3, 4, 5])
+
+    # Відновлення перерваного запуску — тільки незавершені кроки ринків
+    results = run_markets_parallel(market_ids, run_id='20261017_101500')
+
+    # Fused Steps 2-4, CSV артефакти пишуться в кінці кожного ринку
+    results = run_markets_parallel(
+        market_ids=[28670, 28753, 79021],
+        fused=True,
+        write_mode='deferred'
+    )
+
 Документація:
     docs/_project_tech_parameters/_asynchronous_computing.md
 """
 
 import sys
 import time
+import atexit
+import threading
 import traceback
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Any, Optional, Callable, Tuple
-from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from tqdm import tqdm
 
 # Додаємо project root до sys.path
@@ -45,14 +87,164 @@ PROJECT_ROOT = _CURRENT_FILE.parent.parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
+from project_core.utility_functions.market_watchdog import (
+    collect_task_starts,
+    expired_tokens,
+    get_status_queue,
+    init_worker_status,
+    kill_worker,
+    next_wait_timeout,
+    submit_tracked
+)
+
+# Модулі кроків, що імпортуються initializer-ом worker-а
+WARM_STEP_MODULES = [
+    '02_01_data_aggregation',
+    '02_02_stockout_detection',
+    '02_03_did_analysis',
+    '02_04_substitute_analysis',
+    '02_05_reports_cross_market'
+]
+
+
+# =============================================================================
+# WORKER POOL (постійний пул процесу-координатора)
+# =============================================================================
+
+# Поточний пул: {'executor': ProcessPoolExecutor, 'max_workers': int}
+_pool: Optional[Dict[str, Any]] = None
+_pool_lock = threading.Lock()
+_atexit_registered = False
+
+
+def ensure_import_paths() -> None:
+    """Додати project root та папки exec_scripts до sys.path (імпорт кроків за назвою)."""
+    for path in (
+        PROJECT_ROOT,
+        PROJECT_ROOT / "exec_scripts" / "02_substitution_coefficients",
+        PROJECT_ROOT / "exec_scripts" / "01_did_processing"
+    ):
+        if str(path) not in sys.path:
+            sys.path.insert(0, str(path))
+
+
+def _init_worker(status_queue: Optional[Any] = None) -> None:
+    """
+    Initializer worker-процесу: імпорти та прогрів один раз на worker.
+
+    Імпортує модулі кроків (pandas, numpy, scipy та конфігурація —
+    транзитивно) і обчислює версії кроків (hash конфігурації та коду,
+    step_fingerprint), тож перший ринок worker-а не платить за старт.
+    Помилка імпорту не ламає пул — вона повториться і буде записана
+    в результат ринку.
+
+    Args:
+        status_queue: Черга старту задач (market_watchdog)
+    """
+    import importlib
+
+    init_worker_status(status_queue)
+    ensure_import_paths()
+
+    for module_name in WARM_STEP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            pass
+
+    from project_core.utility_functions.step_fingerprint import get_step_version
+    for step in (1, 2, 3, 4, 5):
+        get_step_version(step)
+
+
+def get_worker_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Отримати постійний пул workers процесу-координатора.
+
+    Пул створюється при першому виклику і живе до shutdown_worker_pool
+    (або завершення процесу). Якщо кількість workers змінилась, старий
+    пул закривається і створюється новий.
+
+    Args:
+        max_workers: Кількість worker-процесів
+
+    Returns:
+        ProcessPoolExecutor: Пул з прогрітими workers (_init_worker)
+    """
+    global _pool, _atexit_registered
+
+    with _pool_lock:
+        if _pool is not None and _pool['max_workers'] != max_workers:
+            _pool['executor'].shutdown(wait=True)
+            _pool = None
+
+        if _pool is None:
+            _pool = {
+                'executor': ProcessPoolExecutor(
+                    max_workers=max_workers,
+                    initializer=_init_worker,
+                    initargs=(get_status_queue(),)
+                ),
+                'max_workers': max_workers
+            }
+            if not _atexit_registered:
+                atexit.register(shutdown_worker_pool)
+                _atexit_registered = True
+
+        return _pool['executor']
+
+
+def shutdown_worker_pool(wait: bool = True) -> None:
+    """
+    Закрити постійний пул workers (якщо створений).
+
+    Args:
+        wait: Чекати завершення поточних задач
+    """
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool['executor'].shutdown(wait=wait)
+            _pool = None
+
 
 # =============================================================================
 # MARKET PROCESSING FUNCTIONS (виконуються у worker-процесах)
 # =============================================================================
 
+def validate_write_mode(write_mode: str, steps: List[int]) -> None:
+    """
+    Перевірити режим запису артефактів для набору кроків.
+
+    Step 5 читає did_results / drugs_summary / substitute_shares з диску,
+    тому write_mode='none' допустимий тільки без Step 5.
+
+    Args:
+        write_mode: Режим запису ('immediate', 'deferred', 'none')
+        steps: Кроки пайплайну
+
+    Raises:
+        ValueError: Якщо режим невідомий або несумісний з кроками
+    """
+    from project_core.utility_functions.market_context import WRITE_MODES
+
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Невідомий write_mode: {write_mode} (допустимі: {WRITE_MODES})")
+    if write_mode == 'none' and 5 in steps:
+        raise ValueError("write_mode='none' несумісний зі Step 5 (звіти читають CSV артефакти)")
+
+
 def process_single_market_pipeline(
     client_id: int,
-    steps: Optional[List[int]] = None
+    steps: Optional[List[int]] = None,
+    fused: bool = False,
+    write_mode: str = 'immediate',
+    async_writes: bool = True,
+    incremental: bool = False,
+    inn_results: Optional[Dict[int, Dict[str, Any]]] = None,
+    intra_executor: Optional[str] = None,
+    run_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Обробка одного ринку через повний пайплайн (Steps 1-5).
@@ -63,12 +255,35 @@ def process_single_market_pipeline(
     Args:
         client_id: ID цільової аптеки
         steps: Список кроків для виконання (1-5). None = всі.
+        fused: Передавати дані між Steps 2-4 в пам'яті (market_context):
+               store читається один раз, тензори INN з Step 3
+               перевикористовуються у Step 4
+        write_mode: Запис CSV артефактів Steps 2-4 у fused режимі:
+                    'immediate' — одразу, 'deferred' — в кінці ринку
+                    (перед Step 5), 'none' — не писати (без Step 5)
+        async_writes: Писати артефакти у фоновому writer thread; всі
+                      записи ринку завершені до повернення результату
+        incremental: Пропускати кроки, fingerprint входів яких не змінився
+                     з останнього успішного запуску (step_fingerprint), а у
+                     Steps 2-4 брати результати незмінених INN з per-INN
+                     кешу (inn_cache)
+        inn_results: Готові per-INN результати Steps 3-4, обчислені
+                     задачами INN-рівня (market_scheduler):
+                     {INN_ID: {'did': process_inn_did(),
+                               'lifts': process_inn_substitute() | None}}
+        intra_executor: Режим INN-груп ринку ('serial', 'threads',
+                        'processes'; None = INTRA_MARKET_EXECUTOR) —
+                        повтор після таймауту виконується з 'serial'
+        run_id: ID запуску — завершені кроки записуються в маніфест
+                запуску з checksum виходів (run_manifest), spans ринку /
+                кроків / INN — у trace запуску (run_trace)
 
     Returns:
         Dict з результатами обробки:
             - client_id: ID ринку
             - status: 'success' | 'error'
             - steps_completed: список завершених кроків
+            - steps_skipped: кроки, пропущені через незмінні входи
             - elapsed_seconds: час обробки
             - error: опис помилки (якщо status='error')
             - step_times: час кожного кроку
@@ -81,75 +296,189 @@ def process_single_market_pipeline(
         'client_id': client_id,
         'status': 'success',
         'steps_completed': [],
+        'steps_skipped': [],
         'step_times': {},
         'elapsed_seconds': 0,
         'error': None
     }
 
-    # Імпорти всередині worker-процесу (після fork)
-    import sys
-    from pathlib import Path
-    _project_root = Path(__file__).resolve().parent.parent.parent
-    if str(_project_root) not in sys.path:
-        sys.path.insert(0, str(_project_root))
-
-    # Імпорт exec_scripts (шляхи до скриптів додаємо для коректної роботи)
-    _exec_did_path = str(_project_root / "exec_scripts" / "01_did_processing")
-    _exec_sub_path = str(_project_root / "exec_scripts" / "02_substitution_coefficients")
-    if _exec_did_path not in sys.path:
-        sys.path.insert(0, _exec_did_path)
-    if _exec_sub_path not in sys.path:
-        sys.path.insert(0, _exec_sub_path)
+    # Шляхи до exec_scripts (у прогрітому worker-і вже додані initializer-ом)
+    ensure_import_paths()
+
+    from project_core.utility_functions.artifact_writer import (
+        start_writer,
+        flush_writes
+    )
+    from project_core.utility_functions.inn_executor import set_executor_override
+    from project_core.utility_functions.run_trace import begin_span, end_span, start_trace
+
+    start_trace(run_id)
+    market_span = begin_span('market', client_id=client_id, steps=steps)
+    step_spans = {}
+
+    # Fingerprints кроків, що успішно завершились (записуються після flush)
+    completed_fingerprints = {}
+    # Кроки для маніфесту запуску (записуються на flush barrier)
+    manifest_steps = []
+    artifacts_flushed = False
+    # In-memory контекст ринку для fused Steps 2-4
+    context = None
+    previous_executor = set_executor_override(intra_executor) if intra_executor else None
+
+    def checkpoint(error: Optional[str] = None) -> None:
+        """Записати в маніфест запуску кроки, артефакти яких уже на диску (після flush)."""
+        deferred = context is not None and write_mode == 'deferred' and not artifacts_flushed
+        ready = [step for step in manifest_steps if not (deferred and step in (2, 3, 4))]
+        if run_id is None or not (ready or error):
+            return
+        from project_core.utility_functions.run_manifest import record_market_steps
+        record_market_steps(run_id, client_id, ready, error=error)
+        for step in ready:
+            manifest_steps.remove(step)
 
     try:
+        import importlib
+
+        # Фоновий writer процесу (один на worker, живе між ринками)
+        if async_writes:
+            start_writer()
+
+        if fused:
+            from project_core.utility_functions.market_context import (
+                create_market_context,
+                flush_artifacts
+            )
+            validate_write_mode(write_mode, steps)
+            context = create_market_context(client_id, write_mode)
+
+        # Fingerprints входів кроків (інкрементальний режим)
+        fingerprints = None
+        if incremental:
+            from project_core.utility_functions.step_fingerprint import (
+                compute_step_fingerprints,
+                is_step_current,
+                invalidate_step
+            )
+            fingerprints = compute_step_fingerprints(client_id)
+
+        def should_run(step: int) -> bool:
+            """Крок запитаний і його входи змінились (або incremental вимкнено)."""
+            if step not in steps:
+                return False
+            if fingerprints is not None:
+                if is_step_current(client_id, step, fingerprints[step]):
+                    result['steps_skipped'].append(step)
+                    manifest_steps.append(step)
+                    return False
+                invalidate_step(client_id, step)
+            step_spans[step] = begin_span('step', client_id=client_id, step=step)
+            return True
+
+        def step_done(step: int, step_result: Any, step_start: float) -> None:
+            """Зафіксувати завершення кроку (fingerprint — тільки якщо артефакти пишуться)."""
+            result['steps_completed'].append(step)
+            result['step_times'][step] = round(time.time() - step_start, 2)
+
+            failed = isinstance(step_result, dict) and step_result.get('status') == 'error'
+            no_artifacts = context is not None and write_mode == 'none' and step in (2, 3, 4)
+            if fingerprints is not None and not failed and not no_artifacts:
+                completed_fingerprints[step] = fingerprints[step]
+            if not failed and not no_artifacts:
+                manifest_steps.append(step)
+
+            rows_out = step_result.get('total_rows') if isinstance(step_result, dict) else None
+            end_span(step_spans.pop(step), status='error' if failed else 'success', rows_out=rows_out)
+
         # === Step 1: Data Aggregation ===
-        if 1 in steps:
+        if should_run(1):
             step_start = time.time()
             # Імпортуємо модуль напряму з exec_scripts
-            import importlib
             step1 = importlib.import_module('02_01_data_aggregation')
-            step1.process_market(client_id)
-            result['steps_completed'].append(1)
-            result['step_times'][1] = round(time.time() - step_start, 2)
+            step_result = step1.process_market(client_id)
+            step_done(1, step_result, step_start)
 
         # === Step 2: Stockout Detection ===
-        if 2 in steps:
+        if should_run(2):
             step_start = time.time()
             step2 = importlib.import_module('02_02_stockout_detection')
-            step2.process_market_stockout(client_id)
-            result['steps_completed'].append(2)
-            result['step_times'][2] = round(time.time() - step_start, 2)
+            step_result = step2.process_market_stockout(
+                client_id, context=context, use_cache=incremental
+            )
+            step_done(2, step_result, step_start)
 
         # === Step 3: DiD Analysis ===
-        if 3 in steps:
+        if should_run(3):
             step_start = time.time()
+            if context is None:
+                flush_writes()  # Step 3 читає stockout_events CSV
+                checkpoint()
             step3 = importlib.import_module('02_03_did_analysis')
-            step3.process_market_did(client_id)
-            result['steps_completed'].append(3)
-            result['step_times'][3] = round(time.time() - step_start, 2)
+            step_result = step3.process_market_did(
+                client_id, context=context, use_cache=incremental,
+                inn_results=None if inn_results is None else {
+                    inn_id: r['did'] for inn_id, r in inn_results.items()
+                }
+            )
+            step_done(3, step_result, step_start)
 
         # === Step 4: Substitute Analysis ===
-        if 4 in steps:
+        if should_run(4):
             step_start = time.time()
+            if context is None:
+                flush_writes()  # Step 4 читає did_results / substitute_mapping CSV
+                checkpoint()
             step4 = importlib.import_module('02_04_substitute_analysis')
-            step4.process_market(client_id)
-            result['steps_completed'].append(4)
-            result['step_times'][4] = round(time.time() - step_start, 2)
+            step_result = step4.process_market(
+                client_id, context=context, use_cache=incremental,
+                inn_lifts=None if inn_results is None else {
+                    inn_id: r['lifts'] for inn_id, r in inn_results.items()
+                    if r.get('lifts') is not None
+                }
+            )
+            step_done(4, step_result, step_start)
+
+        # Відкладені артефакти Steps 2-4 (потрібні Step 5 та для аудиту)
+        if context is not None:
+            flush_artifacts(context)
+            artifacts_flushed = True
 
         # === Step 5: Reports & Cross-Market ===
-        if 5 in steps:
+        if should_run(5):
             step_start = time.time()
+            flush_writes()  # Step 5 читає CSV Steps 3-4
+            checkpoint()
             step5 = importlib.import_module('02_05_reports_cross_market')
-            step5.process_market(client_id)
-            result['steps_completed'].append(5)
-            result['step_times'][5] = round(time.time() - step_start, 2)
+            step_result = step5.process_market(client_id)
+            step_done(5, step_result, step_start)
 
     except Exception as e:
         result['status'] = 'error'
         result['error'] = f"{type(e).__name__}: {e}"
         # Додаємо traceback для дебагу
         result['traceback'] = traceback.format_exc()
+        for step, span in step_spans.items():
+            end_span(span, status='error', error=type(e).__name__)
+
+    # Flush barrier: всі артефакти ринку записані до повернення результату
+    try:
+        flush_writes()
 
+        # Артефакти записані — fingerprints завершених кроків актуальні
+        if completed_fingerprints:
+            from project_core.utility_functions.step_fingerprint import record_step_fingerprints
+            record_step_fingerprints(client_id, completed_fingerprints)
+
+        checkpoint(error=result['error'])
+    except (RuntimeError, OSError) as e:
+        if result['status'] == 'success':
+            result['status'] = 'error'
+            result['error'] = f"{type(e).__name__}: {e}"
+            result['traceback'] = traceback.format_exc()
+
+    if intra_executor:
+        set_executor_override(previous_executor)
+
+    end_span(market_span, status=result['status'], steps_skipped=result['steps_skipped'])
     result['elapsed_seconds'] = round(time.time() - start_time, 2)
     return result
 
@@ -159,13 +488,12 @@ def _process_market_wrapper(args: Tuple) -> Dict[str, Any]:
     Wrapper для ProcessPoolExecutor.map() — розпаковує аргументи.
 
     Args:
-        args: Tuple (client_id, steps)
+        args: Tuple (client_id, steps, fused, write_mode, async_writes, incremental)
 
     Returns:
         Dict з результатами
     """
-    client_id, steps = args
-    return process_single_market_pipeline(client_id, steps)
+    return process_single_market_pipeline(*args)
 
 
 # =============================================================================
@@ -177,37 +505,86 @@ def run_markets_parallel(
     steps: Optional[List[int]] = None,
     max_workers: Optional[int] = None,
     timeout_per_market: Optional[int] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    fused: bool = False,
+    write_mode: str = 'immediate',
+    async_writes: bool = True,
+    incremental: bool = False,
+    reuse_pool: bool = True,
+    memory_budget_gb: Optional[float] = None,
+    run_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Паралельна обробка списку ринків через ProcessPoolExecutor.
 
+    Ринки видаються вільним workers у порядку market_ids; ринок, для
+    якого не вистачає бюджету пам'яті, чекає (наступні менші ринки
+    допускаються раніше). Ринок, що перевищив таймаут від старту,
+    зупиняється (kill worker-а, заміна пулу) і повторюється до
+    MARKET_TIMEOUT_RETRIES разів з INN-групами без паралелізму.
+
     Args:
         market_ids: Список ID цільових аптек
         steps: Кроки пайплайну для виконання (1-5). None = всі.
         max_workers: Кількість паралельних процесів.
-                     None = auto (з machine_parameters).
-        timeout_per_market: Таймаут на один ринок (секунди).
-                           None = auto (з machine_parameters).
+                     None = auto (OPTIMAL_WORKERS, обмежений бюджетом
+                     пам'яті для медіанного ринку).
+        timeout_per_market: Таймаут на один ринок (секунди, від старту у worker-і).
+                           None = auto (MARKET_TIMEOUT_SEC), 0 = без таймауту.
         show_progress: Показувати прогрес
+        fused: In-memory передача даних між Steps 2-4
+        write_mode: Запис артефактів у fused режимі ('immediate', 'deferred', 'none')
+        async_writes: Фоновий запис артефактів (writer thread у кожному worker)
+        incremental: Пропускати кроки з незмінним fingerprint входів
+        reuse_pool: Використати постійний пул (get_worker_pool), що
+                    залишається живим після виклику; False — окремий
+                    пул, закривається в кінці виклику
+        memory_budget_gb: Бюджет пам'яті ринків у роботі (ГБ).
+                          None = AVAILABLE_RAM_GB (market_memory)
+        run_id: ID запуску (run_manifest). None — новий запуск; ID
+                записаного маніфесту — resume: видаються тільки
+                незавершені кроки ринків
 
     Returns:
         Dict з результатами:
+            - run_id: ID запуску (маніфест data/processed_data/_runs/)
+            - resume_skipped_count: ринки, завершені до resume
             - successful: список успішних результатів
             - failed: список помилок
             - total_time: загальний час
             - markets_per_second: середня швидкість
+            - memory_budget_gb, memory_estimate_max_gb, memory_held_count
+            - timeout_count, timeout_retries_count: таймаути та повтори
+            - requeued_count: ринки, перезапущені після заміни пулу
     """
     if steps is None:
         steps = [1, 2, 3, 4, 5]
+    if fused:
+        validate_write_mode(write_mode, steps)
 
     # Завантажуємо параметри машини
     from project_core.calculation_parameters_config.machine_parameters import (
-        OPTIMAL_WORKERS, MARKET_TIMEOUT_SEC
+        OPTIMAL_WORKERS, MARKET_TIMEOUT_SEC, MARKET_TIMEOUT_RETRIES, TIMEOUT_RETRY_INTRA_EXECUTOR
+    )
+    from project_core.utility_functions.market_memory import (
+        adaptive_worker_count, can_admit, estimate_markets_memory,
+        get_memory_budget_gb, memory_summary
     )
 
+    from project_core.utility_functions.run_manifest import start_run, finish_run
+
+    run_id, market_steps = start_run(run_id, market_ids, steps, {
+        'scheduler': 'market', 'fused': fused, 'write_mode': write_mode,
+        'async_writes': async_writes, 'incremental': incremental
+    })
+    resume_skipped = len(market_ids) - len(market_steps)
+    market_ids = list(market_steps)
+
+    estimates = estimate_markets_memory(market_ids)
+    budget_gb = get_memory_budget_gb(memory_budget_gb)
+
     if max_workers is None:
-        max_workers = OPTIMAL_WORKERS
+        max_workers = adaptive_worker_count(estimates, OPTIMAL_WORKERS, budget_gb)
     if timeout_per_market is None:
         timeout_per_market = MARKET_TIMEOUT_SEC
 
@@ -221,7 +598,13 @@ def run_markets_parallel(
         print(f"  Markets:     {total_markets}")
         print(f"  Workers:     {max_workers}")
         print(f"  Steps:       {steps}")
+        if fused:
+            print(f"  Fused:       Steps 2-4 in memory (artifacts: {write_mode})")
+        if incremental:
+            print(f"  Incremental: skip steps with unchanged inputs")
         print(f"  Timeout:     {timeout_per_market}s per market")
+        print_run_plan(run_id, resume_skipped)
+        print_memory_plan(estimates, budget_gb)
         print(f"  Started:     {datetime.now().strftime('%H:%M:%S')}")
         print("=" * 70)
 
@@ -229,67 +612,189 @@ def run_markets_parallel(
     successful = []
     failed = []
 
-    # Підготовка аргументів для workers
-    tasks = [(cid, steps) for cid in market_ids]
-
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submit всі задачі
-        future_to_market = {}
-        for client_id, step_list in tasks:
-            future = executor.submit(process_single_market_pipeline, client_id, step_list)
-            future_to_market[future] = client_id
-
-        # Збираємо результати по мірі завершення (tqdm прогрес-бар)
-        pbar = tqdm(
-            as_completed(future_to_market),
-            total=total_markets,
-            desc="  Markets",
-            unit="market",
-            disable=not show_progress,
-            bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
+    # Задачі ринків (повтори після таймауту та ринки зламаного пулу — на початок черги)
+    pending = [
+        {
+            'client_id': cid,
+            'args': (cid, market_steps[cid], fused, write_mode, async_writes, incremental),
+            'kwargs': {'run_id': run_id}
+        }
+        for cid in market_ids
+    ]
+
+    def new_pool() -> ProcessPoolExecutor:
+        """Постійний пул (get_worker_pool) або окремий пул виклику."""
+        if reuse_pool:
+            return get_worker_pool(max_workers)
+        return ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(get_status_queue(),)
         )
-        for future in pbar:
-            client_id = future_to_market[future]
-
-            try:
-                result = future.result(timeout=timeout_per_market)
-
-                if result['status'] == 'success':
-                    successful.append(result)
-                    status_str = f"OK ({result['elapsed_seconds']:.1f}s)"
-                else:
-                    failed.append(result)
-                    status_str = f"FAILED: {result['error']}"
-
-            except TimeoutError:
-                failed.append({
-                    'client_id': client_id,
-                    'status': 'error',
-                    'error': f'Timeout after {timeout_per_market}s',
-                    'elapsed_seconds': timeout_per_market,
-                    'steps_completed': [],
-                    'step_times': {}
-                })
-                status_str = f"TIMEOUT ({timeout_per_market}s)"
-
-            except Exception as e:
-                failed.append({
-                    'client_id': client_id,
-                    'status': 'error',
-                    'error': f'{type(e).__name__}: {e}',
-                    'elapsed_seconds': 0,
-                    'steps_completed': [],
-                    'step_times': {}
-                })
-                status_str = f"ERROR: {type(e).__name__}"
-
-            pbar.set_postfix_str(f"Market {client_id}: {status_str}")
+
+    def replace_pool(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        """Замінити зламаний пул (вбитий або аварійно завершений worker) новим."""
+        if reuse_pool:
+            shutdown_worker_pool(wait=False)
+        else:
+            broken.shutdown(wait=False, cancel_futures=True)
+        return new_pool()
+
+    def market_error(client_id: int, error: str, elapsed: float = 0) -> Dict[str, Any]:
+        """Результат ринку, що не повернув результат worker-а."""
+        return {
+            'client_id': client_id,
+            'status': 'error',
+            'error': error,
+            'elapsed_seconds': elapsed,
+            'steps_completed': [],
+            'step_times': {}
+        }
+
+    executor = new_pool()
+    in_flight: Dict[Any, Dict[str, Any]] = {}     # future → {'task', 'token', 'executor'}
+    starts: Dict[int, Tuple[int, float]] = {}     # token → (PID worker-а, старт)
+    timeout_attempts: Dict[int, int] = {}
+    counters = {'timeouts': 0, 'retries': 0, 'requeued': 0}
+    memory_in_use = 0.0
+    held = set()
+
+    pbar = tqdm(
+        total=total_markets,
+        desc="  Markets",
+        unit="market",
+        disable=not show_progress,
+        bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
+    )
+
+    def record(client_id: int, future: Any) -> bool:
+        """Записати результат завершеного future; True якщо пул зламаний."""
+        try:
+            result = future.result()
+
+            if result['status'] == 'success':
+                successful.append(result)
+                status_str = f"OK ({result['elapsed_seconds']:.1f}s)"
+            else:
+                failed.append(result)
+                status_str = f"FAILED: {result['error']}"
+            broken = False
+
+        except Exception as e:
+            broken = isinstance(e, BrokenProcessPool)
+            failed.append(market_error(client_id, f'{type(e).__name__}: {e}'))
+            status_str = f"ERROR: {type(e).__name__}"
+
+        pbar.update(1)
+        pbar.set_postfix_str(f"Market {client_id}: {status_str}")
+        return broken
+
+    try:
+        while pending or in_flight:
+            # Вільні workers отримують ринки, для яких вистачає бюджету пам'яті
+            index = 0
+            while index < len(pending) and len(in_flight) < max_workers:
+                task = pending[index]
+                client_id = task['client_id']
+                if not can_admit(estimates[client_id], memory_in_use, budget_gb, len(in_flight)):
+                    held.add(client_id)
+                    index += 1
+                    continue
+
+                try:
+                    future, token = submit_tracked(
+                        executor, process_single_market_pipeline, task['args'], task['kwargs']
+                    )
+                except BrokenProcessPool:
+                    executor = replace_pool(executor)
+                    continue
+                pending.pop(index)
+                in_flight[future] = {'task': task, 'token': token, 'executor': executor}
+                memory_in_use += estimates[client_id]
+
+            if not in_flight:
+                continue
+
+            collect_task_starts(starts)
+            tokens = [entry['token'] for entry in in_flight.values()]
+            done, _ = wait(
+                in_flight,
+                timeout=next_wait_timeout(starts, tokens, timeout_per_market),
+                return_when=FIRST_COMPLETED
+            )
+
+            pool_broken = False
+            for future in done:
+                entry = in_flight.pop(future)
+                starts.pop(entry['token'], None)
+                memory_in_use -= estimates[entry['task']['client_id']]
+                broken = record(entry['task']['client_id'], future)
+                # Задачі вже заміненого пулу не ламають поточний
+                pool_broken = pool_broken or (broken and entry['executor'] is executor)
+
+            # Watchdog: ринки, що перевищили таймаут від старту у worker-і
+            collect_task_starts(starts)
+            expired = set(expired_tokens(
+                starts, [entry['token'] for entry in in_flight.values()], timeout_per_market
+            ))
+
+            if expired:
+                for token in expired:
+                    kill_worker(starts[token][0])
+
+                # Вбитий worker ламає пул — дочікуємось усіх задач у роботі
+                wait(in_flight)
+                pool_broken = True
+
+                for future, entry in list(in_flight.items()):
+                    del in_flight[future]
+                    starts.pop(entry['token'], None)
+                    task = entry['task']
+                    client_id = task['client_id']
+                    memory_in_use -= estimates[client_id]
+
+                    if entry['token'] in expired:
+                        counters['timeouts'] += 1
+                        timeout_attempts[client_id] = timeout_attempts.get(client_id, 0) + 1
+                        if timeout_attempts[client_id] <= MARKET_TIMEOUT_RETRIES:
+                            # Повтор зі зменшеним INN-паралелізмом
+                            counters['retries'] += 1
+                            pending.insert(0, {
+                                **task,
+                                'kwargs': {**task['kwargs'], 'intra_executor': TIMEOUT_RETRY_INTRA_EXECUTOR}
+                            })
+                            pbar.set_postfix_str(f"Market {client_id}: TIMEOUT, retry")
+                        else:
+                            failed.append({
+                                **market_error(
+                                    client_id,
+                                    f'Timeout after {timeout_per_market}s '
+                                    f'({timeout_attempts[client_id]} attempts)',
+                                    timeout_per_market
+                                ),
+                                'timed_out': True
+                            })
+                            pbar.update(1)
+                            pbar.set_postfix_str(f"Market {client_id}: TIMEOUT ({timeout_per_market}s)")
+                    elif future.exception() is None:
+                        # Ринок завершився до kill
+                        record(client_id, future)
+                    else:
+                        # Ринок іншого worker-а зламаного пулу — виконується знову
+                        counters['requeued'] += 1
+                        pending.insert(0, task)
+
+            if pool_broken:
+                executor = replace_pool(executor)
+    finally:
         pbar.close()
+        if not reuse_pool:
+            executor.shutdown(wait=True)
 
     pipeline_elapsed = time.time() - pipeline_start
 
     # Підсумок
     summary = {
+        'run_id': run_id,
+        'resume_skipped_count': resume_skipped,
         'successful': successful,
         'failed': failed,
         'total_markets': total_markets,
@@ -298,39 +803,22 @@ def run_markets_parallel(
         'total_time': round(pipeline_elapsed, 2),
         'markets_per_second': round(total_markets / pipeline_elapsed, 3) if pipeline_elapsed > 0 else 0,
         'max_workers': max_workers,
-        'steps': steps
+        'steps': steps,
+        'fused': fused,
+        'write_mode': write_mode,
+        'incremental': incremental,
+        'reuse_pool': reuse_pool,
+        'skipped_steps_count': sum(len(r.get('steps_skipped', [])) for r in successful + failed),
+        'memory_held_count': len(held),
+        'timeout_count': counters['timeouts'],
+        'timeout_retries_count': counters['retries'],
+        'requeued_count': counters['requeued'],
+        **memory_summary(estimates, budget_gb)
     }
+    finish_run(run_id, summary)
 
     if show_progress:
-        print()
-        print("=" * 70)
-        print("  PARALLEL EXECUTION COMPLETED")
-        print("=" * 70)
-        print(f"  Finished:      {datetime.now().strftime('%H:%M:%S')}")
-        print(f"  Total time:    {_format_time(pipeline_elapsed)}")
-        print(f"  Successful:    {len(successful)}/{total_markets}")
-        print(f"  Failed:        {len(failed)}/{total_markets}")
-
-        if successful:
-            avg_time = sum(r['elapsed_seconds'] for r in successful) / len(successful)
-            max_time = max(r['elapsed_seconds'] for r in successful)
-            min_time = min(r['elapsed_seconds'] for r in successful)
-            print(f"  Avg per market: {_format_time(avg_time)}")
-            print(f"  Min / Max:     {_format_time(min_time)} / {_format_time(max_time)}")
-
-            # Порівняння з послідовним виконанням
-            sequential_estimate = sum(r['elapsed_seconds'] for r in successful)
-            if sequential_estimate > 0:
-                speedup = sequential_estimate / pipeline_elapsed
-                print(f"  Sequential est: {_format_time(sequential_estimate)}")
-                print(f"  Speedup:       {speedup:.1f}x")
-
-        if failed:
-            print(f"\n  FAILED MARKETS:")
-            for r in failed:
-                print(f"    {r['client_id']}: {r['error']}")
-
-        print("=" * 70)
+        print_run_summary(summary)
 
     return summary
 
@@ -338,7 +826,12 @@ def run_markets_parallel(
 def run_markets_sequential(
     market_ids: List[int],
     steps: Optional[List[int]] = None,
-    show_progress: bool = True
+    show_progress: bool = True,
+    fused: bool = False,
+    write_mode: str = 'immediate',
+    async_writes: bool = True,
+    incremental: bool = False,
+    run_id: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Послідовна обробка списку ринків (fallback / benchmark).
@@ -350,12 +843,28 @@ def run_markets_sequential(
         market_ids: Список ID цільових аптек
         steps: Кроки пайплайну (1-5). None = всі.
         show_progress: Показувати прогрес
+        fused: In-memory передача даних між Steps 2-4
+        write_mode: Запис артефактів у fused режимі ('immediate', 'deferred', 'none')
+        async_writes: Фоновий запис артефактів (writer thread процесу)
+        incremental: Пропускати кроки з незмінним fingerprint входів
+        run_id: ID запуску (None — новий; ID записаного маніфесту — resume)
 
     Returns:
         Dict з результатами (той самий формат що й run_markets_parallel)
     """
     if steps is None:
         steps = [1, 2, 3, 4, 5]
+    if fused:
+        validate_write_mode(write_mode, steps)
+
+    from project_core.utility_functions.run_manifest import start_run, finish_run
+
+    run_id, market_steps = start_run(run_id, market_ids, steps, {
+        'scheduler': 'sequential', 'fused': fused, 'write_mode': write_mode,
+        'async_writes': async_writes, 'incremental': incremental
+    })
+    resume_skipped = len(market_ids) - len(market_steps)
+    market_ids = list(market_steps)
 
     total_markets = len(market_ids)
 
@@ -366,6 +875,9 @@ def run_markets_sequential(
         print("=" * 70)
         print(f"  Markets: {total_markets}")
         print(f"  Steps:   {steps}")
+        print(f"  Run ID:  {run_id}")
+        if resume_skipped:
+            print(f"  Resume:  {resume_skipped} markets already complete")
         print(f"  Started: {datetime.now().strftime('%H:%M:%S')}")
         print("=" * 70)
 
@@ -381,7 +893,10 @@ def run_markets_sequential(
         bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
     )
     for client_id in pbar:
-        result = process_single_market_pipeline(client_id, steps)
+        result = process_single_market_pipeline(
+            client_id, market_steps[client_id], fused, write_mode, async_writes, incremental,
+            run_id=run_id
+        )
 
         if result['status'] == 'success':
             successful.append(result)
@@ -396,6 +911,8 @@ def run_markets_sequential(
     pipeline_elapsed = time.time() - pipeline_start
 
     summary = {
+        'run_id': run_id,
+        'resume_skipped_count': resume_skipped,
         'successful': successful,
         'failed': failed,
         'total_markets': total_markets,
@@ -404,15 +921,23 @@ def run_markets_sequential(
         'total_time': round(pipeline_elapsed, 2),
         'markets_per_second': round(total_markets / pipeline_elapsed, 3) if pipeline_elapsed > 0 else 0,
         'max_workers': 1,
-        'steps': steps
+        'steps': steps,
+        'fused': fused,
+        'write_mode': write_mode,
+        'incremental': incremental,
+        'skipped_steps_count': sum(len(r.get('steps_skipped', [])) for r in successful + failed)
     }
+    finish_run(run_id, summary)
 
     if show_progress:
         print()
         print(f"  Total time: {_format_time(pipeline_elapsed)}")
         print(f"  Successful: {len(successful)}/{total_markets}")
+        if incremental:
+            print(f"  Skipped steps: {summary['skipped_steps_count']} (unchanged inputs)")
         if failed:
             print(f"  Failed: {len(failed)}")
+            print(f"  Resume incomplete markets: --resume {run_id}")
         print("=" * 70)
 
     return summary
@@ -422,6 +947,92 @@ def run_markets_sequential(
 # UTILITIES
 # =============================================================================
 
+def print_run_summary(summary: Dict[str, Any]) -> None:
+    """
+    Вивести підсумок паралельного виконання (run_markets_parallel / market_scheduler).
+
+    Args:
+        summary: Підсумок виконання (формат run_markets_parallel)
+    """
+    successful = summary['successful']
+    failed = summary['failed']
+    total_markets = summary['total_markets']
+    pipeline_elapsed = summary['total_time']
+
+    print()
+    print("=" * 70)
+    print("  PARALLEL EXECUTION COMPLETED")
+    print("=" * 70)
+    print(f"  Finished:      {datetime.now().strftime('%H:%M:%S')}")
+    print(f"  Total time:    {_format_time(pipeline_elapsed)}")
+    print(f"  Successful:    {len(successful)}/{total_markets}")
+    print(f"  Failed:        {len(failed)}/{total_markets}")
+    if summary['incremental']:
+        print(f"  Skipped steps: {summary['skipped_steps_count']} (unchanged inputs)")
+    if 'tasks_count' in summary:
+        print(f"  Tasks:         {summary['tasks_count']} ({summary['inn_tasks_count']} INN-level)")
+    if summary.get('timeout_count'):
+        print(
+            f"  Timeouts:      {summary['timeout_count']} "
+            f"({summary['timeout_retries_count']} retried, {summary['requeued_count']} tasks requeued)"
+        )
+    if summary.get('memory_held_count'):
+        print(f"  Memory held:   {summary['memory_held_count']} markets waited for memory budget")
+
+    if successful:
+        avg_time = sum(r['elapsed_seconds'] for r in successful) / len(successful)
+        max_time = max(r['elapsed_seconds'] for r in successful)
+        min_time = min(r['elapsed_seconds'] for r in successful)
+        print(f"  Avg per market: {_format_time(avg_time)}")
+        print(f"  Min / Max:     {_format_time(min_time)} / {_format_time(max_time)}")
+
+        # Порівняння з послідовним виконанням
+        sequential_estimate = sum(r['elapsed_seconds'] for r in successful)
+        if sequential_estimate > 0 and pipeline_elapsed > 0:
+            speedup = sequential_estimate / pipeline_elapsed
+            print(f"  Sequential est: {_format_time(sequential_estimate)}")
+            print(f"  Speedup:       {speedup:.1f}x")
+
+    if failed:
+        print(f"\n  FAILED MARKETS:")
+        for r in failed:
+            print(f"    {r['client_id']}: {r['error']}")
+        if summary.get('run_id'):
+            print(f"\n  Resume incomplete markets: --resume {summary['run_id']}")
+
+    print("=" * 70)
+
+
+def print_run_plan(run_id: str, resume_skipped: int) -> None:
+    """
+    Вивести ID запуску та кількість ринків, завершених до resume (заголовок запуску).
+
+    Args:
+        run_id: ID запуску (run_manifest)
+        resume_skipped: Ринки, всі кроки яких уже завершені
+    """
+    print(f"  Run ID:      {run_id}")
+    if resume_skipped:
+        print(f"  Resume:      {resume_skipped} markets already complete")
+
+
+def print_memory_plan(estimates: Dict[int, float], budget_gb: float) -> None:
+    """
+    Вивести бюджет пам'яті та діапазон оцінок ринків (заголовок запуску).
+
+    Args:
+        estimates: {CLIENT_ID: оцінка пам'яті (ГБ)}
+        budget_gb: Бюджет пам'яті (math.inf — без обмеження)
+    """
+    if not estimates:
+        return
+    budget_str = f"{budget_gb:.1f} GB" if budget_gb != float('inf') else "unlimited"
+    print(
+        f"  Memory:      budget {budget_str}, "
+        f"est. {min(estimates.values()):.2f}-{max(estimates.values()):.2f} GB per market"
+    )
+
+
 def _format_time(seconds: float) -> str:
     """Форматувати час у читабельний рядок."""
     if seconds < 60:
@@ -442,11 +1053,12 @@ if __name__ == "__main__":
     print()
 
     from project_core.calculation_parameters_config.machine_parameters import (
-        OPTIMAL_WORKERS, MAX_WORKERS, CPU_PHYSICAL_CORES, AVAILABLE_RAM_GB
+        OPTIMAL_WORKERS, MAX_WORKERS, CPU_PHYSICAL_CORES, CPU_LOGICAL_CORES,
+        AVAILABLE_RAM_GB, HARDWARE_AUTODETECT
     )
 
-    print(f"Machine parameters:")
-    print(f"  CPU cores:     {CPU_PHYSICAL_CORES}")
+    print(f"Machine parameters ({'auto-detected' if HARDWARE_AUTODETECT else 'manual'}):")
+    print(f"  CPU cores:     {CPU_PHYSICAL_CORES} physical, {CPU_LOGICAL_CORES} logical (usable)")
     print(f"  Available RAM: {AVAILABLE_RAM_GB} GB")
     print(f"  Max workers:   {MAX_WORKERS}")
     print(f"  Optimal:       {OPTIMAL_WORKERS}")
@@ -0,0 +1,258 @@
+# =============================================================================
+# RAW INGEST - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/raw_ingest.py
+# Дата: 2026-10-17
+# Опис: Потокове (chunked) читання raw файлів Rd2_*.csv з обмеженою пам'яттю
+# =============================================================================
+
+"""
+Потокове читання raw файлів Rd2_{CLIENT_ID}.csv.
+
+pd.read_csv всього файлу тримає в пам'яті весь ринок з object-колонками
+назв (~5-8× розміру CSV). Для файлів, більших за RAM worker-а, читання
+йде chunks по RAW_CHUNK_ROWS рядків з явними типами:
+    - ID колонки (CLIENT_ID, ORG_ID, PERIOD_ID, DRUGS_ID, INN_ID): int64
+    - Q, V: парсяться reader-ом з десятковою комою (RAW_NUMERIC_OPTIONS)
+      без проміжних рядків; побітово той самий результат, що й
+      str.replace(',', '.').astype(float)
+    - назви (INN, Full medication name, NFC Code (1/2)): category
+      (коди замість рядка на кожен запис)
+
+Споживачі:
+    - 01_preproc.process_single_file: інкрементальні унікальні значення
+      та статистика ринку
+    - Step 1 (02_01_data_aggregation): великі файли розкладаються у spill
+      файли per INN, після чого агрегація йде по одному INN
+    - Phase 2 (01_data_preparation.load_all_drugs_from_raw): унікальні
+      препарати без завантаження файлів цілком
+
+Структура spill (тимчасова, видаляється після Step 1):
+    01_aggregation_{CLIENT_ID}/_spill_{CLIENT_ID}/
+    ├── INN_ID=350/chunk-00000.parquet
+    ├── INN_ID=350/chunk-00003.parquet
+    └── ...
+
+Використання:
+    from project_core.utility_functions.raw_ingest import (
+        iter_raw_chunks,
+        spill_raw_by_inn,
+        load_spill_inn
+    )
+
+    for chunk in iter_raw_chunks(raw_file, columns=['DRUGS_ID', 'INN_ID']):
+        ...
+"""
+
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from project_core.calculation_parameters_config.machine_parameters import (
+    RAW_CHUNK_ROWS,
+    RAW_INMEMORY_MAX_MB
+)
+from project_core.data_config.column_mapping import (
+    COLUMN_RENAME_MAP,
+    NUMERIC_COLUMNS,
+    RAW_REQUIRED_COLUMNS
+)
+from project_core.data_config.paths_config import CSV_SEPARATOR
+from project_core.utility_functions.etl_utils import convert_numeric_columns
+
+
+# =============================================================================
+# SCHEMA
+# =============================================================================
+
+# Колонки raw файлу за типом (оригінальні назви)
+RAW_INT_COLUMNS: List[str] = ['CLIENT_ID', 'ORG_ID', 'PERIOD_ID', 'DRUGS_ID', 'INN_ID']
+RAW_DECIMAL_COLUMNS: List[str] = ['Q', 'V']
+RAW_TEXT_COLUMNS: List[str] = ['INN', 'Full medication name', 'NFC Code (1)', 'NFC Code (2)']
+
+# Кодування raw файлів (utf-8-sig прибирає BOM, якщо він є)
+RAW_ENCODING = 'utf-8-sig'
+
+# Парсинг Q/V з десятковою комою у reader. round_trip — єдиний режим
+# парсера pandas, що побітово збігається з float(str); режим за
+# замовчуванням ('high') відхиляється в останньому біті на ~4% значень.
+# Якщо колонка містить нечислові значення, reader повертає її як рядки,
+# і convert_numeric_columns конвертує її старим шляхом.
+RAW_NUMERIC_OPTIONS: Dict[str, Any] = {
+    'decimal': ',',
+    'float_precision': 'round_trip'
+}
+
+SPILL_FILE_PATTERN = "chunk-{index:05d}.parquet"
+
+
+def raw_dtypes(columns: List[str], text_dtype: Any = 'category') -> Dict[str, Any]:
+    """
+    Явні типи колонок raw файлу для pd.read_csv.
+
+    Q та V не фіксуються: reader парсить їх з RAW_NUMERIC_OPTIONS
+    (float64, або int64 якщо всі значення цілі), convert_numeric_columns
+    доводить до float64.
+
+    Args:
+        columns: Колонки raw файлу (оригінальні назви)
+        text_dtype: Тип текстових колонок ('category' або object)
+
+    Returns:
+        Dict: {колонка: dtype}
+    """
+    dtypes: Dict[str, Any] = {}
+    for col in columns:
+        if col in RAW_INT_COLUMNS:
+            dtypes[col] = 'int64'
+        elif col in RAW_TEXT_COLUMNS:
+            dtypes[col] = text_dtype
+    return dtypes
+
+
+# =============================================================================
+# CHUNKED READ
+# =============================================================================
+
+def should_stream(file_path: Path, max_mb: Optional[float] = None) -> bool:
+    """
+    Чи читати raw файл потоково (розмір більший за поріг in-memory).
+
+    Args:
+        file_path: Шлях до raw файлу
+        max_mb: Поріг у МБ (None = RAW_INMEMORY_MAX_MB)
+
+    Returns:
+        bool: True якщо файл більший за поріг
+    """
+    if max_mb is None:
+        max_mb = RAW_INMEMORY_MAX_MB
+    return Path(file_path).stat().st_size > max_mb * 1024 * 1024
+
+
+def iter_raw_chunks(
+    file_path: Path,
+    columns: Optional[List[str]] = None,
+    chunk_size: Optional[int] = None,
+    rename: bool = True
+) -> Iterator[pd.DataFrame]:
+    """
+    Читати raw файл chunks з явними типами колонок.
+
+    Args:
+        file_path: Шлях до raw файлу
+        columns: Колонки для читання (оригінальні назви; None = RAW_REQUIRED_COLUMNS)
+        chunk_size: Рядків на chunk (None = RAW_CHUNK_ROWS)
+        rename: Перейменувати колонки через COLUMN_RENAME_MAP
+
+    Yields:
+        pd.DataFrame: Chunk з Q/V як float64 та назвами як category
+    """
+    if columns is None:
+        columns = RAW_REQUIRED_COLUMNS
+    if chunk_size is None:
+        chunk_size = RAW_CHUNK_ROWS
+
+    reader = pd.read_csv(
+        file_path,
+        sep=CSV_SEPARATOR,
+        usecols=columns,
+        dtype=raw_dtypes(columns),
+        chunksize=chunk_size,
+        encoding=RAW_ENCODING,
+        **RAW_NUMERIC_OPTIONS
+    )
+
+    with reader:
+        for chunk in reader:
+            chunk = convert_numeric_columns(chunk, NUMERIC_COLUMNS, verbose=False)
+            if rename:
+                chunk = chunk.rename(columns=COLUMN_RENAME_MAP)
+            yield chunk
+
+
+# =============================================================================
+# SPILL PER INN
+# =============================================================================
+
+def spill_raw_by_inn(
+    file_path: Path,
+    spill_dir: Path,
+    chunk_size: Optional[int] = None
+) -> List[int]:
+    """
+    Розкласти raw файл у spill файли per INN (Parquet, по файлу на chunk × INN).
+
+    Пам'ять обмежена одним chunk: кожен chunk групується по INN_ID і
+    записується одразу. Порядок рядків всередині INN зберігається
+    (chunks нумеруються за порядком у файлі).
+
+    Args:
+        file_path: Шлях до raw файлу
+        spill_dir: Папка spill (перезаписується)
+        chunk_size: Рядків на chunk (None = RAW_CHUNK_ROWS)
+
+    Returns:
+        List[int]: INN_ID у порядку першої появи у файлі
+    """
+    remove_spill(spill_dir)
+    spill_dir.mkdir(parents=True, exist_ok=True)
+
+    inn_order: Dict[int, None] = {}
+    text_columns = [COLUMN_RENAME_MAP.get(col, col) for col in RAW_TEXT_COLUMNS]
+
+    for index, chunk in enumerate(iter_raw_chunks(file_path, chunk_size=chunk_size)):
+        # Категорії різних chunks не збігаються — у spill пишемо рядки
+        chunk = chunk.astype({col: object for col in text_columns})
+
+        for inn_id, df_inn in chunk.groupby('INN_ID', sort=False):
+            inn_order.setdefault(int(inn_id), None)
+            inn_dir = spill_dir / f"INN_ID={int(inn_id)}"
+            inn_dir.mkdir(exist_ok=True)
+            table = pa.Table.from_pandas(df_inn, preserve_index=False)
+            pq.write_table(table, inn_dir / SPILL_FILE_PATTERN.format(index=index))
+
+    return list(inn_order)
+
+
+def load_spill_inn(spill_dir: Path, inn_id: int) -> pd.DataFrame:
+    """
+    Завантажити raw рядки одного INN зі spill (у порядку файлу).
+
+    Args:
+        spill_dir: Папка spill
+        inn_id: ID INN групи
+
+    Returns:
+        pd.DataFrame: Рядки INN (колонки та типи як у in-memory шляху Step 1)
+    """
+    inn_dir = spill_dir / f"INN_ID={int(inn_id)}"
+    files = sorted(inn_dir.glob("chunk-*.parquet"))
+
+    df = pd.concat(
+        [pq.read_table(f).to_pandas() for f in files],
+        ignore_index=True
+    )
+
+    # Parquet повертає None для пропусків — як read_csv, використовуємо NaN
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), np.nan)
+
+    return df
+
+
+def remove_spill(spill_dir: Path) -> None:
+    """
+    Видалити папку spill (якщо існує).
+
+    Args:
+        spill_dir: Папка spill
+    """
+    if spill_dir.exists():
+        shutil.rmtree(spill_dir)
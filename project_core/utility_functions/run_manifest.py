@@ -0,0 +1,407 @@
+# =============================================================================
+# RUN MANIFEST - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/run_manifest.py
+# Дата: 2026-10-17
+# Опис: Маніфест запуску Steps 1-5: завершені кроки ринків, checksums виходів, resume
+# =============================================================================
+
+"""
+Маніфест запуску per-market кроків (Steps 1-5) для відновлення після збою.
+
+Якщо worker вбито (OOM kill, перезавантаження вузла), єдиним способом
+продовжити був --from-step, що перераховує всі ринки. Маніфест
+запуску фіксує завершені кроки кожного ринку з checksum виходів, а
+resume видає лише незавершену роботу:
+
+    _runs/{RUN_ID}/run.json
+    {
+        "run_id": ..., "status": "running" | "completed" | "incomplete",
+        "market_ids": [...], "steps": [...], "options": {...},
+        "created_at": ..., "updated_at": ..., "resumes": [...], "summary": {...}
+    }
+    _runs/{RUN_ID}/markets/{CLIENT_ID}.json
+    {
+        "client_id": ..., "error": ..., "updated_at": ...,
+        "steps": {"1": {"completed_at": ..., "outputs": {"files": N, "sha256": ...}}, ...}
+    }
+
+run.json пише процес-координатор (runner), файл ринку — worker, що
+виконує ринок (задачі prepare / finalize одного ринку не виконуються
+одночасно). Крок фіксується на flush barrier (перед Steps 3/4/5 та в
+кінці ринку), коли його артефакти вже на диску; кроки, пропущені
+інкрементальним режимом, теж вважаються завершеними.
+
+Resume: крок ринку завершений, якщо він записаний і checksum його
+виходів збігається з поточними файлами. Ринку видаються кроки,
+починаючи з першого незавершеного (наступні кроки читають його
+виходи); ринки з усіма завершеними кроками не видаються.
+
+Використання:
+    from project_core.utility_functions.run_manifest import (
+        start_run,
+        record_market_steps,
+        finish_run
+    )
+
+    run_id, market_steps = start_run(None, market_ids, [1, 2, 3, 4, 5], options)
+    ...
+    record_market_steps(run_id, client_id, [1, 2])
+    finish_run(run_id, summary)
+
+    # Відновлення
+    python exec_scripts/run_full_pipeline.py --resume 20261017_101500
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from project_core.data_config.paths_config import (
+    RESULTS_PATH,
+    RUN_MANIFESTS_PATH,
+    get_market_paths
+)
+from project_core.utility_functions.artifact_writer import atomic_write
+from project_core.utility_functions.step_fingerprint import hash_file, invalidate_step
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+RUN_FILE_NAME = "run.json"
+MARKETS_FOLDER = "markets"
+
+# Поля підсумку runner-а, що зберігаються в run.json
+SUMMARY_FIELDS = [
+    'total_markets', 'successful_count', 'failed_count', 'total_time',
+    'max_workers', 'timeout_count', 'resume_skipped_count'
+]
+
+
+# =============================================================================
+# PATHS / IO
+# =============================================================================
+
+def get_run_dir(run_id: str) -> Path:
+    """
+    Отримати папку маніфесту запуску.
+
+    Args:
+        run_id: ID запуску
+
+    Returns:
+        Path: _runs/{RUN_ID}/
+    """
+    return RUN_MANIFESTS_PATH / run_id
+
+
+def _market_file(run_id: str, client_id: int) -> Path:
+    """Файл записів ринку у маніфесті запуску."""
+    return get_run_dir(run_id) / MARKETS_FOLDER / f"{int(client_id)}.json"
+
+
+def _now() -> str:
+    """Поточний час для записів маніфесту."""
+    return datetime.now().isoformat(timespec='seconds')
+
+
+def _load_json(file_path: Path) -> Optional[Dict[str, Any]]:
+    """Прочитати JSON (None якщо файлу немає або він пошкоджений)."""
+    if not file_path.exists():
+        return None
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _save_json(file_path: Path, data: Dict[str, Any]) -> Path:
+    """Записати JSON атомарно (синхронно, без writer)."""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_json(tmp_path: Path) -> None:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+
+    return atomic_write(file_path, write_json)
+
+
+# =============================================================================
+# STEP OUTPUTS
+# =============================================================================
+
+def get_step_output_paths(client_id: int, step: int) -> List[Path]:
+    """
+    Папки виходів кроку ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку (1-5)
+
+    Returns:
+        List[Path]: Папки, файли яких входять у checksum кроку
+    """
+    paths = get_market_paths(client_id)
+
+    if step == 1:
+        return [paths['aggregation']]
+    if step == 2:
+        return [paths['stockout']]
+    if step == 3:
+        return [paths['did_analysis']]
+    if step == 4:
+        return [paths['substitute_shares']]
+    return [
+        RESULTS_PATH / 'data_reports' / f'reports_{client_id}',
+        RESULTS_PATH / 'cross_market_data' / f'market_substitution_{client_id}'
+    ]
+
+
+def hash_step_outputs(client_id: int, step: int) -> Dict[str, Any]:
+    """
+    Checksum виходів кроку: sha256 від відносних шляхів та sha256 файлів.
+
+    Тимчасові файли атомарного запису (.*.tmp.*) не враховуються.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку (1-5)
+
+    Returns:
+        Dict: {'files': кількість файлів, 'sha256': hex digest}
+    """
+    digest = hashlib.sha256()
+    n_files = 0
+
+    for root in get_step_output_paths(client_id, step):
+        if not root.exists():
+            continue
+        for file_path in sorted(p for p in root.rglob('*') if p.is_file()):
+            if file_path.name.startswith('.'):
+                continue
+            digest.update(file_path.relative_to(root.parent).as_posix().encode('utf-8'))
+            digest.update(hash_file(file_path).encode('ascii'))
+            n_files += 1
+
+    return {'files': n_files, 'sha256': digest.hexdigest()}
+
+
+# =============================================================================
+# RUN (процес-координатор)
+# =============================================================================
+
+def new_run_id() -> str:
+    """
+    Згенерувати ID запуску (час старту; суфікс, якщо папка вже існує).
+
+    Returns:
+        str: напр. '20261017_101500'
+    """
+    base = datetime.now().strftime('%Y%m%d_%H%M%S')
+    run_id, suffix = base, 1
+    while get_run_dir(run_id).exists():
+        suffix += 1
+        run_id = f"{base}_{suffix}"
+    return run_id
+
+
+def load_run(run_id: str) -> Dict[str, Any]:
+    """
+    Завантажити маніфест запуску.
+
+    Args:
+        run_id: ID запуску
+
+    Returns:
+        Dict: Вміст run.json
+
+    Raises:
+        FileNotFoundError: Якщо маніфест не знайдено
+    """
+    data = _load_json(get_run_dir(run_id) / RUN_FILE_NAME)
+    if data is None:
+        raise FileNotFoundError(f"Маніфест запуску не знайдено: {get_run_dir(run_id) / RUN_FILE_NAME}")
+    return data
+
+
+def list_runs() -> List[str]:
+    """
+    ID записаних запусків (від старіших до новіших).
+
+    Returns:
+        List[str]: ID запусків
+    """
+    if not RUN_MANIFESTS_PATH.exists():
+        return []
+    return sorted(p.parent.name for p in RUN_MANIFESTS_PATH.glob(f"*/{RUN_FILE_NAME}"))
+
+
+def load_market_record(run_id: str, client_id: int) -> Dict[str, Any]:
+    """
+    Записи ринку у маніфесті запуску.
+
+    Args:
+        run_id: ID запуску
+        client_id: ID цільової аптеки
+
+    Returns:
+        Dict: {'client_id', 'steps', 'error', ...} (порожні steps, якщо записів немає)
+    """
+    data = _load_json(_market_file(run_id, client_id)) or {}
+    data.setdefault('client_id', int(client_id))
+    data.setdefault('steps', {})
+    data.setdefault('error', None)
+    return data
+
+
+def completed_steps(run_id: str, client_id: int, steps: List[int]) -> List[int]:
+    """
+    Завершені кроки ринку: записані, з незмінним checksum виходів, без пропусків.
+
+    Args:
+        run_id: ID запуску
+        client_id: ID цільової аптеки
+        steps: Кроки запуску (за зростанням)
+
+    Returns:
+        List[int]: Префікс steps, завершений і підтверджений checksum
+    """
+    recorded = load_market_record(run_id, client_id)['steps']
+    completed = []
+
+    for step in steps:
+        record = recorded.get(str(step))
+        if not record or hash_step_outputs(client_id, step) != record.get('outputs'):
+            break
+        completed.append(step)
+
+    return completed
+
+
+def start_run(
+    run_id: Optional[str],
+    market_ids: List[int],
+    steps: List[int],
+    options: Dict[str, Any]
+) -> Tuple[str, Dict[int, List[int]]]:
+    """
+    Почати новий запуск або відновити записаний.
+
+    Args:
+        run_id: ID запуску (None — новий; ID існуючого маніфесту — resume)
+        market_ids: Ринки запуску
+        steps: Кроки запуску
+        options: Параметри runner-а (fused, write_mode, scheduler, ...)
+
+    Returns:
+        Tuple (run_id, {CLIENT_ID: кроки до виконання}); при resume —
+        тільки незавершені ринки та їхні незавершені кроки (fingerprints
+        цих кроків інвалідуються — step_fingerprint)
+    """
+    steps = sorted(steps)
+
+    if run_id is not None and (get_run_dir(run_id) / RUN_FILE_NAME).exists():
+        run = load_run(run_id)
+        market_steps = {}
+        for client_id in market_ids:
+            done = completed_steps(run_id, client_id, steps)
+            remaining = steps[len(done):]
+            if remaining:
+                market_steps[client_id] = remaining
+            # Виходи незавершених кроків могли змінитись після запису
+            # fingerprint — інкрементальний режим не повинен їх пропустити
+            for step in remaining:
+                invalidate_step(client_id, step)
+
+        run['status'] = 'running'
+        run['updated_at'] = _now()
+        run.setdefault('resumes', []).append({
+            'started_at': run['updated_at'],
+            'markets': len(market_steps),
+            'options': options
+        })
+        _save_json(get_run_dir(run_id) / RUN_FILE_NAME, run)
+        return run_id, market_steps
+
+    if run_id is None:
+        run_id = new_run_id()
+
+    created_at = _now()
+    _save_json(get_run_dir(run_id) / RUN_FILE_NAME, {
+        'run_id': run_id,
+        'status': 'running',
+        'market_ids': [int(client_id) for client_id in market_ids],
+        'steps': steps,
+        'options': options,
+        'created_at': created_at,
+        'updated_at': created_at,
+        'resumes': [],
+        'summary': {}
+    })
+    return run_id, {client_id: list(steps) for client_id in market_ids}
+
+
+def finish_run(run_id: str, summary: Dict[str, Any]) -> None:
+    """
+    Зафіксувати завершення запуску (статус та підсумок runner-а).
+
+    Args:
+        run_id: ID запуску
+        summary: Підсумок runner-а (run_markets_*)
+    """
+    run = load_run(run_id)
+    run['status'] = 'completed' if summary.get('failed_count', 0) == 0 else 'incomplete'
+    run['updated_at'] = _now()
+    run['summary'] = {key: summary[key] for key in SUMMARY_FIELDS if key in summary}
+    _save_json(get_run_dir(run_id) / RUN_FILE_NAME, run)
+
+
+# =============================================================================
+# MARKET RECORDS (worker)
+# =============================================================================
+
+def record_market_steps(
+    run_id: str,
+    client_id: int,
+    steps: List[int],
+    error: Optional[str] = None
+) -> Path:
+    """
+    Записати завершені кроки ринку з checksum виходів (після flush barrier).
+
+    Записи кроків після останнього записаного видаляються (перераховані
+    кроки змінюють їхні входи).
+
+    Args:
+        run_id: ID запуску
+        client_id: ID цільової аптеки
+        steps: Завершені кроки, артефакти яких записані
+        error: Помилка ринку (None — ринок виконується / завершився успішно)
+
+    Returns:
+        Path: Файл записів ринку
+    """
+    record = load_market_record(run_id, client_id)
+    completed_at = _now()
+
+    for step in steps:
+        record['steps'][str(step)] = {
+            'completed_at': completed_at,
+            'outputs': hash_step_outputs(client_id, step)
+        }
+    if steps:
+        # Наступні кроки читають виходи перерахованих — їхні записи застаріли
+        for key in [key for key in record['steps'] if int(key) > max(steps)]:
+            del record['steps'][key]
+    record['error'] = error
+    record['updated_at'] = completed_at
+    record['pid'] = os.getpid()
+
+    return _save_json(_market_file(run_id, client_id), record)
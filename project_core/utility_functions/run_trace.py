@@ -0,0 +1,459 @@
+# =============================================================================
+# RUN TRACE - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/run_trace.py
+# Дата: 2026-10-17
+# Опис: Trace spans запуску (ринок → крок → INN → фаза): час, CPU, RSS, рядки, I/O
+# =============================================================================
+
+"""
+Trace spans запуску per-market кроків.
+
+step_times ринку — лише грубий час кроку. Тут іменовані spans
+(market → step → inn → phase) записують:
+    - wall_sec, cpu_sec (CPU процесу), thread_cpu_sec (CPU потоку span-а)
+    - rss_mb (поточний RSS після span-а), rss_peak_mb (пік RSS процесу),
+      rss_peak_delta_mb (на скільки span підняв пік процесу)
+    - read_bytes, write_bytes (/proc/self/io rchar / wchar процесу)
+    - rows_in, rows_out та інші лічильники, задані кодом кроку
+
+Spans пишуться JSON-lines у маніфест запуску (run_manifest):
+    _runs/{RUN_ID}/trace/spans-{PID}.jsonl
+
+Кожен процес пише свій файл (рядок — одразу на диск, тому spans
+вбитого worker-а зберігаються). Spans одного потоку вкладені
+(parent_id, client_id / step / inn_id успадковуються); INN spans у
+потоках inn_executor мають client_id / step / inn_id явно. CPU процесу та
+I/O у паралельних INN spans (INTRA_MARKET_EXECUTOR='threads')
+перекриваються — точні per-INN значення: thread_cpu_sec, режими
+'serial' / 'processes' або задачі INN market_scheduler.
+
+Детальність — TRACE_LEVEL (machine_parameters); 'off' або процес без
+start_trace — spans не створюються.
+
+Використання:
+    from project_core.utility_functions.run_trace import trace_span
+
+    with trace_span('inn', client_id=client_id, step=3, inn_id=inn_id) as span:
+        with trace_span('phase', 'load') as phase:
+            df_inn = load_inn_data(...)
+            phase['rows_out'] = len(df_inn)
+        span['rows_out'] = len(did_results)
+
+    # Підсумок: найповільніші кроки, фази та INN
+    python exec_scripts/trace_summary.py 20261017_101500
+"""
+
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from project_core.calculation_parameters_config.machine_parameters import TRACE_LEVEL
+from project_core.utility_functions.run_manifest import get_run_dir
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+TRACE_LEVELS = ('off', 'market', 'step', 'inn', 'phase')
+
+TRACE_FOLDER = "trace"
+
+# Атрибути, що успадковуються вкладеними spans потоку
+INHERITED_ATTRS = ('client_id', 'step', 'inn_id')
+
+BYTES_PER_MB = 1024 ** 2
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+# =============================================================================
+# PROCESS STATE
+# =============================================================================
+
+# Trace процесу: {'run_id', 'pid', 'file'} (run_id None — trace вимкнено)
+_trace: Dict[str, Any] = {'run_id': None, 'pid': None, 'file': None}
+_trace_lock = threading.Lock()
+_span_ids = itertools.count(1)
+_local = threading.local()
+
+
+def get_trace_path(run_id: str, pid: Optional[int] = None) -> Path:
+    """
+    Отримати шлях до trace файлу процесу.
+
+    Args:
+        run_id: ID запуску
+        pid: PID процесу (None = поточний)
+
+    Returns:
+        Path: _runs/{RUN_ID}/trace/spans-{PID}.jsonl
+    """
+    return get_run_dir(run_id) / TRACE_FOLDER / f"spans-{pid or os.getpid()}.jsonl"
+
+
+def start_trace(run_id: Optional[str]) -> None:
+    """
+    Увімкнути trace процесу для запуску (файл відкривається при першому span).
+
+    Args:
+        run_id: ID запуску (None — вимкнути)
+    """
+    with _trace_lock:
+        if _trace['run_id'] == run_id and _trace['pid'] == os.getpid():
+            return
+        _close_file()
+        _trace['run_id'] = run_id if TRACE_LEVEL != 'off' else None
+        _trace['pid'] = os.getpid()
+
+
+def close_trace() -> None:
+    """Закрити trace файл процесу та вимкнути trace."""
+    with _trace_lock:
+        _close_file()
+        _trace['run_id'] = None
+
+
+def _close_file() -> None:
+    """Закрити відкритий trace файл (під _trace_lock)."""
+    if _trace['file'] is not None:
+        _trace['file'].close()
+        _trace['file'] = None
+
+
+def get_trace_run_id() -> Optional[str]:
+    """ID запуску, для якого увімкнено trace процесу (None — вимкнено)."""
+    return _trace['run_id']
+
+
+def call_traced(run_id: Optional[str], func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Виконати func з trace запуску (дочірні процеси inn_executor).
+
+    Args:
+        run_id: ID запуску процесу-батька (get_trace_run_id)
+        func: Функція (module-level)
+        *args, **kwargs: Аргументи func
+
+    Returns:
+        Результат func
+    """
+    start_trace(run_id)
+    return func(*args, **kwargs)
+
+
+# =============================================================================
+# MEASUREMENTS
+# =============================================================================
+
+def _io_bytes() -> Dict[str, int]:
+    """Прочитані / записані байти процесу (Linux /proc/self/io; порожньо на інших ОС)."""
+    values = {}
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in ('rchar', 'wchar'):
+                    values[key] = int(value)
+    except OSError:
+        pass
+    return values
+
+
+def _rss_mb() -> Optional[float]:
+    """Поточний RSS процесу (МБ; None якщо недоступний)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / BYTES_PER_MB
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Пік RSS процесу з моменту старту (МБ; ru_maxrss: КБ на Linux, байти на macOS)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / BYTES_PER_MB if os.uname().sysname == 'Darwin' else peak / 1024
+
+
+def _snapshot() -> Dict[str, Any]:
+    """Лічильники процесу на початку / в кінці span-а."""
+    return {
+        'wall': time.perf_counter(),
+        'cpu': time.process_time(),
+        'thread_cpu': time.thread_time(),
+        'peak': _peak_rss_mb(),
+        'io': _io_bytes()
+    }
+
+
+# =============================================================================
+# SPANS
+# =============================================================================
+
+def _stack() -> List[Dict[str, Any]]:
+    """Стек відкритих spans поточного потоку."""
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def is_traced(kind: str) -> bool:
+    """
+    Чи записуються spans цього рівня.
+
+    Args:
+        kind: 'market', 'step', 'inn' або 'phase'
+
+    Returns:
+        bool: True якщо trace процесу увімкнено і TRACE_LEVEL включає kind
+    """
+    return _trace['run_id'] is not None and TRACE_LEVELS.index(TRACE_LEVEL) >= TRACE_LEVELS.index(kind)
+
+
+def begin_span(kind: str, name: Optional[str] = None, **attrs: Any) -> Optional[Dict[str, Any]]:
+    """
+    Відкрити span (для коду, де context manager незручний).
+
+    Args:
+        kind: 'market', 'step', 'inn' або 'phase'
+        name: Назва span-а (None = kind)
+        **attrs: Атрибути (client_id, step, inn_id, ...)
+
+    Returns:
+        Dict: Відкритий span (None — рівень не записується)
+    """
+    if not is_traced(kind):
+        return None
+
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    inherited = {}
+    if parent is not None:
+        inherited = {key: parent['attrs'][key] for key in INHERITED_ATTRS if key in parent['attrs']}
+
+    span = {
+        'kind': kind,
+        'name': name or kind,
+        'span_id': f"{os.getpid()}-{next(_span_ids)}",
+        'parent_id': parent['span_id'] if parent is not None else None,
+        'attrs': {**inherited, **attrs},
+        'start': time.time(),
+        'begin': _snapshot()
+    }
+    stack.append(span)
+    return span
+
+
+def end_span(span: Optional[Dict[str, Any]], **attrs: Any) -> None:
+    """
+    Закрити span і записати його у trace файл процесу.
+
+    Args:
+        span: Span з begin_span (None — нічого не робити)
+        **attrs: Додаткові атрибути (rows_in, rows_out, status, ...)
+    """
+    if span is None:
+        return
+
+    # Разом зі span закриваються не закриті вкладені spans (виняток між begin / end)
+    stack = _stack()
+    if span in stack:
+        del stack[stack.index(span):]
+
+    begin, end = span['begin'], _snapshot()
+    record = {
+        'run_id': _trace['run_id'],
+        'pid': os.getpid(),
+        'span_id': span['span_id'],
+        'parent_id': span['parent_id'],
+        'kind': span['kind'],
+        'name': span['name'],
+        **span['attrs'],
+        **attrs,
+        'start': round(span['start'], 6),
+        'wall_sec': round(end['wall'] - begin['wall'], 6),
+        'cpu_sec': round(end['cpu'] - begin['cpu'], 6),
+        'thread_cpu_sec': round(end['thread_cpu'] - begin['thread_cpu'], 6),
+        'rss_mb': _rss_mb(),
+        'rss_peak_mb': end['peak'],
+        'rss_peak_delta_mb': end['peak'] - begin['peak'] if end['peak'] is not None else None,
+        'read_bytes': end['io'].get('rchar', 0) - begin['io'].get('rchar', 0) if end['io'] else None,
+        'write_bytes': end['io'].get('wchar', 0) - begin['io'].get('wchar', 0) if end['io'] else None
+    }
+    _write_record(record)
+
+
+def _write_record(record: Dict[str, Any]) -> None:
+    """Дописати span у trace файл процесу (рядок JSON, одразу на диск)."""
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+
+    with _trace_lock:
+        if _trace['run_id'] is None:
+            return
+        if _trace['file'] is None:
+            trace_path = get_trace_path(_trace['run_id'])
+            trace_path.parent.mkdir(parents=True, exist_ok=True)
+            _trace['file'] = open(trace_path, 'a', encoding='utf-8')
+        _trace['file'].write(line)
+        _trace['file'].flush()
+
+
+@contextmanager
+def trace_span(kind: str, name: Optional[str] = None, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Span як context manager.
+
+    Args:
+        kind: 'market', 'step', 'inn' або 'phase'
+        name: Назва span-а (None = kind)
+        **attrs: Атрибути (client_id, step, inn_id, ...)
+
+    Yields:
+        Dict: Лічильники span-а (rows_in, rows_out, ...), записуються в кінці
+    """
+    span = begin_span(kind, name, **attrs)
+    counters: Dict[str, Any] = {}
+    try:
+        yield counters
+    except BaseException as e:
+        counters['error'] = type(e).__name__
+        raise
+    finally:
+        end_span(span, **counters)
+
+
+# =============================================================================
+# SUMMARY
+# =============================================================================
+
+def load_trace(run_id: str) -> pd.DataFrame:
+    """
+    Завантажити spans запуску (усі процеси).
+
+    Args:
+        run_id: ID запуску
+
+    Returns:
+        pd.DataFrame: Span на рядок
+
+    Raises:
+        FileNotFoundError: Якщо trace запуску не знайдено
+    """
+    trace_files = sorted((get_run_dir(run_id) / TRACE_FOLDER).glob("spans-*.jsonl"))
+    records = []
+    for trace_file in trace_files:
+        with open(trace_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        continue  # Рядок, обірваний kill-ом worker-а
+
+    if not records:
+        raise FileNotFoundError(f"Trace запуску не знайдено: {get_run_dir(run_id) / TRACE_FOLDER}")
+
+    return pd.DataFrame.from_records(records)
+
+
+def summarize_trace(df_spans: pd.DataFrame, top: int = 10) -> Dict[str, pd.DataFrame]:
+    """
+    Підсумок trace: частка кроків, найповільніші фази, INN та ринки.
+
+    Args:
+        df_spans: Spans (load_trace)
+        top: Кількість найповільніших INN / ринків
+
+    Returns:
+        Dict[str, pd.DataFrame]: steps, phases, inns, markets (порожні, якщо
+        таких spans немає)
+    """
+    df_spans = df_spans.copy()
+    for column in ('client_id', 'step', 'inn_id', 'rows_in', 'rows_out', 'read_bytes', 'write_bytes'):
+        if column not in df_spans.columns:
+            df_spans[column] = pd.NA
+    for column in ('client_id', 'step', 'inn_id', 'rows_in', 'rows_out'):
+        df_spans[column] = pd.to_numeric(df_spans[column], errors='coerce').astype('Int64')
+
+    summary = {}
+
+    steps = df_spans[df_spans['kind'] == 'step']
+    df_steps = steps.groupby('step').agg(
+        spans=('span_id', 'count'),
+        wall_sec=('wall_sec', 'sum'),
+        cpu_sec=('cpu_sec', 'sum'),
+        rss_peak_mb=('rss_peak_mb', 'max'),
+        read_mb=('read_bytes', lambda s: s.sum() / BYTES_PER_MB),
+        write_mb=('write_bytes', lambda s: s.sum() / BYTES_PER_MB)
+    ).reset_index()
+    total_wall = df_steps['wall_sec'].sum()
+    df_steps.insert(3, 'wall_share_pct', df_steps['wall_sec'] / total_wall * 100 if total_wall > 0 else 0.0)
+    summary['steps'] = df_steps
+
+    phases = df_spans[df_spans['kind'] == 'phase']
+    summary['phases'] = phases.groupby(['step', 'name']).agg(
+        spans=('span_id', 'count'),
+        wall_sec=('wall_sec', 'sum'),
+        thread_cpu_sec=('thread_cpu_sec', 'sum')
+    ).reset_index().sort_values('wall_sec', ascending=False)
+
+    inns = df_spans[df_spans['kind'] == 'inn']
+    inn_columns = ['client_id', 'step', 'inn_id', 'wall_sec', 'thread_cpu_sec', 'rows_in', 'rows_out']
+    if 'cache_hit' in inns.columns:
+        inn_columns.append('cache_hit')
+    summary['inns'] = inns.sort_values('wall_sec', ascending=False)[inn_columns].head(top)
+
+    markets = df_spans[df_spans['kind'] == 'market']
+    summary['markets'] = markets.groupby('client_id').agg(
+        tasks=('span_id', 'count'),
+        wall_sec=('wall_sec', 'sum'),
+        rss_peak_mb=('rss_peak_mb', 'max')
+    ).reset_index().sort_values('wall_sec', ascending=False).head(top)
+
+    return summary
+
+
+def print_trace_summary(run_id: str, summary: Dict[str, pd.DataFrame]) -> None:
+    """
+    Вивести підсумок trace (summarize_trace).
+
+    Args:
+        run_id: ID запуску
+        summary: Результат summarize_trace()
+    """
+    titles = {
+        'steps': "STEPS (частка wall time кроків)",
+        'phases': "INN PHASES (сума по INN)",
+        'inns': "SLOWEST INNs",
+        'markets': "SLOWEST MARKETS (сума задач ринку)"
+    }
+
+    print("=" * 70)
+    print(f"  TRACE SUMMARY — run {run_id}")
+    print("=" * 70)
+    for key, title in titles.items():
+        df = summary[key]
+        print(f"\n  {title}")
+        if df.empty:
+            print("    (немає spans цього рівня)")
+            continue
+        text = df.to_string(index=False, float_format=lambda v: f"{v:.2f}")
+        for line in text.splitlines():
+            print(f"    {line}")
+    print("=" * 70)
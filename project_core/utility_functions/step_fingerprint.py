@@ -0,0 +1,453 @@
+# =============================================================================
+# STEP FINGERPRINT - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/step_fingerprint.py
+# Дата: 2026-10-17
+# Опис: Fingerprints входів per-market кроків для інкрементального запуску
+# =============================================================================
+
+"""
+Fingerprints входів per-market кроків (Steps 1-5).
+
+Fingerprint кроку — sha256 від:
+    - fingerprint попереднього кроку (для Step 1 — sha256 raw файлу
+      Rd2_{CLIENT_ID}.csv), тому зміна входу інвалідує всі наступні кроки
+    - значень конфігурації, які читає крок (STEP_CONFIG: константи
+      stockout_params / classification_thresholds / nfc_compatibility /
+      column_mapping), та source функцій цих config модулів
+    - версії коду: source скрипта кроку та спільних обчислювальних
+      модулів (COMPUTE_MODULES) + FINGERPRINT_VERSION
+
+Зміна порогу в stockout_params не змінює версію коду (config модулі
+враховуються тільки через значення), тому перераховуються лише кроки,
+які цей поріг читають, та кроки після них.
+
+Записані fingerprints ринку:
+    01_per_market/{CLIENT_ID}/_fingerprints.json
+    {
+        "raw_file": {"size": ..., "mtime_ns": ..., "sha256": ...},
+        "steps": {"1": {"fingerprint": ..., "recorded_at": ...}, ...}
+    }
+
+sha256 raw файлу перераховується тільки якщо змінились size або mtime.
+Fingerprint записується після того, як крок завершився і його артефакти
+записані (parallel_runner, після flush barrier); перед виконанням крок
+інвалідується, тому перерваний крок не буде пропущено.
+
+Використання:
+    from project_core.utility_functions.step_fingerprint import (
+        compute_step_fingerprints,
+        is_step_current,
+        record_step_fingerprints
+    )
+
+    fingerprints = compute_step_fingerprints(client_id)
+    if not is_step_current(client_id, 3, fingerprints[3]):
+        step3.process_market_did(client_id)
+        record_step_fingerprints(client_id, {3: fingerprints[3]})
+"""
+
+import hashlib
+import importlib
+import inspect
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from project_core.data_config.paths_config import (
+    RESULTS_PATH,
+    get_market_folder,
+    get_market_paths,
+    get_market_raw_file
+)
+from project_core.utility_functions.artifact_writer import atomic_write
+from project_core.utility_functions.market_store import store_exists
+
+
+# =============================================================================
+# CONSTANTS
+# =============================================================================
+
+# Збільшувати при зміні формату fingerprint (інвалідує всі записані)
+FINGERPRINT_VERSION = 1
+
+FINGERPRINT_FILE_NAME = "_fingerprints.json"
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+_STEP_SCRIPTS_DIR = _PROJECT_ROOT / "exec_scripts" / "01_did_processing"
+
+# Скрипти per-market кроків
+STEP_SCRIPTS: Dict[int, str] = {
+    1: "02_01_data_aggregation.py",
+    2: "02_02_stockout_detection.py",
+    3: "02_03_did_analysis.py",
+    4: "02_04_substitute_analysis.py",
+    5: "02_05_reports_cross_market.py"
+}
+
+# Конфігурація, яку читає кожен крок: {модуль: [константи]}
+STEP_CONFIG: Dict[int, Dict[str, List[str]]] = {
+    1: {
+        'project_core.did_config.stockout_params': [
+            'MIN_NOTSOLD_PERCENT', 'MAX_NOTSOLD_PERCENT'
+        ],
+        'project_core.data_config.column_mapping': [
+            'COLUMN_RENAME_MAP', 'NUMERIC_COLUMNS', 'CATEGORICAL_COLUMNS'
+        ],
+        'project_core.data_config.paths_config': ['CSV_SEPARATOR']
+    },
+    2: {
+        'project_core.did_config.stockout_params': [
+            'MIN_STOCKOUT_WEEKS', 'MIN_PRE_PERIOD_WEEKS'
+        ]
+    },
+    3: {
+        'project_core.did_config.stockout_params': [
+            'MIN_POST_PERIOD_WEEKS', 'MAX_POST_GAP_WEEKS',
+            'MIN_MARKET_PRE', 'MIN_TOTAL_FOR_SHARE'
+        ],
+        'project_core.did_config.classification_thresholds': [
+            'CRITICAL_THRESHOLD', 'SUBSTITUTABLE_THRESHOLD'
+        ],
+        'project_core.did_config.nfc_compatibility': [
+            'ORAL_GROUP', 'EXCLUDE_FORMS', 'ALL_NFC1_CATEGORIES'
+        ]
+    },
+    4: {},
+    5: {}
+}
+
+# Спільні модулі, від яких залежать результати всіх кроків
+COMPUTE_MODULES: List[str] = [
+    'project_core/utility_functions/etl_utils.py',
+    'project_core/utility_functions/raw_ingest.py',
+    'project_core/utility_functions/did_utils.py',
+    'project_core/utility_functions/market_store.py',
+    'project_core/utility_functions/inn_tensor.py',
+    'project_core/utility_functions/market_context.py'
+]
+
+# Буфер читання raw файлу для sha256
+_HASH_CHUNK_SIZE = 1 << 20
+
+# Кеш версій коду та кроків (source і конфігурація не змінюються під час запуску)
+_code_versions: Dict[int, str] = {}
+_code_versions_lock = threading.Lock()
+_step_versions: Dict[int, str] = {}
+
+
+# =============================================================================
+# HASHING
+# =============================================================================
+
+def _to_jsonable(value: Any) -> Any:
+    """Привести значення конфігурації до JSON-сумісного вигляду."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = sorted(value, key=str) if isinstance(value, (set, frozenset)) else value
+        return [_to_jsonable(v) for v in items]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _sha256_json(payload: Any) -> str:
+    """sha256 від канонічного JSON."""
+    text = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def hash_file(file_path: Path) -> str:
+    """
+    Порахувати sha256 файлу потоково.
+
+    Args:
+        file_path: Шлях до файлу
+
+    Returns:
+        str: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_step_config(step: int) -> Dict[str, Any]:
+    """
+    Зібрати значення конфігурації кроку.
+
+    Для кожного config модуля кроку береться значення перелічених
+    констант та source функцій модуля (логіка порогів/сумісності).
+
+    Args:
+        step: Номер кроку (1-5)
+
+    Returns:
+        Dict: {модуль: {константа: значення, '__functions__': sha256}}
+    """
+    config = {}
+
+    for module_name, names in STEP_CONFIG[step].items():
+        module = importlib.import_module(module_name)
+        values = {name: _to_jsonable(getattr(module, name)) for name in names}
+
+        functions = [
+            inspect.getsource(obj)
+            for _, obj in sorted(inspect.getmembers(module, inspect.isfunction))
+            if obj.__module__ == module.__name__
+        ]
+        values['__functions__'] = hashlib.sha256('\n'.join(functions).encode('utf-8')).hexdigest()
+
+        config[module_name] = values
+
+    return config
+
+
+def get_code_version(step: int) -> str:
+    """
+    Версія коду кроку: sha256 від source скрипта та COMPUTE_MODULES.
+
+    Args:
+        step: Номер кроку (1-5)
+
+    Returns:
+        str: hex digest
+    """
+    with _code_versions_lock:
+        version = _code_versions.get(step)
+        if version is None:
+            digest = hashlib.sha256(f"v{FINGERPRINT_VERSION}".encode('utf-8'))
+            files = [_STEP_SCRIPTS_DIR / STEP_SCRIPTS[step]] + [_PROJECT_ROOT / m for m in COMPUTE_MODULES]
+            for file_path in files:
+                digest.update(file_path.name.encode('utf-8'))
+                digest.update(file_path.read_bytes())
+            version = digest.hexdigest()
+            _code_versions[step] = version
+
+    return version
+
+
+def get_step_version(step: int) -> str:
+    """
+    Версія кроку: sha256 від конфігурації кроку та версії коду (без upstream).
+
+    Використовується як частина fingerprint ринку та ключів per-INN кешу
+    (inn_cache).
+
+    Args:
+        step: Номер кроку (1-5)
+
+    Returns:
+        str: hex digest
+    """
+    version = _step_versions.get(step)
+    if version is None:
+        version = _sha256_json({'config': get_step_config(step), 'code': get_code_version(step)})
+        _step_versions[step] = version
+
+    return version
+
+
+# =============================================================================
+# RECORDS
+# =============================================================================
+
+def get_fingerprint_path(client_id: int) -> Path:
+    """
+    Отримати шлях до файлу fingerprints ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Path: 01_per_market/{CLIENT_ID}/_fingerprints.json
+    """
+    return get_market_folder(client_id) / FINGERPRINT_FILE_NAME
+
+
+def load_fingerprints(client_id: int) -> Dict[str, Any]:
+    """
+    Завантажити записані fingerprints ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Dict: {'raw_file': {...}, 'steps': {...}} (порожній якщо файлу
+              немає або він пошкоджений)
+    """
+    file_path = get_fingerprint_path(client_id)
+    empty = {'raw_file': {}, 'steps': {}}
+
+    if not file_path.exists():
+        return empty
+
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return empty
+
+    if not isinstance(data, dict):
+        return empty
+
+    data.setdefault('raw_file', {})
+    data.setdefault('steps', {})
+    return data
+
+
+def _save_fingerprints(client_id: int, data: Dict[str, Any]) -> Path:
+    """Записати fingerprints ринку атомарно (синхронно, без writer)."""
+    file_path = get_fingerprint_path(client_id)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def write_json(tmp_path: Path) -> None:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+
+    return atomic_write(file_path, write_json)
+
+
+def get_raw_file_hash(client_id: int) -> str:
+    """
+    sha256 raw файлу ринку (з кешем за size + mtime у файлі fingerprints).
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        str: hex digest
+
+    Raises:
+        FileNotFoundError: Якщо raw файл не знайдено
+    """
+    raw_file = get_market_raw_file(client_id)
+    if not raw_file.exists():
+        raise FileNotFoundError(f"Raw файл не знайдено: {raw_file}")
+
+    stat = raw_file.stat()
+    data = load_fingerprints(client_id)
+    cached = data['raw_file']
+
+    if cached.get('size') == stat.st_size and cached.get('mtime_ns') == stat.st_mtime_ns and cached.get('sha256'):
+        return cached['sha256']
+
+    sha256 = hash_file(raw_file)
+    data['raw_file'] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    _save_fingerprints(client_id, data)
+
+    return sha256
+
+
+# =============================================================================
+# FINGERPRINTS
+# =============================================================================
+
+def compute_step_fingerprints(client_id: int) -> Dict[int, str]:
+    """
+    Порахувати fingerprints входів усіх кроків ринку (ланцюжком 1 → 5).
+
+    Args:
+        client_id: ID цільової аптеки
+
+    Returns:
+        Dict[int, str]: {крок: fingerprint}
+
+    Raises:
+        FileNotFoundError: Якщо raw файл не знайдено
+    """
+    fingerprints = {}
+    upstream = get_raw_file_hash(client_id)
+
+    for step in sorted(STEP_SCRIPTS):
+        upstream = _sha256_json({'upstream': upstream, 'step': get_step_version(step)})
+        fingerprints[step] = upstream
+
+    return fingerprints
+
+
+def step_outputs_exist(client_id: int, step: int) -> bool:
+    """
+    Перевірити чи існують виходи кроку на диску.
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку (1-5)
+
+    Returns:
+        bool: True якщо вихідна папка кроку існує
+    """
+    paths = get_market_paths(client_id)
+
+    if step == 1:
+        return store_exists(client_id)
+    if step == 2:
+        return paths['stockout'].exists()
+    if step == 3:
+        return paths['did_analysis'].exists()
+    if step == 4:
+        return paths['substitute_shares'].exists()
+    return (RESULTS_PATH / 'data_reports' / f'reports_{client_id}').exists()
+
+
+def is_step_current(client_id: int, step: int, fingerprint: str) -> bool:
+    """
+    Перевірити чи можна пропустити крок (входи не змінились).
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку (1-5)
+        fingerprint: Поточний fingerprint кроку
+
+    Returns:
+        bool: True якщо записаний fingerprint збігається і виходи існують
+    """
+    record = load_fingerprints(client_id)['steps'].get(str(step))
+    if not record or record.get('fingerprint') != fingerprint:
+        return False
+    return step_outputs_exist(client_id, step)
+
+
+def invalidate_step(client_id: int, step: int) -> None:
+    """
+    Видалити записаний fingerprint кроку (перед його виконанням).
+
+    Args:
+        client_id: ID цільової аптеки
+        step: Номер кроку (1-5)
+    """
+    data = load_fingerprints(client_id)
+    if data['steps'].pop(str(step), None) is not None:
+        _save_fingerprints(client_id, data)
+
+
+def record_step_fingerprints(client_id: int, fingerprints: Dict[int, str]) -> Optional[Path]:
+    """
+    Записати fingerprints кроків, що успішно завершились.
+
+    Args:
+        client_id: ID цільової аптеки
+        fingerprints: {крок: fingerprint}
+
+    Returns:
+        Path: Шлях до файлу fingerprints (None якщо нічого записувати)
+    """
+    if not fingerprints:
+        return None
+
+    data = load_fingerprints(client_id)
+    recorded_at = datetime.now().isoformat(timespec='seconds')
+
+    for step, fingerprint in fingerprints.items():
+        data['steps'][str(step)] = {'fingerprint': fingerprint, 'recorded_at': recorded_at}
+
+    return _save_fingerprints(client_id, data)
@@ -0,0 +1,450 @@
+# =============================================================================
+# SYNTHETIC MARKETS - cross_pharm_market_analysis
+# =============================================================================
+# Файл: project_core/utility_functions/synthetic_markets.py
+# Дата: 2026-10-17
+# Опис: Генератор синтетичних raw файлів Rd2_{CLIENT_ID}.csv (seeded)
+# =============================================================================
+
+"""
+Генератор синтетичних ринків у форматі raw файлів Rd2_{CLIENT_ID}.csv.
+
+Репозиторій не містить data/raw, тому пайплайн не можна відтворити чи
+навантажити більшим обсягом. Генератор пише файли з колонками
+RAW_REQUIRED_COLUMNS (роздільник CSV_SEPARATOR, Q / V з десятковою
+комою), за профілем, близьким до поточних 10 ринків:
+    - 4-12 конкурентів, 20 INN, 15-45 SKU на INN, 156 тижнів
+    - продаж (аптека, препарат) у тижні з імовірністю пари, вікно
+      присутності препарату (вихід на ринок / вибуття)
+    - stock-out вікна цільової аптеки: продажів немає, Q інших SKU тієї ж
+      INN у цільовій аптеці та Q конкурентів ростуть (substitution_lift,
+      competitor_lift)
+    - NFC1 / NFC2 за сумішшю nfc1_mix (категорії nfc_compatibility)
+
+Детермінізм: каталог препаратів — з seed, ринок i — з (seed, i), тому
+ринок не залежить від кількості ринків та порядку генерації (10× набір
+містить 1× набір як перші 10 ринків).
+
+Використання:
+    from project_core.utility_functions.synthetic_markets import (
+        generate_market,
+        generate_markets
+    )
+
+    # 100 ринків (10× поточного набору) у data/raw:
+    generate_markets(100, seed=42)
+
+    # Великі ринки для тесту пам'яті:
+    generate_markets(10, output_dir=Path('/tmp/raw'), profile={'competitors': (30, 40)})
+
+    # CLI:
+    python exec_scripts/generate_synthetic_data.py --scale 10
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from project_core.data_config.column_mapping import RAW_REQUIRED_COLUMNS
+from project_core.data_config.paths_config import (
+    CSV_SEPARATOR,
+    RAW_DATA_PATH,
+    RAW_FILE_PATTERN
+)
+
+
+# =============================================================================
+# PROFILE
+# =============================================================================
+
+DEFAULT_SEED = 42
+
+# Кількість ринків поточного набору (scale=1)
+BASE_MARKETS = 10
+
+# CLIENT_ID синтетичних ринків: FIRST_CLIENT_ID + індекс ринку;
+# ORG_ID конкурентів — з діапазону нижче (не перетинається з CLIENT_ID)
+FIRST_CLIENT_ID = 900001
+COMPETITOR_ID_RANGE = (10000, 900000)
+DRUGS_ID_RANGE = (1000, 1000000)
+
+# Профіль за замовчуванням (калібрований по markets_statistics поточних ринків:
+# 40-130 тис. записів, ~500 препаратів, 850-3900 stock-out подій на ринок)
+DEFAULT_PROFILE: Dict[str, Any] = {
+    'competitors': (4, 12),              # Кількість конкурентів ринку (min, max)
+    'inn_count': 20,                     # INN груп у каталозі
+    'skus_per_inn': (15, 45),            # Препаратів на INN (min, max)
+    'weeks': 156,                        # Тижнів даних
+    'start_date': '2023-01-02',          # Понеділок першого тижня
+    'market_drug_share': 0.8,            # Частка каталогу, присутня на ринку
+    'pharmacy_drug_presence': 0.3,       # Імовірність, що аптека продає препарат ринку
+    'weekly_sale_prob': (0.45, 0.9),     # Імовірність продажу пари у тижні (min, max)
+    'mean_q': 2.0,                       # Медіана середнього Q пари
+    'q_sigma': 0.8,                      # Розкид середнього Q між парами (lognormal)
+    'stockouts_per_year': 1.0,           # Stock-out вікон на препарат цільової аптеки за рік
+    'stockout_weeks': (1, 8),            # Тривалість stock-out вікна (min, max)
+    'substitution_lift': 0.5,            # Ріст Q субститутів цільової аптеки у вікні
+    'competitor_lift': 0.3,              # Ріст Q препарату у конкурентів у вікні
+    'nfc1_mix': {                        # Частки форм випуску NFC1 у каталозі
+        "Пероральные твердые обычные": 0.45,
+        "Пероральные твердые длительно действующие": 0.10,
+        "Пероральные жидкие обычные": 0.10,
+        "Местно действующие, дерматологические, антигеморроидальные, наружные": 0.14,
+        "Парентеральные обычные": 0.10,
+        "Офтальмологические": 0.04,
+        "Ректальные системные": 0.03,
+        "Прочие системные": 0.03,
+        "Не предназначенные для использования у человека и прочие": 0.01
+    },
+    'decimal': ','                       # Десятковий роздільник Q / V
+}
+
+# Форми NFC2 для кожної NFC1 (NFC2 препарату обирається з них)
+NFC2_BY_NFC1: Dict[str, Tuple[str, ...]] = {
+    "Пероральные твердые обычные": ("Таблетки", "Таблетки, покрытые оболочкой", "Капсулы"),
+    "Пероральные твердые длительно действующие": ("Таблетки, покрытые оболочкой", "Капсулы"),
+    "Пероральные жидкие обычные": ("Жидкости", "Порошки/гранулы"),
+    "Местно действующие, дерматологические, антигеморроидальные, наружные": ("Гели и золи", "Кремы", "Мази"),
+    "Парентеральные обычные": ("Ампулы", "Флаконы", "Картриджи/шприц-ручки", "Инфузии"),
+    "Офтальмологические": ("Жидкости",),
+    "Ректальные системные": ("Суппозитории",),
+    "Прочие системные": ("Прочие специальные формы", "Аэрозоли под давлением"),
+    "Не предназначенные для использования у человека и прочие": ("Лечебные повязки",),
+    "Для введения в легкие": ("Аэрозоли под давлением",)
+}
+
+# Назви INN каталогу (далі — з числовим суфіксом)
+INN_NAMES: Tuple[str, ...] = (
+    "ДИКЛОФЕНАК", "ИБУПРОФЕН", "ПРЕГАБАЛИН", "ЛОРАТАДИН", "ДЕЗЛОРАТАДИН",
+    "ДРОТАВЕРИН", "АЦИКЛОВИР", "НАПРОКСЕН", "МЕСАЛАЗИН", "ТРОКСЕРУТИН",
+    "ГЕПАРИН НАТРИЙ", "НАФТИФИН", "ТОБРАМИЦИН", "АРГИНИН", "ЛЕРКАНИДИПИН",
+    "РЕБАМИПИД", "БИЛАСТИН", "ЭДОКСАБАН", "ИНСУЛИН ГЛУЛИЗИН", "ИПРАТРОПИЯ БРОМИД+ФЕНОТЕРОЛ"
+)
+
+# Потік seed каталогу (ринки — потоки 0..N-1)
+_CATALOG_STREAM = 2 ** 31
+
+# Форма розподілу тижневого Q навколо середнього пари (gamma)
+_Q_SHAPE = 1.5
+
+
+def resolve_profile(profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Профіль генерації: DEFAULT_PROFILE з перевизначеннями.
+
+    Args:
+        profile: Перевизначення параметрів (None = за замовчуванням)
+
+    Returns:
+        Dict: Повний профіль
+
+    Raises:
+        ValueError: Невідомий параметр, невідома форма NFC1 або некоректний діапазон
+    """
+    profile = {**DEFAULT_PROFILE, **(profile or {})}
+
+    unknown = set(profile) - set(DEFAULT_PROFILE)
+    if unknown:
+        raise ValueError(f"Невідомі параметри профілю: {sorted(unknown)}")
+
+    unknown_forms = set(profile['nfc1_mix']) - set(NFC2_BY_NFC1)
+    if unknown_forms:
+        raise ValueError(f"Невідомі форми NFC1 у nfc1_mix: {sorted(unknown_forms)}")
+
+    for key in ('competitors', 'skus_per_inn', 'weekly_sale_prob', 'stockout_weeks'):
+        low, high = profile[key]
+        if low > high or low < 0:
+            raise ValueError(f"Некоректний діапазон {key}: {profile[key]}")
+
+    if profile['decimal'] not in (',', '.'):
+        raise ValueError(f"decimal має бути ',' або '.', отримано: {profile['decimal']!r}")
+
+    return profile
+
+
+# =============================================================================
+# CATALOG
+# =============================================================================
+
+def build_catalog(profile: Optional[Dict[str, Any]] = None, seed: int = DEFAULT_SEED) -> pd.DataFrame:
+    """
+    Каталог препаратів (спільний для всіх ринків — препарати перетинаються між ринками).
+
+    Args:
+        profile: Профіль генерації (None = DEFAULT_PROFILE)
+        seed: Seed генерації
+
+    Returns:
+        pd.DataFrame: DRUGS_ID, INN_ID, INN, Full medication name,
+                      NFC Code (1), NFC Code (2), PRICE (ціна упаковки)
+    """
+    profile = resolve_profile(profile)
+    return _build_catalog(
+        seed, profile['inn_count'], tuple(profile['skus_per_inn']),
+        tuple(profile['nfc1_mix'].items())
+    ).copy()
+
+
+@lru_cache(maxsize=8)
+def _build_catalog(
+    seed: int,
+    inn_count: int,
+    skus_per_inn: Tuple[int, int],
+    nfc1_mix: Tuple[Tuple[str, float], ...]
+) -> pd.DataFrame:
+    """Каталог за hashable параметрами (кешується на процес)."""
+    rng = np.random.default_rng([seed, _CATALOG_STREAM])
+
+    forms = [form for form, _ in nfc1_mix]
+    weights = np.array([weight for _, weight in nfc1_mix], dtype=float)
+    weights /= weights.sum()
+
+    inn_ids = rng.choice(np.arange(100, 100000), size=inn_count, replace=False)
+    sku_counts = rng.integers(skus_per_inn[0], skus_per_inn[1] + 1, size=inn_count)
+    n_drugs = int(sku_counts.sum())
+    drug_ids = np.sort(rng.choice(np.arange(*DRUGS_ID_RANGE), size=n_drugs, replace=False))
+
+    rows = []
+    drug_index = 0
+    for i, (inn_id, n_skus) in enumerate(zip(inn_ids, sku_counts)):
+        inn_name = INN_NAMES[i % len(INN_NAMES)]
+        if i >= len(INN_NAMES):
+            inn_name = f"{inn_name} {i // len(INN_NAMES) + 1}"
+
+        for sku in range(n_skus):
+            nfc1 = forms[rng.choice(len(forms), p=weights)]
+            nfc2 = NFC2_BY_NFC1[nfc1][rng.integers(len(NFC2_BY_NFC1[nfc1]))]
+            dose = int(rng.choice([5, 10, 20, 25, 50, 75, 100, 150, 200, 400]))
+            pack = int(rng.choice([10, 14, 20, 28, 30, 50, 60, 100]))
+            rows.append({
+                'DRUGS_ID': int(drug_ids[drug_index]),
+                'INN_ID': int(inn_id),
+                'INN': inn_name,
+                'Full medication name': (
+                    f"{inn_name}-СИНТ {sku + 1}, Synthetic Pharma {sku % 7 + 1} (Украина), "
+                    f"{nfc2.lower()} {dose} мг, #{pack}"
+                ),
+                'NFC Code (1)': nfc1,
+                'NFC Code (2)': nfc2,
+                'PRICE': round(float(rng.lognormal(np.log(150), 0.7)), 2)
+            })
+            drug_index += 1
+
+    return pd.DataFrame(rows)
+
+
+# =============================================================================
+# MARKET GENERATION
+# =============================================================================
+
+def _period_ids(start_date: str, days: np.ndarray) -> np.ndarray:
+    """Дні від start_date → PERIOD_ID (YYYY + номер дня від 1 січня, 5 цифр; parse_period_id)."""
+    dates = np.datetime64(start_date, 'D') + days
+    years = dates.astype('datetime64[Y]')
+    day_of_year = (dates - years.astype('datetime64[D]')).astype(np.int64)
+    return (years.astype(np.int64) + 1970) * 100000 + day_of_year
+
+
+def generate_market(
+    client_id: int,
+    market_index: int,
+    profile: Optional[Dict[str, Any]] = None,
+    seed: int = DEFAULT_SEED
+) -> pd.DataFrame:
+    """
+    Згенерувати raw дані одного ринку.
+
+    Args:
+        client_id: ID цільової аптеки
+        market_index: Індекс ринку (потік seed: ринок однаковий для будь-якої
+                      кількості ринків)
+        profile: Профіль генерації (None = DEFAULT_PROFILE)
+        seed: Seed генерації
+
+    Returns:
+        pd.DataFrame: Рядок на продаж (аптека, препарат, тиждень), колонки
+                      RAW_REQUIRED_COLUMNS (Q / V — float)
+    """
+    profile = resolve_profile(profile)
+    catalog = build_catalog(profile, seed)
+    rng = np.random.default_rng([seed, market_index])
+    weeks = profile['weeks']
+
+    # Аптеки ринку: цільова (рядок 0) + конкуренти
+    n_competitors = int(rng.integers(profile['competitors'][0], profile['competitors'][1] + 1))
+    competitors = rng.choice(np.arange(*COMPETITOR_ID_RANGE), size=n_competitors, replace=False)
+    pharm_ids = np.concatenate([[client_id], competitors]).astype(np.int64)
+
+    # Препарати ринку та пари (аптека, препарат)
+    drugs = catalog[rng.random(len(catalog)) < profile['market_drug_share']].reset_index(drop=True)
+    present = rng.random((len(pharm_ids), len(drugs))) < profile['pharmacy_drug_presence']
+    pair_pharm, pair_drug = np.nonzero(present)
+    n_pairs = len(pair_pharm)
+
+    # Тижні продажів пари: вікно присутності × імовірність продажу
+    quarter = weeks // 4 + 1
+    first_week = rng.integers(0, quarter, size=n_pairs)
+    last_week = weeks - rng.integers(0, quarter, size=n_pairs)
+    week_idx = np.arange(weeks)
+    sale_prob = rng.uniform(*profile['weekly_sale_prob'], size=n_pairs)
+    sold = (
+        (week_idx >= first_week[:, None])
+        & (week_idx < last_week[:, None])
+        & (rng.random((n_pairs, weeks)) < sale_prob[:, None])
+    )
+
+    mean_q = rng.lognormal(np.log(profile['mean_q']), profile['q_sigma'], size=n_pairs)
+    q = rng.gamma(_Q_SHAPE, 1.0, size=(n_pairs, weeks)) * (mean_q / _Q_SHAPE)[:, None]
+
+    # Stock-out вікна цільової аптеки та перетік попиту
+    pair_inn = drugs['INN_ID'].to_numpy()[pair_drug]
+    target_pairs = np.flatnonzero(pair_pharm == 0)
+    n_windows = rng.poisson(profile['stockouts_per_year'] * weeks / 52, size=len(target_pairs))
+    low_weeks, high_weeks = profile['stockout_weeks']
+
+    for pair, n in zip(target_pairs, n_windows):
+        substitutes = target_pairs[(pair_inn[target_pairs] == pair_inn[pair]) & (target_pairs != pair)]
+        competitor_pairs = np.flatnonzero((pair_drug == pair_drug[pair]) & (pair_pharm != 0))
+        for _ in range(n):
+            length = int(rng.integers(low_weeks, high_weeks + 1))
+            latest_start = last_week[pair] - length
+            if latest_start <= first_week[pair]:
+                continue
+            start = int(rng.integers(first_week[pair], latest_start))
+            window = slice(start, start + length)
+            sold[pair, window] = False
+            q[substitutes, window] *= 1 + profile['substitution_lift']
+            q[competitor_pairs, window] *= 1 + profile['competitor_lift']
+
+    # Рядки продажів (впорядковані: аптека, препарат, тиждень)
+    rows, row_weeks = np.nonzero(sold)
+    row_drugs = pair_drug[rows]
+    q_rows = np.maximum(np.round(q[rows, row_weeks], 2), 0.01)
+    price = drugs['PRICE'].to_numpy()[row_drugs]
+    v_rows = np.round(q_rows * price * rng.uniform(0.9, 1.1, size=len(rows)), 2)
+    days = row_weeks * 7 + rng.integers(0, 7, size=len(rows))
+
+    df = pd.DataFrame({
+        'CLIENT_ID': np.int64(client_id),
+        'ORG_ID': pharm_ids[pair_pharm[rows]],
+        'PERIOD_ID': _period_ids(profile['start_date'], days),
+        'DRUGS_ID': drugs['DRUGS_ID'].to_numpy()[row_drugs],
+        'INN_ID': drugs['INN_ID'].to_numpy()[row_drugs],
+        'INN': drugs['INN'].to_numpy()[row_drugs],
+        'Q': q_rows,
+        'V': v_rows,
+        'Full medication name': drugs['Full medication name'].to_numpy()[row_drugs],
+        'NFC Code (1)': drugs['NFC Code (1)'].to_numpy()[row_drugs],
+        'NFC Code (2)': drugs['NFC Code (2)'].to_numpy()[row_drugs]
+    })
+    return df[RAW_REQUIRED_COLUMNS]
+
+
+def write_market(df: pd.DataFrame, file_path: Path, decimal: str = ',') -> int:
+    """
+    Записати raw файл ринку (формат Rd2: CSV_SEPARATOR, Q / V з 2 знаками).
+
+    Args:
+        df: Дані ринку (generate_market)
+        file_path: Шлях до Rd2_{CLIENT_ID}.csv
+        decimal: Десятковий роздільник Q / V
+
+    Returns:
+        int: Розмір файлу в байтах
+    """
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(file_path, sep=CSV_SEPARATOR, index=False, decimal=decimal, float_format='%.2f')
+    return file_path.stat().st_size
+
+
+def _generate_and_write(
+    client_id: int,
+    market_index: int,
+    output_dir: Path,
+    profile: Dict[str, Any],
+    seed: int
+) -> Dict[str, Any]:
+    """Згенерувати та записати один ринок (задача процесу generate_markets)."""
+    df = generate_market(client_id, market_index, profile, seed)
+    file_path = output_dir / f"Rd2_{client_id}.csv"
+    size = write_market(df, file_path, profile['decimal'])
+    return {
+        'CLIENT_ID': client_id,
+        'FILE_NAME': file_path.name,
+        'COMPETITORS_COUNT': int(df['ORG_ID'].nunique()) - 1,
+        'DRUGS_COUNT': int(df['DRUGS_ID'].nunique()),
+        'INN_COUNT': int(df['INN_ID'].nunique()),
+        'RECORDS_COUNT': len(df),
+        'SIZE_MB': round(size / 1024 ** 2, 2)
+    }
+
+
+def generate_markets(
+    n_markets: int = BASE_MARKETS,
+    output_dir: Optional[Path] = None,
+    profile: Optional[Dict[str, Any]] = None,
+    seed: int = DEFAULT_SEED,
+    first_client_id: int = FIRST_CLIENT_ID,
+    max_workers: Optional[int] = None,
+    overwrite: bool = False
+) -> pd.DataFrame:
+    """
+    Згенерувати набір синтетичних ринків (паралельно по ринках).
+
+    Args:
+        n_markets: Кількість ринків (10 = поточний набір, 100 = 10×, 1000 = 100×)
+        output_dir: Папка raw файлів (None = RAW_DATA_PATH)
+        profile: Перевизначення профілю (None = DEFAULT_PROFILE)
+        seed: Seed генерації
+        first_client_id: CLIENT_ID першого ринку (далі — послідовно)
+        max_workers: Кількість процесів (None = OPTIMAL_WORKERS, 1 = послідовно)
+        overwrite: Дозволити запис у папку з іншими Rd2_*.csv
+
+    Returns:
+        pd.DataFrame: Статистика згенерованих ринків (рядок на ринок)
+
+    Raises:
+        FileExistsError: Папка містить Rd2_*.csv, яких немає у наборі (без overwrite)
+        ValueError: Некоректний профіль
+    """
+    profile = resolve_profile(profile)
+    output_dir = Path(output_dir) if output_dir is not None else RAW_DATA_PATH
+    client_ids = [first_client_id + i for i in range(n_markets)]
+
+    # Чужі raw файли змішалися б із синтетичними у preprocessing
+    expected = {f"Rd2_{client_id}.csv" for client_id in client_ids}
+    foreign = [p.name for p in output_dir.glob(RAW_FILE_PATTERN) if p.name not in expected]
+    if foreign and not overwrite:
+        raise FileExistsError(
+            f"{output_dir} містить {len(foreign)} інших raw файлів ({foreign[0]}, ...). "
+            f"Оберіть іншу папку або дозвольте overwrite"
+        )
+
+    if max_workers is None:
+        from project_core.calculation_parameters_config.machine_parameters import OPTIMAL_WORKERS
+        max_workers = OPTIMAL_WORKERS
+    max_workers = max(1, min(max_workers, n_markets))
+
+    tasks = [(client_id, i, output_dir, profile, seed) for i, client_id in enumerate(client_ids)]
+    if max_workers == 1:
+        stats = [_generate_and_write(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            stats = list(executor.map(_generate_and_write, *zip(*tasks)))
+
+    return pd.DataFrame(stats)
+
+
+# =============================================================================
+# ТЕСТУВАННЯ
+# =============================================================================
+
+if __name__ == "__main__":
+    df_market = generate_market(FIRST_CLIENT_ID, 0)
+    print(f"Ринок {FIRST_CLIENT_ID}: {len(df_market):,} рядків, "
+          f"{df_market['ORG_ID'].nunique()} аптек, {df_market['DRUGS_ID'].nunique()} препаратів")
+    print(df_market.head())